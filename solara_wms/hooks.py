@@ -36,21 +36,47 @@ fixtures = [
 doc_events = {
     "WMS Task": {
         "before_save": "solara_wms.wms.utils.check_stock_freeze_on_task"
-    }
+    },
+    # Returns desk lookup index (D2C Return Lookup). Handlers ignore non-Shopify
+    # documents, refresh the index in after-commit jobs, and swallow and log
+    # their own errors so they can never block an invoice or DN posting.
+    "Sales Invoice": {
+        "on_submit": "solara_wms.wms.d2c_return_lookup.on_sales_invoice_submit",
+        "on_cancel": "solara_wms.wms.d2c_return_lookup.on_sales_invoice_cancel",
+    },
+    "Delivery Note": {
+        "on_submit": "solara_wms.wms.d2c_return_lookup.on_delivery_note_submit",
+        "on_update_after_submit": "solara_wms.wms.d2c_return_lookup.on_delivery_note_update_after_submit",
+        "on_cancel": "solara_wms.wms.d2c_return_lookup.on_delivery_note_cancel",
+    },
+    # Shared barcode index (wms/item_barcodes.py). Item Barcode is a child of
+    # Item, so barcode edits arrive as Item saves.
+    "Item": {
+        "on_update": "solara_wms.wms.item_barcodes.on_item_update",
+        "on_trash": "solara_wms.wms.item_barcodes.on_item_trash",
+        "after_rename": "solara_wms.wms.item_barcodes.on_item_rename",
+    },
 }
 
 # Scheduled Tasks
 # ---------------
 scheduler_events = {
     "cron": {
+        # ERPNext drafts queued by floor completions (WMS ERP Outbox). No-op
+        # unless WMS Settings is in Draft Handoff mode; never submits.
+        "* * * * *": [
+            "solara_wms.wms.erp_outbox.drain_erp_outbox",
+        ],
         # D2C fulfillment — both jobs are internally gated (no-op unless enabled
         # in D2C Fulfillment Settings), so wiring them here is safe by default.
         "*/15 * * * *": [
             "solara_wms.wms.d2c_fulfillment.release_opd_replacements",
             "solara_wms.wms.d2c_fulfillment.release_d2c_shipments",
+            "solara_wms.wms.d2c_fulfillment.resume_release_ranges",
             "solara_wms.wms.d2c_fulfillment.fetch_d2c_labels",
             "solara_wms.wms.d2c_fulfillment.run_prepare_waves",
             "solara_wms.wms.inventory_accuracy.scheduled_inventory_reconciliation",
+            "solara_wms.wms.replenishment.scheduled_replenishment",
         ],
         # Customer-facing Shopify fulfillment/AWB sync. This is gated by
         # auto_fulfill_shopify AND custom_dispatched, so label creation alone
@@ -58,6 +84,10 @@ scheduler_events = {
         "*/5 * * * *": [
             "solara_wms.wms.d2c_fulfillment.sync_dispatched_shopify_fulfillments",
             "solara_wms.wms.shopify_address_sync.sync_shopify_address_changes",
+            # Deferred SHPSI27s queued by label fetch; gated by auto_invoice_on_label.
+            "solara_wms.wms.d2c_invoice_queue.drain_invoice_queue",
+            # Return Intakes whose preparation job failed or was lost.
+            "solara_wms.wms.d2c_returns.retry_return_intakes",
         ],
         # Ops Google Sheet mirror — gated by ops_sheet_enabled; secrets in site config.
         "*/30 * * * *": [
@@ -79,6 +109,16 @@ scheduler_events = {
         "40 2 * * *": [
             "solara_wms.wms.d2c_pack_verify.purge_pack_photos",
         ],
+        # Shadow-command idempotency ledger retention (WMS Settings,
+        # default 30 days). Movement/work event evidence is untouched.
+        "20 3 * * *": [
+            "solara_wms.wms.inventory.archive_idempotency_ledger",
+        ],
+        # Perpetual cycle-count plan for the day, before the first shift.
+        # Gated by cycle_count_planner_enabled (default OFF); Draft counts only.
+        "30 5 * * *": [
+            "solara_wms.wms.cycle_count_planner.scheduled_cycle_count_plan",
+        ],
         # Auto-stamp custom_dispatched from courier first-scan. Gated by
         # dispatch_stamp_enabled (default OFF); twice hourly.
         "5,35 * * * *": [
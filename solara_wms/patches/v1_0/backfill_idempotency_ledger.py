@@ -0,0 +1,32 @@
+"""Index every existing movement and work event key in WMS Idempotency Ledger.
+
+Ledger names are "WMS-IDEM-" + the first 20 hex digits of sha256(key), the same
+digest the DocType's autoname computes, so this is a set-based copy.
+"""
+
+import frappe
+
+
+SOURCES = (
+    ("WMS Movement", "Movement"),
+    ("WMS Work Event", "Work"),
+)
+
+
+def execute():
+    frappe.reload_doc("wms", "doctype", "wms_idempotency_ledger")
+    for doctype, command in SOURCES:
+        frappe.db.sql(
+            f"""
+            INSERT IGNORE INTO `tabWMS Idempotency Ledger`
+                (name, creation, modified, owner, modified_by, docstatus, idx,
+                 idempotency_key, request_hash, command, result_doctype,
+                 result_name, recorded_at)
+            SELECT CONCAT('WMS-IDEM-', UPPER(LEFT(SHA2(idempotency_key, 256), 20))),
+                   creation, creation, owner, owner, 0, 0,
+                   idempotency_key, request_hash, %s, %s, name, creation
+              FROM `tab{doctype}`
+             WHERE IFNULL(idempotency_key, '') != ''
+            """,
+            (command, doctype),
+        )
@@ -0,0 +1,27 @@
+"""Number every existing D2C Pack QC row and start the feed counter after them."""
+
+import frappe
+
+
+def execute():
+    frappe.reload_doc("wms", "doctype", "d2c_pack_qc")
+    from solara_wms.wms.d2c_pack_qc import QC_FEED_SERIES
+
+    frappe.db.sql(
+        "SET @feed_version := (SELECT IFNULL(MAX(feed_version), 0) FROM `tabD2C Pack QC`)")
+    frappe.db.sql(
+        """
+        UPDATE `tabD2C Pack QC`
+           SET feed_version = (@feed_version := @feed_version + 1)
+         WHERE IFNULL(feed_version, 0) = 0
+         ORDER BY staged_at, name
+        """
+    )
+    frappe.db.sql(
+        """
+        INSERT INTO `tabSeries` (`name`, `current`)
+        SELECT %s, IFNULL(MAX(feed_version), 0) FROM `tabD2C Pack QC`
+        ON DUPLICATE KEY UPDATE `current` = GREATEST(`current`, VALUES(`current`))
+        """,
+        (QC_FEED_SERIES,),
+    )
@@ -0,0 +1,31 @@
+"""Seed WMS Parcel Pick Summary from completed, unhanded parcel pick work."""
+
+import frappe
+
+
+def execute():
+    frappe.reload_doc("wms", "doctype", "wms_parcel_pick_summary")
+    frappe.reload_doc("wms", "doctype", "wms_work")
+    frappe.reload_doc("wms", "doctype", "wms_work_line")
+    from solara_wms.wms.pack_handoff import record_completed_pick
+
+    rows = frappe.db.sql(
+        """
+        SELECT w.name, w.parcel_awb, w.reference_name, w.warehouse,
+               l.item_code, l.executed_qty
+          FROM `tabWMS Work` w
+          JOIN `tabWMS Work Line` l
+            ON l.parent = w.name AND l.parenttype = 'WMS Work'
+         WHERE w.work_type = 'Pick' AND w.status = 'Completed'
+           AND w.reference_doctype = 'Delivery Note'
+           AND IFNULL(w.parcel_awb, '') != ''
+           AND IFNULL(w.pack_handoff, '') = ''
+         ORDER BY w.name
+        """,
+        as_dict=True,
+    )
+    for row in rows:
+        record_completed_pick(
+            row.parcel_awb, row.reference_name, row.warehouse, row.name,
+            row.item_code, row.executed_qty,
+        )
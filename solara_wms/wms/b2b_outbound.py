@@ -16,6 +16,7 @@ from solara_wms.wms.d2c_appliance_express import (
     DEFAULT_PREKIT_BUNDLES,
     express_config,
 )
+from solara_wms.wms.item_barcodes import barcodes_for, items_for_barcode
 
 
 CHANNELS = (
@@ -129,14 +130,6 @@ def _company():
             "Win The Buy Box Private Limited")
 
 
-def _ean(item_code):
-    rows = frappe.get_all(
-        "Item Barcode", filters={"parent": item_code}, fields=["barcode"],
-        order_by="idx asc", limit_page_length=2,
-    )
-    return rows[0].barcode if rows else None
-
-
 def _item_master(item_code):
     fields = [
         "item_name", "is_stock_item", "disabled", "qty_per_carton",
@@ -206,6 +199,7 @@ def _physical_items(source):
                 fields=["item_code", "qty"], order_by="idx asc"):
             _merge_item(merged, child.item_code, flt(row.qty) * flt(child.qty))
 
+    eans = barcodes_for(merged)
     rows = []
     for item_code, expected_qty in merged.items():
         master = _item_master(item_code)
@@ -217,7 +211,7 @@ def _physical_items(source):
         rows.append({
             "item_code": item_code,
             "item_name": master.item_name or item_code,
-            "ean": _ean(item_code) or "",
+            "ean": (eans.get(item_code) or [""])[0],
             "expected_qty": expected_qty,
             "packed_qty": 0,
             "qty_per_carton": cint(master.qty_per_carton),
@@ -567,11 +561,7 @@ def _match_job_item(job, code):
     # select Triply on screen while holding a Cast Iron carton.  Accept any
     # barcode mapped to the job item in Atlas, but never accept an unmapped SKU
     # string as proof of the physical product.
-    barcode_items = frappe.get_all(
-        "Item Barcode", filters={"barcode": value}, fields=["parent"],
-        limit_page_length=5,
-    )
-    mapped = {row.parent for row in barcode_items}
+    mapped = set(items_for_barcode(value))
     matches = [row for row in job.items or []
                if (row.ean and value == row.ean) or row.item_code in mapped]
     if not matches:
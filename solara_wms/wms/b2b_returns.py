@@ -18,6 +18,7 @@ from frappe.utils import cint, flt, now_datetime, today
 from solara_wms.wms.doctype.return_intake.return_intake import (
     target_warehouse_for_condition,
 )
+from solara_wms.wms.item_barcodes import barcodes_for
 
 
 CHANNELS = {"Blinkit", "Swiggy", "Zepto", "Amazon VC", "Flipkart VC", "Offline", "Other"}
@@ -27,6 +28,8 @@ FINDINGS = {
     "Missing accessories", "Wrong product", "Short quantity",
     "Excess quantity", "Packaging damage only", "Other",
 }
+QUEUE_PAGE_SIZE = 50
+QUEUE_MAX_PAGE = 200
 BUCKETS = (
     ("good_qty", "Good"),
     ("repairable_qty", "Repairable"),
@@ -51,12 +54,6 @@ def _company():
             "Win The Buy Box Private Limited")
 
 
-def _ean(item_code):
-    row = frappe.get_all("Item Barcode", filters={"parent": item_code},
-                         fields=["barcode"], order_by="idx asc", limit_page_length=1)
-    return row[0].barcode if row else None
-
-
 def _payload(doc):
     return {
         "lot": doc.name,
@@ -150,6 +147,7 @@ def b2b_return_start(channel, inventory_treatment, platform_return_id,
     items = _parse(expected_items, list, [])
     if not items:
         frappe.throw("Add at least one expected SKU from the platform return document.")
+    eans = barcodes_for({(raw.get("item_code") or "").strip() for raw in items})
     item_rows = []
     for raw in items:
         code = (raw.get("item_code") or "").strip()
@@ -161,7 +159,7 @@ def b2b_return_start(channel, inventory_treatment, platform_return_id,
         item_rows.append({
             "item_code": code,
             "item_name": frappe.db.get_value("Item", code, "item_name") or code,
-            "ean": (raw.get("ean") or _ean(code) or "").strip(),
+            "ean": (raw.get("ean") or (eans.get(code) or [""])[0]).strip(),
             "expected_qty": qty,
             "received_qty": 0,
         })
@@ -414,10 +412,114 @@ def b2b_return_finalize(lot, item_results, evidence, notes=None):
 
 @frappe.whitelist()
 def b2b_return_queue(status=None, limit=250):
-    """Read-only floor/HQ queue for platform return lots."""
+    """Read-only floor/HQ queue for platform return lots, with full payloads.
+    Large drops should use b2b_return_queue_summary, b2b_return_queue_page and
+    b2b_return_lot_detail instead."""
     filters = {"status": status} if status else {}
     names = frappe.get_all("B2B Return Lot", filters=filters, pluck="name",
                            order_by="creation desc",
                            limit_page_length=min(max(cint(limit) or 250, 1), 1000))
     rows = [_payload(frappe.get_doc("B2B Return Lot", name)) for name in names]
     return {"rows": rows, "count": len(rows)}
+
+
+def _queue_conditions(status=None, channel=None, inventory_treatment=None):
+    conditions, values = [], {}
+    for field, value in (("status", status), ("channel", channel),
+                         ("inventory_treatment", inventory_treatment)):
+        if value:
+            conditions.append("lot.`{0}` = %({0})s".format(field))
+            values[field] = value
+    return conditions, values
+
+
+def _where(conditions):
+    return ("WHERE " + " AND ".join(conditions)) if conditions else ""
+
+
+@frappe.whitelist()
+def b2b_return_queue_summary(channel=None, inventory_treatment=None):
+    """Queue header counts per status, channel and treatment, from one grouped
+    query. No lot document is loaded."""
+    conditions, values = _queue_conditions(channel=channel,
+                                           inventory_treatment=inventory_treatment)
+    groups = frappe.db.sql(
+        """
+        SELECT lot.status, lot.channel, lot.inventory_treatment,
+               COUNT(*) AS lots, SUM(lot.exception) AS exceptions,
+               SUM(lot.expected_cartons) AS expected_cartons,
+               SUM(lot.received_cartons) AS received_cartons
+          FROM `tabB2B Return Lot` lot
+          {0}
+         GROUP BY lot.status, lot.channel, lot.inventory_treatment
+        """.format(_where(conditions)),
+        values,
+        as_dict=True,
+    )
+    summary = {"total": 0, "exceptions": 0, "expected_cartons": 0, "received_cartons": 0,
+               "by_status": {}, "by_channel": {}, "by_treatment": {}}
+    for group in groups:
+        lots = cint(group.lots)
+        summary["total"] += lots
+        for key in ("exceptions", "expected_cartons", "received_cartons"):
+            summary[key] += cint(group.get(key))
+        for bucket, value in (("by_status", group.status), ("by_channel", group.channel),
+                              ("by_treatment", group.inventory_treatment)):
+            summary[bucket][value or ""] = summary[bucket].get(value or "", 0) + lots
+    return summary
+
+
+@frappe.whitelist()
+def b2b_return_queue_page(status=None, channel=None, inventory_treatment=None,
+                          after=None, limit=QUEUE_PAGE_SIZE):
+    """One page of lot headers, newest first, with per-lot line totals computed
+    in SQL. Pass the returned next_after back as `after` for the next page;
+    it is None on the last page. Open a lot with b2b_return_lot_detail."""
+    limit = min(max(cint(limit) or QUEUE_PAGE_SIZE, 1), QUEUE_MAX_PAGE)
+    conditions, values = _queue_conditions(status, channel, inventory_treatment)
+    if after:
+        creation, _sep, name = str(after).partition("|")
+        conditions.append(
+            "(lot.creation < %(after_creation)s OR "
+            "(lot.creation = %(after_creation)s AND lot.name < %(after_name)s))")
+        values.update(after_creation=creation, after_name=name)
+    values["limit"] = limit + 1
+    rows = frappe.db.sql(
+        """
+        SELECT lot.name AS lot, lot.status AS lot_status, lot.channel,
+               lot.inventory_treatment, lot.platform_return_id, lot.platform_document_no,
+               lot.expected_cartons, lot.received_cartons, lot.inventory_status,
+               lot.draft_stock_entry, lot.return_intake, lot.exception,
+               lot.received_at, lot.completed_at, lot.creation,
+               COUNT(item.name) AS item_lines,
+               COALESCE(SUM(item.expected_qty), 0) AS expected_qty,
+               COALESCE(SUM(item.received_qty), 0) AS received_qty
+          FROM `tabB2B Return Lot` lot
+          LEFT JOIN `tabB2B Return Lot Item` item
+            ON item.parent = lot.name AND item.parenttype = 'B2B Return Lot'
+          {0}
+         GROUP BY lot.name
+         ORDER BY lot.creation DESC, lot.name DESC
+         LIMIT %(limit)s
+        """.format(_where(conditions)),
+        values,
+        as_dict=True,
+    )
+    more = len(rows) > limit
+    rows = rows[:limit]
+    for row in rows:
+        row.exception = cint(row.exception)
+        row.expected_qty = flt(row.expected_qty)
+        row.received_qty = flt(row.received_qty)
+    next_after = "{0}|{1}".format(rows[-1].creation, rows[-1].lot) if more else None
+    return {"rows": rows, "count": len(rows), "next_after": next_after}
+
+
+@frappe.whitelist()
+def b2b_return_lot_detail(lot):
+    """Full lot - cartons and item QC lines - loaded when a queue row is opened."""
+    if not frappe.db.exists("B2B Return Lot", lot):
+        return {"status": "not_found", "lot": lot, "message": "Return lot not found."}
+    out = _payload(frappe.get_doc("B2B Return Lot", lot))
+    out["status"] = "ok"
+    return out
@@ -0,0 +1,153 @@
+"""Pure perpetual cycle-count planning: ABC classes and a daily count plan.
+
+Items are ranked by a blend of stock value and pick velocity, so both an
+expensive slow mover and a cheap fast mover land in A. A bin takes the best
+class of anything it holds and is due once its class cycle has elapsed. Each
+day the planner fills a counter-minute budget with the most urgent bins -
+recent pick shortages and reconciliation variances first, then the most
+overdue - and spreads them over the shifts.
+"""
+
+from dataclasses import dataclass
+
+
+CLASS_ORDER = {"A": 0, "B": 1, "C": 2}
+# A bin becomes eligible once this fraction of its cycle has passed, so the
+# load is levelled by counting a little early instead of in due-date spikes.
+EARLY_FRACTION = 0.5
+
+
+class CycleCountPlanError(ValueError):
+    pass
+
+
+def classify_abc(items, a_share=0.8, b_share=0.95):
+    """{item: (stock_value, pick_visits)} -> {item: "A" | "B" | "C"}.
+
+    Each item scores its share of total value plus its share of total
+    visits; items are taken best-first until the cumulative score reaches
+    a_share (A), then b_share (B); the rest are C.
+    """
+    if not 0 < a_share <= b_share <= 1:
+        raise CycleCountPlanError("ABC shares must satisfy 0 < A <= B <= 1")
+    total_value = sum(max(value, 0) for value, _visits in items.values())
+    total_visits = sum(max(visits, 0) for _value, visits in items.values())
+    scores = {
+        item: (max(value, 0) / total_value if total_value else 0)
+        + (max(visits, 0) / total_visits if total_visits else 0)
+        for item, (value, visits) in items.items()
+    }
+    total = sum(scores.values())
+    classes = {}
+    cumulative = 0
+    for item in sorted(scores, key=lambda code: (-scores[code], code)):
+        if not total or not scores[item]:
+            classes[item] = "C"
+            continue
+        # An item is in the band its score starts in, so the top item is
+        # always A even when it alone exceeds a_share.
+        start = cumulative / total
+        cumulative += scores[item]
+        classes[item] = "A" if start < a_share else "B" if start < b_share else "C"
+    return classes
+
+
+def bin_class(item_classes):
+    return min(item_classes, key=CLASS_ORDER.__getitem__, default="C")
+
+
+@dataclass(frozen=True)
+class CountCandidate:
+    """One bin that could be counted today."""
+
+    bin: str
+    abc_class: str
+    items: int
+    # None when the bin has never been counted.
+    days_since_count: int = None
+    shortages: int = 0
+    variance: bool = False
+
+
+def count_minutes(candidate, minutes_per_bin, minutes_per_item):
+    return minutes_per_bin + minutes_per_item * candidate.items
+
+
+def _overdue(candidate, cycle_days):
+    if candidate.days_since_count is None:
+        return float("inf")
+    return candidate.days_since_count / max(cycle_days[candidate.abc_class], 1)
+
+
+def _reason(candidate, overdue):
+    if candidate.shortages:
+        return "Pick shortage"
+    if candidate.variance:
+        return "Reconciliation variance"
+    if overdue == float("inf"):
+        return "Never counted"
+    return "Overdue" if overdue >= 1 else "Due"
+
+
+def plan_daily_counts(
+    candidates,
+    cycle_days,
+    capacity_minutes,
+    shifts=1,
+    minutes_per_bin=5,
+    minutes_per_item=1,
+):
+    """Choose today's bins and assign each to the least-loaded shift.
+
+    `cycle_days` maps class to its cycle length. A bin that does not fit
+    the remaining shift budget is deferred to a later day. Returns the plan,
+    deferred bins, per-shift minutes and `required_minutes`, the steady-state
+    daily load that covers every bin once per cycle.
+    """
+    if shifts < 1:
+        raise CycleCountPlanError("At least one counting shift is required")
+    if capacity_minutes < 0 or minutes_per_bin < 0 or minutes_per_item < 0:
+        raise CycleCountPlanError("Counting time budgets cannot be negative")
+    if any(cycle_days.get(cls, 0) < 1 for cls in CLASS_ORDER):
+        raise CycleCountPlanError("Every ABC class needs a cycle of at least one day")
+
+    shift_capacity = capacity_minutes / shifts
+    load = [0] * shifts
+    ranked = []
+    for candidate in candidates:
+        overdue = _overdue(candidate, cycle_days)
+        flagged = bool(candidate.shortages or candidate.variance)
+        if flagged or overdue >= EARLY_FRACTION:
+            ranked.append((not flagged, -overdue, CLASS_ORDER[candidate.abc_class],
+                           candidate.bin, candidate, overdue))
+    ranked.sort(key=lambda entry: entry[:4])
+
+    planned = []
+    deferred = []
+    for *_key, candidate, overdue in ranked:
+        minutes = count_minutes(candidate, minutes_per_bin, minutes_per_item)
+        shift = min(range(shifts), key=lambda index: (load[index], index))
+        if load[shift] + minutes > shift_capacity:
+            deferred.append(candidate.bin)
+            continue
+        load[shift] += minutes
+        planned.append(
+            {
+                "bin": candidate.bin,
+                "abc_class": candidate.abc_class,
+                "shift": shift + 1,
+                "minutes": minutes,
+                "reason": _reason(candidate, overdue),
+            }
+        )
+    required = sum(
+        count_minutes(candidate, minutes_per_bin, minutes_per_item)
+        / cycle_days[candidate.abc_class]
+        for candidate in candidates
+    )
+    return {
+        "planned": planned,
+        "deferred": deferred,
+        "shift_minutes": load,
+        "required_minutes": round(required, 1),
+    }
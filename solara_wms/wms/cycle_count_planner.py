@@ -0,0 +1,313 @@
+"""Rolling perpetual cycle-count planner for the pilot warehouse.
+
+Each day the planner classifies stocked bins A/B/C from stock value and pick
+velocity, raises bins with a pick shortage since their last count or an item
+in the reconciliation variance list, and creates Draft `WMS Cycle Count`
+records sized to the configured counter-hours and spread across shifts. The
+counts then run through the normal blind-count flow; nothing here snapshots
+or touches a balance.
+"""
+
+from collections import defaultdict
+
+import frappe
+from frappe import _
+from frappe.utils import add_days, cint, date_diff, flt, getdate, nowdate
+
+from solara_wms.wms.cycle_count_domain import (
+    CountCandidate,
+    CycleCountPlanError,
+    bin_class,
+    classify_abc,
+    count_minutes,
+    plan_daily_counts,
+)
+from solara_wms.wms.inventory_accuracy import MANAGER_ROLES, reconcile_warehouse
+
+
+SETTINGS_FIELDS = (
+    "operating_mode",
+    "pilot_warehouse",
+    "cycle_count_planner_enabled",
+    "cycle_count_counter_hours",
+    "cycle_count_shifts",
+    "cycle_count_a_days",
+    "cycle_count_b_days",
+    "cycle_count_c_days",
+    "cycle_count_minutes_per_bin",
+    "cycle_count_minutes_per_item",
+    "cycle_count_velocity_days",
+)
+OPEN_COUNT_STATES = ("Draft", "In Progress", "Recount Required", "Variance Review")
+COUNTED_STATES = ("Variance Review", "Completed")
+PLANNER_NOTE = "Perpetual cycle count"
+
+
+def _settings():
+    values = frappe.db.get_value("WMS Settings", None, SETTINGS_FIELDS, as_dict=True)
+    return values or frappe._dict()
+
+
+def _cycle_days(settings):
+    return {
+        "A": cint(settings.cycle_count_a_days) or 30,
+        "B": cint(settings.cycle_count_b_days) or 90,
+        "C": cint(settings.cycle_count_c_days) or 180,
+    }
+
+
+def _budget(settings):
+    return {
+        "capacity_minutes": flt(settings.cycle_count_counter_hours or 4) * 60,
+        "shifts": cint(settings.cycle_count_shifts) or 1,
+        "minutes_per_bin": flt(settings.cycle_count_minutes_per_bin or 4),
+        "minutes_per_item": flt(settings.cycle_count_minutes_per_item or 1.5),
+    }
+
+
+def scheduled_cycle_count_plan():
+    """Daily entry: plan the pilot warehouse's counts for today."""
+    settings = _settings()
+    if (
+        not cint(settings.cycle_count_planner_enabled)
+        or settings.operating_mode not in ("Shadow", "Draft Handoff")
+        or not settings.pilot_warehouse
+    ):
+        return
+    result = _plan(settings.pilot_warehouse, settings, create=True)
+    frappe.logger("solara_wms").info(
+        "WMS cycle count plan: " + frappe.as_json(
+            {k: result[k] for k in ("warehouse", "created", "deferred", "required_minutes")}
+        )
+    )
+
+
+def _require_manager(warehouse, settings):
+    if not MANAGER_ROLES.intersection(frappe.get_roles()):
+        frappe.throw(_("Only a Stock Manager can plan cycle counts"), frappe.PermissionError)
+    if settings.pilot_warehouse and warehouse != settings.pilot_warehouse:
+        frappe.throw(
+            _("Counts are restricted to pilot warehouse {0}").format(settings.pilot_warehouse)
+        )
+
+
+@frappe.whitelist(methods=["GET"])
+def preview_cycle_count_plan(warehouse):
+    """Today's plan without creating counts."""
+    settings = _settings()
+    _require_manager(warehouse, settings)
+    return _plan(warehouse, settings, create=False)
+
+
+@frappe.whitelist(methods=["POST"])
+def generate_cycle_count_plan(warehouse):
+    """Create today's Draft counts; re-running only tops up unused capacity."""
+    settings = _settings()
+    _require_manager(warehouse, settings)
+    return _plan(warehouse, settings, create=True)
+
+
+def _plan(warehouse, settings, create=False):
+    today = getdate(nowdate())
+    cycle_days = _cycle_days(settings)
+    budget = _budget(settings)
+    contents = _bin_contents(warehouse)
+    open_counts = _open_counts(warehouse)
+    last_counted = _last_counted(warehouse)
+    shortages = _shortages_since_count(
+        warehouse, last_counted, add_days(today, -max(cycle_days.values()))
+    )
+    variance_items = _variance_items(warehouse)
+    velocity = _pick_visits(
+        warehouse, add_days(today, -(cint(settings.cycle_count_velocity_days) or 90))
+    )
+
+    values = defaultdict(float)
+    for rows in contents.values():
+        for row in rows:
+            values[row.item_code] += flt(row.physical_qty) * flt(row.valuation_rate)
+    item_classes = classify_abc(
+        {item: (values[item], velocity.get(item, 0)) for item in values}
+    )
+
+    candidates = []
+    for bin_name, rows in contents.items():
+        if bin_name in open_counts:
+            continue
+        counted = last_counted.get(bin_name)
+        candidates.append(
+            CountCandidate(
+                bin=bin_name,
+                abc_class=bin_class(item_classes[row.item_code] for row in rows),
+                items=len(rows),
+                days_since_count=date_diff(today, counted) if counted else None,
+                shortages=shortages.get(bin_name, 0),
+                variance=any(row.item_code in variance_items for row in rows),
+            )
+        )
+
+    # Counts already planned for today use up part of the day's budget.
+    used = sum(
+        count_minutes(
+            CountCandidate(bin_name, "C", len(contents.get(bin_name, ()))),
+            budget["minutes_per_bin"],
+            budget["minutes_per_item"],
+        )
+        for bin_name, scheduled in open_counts.items()
+        if scheduled and getdate(scheduled) == today
+    )
+    try:
+        plan = plan_daily_counts(
+            candidates,
+            cycle_days,
+            max(budget["capacity_minutes"] - used, 0),
+            shifts=budget["shifts"],
+            minutes_per_bin=budget["minutes_per_bin"],
+            minutes_per_item=budget["minutes_per_item"],
+        )
+    except CycleCountPlanError as exc:
+        frappe.throw(_(str(exc)))
+
+    created = []
+    if create:
+        bin_codes = _bin_codes([entry["bin"] for entry in plan["planned"]])
+        for entry in plan["planned"]:
+            created.append(_create_count(warehouse, entry, bin_codes, today))
+    return {
+        "warehouse": warehouse,
+        "date": str(today),
+        "bins": len(contents),
+        "capacity_minutes": budget["capacity_minutes"],
+        "already_planned_minutes": used,
+        "required_minutes": plan["required_minutes"],
+        "shift_minutes": plan["shift_minutes"],
+        "planned": plan["planned"],
+        "deferred": len(plan["deferred"]),
+        "created": created,
+        "class_counts": {
+            cls: sum(1 for c in candidates if c.abc_class == cls) for cls in ("A", "B", "C")
+        },
+    }
+
+
+def _create_count(warehouse, entry, bin_codes, today):
+    doc = frappe.get_doc(
+        {
+            "doctype": "WMS Cycle Count",
+            "count_name": "{0} - Shift {1}".format(
+                bin_codes.get(entry["bin"], entry["bin"]), entry["shift"]
+            ),
+            "count_type": "ABC-" + entry["abc_class"],
+            "abc_class": entry["abc_class"],
+            "warehouse": warehouse,
+            "bin": entry["bin"],
+            "scheduled_date": today,
+            "count_shift": entry["shift"],
+            "status": "Draft",
+            "notes": "{0}: {1} (~{2:g} min)".format(
+                PLANNER_NOTE, entry["reason"], entry["minutes"]
+            ),
+        }
+    )
+    doc.insert(ignore_permissions=True)
+    return doc.name
+
+
+def _bin_contents(warehouse):
+    """Stocked items per active bin, with the Atlas valuation rate."""
+    rows = frappe.db.sql(
+        """
+        SELECT bal.bin, bal.item_code, bal.physical_qty,
+               IFNULL(atlas.valuation_rate, 0) AS valuation_rate
+          FROM `tabWMS Bin Balance` bal
+          JOIN `tabWarehouse Bin` wb ON wb.name = bal.bin
+          LEFT JOIN `tabBin` atlas
+            ON atlas.warehouse = bal.warehouse AND atlas.item_code = bal.item_code
+         WHERE bal.warehouse = %s
+           AND wb.is_active = 1
+           AND (bal.physical_qty != 0 OR bal.allocated_qty != 0 OR bal.hold_qty != 0)
+        """,
+        (warehouse,),
+        as_dict=True,
+    )
+    contents = defaultdict(list)
+    for row in rows:
+        contents[row.bin].append(row)
+    return contents
+
+
+def _open_counts(warehouse):
+    rows = frappe.get_all(
+        "WMS Cycle Count",
+        filters={"warehouse": warehouse, "status": ["in", OPEN_COUNT_STATES]},
+        fields=["bin", "scheduled_date"],
+    )
+    return {row.bin: row.scheduled_date for row in rows if row.bin}
+
+
+def _last_counted(warehouse):
+    rows = frappe.db.sql(
+        """
+        SELECT bin, MAX(counted_at) AS counted_at
+          FROM `tabWMS Cycle Count`
+         WHERE warehouse = %s AND status IN %s AND counted_at IS NOT NULL
+         GROUP BY bin
+        """,
+        (warehouse, COUNTED_STATES),
+        as_dict=True,
+    )
+    return {row.bin: row.counted_at for row in rows}
+
+
+def _shortages_since_count(warehouse, last_counted, since):
+    """Pick shortages per bin reported after that bin's last count."""
+    rows = frappe.db.sql(
+        """
+        SELECT scanned_bin, posted_at
+          FROM `tabWMS Work Event`
+         WHERE warehouse = %s
+           AND event_type = 'Pick Shortage'
+           AND posted_at >= %s
+        """,
+        (warehouse, since),
+        as_dict=True,
+    )
+    shortages = defaultdict(int)
+    for row in rows:
+        counted = last_counted.get(row.scanned_bin)
+        if not counted or row.posted_at > counted:
+            shortages[row.scanned_bin] += 1
+    return shortages
+
+
+def _variance_items(warehouse):
+    report = reconcile_warehouse(warehouse, only_variances=1)
+    return {row["item_code"] for row in report["items"]}
+
+
+def _pick_visits(warehouse, since):
+    rows = frappe.db.sql(
+        """
+        SELECT item_code, COUNT(*) AS visits
+          FROM `tabWMS Movement`
+         WHERE warehouse = %s
+           AND movement_type = 'Pick'
+           AND status = 'Posted'
+           AND posted_at >= %s
+         GROUP BY item_code
+        """,
+        (warehouse, since),
+        as_dict=True,
+    )
+    return {row.item_code: cint(row.visits) for row in rows}
+
+
+def _bin_codes(bins):
+    if not bins:
+        return {}
+    return {
+        row.name: row.bin_code
+        for row in frappe.get_all(
+            "Warehouse Bin", filters={"name": ["in", bins]}, fields=["name", "bin_code"]
+        )
+    }
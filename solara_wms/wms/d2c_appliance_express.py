@@ -10,7 +10,9 @@ appliance parcel still gets its own AWB, carton-EAN, condition and photo checks.
 import json
 
 import frappe
-from frappe.utils import cint, flt
+from frappe.utils import cint, flt, get_datetime
+
+from solara_wms.wms.item_barcodes import barcodes_for
 
 
 DEFAULT_APPLIANCE_SKUS = ("SOL-AF-501", "SOL-AF-124", "SOL-JUC-121")
@@ -45,6 +47,9 @@ DEFAULT_EXPRESS_MULTIBOX_ACCESSORIES = (
     "SOL-WB-105",
 )
 STATION = "Appliance Express"
+# Parsed express_config for the last settings version seen by this worker,
+# keyed by (site, modified): the code lists only change on a settings save.
+_CONFIG_CACHE = {}
 
 
 def _value(row, key, default=None):
@@ -61,8 +66,22 @@ def _codes(value, defaults):
 
 
 def express_config(settings=None):
+    """Parsed Express settings. Callers must treat the sets as read-only: the
+    same dict is returned until D2C Fulfillment Settings is saved again."""
     if settings is None:
-        settings = frappe.get_single("D2C Fulfillment Settings")
+        settings = frappe.get_cached_doc("D2C Fulfillment Settings")
+    modified = settings.get("modified")
+    version = (getattr(frappe.local, "site", None), str(modified)) if modified else None
+    if version and _CONFIG_CACHE.get("version") == version:
+        return _CONFIG_CACHE["config"]
+    config = _parse_config(settings)
+    if version:
+        _CONFIG_CACHE.clear()
+        _CONFIG_CACHE.update(version=version, config=config)
+    return config
+
+
+def _parse_config(settings):
     raw_enabled = settings.get("appliance_express_enabled")
     raw_qc_enabled = settings.get("appliance_express_qc_enabled")
     return {
@@ -187,11 +206,47 @@ def classify_dn(dn, config=None):
         multibox_accessories=config.get("multibox_accessories"))
 
 
+def stored_verdict(dn_name, batch):
+    """The verdict classify_dn stored on the prepare-batch row when the wave
+    was built, or None when the DN was not classified there or has been
+    modified since (an amended DN has a new name and is never found)."""
+    if not (dn_name and batch):
+        return None
+    rows = frappe.db.sql(
+        """
+        SELECT r.express_verdict, r.dn_modified, dn.modified
+        FROM `tabD2C Prepare Batch DN` r
+        JOIN `tabDelivery Note` dn ON dn.name = r.delivery_note
+        WHERE r.parent = %s AND r.delivery_note = %s
+        LIMIT 1
+        """,
+        (batch, dn_name), as_dict=True)
+    if not rows or not rows[0].express_verdict or not rows[0].dn_modified:
+        return None
+    if get_datetime(rows[0].dn_modified) != get_datetime(rows[0].modified):
+        return None
+    try:
+        verdict = json.loads(rows[0].express_verdict)
+    except (TypeError, ValueError):
+        return None
+    return verdict if isinstance(verdict, dict) and "eligible" in verdict else None
+
+
+def _parcel_decision(out, cfg):
+    # A single-parcel DN's parcel IS the DN, so the wave verdict answers the
+    # scan. A multi-box DN the wave sent to Express still needs this parcel's
+    # own carton item, so only that case classifies the scanned pieces.
+    box_count = out.get("box_count") or 1
+    verdict = stored_verdict(out.get("dn"), out.get("printed_batch"))
+    if verdict is not None and (not verdict.get("eligible") or cint(box_count) <= 1):
+        return verdict
+    return classify_lines(out.get("pieces") or [], box_count,
+                          cfg["appliance_skus"], cfg["prekit_bundles"],
+                          cfg["combo_bundles"], cfg["multibox_bundles"])
+
+
 def _barcodes(item_code):
-    rows = frappe.get_all("Item Barcode", filters={"parent": item_code},
-                          fields=["barcode"], limit_page_length=0)
-    return sorted({str(_value(row, "barcode") or "").strip() for row in rows
-                   if str(_value(row, "barcode") or "").strip()})
+    return sorted(set(barcodes_for([item_code]).get(item_code) or []))
 
 
 @frappe.whitelist()
@@ -244,11 +299,10 @@ def appliance_express_get(code):
     if out.get("status") not in ("ok", "already"):
         return out
     cfg = express_config()
-    decision = classify_lines(out.get("pieces") or [], out.get("box_count") or 1,
-                              cfg["appliance_skus"], cfg["prekit_bundles"],
-                              cfg["combo_bundles"], cfg["multibox_bundles"])
     if not cfg["enabled"]:
         decision = {"eligible": False, "reason": "Appliance Express is switched off."}
+    else:
+        decision = _parcel_decision(out, cfg)
     if not decision.get("eligible"):
         return {"status": "not_express", "message": decision["reason"],
                 "order": out.get("order"), "awb": out.get("awb")}
@@ -11,7 +11,9 @@ Pipeline (all gated by the `D2C Fulfillment Settings` single doctype):
       release_d2c_shipments()   scheduler */15   ← THIS FILE
         eligible = submitted SHP SO, not On Hold, per_delivered=0,
                    skip_delivery_note=0, all items in stock,
-                   NO multi-box SKU (config), not already DN'd
+                   NO multi-box SKU (config), not already DN'd or in flight
+        → queued as a D2C Release Submit (one per SO)
+      submit_queued_dn()        dn submit queue, N at a time
         → make_delivery_note(so) → submit
         → existing LIVE scripts fire on DN submit:
              "Create Clickpost Shipment"  → AWB + shipping_label
@@ -48,15 +50,46 @@ import hashlib
 import io
 import json
 import os
+import time
 
 import frappe
 from frappe import _
-from frappe.utils import cint, flt, get_datetime, now_datetime, nowdate, add_days, add_to_date, getdate
-
+from frappe.utils import cint, flt, get_datetime, now_datetime, nowdate, add_days, add_to_date, date_diff, getdate
+
+from solara_wms.wms.shopify_cost import CostBucket, is_throttled
+from solara_wms.wms.shopify_fulfillment_state import (
+    MUTATION_COST,
+    ORDER_STATE_COST,
+    ORDERS_PER_QUERY,
+    fulfillment_action,
+    order_states_query,
+    parse_order_states,
+    query_cost,
+)
 from solara_wms.wms.utils import get_available_qty
 
 
 SETTINGS_DOCTYPE = "D2C Fulfillment Settings"
+RELEASE_EXCEPTION_DOCTYPE = "D2C Release Exception"
+RELEASE_SUBMIT_DOCTYPE = "D2C Release Submit"
+DN_SUBMIT_QUEUE = "d2c_dn_submit"
+DN_SUBMIT_CONCURRENCY = 4
+DN_SUBMIT_TIMEOUT = 600          # one DN submit (GL/SLE + CP AWB + Shopify sync)
+DN_SUBMIT_STALE_MINUTES = 30     # a Submitting order whose job died is re-queued after this
+DN_SUBMIT_RETRY_MINUTES = 15     # a failed submit is re-queued by the next run after this
+DN_SUBMIT_MAX_ATTEMPTS = 5       # then the order stays Failed until requeue_dn_submit
+IN_FLIGHT_STATUSES = ("Queued", "Submitting")
+RELEASE_RANGE_DOCTYPE = "D2C Release Range"
+RELEASE_RANGE_WORKERS = 4        # parallel range-release jobs; each claims one day at a time
+RELEASE_RANGE_TIMEOUT = 3600     # also how long a claimed day may stay in flight
+RELEASE_RANGE_DAY_ATTEMPTS = 2   # a day whose worker dies this often is marked failed
+RELEASE_RANGE_DAY_PASSES = 400   # safety ceiling per day (400 * max_orders_per_run)
+RELEASE_RANGE_EVENT = "d2c_release_range_progress"
+RELEASE_RANGE_COUNTS = (
+    "created", "skipped_multibox", "skipped_nostock", "skipped_dn_exists",
+    "skipped_bad_data", "skipped_on_hold", "skipped_ppcod", "skipped_broken_ppcod",
+    "skipped_in_flight", "failed",
+)
 DEFAULT_WAREHOUSE = "Main Warehouse - WTBBPL"
 DEFAULT_PREFIX = "SHP"
 # Deferred-invoice SI (raised after the label is fetched, not at DN submit).
@@ -91,6 +124,14 @@ PER_ORDER_LABEL_ITEMS = {"SOL-GIFWRAP", "SOL-INS-PERSONALISATION"}
 # in the safe_exec sandbox (throws 'NoneType' object is not callable — 133 fails/24h
 # as of 2026-07-15), and the connector's own fulfillment sync is off
 # (Shopify Setting.sync_delivery_note=0). So we do it here in app code (real HTTP).
+# Shopify rate-limit model (see shopify_cost). Standard-plan limits seed the
+# bucket until the shop's own throttleStatus is seen.
+SHOPIFY_GQL_BUCKET = "d2c_shopify_graphql_cost"
+SHOPIFY_GQL_DEFAULT = (1000, 50)   # points, points restored per second
+SHOPIFY_MAX_WAIT_SEC = 20          # longer than this for budget = treat as throttled
+FULFILL_SYNC_BUDGET_SEC = 240      # one */5 catch-up tick
+FULFILL_SYNC_MAX = 1000
+
 SHOPIFY_CARRIER_MAP = {
     "Delhivery": "Delhivery", "Bluedart": "Bluedart", "Blue Dart": "Bluedart",
     "DTDC": "DTDC Express", "Xpressbees": "XpressBees", "Ecom Express": "Ecom Express",
@@ -584,8 +625,9 @@ def _release_opd_replacements():
 # ─── RELEASE JOB: eligible SHP SO → Delivery Note ─────────────────
 
 def release_d2c_shipments(force=False):
-    """Scheduler entry (*/15). Auto-create + submit Delivery Notes for eligible
-    single-AWB Shopify Sales Orders. Idempotent, gated, per-order isolated.
+    """Scheduler entry (*/15). Decide which single-AWB Shopify Sales Orders are
+    eligible and queue their Delivery Note submits (submit_queued_dn runs them on
+    the DN submit queue). Idempotent, gated, per-order isolated.
 
     force=True is the MANUAL pull (Run Release Now button): it bypasses the
     release_enabled pause + the cutoff-hour gate so the warehouse can release a
@@ -625,7 +667,8 @@ def _release_d2c_shipments(force=False):
             "D2C Release",
             "created={0} skipped_multibox={1} skipped_nostock={2} "
             "skipped_dn_exists={3} skipped_bad_data={4} skipped_on_hold={5} "
-            "skipped_ppcod={6} skipped_broken_ppcod={7} failed={8} dry_run={9}\n"
+            "skipped_ppcod={6} skipped_broken_ppcod={7} failed={8} dry_run={9} "
+            "skipped_in_flight={13}\n"
             "bad_data_sos={10}\nbroken_ppcod_sos={11}\nfailures={12}".format(
                 result["created"], result["skipped_multibox"],
                 result["skipped_nostock"], result["skipped_dn_exists"],
@@ -634,7 +677,7 @@ def _release_d2c_shipments(force=False):
                 result["failed"], cint(settings.get("dry_run")),
                 json.dumps(result["bad_data_sos"][:20]),
                 json.dumps(result["broken_ppcod_sos"][:20]),
-                json.dumps(result["failures"][:20]),
+                json.dumps(result["failures"][:20]), result["skipped_in_flight"],
             ),
         )
     return result
@@ -642,50 +685,245 @@ def _release_d2c_shipments(force=False):
 
 def enqueue_release_range(from_date, to_date):
     """Queue a background release of EVERY order with transaction_date in
-    [from_date, to_date] (manual date-range pull). Returns immediately; the job
-    releases oldest-first through the whole range and posts a Slack summary when
-    done. Bypasses the release_enabled pause; respects Dry Run + all per-order gates."""
-    from_date, to_date = str(getdate(from_date)), str(getdate(to_date))
-    frappe.enqueue(
-        "solara_wms.wms.d2c_fulfillment._release_range_job",
-        queue="long", timeout=3600, job_name="d2c_release_range",
-        from_date=from_date, to_date=to_date, user=frappe.session.user)
-    return {"queued": True, "from_date": from_date, "to_date": to_date}
-
-
-def _release_range_job(from_date, to_date, user=None):
-    """Background worker: drain every releasable order in the date range (looping
-    the release job max_orders at a time until the range is empty), then post a
-    summary to the wave Slack channel. Runs as Administrator (matches the cron)."""
+    [from_date, to_date] (manual date-range pull). Returns immediately. The range
+    is split into one shard per day; release_range_workers jobs run in parallel,
+    each claiming the next unreleased day until the range is drained, and the
+    last one posts a Slack summary. Progress is pushed live to the requesting
+    user. Bypasses the release_enabled pause; respects Dry Run + all per-order gates."""
+    from_date, to_date = getdate(from_date), getdate(to_date)
+    if to_date < from_date:
+        frappe.throw(_("To Date must be on or after From Date"))
+    settings = _settings()
+    days = date_diff(to_date, from_date) + 1
+    workers = min(cint(settings.get("release_range_workers")) or RELEASE_RANGE_WORKERS, days)
+    run = frappe.get_doc({
+        "doctype": RELEASE_RANGE_DOCTYPE,
+        "from_date": from_date,
+        "to_date": to_date,
+        "next_date": from_date,
+        "status": "Running",
+        "dry_run": cint(settings.get("dry_run")),
+        "workers": workers,
+        "days_total": days,
+        "requested_by": frappe.session.user,
+        "started_at": now_datetime(),
+    }).insert(ignore_permissions=True)
+    for shard in range(workers):
+        frappe.enqueue(
+            "solara_wms.wms.d2c_fulfillment._release_range_job",
+            queue="long",
+            timeout=RELEASE_RANGE_TIMEOUT,
+            job_id="d2c-release-range:{0}:{1}".format(run.name, shard),
+            deduplicate=True,
+            enqueue_after_commit=True,
+            run=run.name,
+        )
+    return {"queued": True, "run": run.name, "from_date": str(from_date),
+            "to_date": str(to_date), "days": days, "workers": workers}
+
+
+def _release_range_job(run):
+    """Background worker for one range release: claim the next day, drain it
+    (looping the release job max_orders at a time until the day is empty), fold
+    its counts into the run and repeat. Days are disjoint, and an order that is
+    also picked up by the */15 cron is still queued once (_queue_dn_submit locks
+    its D2C Release Submit row). The worker always counts itself out, even when
+    it fails or hits RELEASE_RANGE_TIMEOUT; a day it was holding stays in flight
+    for resume_release_ranges to hand out again. Runs as Administrator (matches
+    the cron)."""
     frappe.set_user("Administrator")
     settings = _settings()
-    dry = cint(settings.get("dry_run"))
-    keys = ("created", "skipped_multibox", "skipped_nostock", "skipped_dn_exists",
-            "skipped_bad_data", "skipped_on_hold", "skipped_ppcod",
-            "skipped_broken_ppcod", "failed")
-    agg = {k: 0 for k in keys}
-    for _i in range(400):  # safety ceiling (400 * max_orders_per_run)
-        res = _run_release(settings, dry_run=dry, from_date=from_date, to_date=to_date)
-        for k in keys:
-            agg[k] += cint(res.get(k))
+    try:
+        while True:
+            claim = _claim_range_day(run)
+            if not claim:
+                break
+            day, dry = claim
+            try:
+                counts = _release_range_day(settings, day, dry)
+            except Exception:
+                frappe.db.rollback()
+                _log("D2C Range Release", "{0} day {1} FATAL (swallowed): {2}".format(
+                    run, day, frappe.get_traceback()))
+                counts = {}
+            _record_range_day(run, day, counts)
+    except Exception:
+        frappe.db.rollback()
+        _log("D2C Range Release", "{0} worker stopped: {1}".format(
+            run, frappe.get_traceback()))
+    finally:
+        _finish_range_worker(run, settings)
+
+
+def _range_claims(row):
+    return json.loads(row.in_flight_days or "{}"), json.loads(row.failed_days or "[]")
+
+
+def _claim_range_day(run):
+    """(day, dry_run) for the next day of the run, or None when none is left.
+
+    A day whose claim is older than RELEASE_RANGE_TIMEOUT belongs to a worker
+    that died; it is handed out again first, and marked failed once it has been
+    claimed RELEASE_RANGE_DAY_ATTEMPTS times. Otherwise the next unreleased day
+    is claimed. The run row lock makes each claim go to one worker."""
+    row = frappe.db.get_value(RELEASE_RANGE_DOCTYPE, run,
+                              ["next_date", "to_date", "dry_run", "in_flight_days",
+                               "failed_days"], as_dict=True, for_update=True)
+    if not row:
+        frappe.db.commit()
+        return None
+    in_flight, failed = _range_claims(row)
+    now = now_datetime()
+    stale_before = add_to_date(now, seconds=-RELEASE_RANGE_TIMEOUT)
+    day = None
+    for held, claim in sorted(in_flight.items()):
+        if get_datetime(claim["claimed_at"]) > stale_before:
+            continue
+        if cint(claim.get("attempts")) >= RELEASE_RANGE_DAY_ATTEMPTS:
+            in_flight.pop(held)
+            failed.append(held)
+            _log("D2C Range Release", "{0} day {1} failed: its worker died {2} times".format(
+                run, held, cint(claim.get("attempts"))))
+            continue
+        day = held
+        break
+    values = {}
+    if day is None and getdate(row.next_date) <= getdate(row.to_date):
+        day = str(getdate(row.next_date))
+        values["next_date"] = add_days(row.next_date, 1)
+    if day:
+        in_flight[day] = {"claimed_at": str(now),
+                          "attempts": cint((in_flight.get(day) or {}).get("attempts")) + 1}
+    values.update(in_flight_days=json.dumps(in_flight, sort_keys=True),
+                  failed_days=json.dumps(sorted(failed)))
+    frappe.db.set_value(RELEASE_RANGE_DOCTYPE, run, values, update_modified=False)
+    frappe.db.commit()
+    return (day, cint(row.dry_run)) if day else None
+
+
+def _release_range_day(settings, day, dry_run):
+    counts = dict.fromkeys(RELEASE_RANGE_COUNTS, 0)
+    for _i in range(RELEASE_RANGE_DAY_PASSES):
+        res = _run_release(settings, dry_run=dry_run, from_date=day, to_date=day)
+        for k in RELEASE_RANGE_COUNTS:
+            counts[k] += cint(res.get(k))
+        frappe.db.commit()
+        # A dry run changes nothing, so another pass would re-count the same orders;
+        # otherwise stop once only gated / no-more-releasable orders remain.
+        if dry_run or not res["created"]:
+            break
+    return counts
+
+
+def _record_range_day(run, day, counts):
+    """Clear the day's claim and add it to the run's totals (in-place increments,
+    so workers never overwrite each other), then push the merged progress to the
+    requester."""
+    row = frappe.db.get_value(RELEASE_RANGE_DOCTYPE, run, ["in_flight_days", "failed_days"],
+                              as_dict=True, for_update=True)
+    if row:
+        in_flight, _failed = _range_claims(row)
+        in_flight.pop(day, None)
+        frappe.db.set_value(RELEASE_RANGE_DOCTYPE, run, "in_flight_days",
+                            json.dumps(in_flight, sort_keys=True), update_modified=False)
+    increments = "".join(", `{0}` = `{0}` + %({0})s".format(k) for k in RELEASE_RANGE_COUNTS)
+    values = {k: cint(counts.get(k)) for k in RELEASE_RANGE_COUNTS}
+    values["run"] = run
+    frappe.db.sql(
+        "UPDATE `tabD2C Release Range` SET days_done = days_done + 1" + increments
+        + " WHERE name = %(run)s",
+        values,
+    )
+    frappe.db.commit()
+    _publish_range_progress(run)
+
+
+def _finish_range_worker(run, settings):
+    """Count this worker out. Whichever worker finds every day handed out and
+    none in flight closes the run - Done, or Failed when a day had to be given
+    up - and posts the summary."""
+    row = frappe.db.get_value(RELEASE_RANGE_DOCTYPE, run,
+                              ["status", "workers_done", "next_date", "to_date",
+                               "in_flight_days", "failed_days"],
+                              as_dict=True, for_update=True)
+    if not row:
         frappe.db.commit()
-        if not res["created"]:
-            break  # only gated / no-more-releasable orders remain in the range
-    held = (agg["skipped_on_hold"] + agg["skipped_ppcod"] + agg["skipped_multibox"]
-            + agg["skipped_nostock"])
+        return
+    in_flight, failed = _range_claims(row)
+    last = (row.status == "Running" and not in_flight
+            and getdate(row.next_date) > getdate(row.to_date))
+    values = {"workers_done": cint(row.workers_done) + 1}
+    if last:
+        values.update({"status": "Failed" if failed else "Done",
+                       "finished_at": now_datetime()})
+    frappe.db.set_value(RELEASE_RANGE_DOCTYPE, run, values, update_modified=False)
+    frappe.db.commit()
+    progress = _publish_range_progress(run)
+    if last and progress:
+        _post_range_summary(settings, progress)
+
+
+def resume_release_ranges():
+    """Scheduler entry (*/15): start one more worker for every Running range
+    release that has a stale in-flight day or no day in flight at all after a
+    full RELEASE_RANGE_TIMEOUT - its workers died. The new worker re-claims
+    the stale day (or gives it up) and closes the run."""
+    stale_before = add_to_date(now_datetime(), seconds=-RELEASE_RANGE_TIMEOUT)
+    runs = frappe.get_all(
+        RELEASE_RANGE_DOCTYPE,
+        filters={"status": "Running", "started_at": ["<", stale_before]},
+        fields=["name", "in_flight_days"],
+        limit_page_length=50,
+    )
+    resumed = []
+    for row in runs:
+        claims = json.loads(row.in_flight_days or "{}").values()
+        if claims and all(get_datetime(c["claimed_at"]) > stale_before for c in claims):
+            continue
+        frappe.enqueue(
+            "solara_wms.wms.d2c_fulfillment._release_range_job",
+            queue="long",
+            timeout=RELEASE_RANGE_TIMEOUT,
+            job_id="d2c-release-range:{0}:resume".format(row.name),
+            deduplicate=True,
+            run=row.name,
+        )
+        resumed.append(row.name)
+    return resumed
+
+
+def _publish_range_progress(run):
+    progress = frappe.db.get_value(
+        RELEASE_RANGE_DOCTYPE, run,
+        ["name", "from_date", "to_date", "status", "dry_run", "requested_by",
+         "days_done", "days_total", "failed_days", *RELEASE_RANGE_COUNTS],
+        as_dict=True)
+    if progress and progress.requested_by:
+        frappe.publish_realtime(RELEASE_RANGE_EVENT, progress, user=progress.requested_by)
+    return progress
+
+
+def _post_range_summary(settings, agg):
+    held = (cint(agg.skipped_on_hold) + cint(agg.skipped_ppcod)
+            + cint(agg.skipped_multibox) + cint(agg.skipped_nostock))
     lines = [
         ":package: *D2C range release done* — {0} → {1}{2}".format(
-            from_date, to_date, " (dry-run)" if dry else ""),
+            agg.from_date, agg.to_date, " (dry-run)" if cint(agg.dry_run) else ""),
         "Released *{0}* · held {1} (on-hold {2} · PPCOD {3} · multibox {4} · no-stock {5}) · "
         "bad-data {6} · failed {7}".format(
-            agg["created"], held, agg["skipped_on_hold"], agg["skipped_ppcod"],
-            agg["skipped_multibox"], agg["skipped_nostock"], agg["skipped_bad_data"],
-            agg["failed"]),
+            cint(agg.created), held, cint(agg.skipped_on_hold), cint(agg.skipped_ppcod),
+            cint(agg.skipped_multibox), cint(agg.skipped_nostock),
+            cint(agg.skipped_bad_data), cint(agg.failed)),
         "Now run a wave / *Prepare* to print the pick list + labels for the released batch.",
     ]
+    failed_days = json.loads(agg.failed_days or "[]")
+    if failed_days:
+        lines.insert(2, ":warning: Not released — worker died on {0}; re-run those days.".format(
+            ", ".join(failed_days)))
     _post_slack(settings, "\n".join(lines), tag="D2C Range Release")
-    _log("D2C Range Release",
-         "range {0}..{1} by {2}: {3}".format(from_date, to_date, user, json.dumps(agg)))
+    _log("D2C Range Release", "{0} range {1}..{2} by {3}: {4}".format(
+        agg.name, agg.from_date, agg.to_date, agg.requested_by,
+        json.dumps({k: cint(agg.get(k)) for k in RELEASE_RANGE_COUNTS})))
 
 
 def _candidate_sos(settings, limit, from_date=None, to_date=None):
@@ -693,17 +931,22 @@ def _candidate_sos(settings, limit, from_date=None, to_date=None):
     from_date/to_date (manual date-range pull) scope by transaction_date instead of
     the rolling lookback window — 'process everything ordered on Jul 18-19'."""
     lookback = cint(settings.get("lookback_days")) or 3
-    filters = {
-        "name": ["like", _prefix(settings) + "%"],
-        "docstatus": 1,
-        "status": ["in", RELEASABLE_STATUSES],
-        "per_delivered": 0,
-        "skip_delivery_note": 0,
-    }
+    filters = [
+        ["name", "like", _prefix(settings) + "%"],
+        ["docstatus", "=", 1],
+        ["status", "in", RELEASABLE_STATUSES],
+        ["per_delivered", "=", 0],
+        ["skip_delivery_note", "=", 0],
+    ]
     if from_date and to_date:
-        filters["transaction_date"] = ["between", [str(from_date), str(to_date)]]
+        filters.append(["transaction_date", "between", [str(from_date), str(to_date)]])
     else:
-        filters["transaction_date"] = [">=", add_days(nowdate(), -lookback)]
+        filters.append(["transaction_date", ">=", add_days(nowdate(), -lookback)])
+    # Orders already queued for submit would otherwise fill the batch window
+    # every run until their DN lands.
+    in_flight = _in_flight_sos()
+    if in_flight:
+        filters.append(["name", "not in", in_flight])
     return frappe.get_all(
         "Sales Order",
         filters=filters,
@@ -726,7 +969,20 @@ def _sos_with_existing_dn(so_names):
     return {r.against_sales_order for r in rows}
 
 
-def _run_release(settings, dry_run=False, from_date=None, to_date=None):
+def _in_flight_sos():
+    return frappe.get_all(
+        RELEASE_SUBMIT_DOCTYPE,
+        filters={"status": ["in", IN_FLIGHT_STATUSES]},
+        pluck="name",
+        limit_page_length=0,
+    )
+
+
+def _run_release(settings, dry_run=False, from_date=None, to_date=None, inline=False):
+    """Decide which candidate SOs release. A passing order is queued for an
+    asynchronous DN submit (see submit_queued_dn), so one slow GL/SLE posting no
+    longer holds up the whole */15 window; `created` counts queued orders.
+    inline=True submits each DN in this call instead (load test)."""
     limit = cint(settings.get("release_batch_size")) or 200
     max_orders = cint(settings.get("max_orders_per_run")) or limit
     warehouse = _source_warehouse(settings)
@@ -739,16 +995,18 @@ def _run_release(settings, dry_run=False, from_date=None, to_date=None):
     res = {
         "created": 0, "failed": 0,
         "skipped_multibox": 0, "skipped_nostock": 0, "skipped_dn_exists": 0,
-        "skipped_bad_data": 0, "bad_data_sos": [],
+        "skipped_bad_data": 0, "bad_data_sos": [], "skipped_in_flight": 0,
         "skipped_on_hold": 0, "skipped_ppcod": 0,
         "skipped_broken_ppcod": 0, "broken_ppcod_sos": [],
         "created_dns": [], "failures": [],
+        "evaluated_sos": [], "exceptions": [],
     }
 
     for cand in candidates:
         if res["created"] >= max_orders:
             break
         so_name = cand.name
+        res["evaluated_sos"].append(so_name)
         if so_name in already:
             res["skipped_dn_exists"] += 1
             continue
@@ -758,6 +1016,8 @@ def _run_release(settings, dry_run=False, from_date=None, to_date=None):
         except Exception as e:
             res["failed"] += 1
             res["failures"].append({"so": so_name, "err": "load: " + str(e)})
+            _hold_exception(res, frappe._dict(name=so_name), "GUARD-FAILED",
+                            "load: " + str(e))
             continue
 
         # Gate 0: malformed data — a line without item_code makes make_delivery_note
@@ -765,6 +1025,7 @@ def _run_release(settings, dry_run=False, from_date=None, to_date=None):
         if any(not it.item_code for it in so.items):
             res["skipped_bad_data"] += 1
             res["bad_data_sos"].append(so_name)
+            _hold_exception(res, so, "BAD-DATA")
             continue
 
         # Gate 0.5: Shopify hold. The DN COD Guard hard-blocks held orders at
@@ -777,6 +1038,7 @@ def _run_release(settings, dry_run=False, from_date=None, to_date=None):
             or cint(so.get("custom_shopify_address_change_hold"))
         ):
             res["skipped_on_hold"] += 1
+            _hold_exception(res, so, "ON-HOLD")
             continue
 
         # Gate 0.6: PPCOD exclusion (Phase-1 scope decision, 2026-07-12).
@@ -788,6 +1050,7 @@ def _run_release(settings, dry_run=False, from_date=None, to_date=None):
             and (so.get("custom_order_type") or "") == "PPCOD"
         ):
             res["skipped_ppcod"] += 1
+            _hold_exception(res, so, "PPCOD")
             continue
 
         # Gate 0.7: broken PPCOD — classified partial-prepaid but COD amount 0.
@@ -802,6 +1065,7 @@ def _run_release(settings, dry_run=False, from_date=None, to_date=None):
         ):
             res["skipped_broken_ppcod"] += 1
             res["broken_ppcod_sos"].append(so_name)
+            _hold_exception(res, so, "BROKEN-PPCOD")
             continue
 
         # Gate 1: single-parcel orders only. Nestable accessories count 0 boxes
@@ -834,6 +1098,10 @@ def _run_release(settings, dry_run=False, from_date=None, to_date=None):
                     parcel_plan = _parcel_plan_for_dn(so, parcels)
             if not covered_by_combo and not parcel_plan:
                 res["skipped_multibox"] += 1
+                _hold_exception(
+                    res, so, "MULTIBOX",
+                    "+".join(sorted({it.item_code for it in so.items})[:4]),
+                    box_count=box_count)
                 continue
 
         # Gate 2: physical stock present for every line (actual_qty, not available:
@@ -856,14 +1124,270 @@ def _run_release(settings, dry_run=False, from_date=None, to_date=None):
             res["created_dns"].append({"so": so_name, "dn": "(dry_run)"})
             continue
 
+        if not inline:
+            # The submit job owns this order's exception row from here on: it
+            # clears it on success and writes GUARD-FAILED on failure, so this
+            # run must not delete it.
+            res["evaluated_sos"].remove(so_name)
+            if _queue_dn_submit(so_name, warehouse, box_count, parcel_plan):
+                res["created"] += 1
+                res["created_dns"].append({"so": so_name, "dn": "(queued)"})
+            else:
+                res["skipped_in_flight"] += 1
+            continue
+
         dn_name = _make_and_submit_dn(so_name, warehouse, res, box_count, parcel_plan)
         if dn_name:
             res["created"] += 1
             res["created_dns"].append({"so": so_name, "dn": dn_name})
-
+        else:
+            _hold_exception(res, so, "GUARD-FAILED", _failure_detail(res))
+
+    if dry_run:
+        # A preview must not rewrite the live Exceptions tab.
+        return res
+    _persist_release_exceptions(res["evaluated_sos"], res["exceptions"])
+    _prune_release_exceptions()
+    if not inline:
+        # Commit the queued rows before locking the in-flight set: a parallel
+        # range shard holding its own fresh rows would otherwise deadlock here.
+        frappe.db.commit()
+        _dispatch_dn_submits(settings)
     return res
 
 
+def _failure_detail(res):
+    return (res["failures"][-1]["err"] or "").split("\n")[0][:120]
+
+
+# ─── ASYNC DN SUBMIT: one job per released SO, N at a time ────────
+
+def _queue_dn_submit(so_name, warehouse, box_count, parcel_plan):
+    """Record the release decision for one SO. False when the order is already
+    in flight (another run queued it), its last submit failed too recently, or
+    it has failed DN_SUBMIT_MAX_ATTEMPTS times and waits for requeue_dn_submit."""
+    values = {
+        "status": "Queued",
+        "warehouse": warehouse,
+        "box_count": cint(box_count),
+        "parcel_plan": json.dumps(parcel_plan) if parcel_plan else None,
+        "queued_at": now_datetime(),
+        "started_at": None,
+        "finished_at": None,
+    }
+    row = frappe.db.get_value(RELEASE_SUBMIT_DOCTYPE, so_name,
+                              ["status", "finished_at", "attempts"], as_dict=True,
+                              for_update=True)
+    if row:
+        if row.status in IN_FLIGHT_STATUSES:
+            return False
+        if row.status == "Failed" and cint(row.attempts) >= DN_SUBMIT_MAX_ATTEMPTS:
+            return False
+        retry_after = add_to_date(now_datetime(), minutes=-DN_SUBMIT_RETRY_MINUTES)
+        if (row.status == "Failed" and row.finished_at
+                and get_datetime(row.finished_at) > retry_after):
+            return False
+        frappe.db.set_value(RELEASE_SUBMIT_DOCTYPE, so_name, values)
+        return True
+    try:
+        frappe.get_doc({"doctype": RELEASE_SUBMIT_DOCTYPE, "sales_order": so_name,
+                        **values}).insert(ignore_permissions=True)
+    except frappe.DuplicateEntryError:
+        return False  # a concurrent run queued it first
+    return True
+
+
+def _dn_submit_queue(settings):
+    from frappe.utils.background_jobs import get_queue_list
+
+    queue = (settings.get("dn_submit_queue") or "").strip() or DN_SUBMIT_QUEUE
+    return queue if queue in get_queue_list() else "long"
+
+
+def _dispatch_dn_submits(settings):
+    """Hand Queued orders to submit jobs, oldest first, while fewer than
+    dn_submit_concurrency are Submitting. Locking every in-flight row (in name
+    order) serialises concurrent dispatchers, so the limit holds. A Submitting
+    order whose job died is recovered: Submitted if its DN landed, else re-queued."""
+    limit = cint(settings.get("dn_submit_concurrency")) or DN_SUBMIT_CONCURRENCY
+    rows = frappe.db.sql(
+        """
+        SELECT name, status, attempts, queued_at, started_at
+          FROM `tabD2C Release Submit`
+         WHERE status IN %s
+         ORDER BY name
+           FOR UPDATE
+        """,
+        (IN_FLIGHT_STATUSES,),
+        as_dict=True,
+    )
+    now = now_datetime()
+    stale_before = add_to_date(now, minutes=-DN_SUBMIT_STALE_MINUTES)
+    stale = [r for r in rows if r.status == "Submitting"
+             and (not r.started_at or get_datetime(r.started_at) < stale_before)]
+    updates = {}
+    if stale:
+        landed = _submitted_dns([r.name for r in stale])
+        for r in stale:
+            if r.name in landed:
+                updates[r.name] = {"status": "Submitted", "delivery_note": landed[r.name],
+                                   "finished_at": now}
+            else:
+                updates[r.name] = {"status": "Queued", "started_at": None}
+                r.status = "Queued"
+    submitting = sum(1 for r in rows if r.status == "Submitting" and r.name not in updates)
+    queued = sorted((r for r in rows if r.status == "Queued"),
+                    key=lambda r: (get_datetime(r.queued_at or now), r.name))
+    handed = queued[:max(limit - submitting, 0)]
+    for r in handed:
+        updates[r.name] = {"status": "Submitting", "started_at": now,
+                           "attempts": cint(r.attempts) + 1}
+    if updates:
+        frappe.db.bulk_update(RELEASE_SUBMIT_DOCTYPE, updates, update_modified=False)
+    queue = _dn_submit_queue(settings)
+    for r in handed:
+        frappe.enqueue(
+            "solara_wms.wms.d2c_fulfillment.submit_queued_dn",
+            queue=queue,
+            timeout=DN_SUBMIT_TIMEOUT,
+            job_id="d2c-dn-submit:" + r.name,
+            deduplicate=True,
+            enqueue_after_commit=True,
+            sales_order=r.name,
+        )
+    return [r.name for r in handed]
+
+
+def _submitted_dns(so_names):
+    """SO → its submitted Delivery Note, for orders whose submit job was lost."""
+    rows = frappe.get_all(
+        "Delivery Note Item",
+        filters={"against_sales_order": ["in", list(so_names)], "docstatus": 1},
+        fields=["against_sales_order", "parent"],
+        limit_page_length=0,
+    )
+    return {r.against_sales_order: r.parent for r in rows}
+
+
+def submit_queued_dn(sales_order):
+    """Background job: submit the DN for one queued SO, record the outcome, then
+    hand the freed slot to the next queued order. Wrapped like the scheduler
+    entries so a defect never escapes into the worker."""
+    try:
+        _submit_queued_dn(sales_order)
+    except Exception:
+        frappe.db.rollback()
+        _log("D2C DN Submit", "FATAL (swallowed) {0}: {1}".format(
+            sales_order, frappe.get_traceback()))
+
+
+def _submit_queued_dn(sales_order):
+    frappe.set_user("Administrator")
+    row = frappe.db.get_value(
+        RELEASE_SUBMIT_DOCTYPE, sales_order,
+        ["status", "warehouse", "box_count", "parcel_plan", "attempts"], as_dict=True)
+    # Only the dispatcher moves an order to Submitting, so the job owns it.
+    if not row or row.status != "Submitting":
+        return
+    res = {"failed": 0, "failures": []}
+    dn_name = _submitted_dns([sales_order]).get(sales_order)
+    if not dn_name:
+        parcel_plan = json.loads(row.parcel_plan) if row.parcel_plan else None
+        dn_name = _make_and_submit_dn(sales_order, row.warehouse, res,
+                                      cint(row.box_count) or 1, parcel_plan)
+    if dn_name:
+        frappe.db.set_value(RELEASE_SUBMIT_DOCTYPE, sales_order, {
+            "status": "Submitted", "delivery_note": dn_name,
+            "finished_at": now_datetime(), "last_error": None})
+        _persist_release_exceptions([sales_order], [])
+    else:
+        frappe.db.set_value(RELEASE_SUBMIT_DOCTYPE, sales_order, {
+            "status": "Failed", "finished_at": now_datetime(),
+            "last_error": res["failures"][-1]["err"]})
+        so = frappe.db.get_value(
+            "Sales Order", sales_order,
+            ["name", "transaction_date", "customer_name", "grand_total"], as_dict=True)
+        res["exceptions"] = []
+        detail = _failure_detail(res)
+        if cint(row.attempts) >= DN_SUBMIT_MAX_ATTEMPTS:
+            detail = "parked after {0} attempts: {1}".format(cint(row.attempts), detail)[:140]
+        _hold_exception(res, so or frappe._dict(name=sales_order), "GUARD-FAILED", detail)
+        _persist_release_exceptions([sales_order], res["exceptions"])
+    frappe.db.commit()
+    _dispatch_dn_submits(_settings())
+    frappe.db.commit()
+
+
+@frappe.whitelist(methods=["POST"])
+def requeue_dn_submit(sales_order):
+    """Give a parked order fresh submit attempts after its cause has been
+    fixed; the next release run queues it again."""
+    frappe.only_for(("System Manager", "Stock Manager"))
+    if frappe.db.get_value(RELEASE_SUBMIT_DOCTYPE, sales_order, "status") != "Failed":
+        frappe.throw(_("Only failed DN submits can be requeued"))
+    frappe.db.set_value(
+        RELEASE_SUBMIT_DOCTYPE,
+        sales_order,
+        {"attempts": 0, "finished_at": None},
+        update_modified=False,
+    )
+    return {"sales_order": sales_order, "status": "Failed"}
+
+
+def _hold_exception(res, so, category, detail="", box_count=0):
+    """Remember why a gate held this SO back; persisted once at the end of the run."""
+    res["exceptions"].append({
+        "sales_order": so.name,
+        "transaction_date": so.get("transaction_date"),
+        "customer_name": so.get("customer_name") or "",
+        "grand_total": flt(so.get("grand_total")),
+        "category": category,
+        "box_count": cint(box_count),
+        "detail": detail or "",
+    })
+
+
+def _persist_release_exceptions(evaluated, exceptions):
+    """Replace the stored gate verdict of every SO a live run evaluated, in two
+    statements. Orders that passed (released, waiting on stock, DN already
+    made) simply lose their row; held orders get a fresh one. The ops sheet's
+    Exceptions tab reads this table instead of re-running the gates."""
+    if not evaluated:
+        return
+    frappe.db.delete(RELEASE_EXCEPTION_DOCTYPE, {"name": ["in", list(evaluated)]})
+    if not exceptions:
+        return
+    now, user = now_datetime(), frappe.session.user
+    fields = ["name", "sales_order", "transaction_date", "customer_name",
+              "grand_total", "category", "box_count", "detail", "classified_at",
+              "creation", "modified", "owner", "modified_by", "docstatus"]
+    values = [
+        (row["sales_order"], row["sales_order"], row["transaction_date"],
+         row["customer_name"], row["grand_total"], row["category"],
+         row["box_count"], row["detail"], now, now, now, user, user, 0)
+        for row in exceptions
+    ]
+    frappe.db.bulk_insert(RELEASE_EXCEPTION_DOCTYPE, fields, values)
+
+
+def _prune_release_exceptions():
+    """Drop stored verdicts of orders that left the candidate set for good -
+    delivered, cancelled, closed or no longer needing a DN - which no run will
+    ever evaluate, and so clear, again."""
+    frappe.db.sql(
+        """
+        DELETE e FROM `tabD2C Release Exception` e
+          LEFT JOIN `tabSales Order` so ON so.name = e.sales_order
+         WHERE so.name IS NULL
+            OR so.docstatus != 1
+            OR so.status NOT IN %(statuses)s
+            OR so.per_delivered > 0
+            OR so.skip_delivery_note = 1
+        """,
+        {"statuses": RELEASABLE_STATUSES},
+    )
+
+
 def _make_and_submit_dn(so_name, warehouse, res, box_count=1, parcel_plan=None,
                         is_replacement=False, opd_resolution_id=None,
                         opd_approval_hash=None):
@@ -930,6 +1454,8 @@ def fetch_d2c_labels():
 
 
 def _fetch_d2c_labels():
+    from solara_wms.wms.d2c_invoice_queue import queue_deferred_invoices
+
     settings = _settings()
     if not cint(settings.get("label_fetch_enabled")):
         return
@@ -939,6 +1465,8 @@ def _fetch_d2c_labels():
     # DN posted). Ops decision 2026-07-15 — replaces the manual evening run as the
     # default trigger; the D2C Invoice Run screen stays as the manual fallback for
     # any DN whose auto-invoice was off/failed. Toggle: auto_invoice_on_label.
+    # This pass only queues the DN; d2c_invoice_queue raises the SHPSI27 on its
+    # own schedule so an IRN round-trip never spends the label budget.
     auto_invoice = cint(settings.get("auto_invoice_on_label"))
     # Push Shopify fulfillment here too (the 'Auto Sync AWB to Shopify' server
     # script is dead in the safe_exec sandbox; connector sync_delivery_note=0).
@@ -987,10 +1515,18 @@ def _fetch_d2c_labels():
         limit_page_length=limit,
     )
 
-    import time
     deadline = time.monotonic() + (cint(settings.get("label_time_budget_sec")) or 210)
+    # Shopify state for every DN this pass may fulfill, in batched lookups.
+    states = {}
+    if do_fulfill:
+        states = _shopify_order_states([
+            dn.get("shopify_order_id") for dn in dns
+            if cint(dn.get("custom_dispatched")) and not cint(dn.get("is_replacement"))
+            and not cint(dn.get("custom_shopify_fulfilled"))
+        ])
 
-    fetched = pending = invoiced = inv_failed = fulfilled = ful_failed = errors = 0
+    fetched = pending = fulfilled = ful_failed = errors = 0
+    to_invoice = []
     shortfall = 0
     ful_no_fo = 0
     for dn in dns:
@@ -1023,7 +1559,8 @@ def _fetch_d2c_labels():
                     and dn.get("shopify_order_id")
                     and not cint(dn.get("is_replacement"))
                     and not cint(dn.get("custom_shopify_fulfilled"))):
-                outcome = _try_fulfill(dn)
+                outcome = _try_fulfill(
+                    dn, state=states.get(str(dn.get("shopify_order_id") or "")))
                 if outcome in ("created", "updated", "repaired", "in_sync"):
                     frappe.db.set_value("Delivery Note", dn.name,
                                         "custom_shopify_fulfilled", 1)
@@ -1044,33 +1581,31 @@ def _fetch_d2c_labels():
                     fetched += 1
                 else:
                     pending += 1
-            # Auto-invoice once the label is on hand: deferred, not-yet-billed DNs.
+            # Queue the invoice once the label is on hand: deferred, not-yet-billed DNs.
             if (
                 auto_invoice and has_label
                 and cint(dn.get("custom_d2c_defer_si"))
                 and flt(dn.get("per_billed")) < 0.01
             ):
-                outcome = _auto_invoice_deferred_dn(dn.name)
-                if outcome == "created":
-                    invoiced += 1
-                elif outcome == "failed":
-                    inv_failed += 1
+                to_invoice.append(dn.name)
         except Exception as e:
             frappe.db.rollback()
             errors += 1
             _log("D2C Label Fetch", "DN {0}: {1}".format(dn.get("name"), str(e)[:250]))
 
-    if (fetched or pending or invoiced or inv_failed or fulfilled or ful_failed
+    inv_queued = queue_deferred_invoices(to_invoice)
+    frappe.db.commit()
+
+    if (fetched or pending or inv_queued or fulfilled or ful_failed
             or errors or shortfall):
         _log(
             "D2C Label Fetch",
-            "attached={0} pending={1} invoiced={2} inv_failed={3} "
-            "fulfilled={4} ful_failed={5} errors={6} awb_shortfall={7}".format(
-                fetched, pending, invoiced, inv_failed, fulfilled, ful_failed,
+            "attached={0} pending={1} inv_queued={2} "
+            "fulfilled={3} ful_failed={4} errors={5} awb_shortfall={6}".format(
+                fetched, pending, inv_queued, fulfilled, ful_failed,
                 errors, shortfall),
         )
-    return {"attached": fetched, "pending": pending,
-            "invoiced": invoiced, "inv_failed": inv_failed,
+    return {"attached": fetched, "pending": pending, "inv_queued": inv_queued,
             "fulfilled": fulfilled, "ful_failed": ful_failed,
             "ful_no_fo": ful_no_fo,
             "errors": errors, "awb_shortfall": shortfall}
@@ -1213,22 +1748,23 @@ def _attach_label_for_dn(dn, cp_key, cpid_map, settings):
     return _attach_label_bytes(dn.name, buf.getvalue())
 
 
-def _try_fulfill(dn):
+def _try_fulfill(dn, state=None):
     """Push fulfillment for one DN, never raising into the job loop."""
     try:
-        return push_shopify_fulfillment(dn)
+        return push_shopify_fulfillment(dn, state=state)
     except Exception as e:
         _log("D2C Fulfill", "{0}: {1}".format(dn.get("name"), str(e)[:250]))
         return "failed"
 
 
-def fulfill_dispatched_dn(dn_name):
+def fulfill_dispatched_dn(dn_name, state=None):
     """Push one physically-dispatched DN to Shopify, idempotently.
 
     This is the only normal gate for customer-facing Shopify fulfillment.
     Creating an AWB or fetching a label is not dispatch evidence.  Success is
     latched only after ``push_shopify_fulfillment`` confirms the complete
-    authoritative AWB set on Shopify.
+    authoritative AWB set on Shopify. ``state`` is the order's prefetched
+    Shopify state, when the caller looked up a batch of orders at once.
     """
     settings = _settings()
     if not cint(settings.get("auto_fulfill_shopify")):
@@ -1247,7 +1783,7 @@ def fulfill_dispatched_dn(dn_name):
     if delivery_note_cancellation_hold(dn):
         return "cancellation_hold"
 
-    outcome = _try_fulfill(dn)
+    outcome = _try_fulfill(dn, state=state)
     if outcome in ("created", "updated", "repaired", "in_sync"):
         frappe.db.set_value(
             "Delivery Note", dn.name, "custom_shopify_fulfilled", 1,
@@ -1257,14 +1793,24 @@ def fulfill_dispatched_dn(dn_name):
     return outcome
 
 
+def _fulfill_sync_capacity():
+    """DNs the Shopify budget can absorb in one catch-up tick: what the modelled
+    bucket holds now plus what it restores over the tick (a share of a batched
+    order-state query and one mutation per DN)."""
+    return _shopify_bucket(SHOPIFY_GQL_BUCKET).affordable(
+        ORDER_STATE_COST + MUTATION_COST, FULFILL_SYNC_BUDGET_SEC, time.time())
+
+
 @frappe.whitelist()
-def sync_dispatched_shopify_fulfillments(days=14, limit=40):
+def sync_dispatched_shopify_fulfillments(days=14, limit=None):
     """Catch up dispatched DNs that have not yet reached Shopify.
 
     Runs every five minutes and deliberately includes fully billed DNs; the
     label-fetch job excludes ``per_billed=100`` and therefore cannot recover a
-    historical fulfillment backlog.  Bounded oldest-first processing keeps the
-    Shopify/API load predictable. Failures remain unlatched for the next tick.
+    historical fulfillment backlog.  The batch is sized from the Shopify cost
+    budget each tick (capped by ``limit`` when given), and every call waits for
+    its budget, so a post-outage backlog drains as fast as Shopify allows
+    without tripping THROTTLED. Failures remain unlatched for the next tick.
     """
     try:
         settings = _settings()
@@ -1272,7 +1818,8 @@ def sync_dispatched_shopify_fulfillments(days=14, limit=40):
             return {"skipped": "auto_fulfill_shopify off"}
 
         start = add_days(nowdate(), -max(cint(days), 1))
-        batch_limit = min(max(cint(limit), 1), 100)
+        batch_limit = max(min(_fulfill_sync_capacity(),
+                              cint(limit) or FULFILL_SYNC_MAX, FULFILL_SYNC_MAX), 1)
         filters = {
             "docstatus": 1,
             "custom_d2c_defer_si": 1,
@@ -1289,7 +1836,7 @@ def sync_dispatched_shopify_fulfillments(days=14, limit=40):
         rows = frappe.get_all(
             "Delivery Note",
             filters=filters,
-            fields=["name"],
+            fields=["name", "shopify_order_id"],
             # Never let a historical recovery queue delay today's customer
             # notification.  New dispatches go first; older confirmed movement
             # continues draining behind them on every tick.
@@ -1298,17 +1845,26 @@ def sync_dispatched_shopify_fulfillments(days=14, limit=40):
         )
 
         counts = {"selected": len(rows), "synced": 0, "failed": 0,
-                  "no_open_fo": 0, "skipped": 0}
-        for row in rows:
-            outcome = fulfill_dispatched_dn(row.name)
-            if outcome in ("created", "updated", "repaired", "in_sync"):
-                counts["synced"] += 1
-            elif outcome == "no_open_fo":
-                counts["no_open_fo"] += 1
-            elif outcome == "failed":
-                counts["failed"] += 1
-            else:
-                counts["skipped"] += 1
+                  "no_open_fo": 0, "skipped": 0, "deferred": 0}
+        deadline = time.monotonic() + FULFILL_SYNC_BUDGET_SEC
+        # One aliased lookup per chunk; then only the needed mutations go out.
+        for start in range(0, len(rows), ORDERS_PER_QUERY):
+            if time.monotonic() > deadline:
+                counts["deferred"] = len(rows) - start
+                break
+            chunk = rows[start:start + ORDERS_PER_QUERY]
+            states = _shopify_order_states([row.get("shopify_order_id") for row in chunk])
+            for row in chunk:
+                outcome = fulfill_dispatched_dn(
+                    row.name, state=states.get(str(row.get("shopify_order_id") or "")))
+                if outcome in ("created", "updated", "repaired", "in_sync"):
+                    counts["synced"] += 1
+                elif outcome == "no_open_fo":
+                    counts["no_open_fo"] += 1
+                elif outcome == "failed":
+                    counts["failed"] += 1
+                else:
+                    counts["skipped"] += 1
 
         if rows:
             _log("D2C Dispatch Shopify Sync", json.dumps(counts, sort_keys=True))
@@ -1328,6 +1884,7 @@ def _shopify_json(r):
         if r.status_code != 200:
             return None
         j = r.json()
+        _observe_shopify_cost(j)
         if j.get("errors"):
             return None
         return j
@@ -1335,6 +1892,101 @@ def _shopify_json(r):
         return None
 
 
+def _shopify_bucket(key):
+    """The modelled bucket, shared by every worker through the cache."""
+    state = frappe.cache().get_value(key)
+    if state:
+        try:
+            return CostBucket.from_state(state)
+        except Exception:
+            pass
+    maximum, rate = SHOPIFY_GQL_DEFAULT
+    return CostBucket(maximum, maximum, rate, time.time())
+
+
+def _save_shopify_bucket(key, bucket):
+    frappe.cache().set_value(key, bucket.state(), expires_in_sec=3600)
+
+
+def _observe_shopify_cost(body):
+    bucket = _shopify_bucket(SHOPIFY_GQL_BUCKET)
+    if bucket.observe_graphql(body, time.time()):
+        _save_shopify_bucket(SHOPIFY_GQL_BUCKET, bucket)
+
+
+def _await_shopify_budget(key, cost):
+    """Sleep until the modelled bucket covers `cost`, then book it. False when
+    that would take longer than SHOPIFY_MAX_WAIT_SEC."""
+    bucket = _shopify_bucket(key)
+    wait = bucket.wait_for(cost, time.time())
+    if wait > SHOPIFY_MAX_WAIT_SEC:
+        return False
+    if wait:
+        time.sleep(wait)
+    bucket.spend(cost, time.time())
+    _save_shopify_bucket(key, bucket)
+    return True
+
+
+def _shopify_graphql(gql, payload, headers, cost):
+    """POST one GraphQL call inside the cost budget. Parsed body (as
+    _shopify_json) or None; a THROTTLED rejection is retried once after the
+    bucket has refilled for it."""
+    import requests
+
+    for _attempt in range(2):
+        if not _await_shopify_budget(SHOPIFY_GQL_BUCKET, cost):
+            return None
+        r = requests.post(gql, data=json.dumps(payload), headers=headers, timeout=30)
+        j = _shopify_json(r)
+        if j is not None or not _graphql_throttled(r):
+            return j
+    return None
+
+
+def _graphql_throttled(r):
+    try:
+        return is_throttled(r.json())
+    except Exception:
+        return False
+
+
+def _shopify_context():
+    """(headers, graphql endpoint) from the Shopify Setting, or None.
+
+    Read the token from the doc ATTRIBUTE — exactly like the proven-working
+    blinkit_edi inventory sync. NOTE: get_decrypted_password() reads the __Auth
+    table which holds a stale/different value here and 401s; the live Admin-API
+    token is the doc's `password` field attribute."""
+    shop = frappe.get_doc("Shopify Setting")
+    if not (shop.shopify_url and shop.password):
+        return None
+    headers = {"X-Shopify-Access-Token": shop.password, "Content-Type": "application/json"}
+    return headers, "https://" + shop.shopify_url + "/admin/api/2024-01/graphql.json"
+
+
+def _shopify_order_states(order_ids, context=None):
+    """{order_id: OrderState} for many Shopify orders, ORDERS_PER_QUERY per
+    aliased GraphQL call. Orders whose lookup failed (throttled, HTTP, unknown)
+    are absent; callers treat a missing state as a failed push."""
+    context = context or _shopify_context()
+    order_ids = list(dict.fromkeys(str(oid) for oid in order_ids if oid))
+    if not (context and order_ids):
+        return {}
+    headers, gql = context
+    states = {}
+    for start in range(0, len(order_ids), ORDERS_PER_QUERY):
+        chunk = order_ids[start:start + ORDERS_PER_QUERY]
+        query, aliases = order_states_query(chunk)
+        body = _shopify_graphql(gql, {"query": query}, headers, query_cost(len(chunk)))
+        if body is None:
+            _log("D2C Fulfill", "order-state lookup for {0} order(s): throttled/HTTP".format(
+                len(chunk)))
+            continue
+        states.update(parse_order_states(body, aliases))
+    return states
+
+
 def _repair_tracking(dn, headers, gql, fulfillment_id, awbs, urls, carrier):
     """Heal an EXISTING fulfillment of ours that is missing tracking numbers.
 
@@ -1344,8 +1996,6 @@ def _repair_tracking(dn, headers, gql, fulfillment_id, awbs, urls, carrier):
     every 3+ box order (133 orders / 150 tracking numbers, 17-Jul..29-Jul-2026,
     surfaced by Shanu on SOL1241948). Success is claimed only when every AWB is
     confirmed present in the response."""
-    import requests
-
     mut = ("mutation($f: ID!, $t: FulfillmentTrackingInput!, $n: Boolean) { "
            "fulfillmentTrackingInfoUpdateV2(fulfillmentId: $f, trackingInfoInput: $t, "
            "notifyCustomer: $n) { fulfillment { id trackingInfo { number } } "
@@ -1354,8 +2004,7 @@ def _repair_tracking(dn, headers, gql, fulfillment_id, awbs, urls, carrier):
         "f": "gid://shopify/Fulfillment/" + str(fulfillment_id),
         "t": {"numbers": awbs, "urls": urls, "company": carrier},
         "n": True}}
-    r = requests.post(gql, data=json.dumps(payload), headers=headers, timeout=30)
-    j = _shopify_json(r)
+    j = _shopify_graphql(gql, payload, headers, MUTATION_COST)
     node = ((j or {}).get("data") or {}).get("fulfillmentTrackingInfoUpdateV2") or {}
     errs = node.get("userErrors", [])
     have = set()
@@ -1371,7 +2020,7 @@ def _repair_tracking(dn, headers, gql, fulfillment_id, awbs, urls, carrier):
     return "repaired"
 
 
-def push_shopify_fulfillment(dn):
+def push_shopify_fulfillment(dn, state=None):
     """Create the Shopify fulfillment for a DN, so the order shows fulfilled + the
     customer gets the AWB tracking. Idempotent + non-clobbering: returns in_sync if a
     success fulfillment already carries all our AWBs, and never overwrites a
@@ -1379,9 +2028,11 @@ def push_shopify_fulfillment(dn):
     no_open_fo | skipped | failed. App-code replacement for the sandbox-broken 'Auto Sync AWB to
     Shopify' server script (frappe.make_*_request is None in safe_exec). Every
     Shopify call is validated via _shopify_json (rejects throttle/HTTP/errors) so a
-    rate-limited response is NEVER mistaken for a successful fulfillment."""
-    import requests
+    rate-limited response is NEVER mistaken for a successful fulfillment. Every
+    call first waits for its share of the modelled Shopify budget.
 
+    `state` is the order's prefetched OrderState (see _shopify_order_states);
+    batch callers pass it so many DNs share one lookup round trip."""
     oid = str(dn.get("shopify_order_id") or "")
     # Multi-parcel aware: a combo DN carries 2 AWBs (awb_number + custom_awb_2).
     pairs = _awb_courier_pairs(dn)
@@ -1389,15 +2040,10 @@ def push_shopify_fulfillment(dn):
     if not (oid and awbs):
         return "skipped"
 
-    # Read shop_url + token from the Shopify Setting doc ATTRIBUTE — exactly like the
-    # proven-working blinkit_edi inventory sync. NOTE: get_decrypted_password() reads
-    # the __Auth table which holds a stale/different value here and 401s; the live
-    # Admin-API token is the doc's `password` field attribute.
-    shop = frappe.get_doc("Shopify Setting")
-    shop_url = shop.shopify_url
-    token = shop.password
-    if not (shop_url and token):
+    context = _shopify_context()
+    if not context:
         return "skipped"
+    headers, gql = context
 
     carrier_raw = (pairs[0][1] or dn.get("courier_partner") or "Delhivery").strip()
     carrier = SHOPIFY_CARRIER_MAP.get(carrier_raw, carrier_raw)
@@ -1415,8 +2061,6 @@ def push_shopify_fulfillment(dn):
             u = base + "cp_id=" + str(cid) + "&waybill=" + str(awb_val) + "&security_key=" + trk_key
         return u
     urls = [_trk(a, c) for a, c in pairs]
-    headers = {"X-Shopify-Access-Token": token, "Content-Type": "application/json"}
-    gql = "https://" + shop_url + "/admin/api/2024-01/graphql.json"
     # Shopify takes a single number or a numbers[] list on one fulfillment.
     if len(awbs) == 1:
         track_info = {"number": awbs[0], "url": urls[0], "company": carrier}
@@ -1424,68 +2068,36 @@ def push_shopify_fulfillment(dn):
         track_info = {"numbers": awbs, "urls": urls, "company": carrier}
     awb = ",".join(awbs)  # for log lines
 
-    # Existing fulfillments. Scan ALL of them (do not break on the first): if any
-    # success fulfillment already carries all our AWBs the order is in sync; if the
-    # order is fulfilled by some OTHER path whose tracking we don't own, we must NOT
-    # clobber it or duplicate — we detect that and stop (no open fulfillment order
-    # will exist to create against anyway).
-    fr = requests.get(
-        "https://" + shop_url + "/admin/api/2024-01/orders/" + oid + "/fulfillments.json",
-        headers=headers, timeout=30)
-    if fr.status_code != 200:
-        _log("D2C Fulfill", "list {0}: HTTP {1}".format(dn.get("name"), fr.status_code))
+    if state is None:
+        state = _shopify_order_states([oid], context).get(oid)
+    if state is None:
+        _log("D2C Fulfill", "order-state {0} AWB {1}: throttled/HTTP".format(dn.get("name"), awb))
         return "failed"
-    fulfillments = (fr.json() or {}).get("fulfillments", [])
-    covered = set()
-    repairable = None
-    for f in fulfillments:
-        if f.get("status") == "success":
-            nums = set(f.get("tracking_numbers") or (
-                [f["tracking_number"]] if f.get("tracking_number") else []))
-            covered |= nums
-            # A success fulfillment whose tracking is a SUBSET of ours is one of
-            # OURS that came up short (truncated by the legacy 2-AWB repush cron,
-            # or created before the last parcel's AWB landed) — safe to repair in
-            # place. One carrying tracking we don't own belongs to another path;
-            # never touch it. An empty set is a subset: filling in tracking on an
-            # untracked fulfillment can't clobber anything.
-            if repairable is None and nums.issubset(set(awbs)):
-                repairable = f.get("id")
-    if awbs and set(awbs).issubset(covered):
-        return "in_sync"
 
-    # Create against the order's OPEN fulfillment orders. An already-fulfilled order
-    # (by CS/manual/connector) has NO open fulfillment order, so we return without
-    # touching the foreign fulfillment.
-    foq = ('{ order(id: "gid://shopify/Order/' + oid + '") { fulfillmentOrders(first: 10) '
-           '{ edges { node { id status } } } } }')
-    r = requests.post(gql, data=json.dumps({"query": foq}), headers=headers, timeout=30)
-    jf = _shopify_json(r)
-    if jf is None:
-        _log("D2C Fulfill", "fo-query {0} AWB {1}: throttled/HTTP".format(dn.get("name"), awb))
-        return "failed"
-    edges = (((jf.get("data") or {}).get("order") or {}).get(
-        "fulfillmentOrders") or {}).get("edges", [])
-    open_fos = [(e.get("node") or {}).get("id") for e in edges
-                if (e.get("node") or {}).get("status") == "OPEN"]
-    if not open_fos:
-        # No open FO: the order is already fulfilled (or cancelled). If one of OUR
-        # fulfillments is carrying an incomplete tracking set, repair it in place —
-        # without this, a short fulfillment could never be healed and the customer
-        # never saw parcels 3..N. Anything we don't own is left strictly alone.
-        if repairable:
-            return _repair_tracking(dn, headers, gql, repairable, awbs, urls, carrier)
+    # Every fulfillment is weighed (see fulfillment_action): if any success
+    # fulfillment already carries all our AWBs the order is in sync. An order
+    # fulfilled by some OTHER path (CS/manual/connector) has NO open fulfillment
+    # order; one of OUR fulfillments with an incomplete tracking set (a subset of
+    # ours — truncated by the legacy 2-AWB repush cron, or created before the last
+    # parcel's AWB landed) is repaired in place, and anything carrying tracking we
+    # don't own is left strictly alone.
+    action, target = fulfillment_action(state, awbs)
+    if action == "in_sync":
+        return "in_sync"
+    if action == "repair":
+        return _repair_tracking(dn, headers, gql, target, awbs, urls, carrier)
+    if action == "no_open_fo":
         _log("D2C Fulfill", "no open FO for {0} AWB {1} — not ours to repair".format(
             dn.get("name"), awb))
         return "no_open_fo"
+    open_fos = target
 
     cmut = ("mutation($f: FulfillmentV2Input!) { fulfillmentCreateV2(fulfillment: $f) "
             "{ fulfillment { id status } userErrors { message } } }")
     cpayload = {"query": cmut, "variables": {"f": {
         "lineItemsByFulfillmentOrder": [{"fulfillmentOrderId": fid} for fid in open_fos],
         "trackingInfo": track_info, "notifyCustomer": True}}}
-    r = requests.post(gql, data=json.dumps(cpayload), headers=headers, timeout=30)
-    jc = _shopify_json(r)
+    jc = _shopify_graphql(gql, cpayload, headers, MUTATION_COST)
     node = ((jc or {}).get("data") or {}).get("fulfillmentCreateV2") or {}
     errs = node.get("userErrors", [])
     # Success ONLY if we got a real fulfillment id back (guards throttle/HTTP/errors).
@@ -1496,26 +2108,10 @@ def push_shopify_fulfillment(dn):
     return "created"
 
 
-def _auto_invoice_deferred_dn(dn_name):
-    """Create + submit the deferred SHPSI27 for one labelled DN, savepoint-isolated
-    so one invoice failure never aborts the label-fetch pass. Returns
-    'created' | 'skipped' | 'failed'."""
-    sp = "d2cinv_" + dn_name.replace("-", "_")[:40]
-    try:
-        frappe.db.savepoint(sp)
-        si_name = create_si_from_deferred_dn(dn_name)
-        frappe.db.commit()
-        return "created" if si_name else "skipped"
-    except Exception as e:
-        frappe.db.rollback(save_point=sp)
-        _log("D2C Auto Invoice", "{0}: {1}".format(dn_name, str(e)[:300]))
-        return "failed"
-
-
 def create_si_from_deferred_dn(dn_name):
     """Create + submit the SHPSI27 for a dispatched/labelled D2C Delivery Note.
     Single source of truth for deferred D2C invoicing — used by both the
-    auto-invoice-on-label hook and the manual D2C Invoice Run screen. Mirrors the
+    D2C Invoice Queue drainer and the manual D2C Invoice Run screen. Mirrors the
     LIVE 'Auto Create SI on Shopify DN Submit' server script (SHPSI27 series,
     tax-inclusive print rate, Sales - WTBBPL income, payment-schedule re-anchor,
     PPCOD prepaid, submit -> IRN via India Compliance). Returns SI name, or None
@@ -1540,8 +2136,13 @@ def create_si_from_deferred_dn(dn_name):
     # check so a concurrent auto-invoice-on-label tick + a manual D2C Invoice Run
     # can't both pass the guard and mint two SHPSI27 / two IRNs for the same DN. The
     # SI submit bumps SO.per_billed inside this txn; the 2nd caller blocks on the
-    # lock, then reads per_billed > 0 and bails.
-    if flt(frappe.db.get_value("Sales Order", so_name, "per_billed", for_update=True)) > 0:
+    # lock, then reads per_billed > 0 and bails. The locked read also carries the
+    # SO fields the invoice needs, so the order is read once.
+    so = frappe.db.get_value(
+        "Sales Order", so_name,
+        ["per_billed", "custom_order_type", "custom_prepaid_amount"],
+        as_dict=True, for_update=True) or frappe._dict()
+    if flt(so.per_billed) > 0:
         return None
 
     si = make_sales_invoice(source_name=doc.name)
@@ -1549,11 +2150,11 @@ def create_si_from_deferred_dn(dn_name):
     si.posting_date = doc.posting_date
     si.set_posting_time = 1
 
-    so_order_type = frappe.db.get_value("Sales Order", so_name, "custom_order_type") or ""
+    so_order_type = so.custom_order_type or ""
     if so_order_type:
         si.custom_payment_method = so_order_type
 
-    so_prepaid = flt(frappe.db.get_value("Sales Order", so_name, "custom_prepaid_amount"))
+    so_prepaid = flt(so.custom_prepaid_amount)
     if so_prepaid > 0:
         si.custom_ppcod_prepaid_amount = so_prepaid
 
@@ -1732,7 +2333,7 @@ def _todays_d2c_dns(settings, on_date):
         filters["custom_shopify_cancellation_hold"] = 0
     fields = ["name", "awb_number", "courier_partner", "customer",
               "customer_name", "shopify_order_id", "shopify_order_number",
-              "shipping_label", "custom_box_count", "is_replacement"]
+              "shipping_label", "custom_box_count", "is_replacement", "modified"]
     or_filters = {"shopify_order_id": ["is", "set"], "is_replacement": 1}
     # Multi-parcel AWBs. WITHOUT these the pick list can only print awb_number and
     # silently under-reports every 2-4 box order (the labels PDF, which uses
@@ -1888,7 +2489,10 @@ def prepare_todays_shipments(on_date=None, run_type="Ad-hoc", wave_tag=None):
             {"delivery_note": d["name"],
              "shopify_order_id": _label_identity(d),
              "awb_number": d.get("awb_number"),
-             "label_found": 1}
+             "label_found": 1,
+             "express_eligible": 1 if (d.get("_express") or {}).get("eligible") else 0,
+             "express_verdict": json.dumps(d["_express"]) if d.get("_express") else None,
+             "dn_modified": d.get("modified")}
             for d in dns
         ],
     })
@@ -2303,7 +2907,9 @@ def _render_batch_files(dns, on_date, batch_no, stamp, pack_lines=0,
             express_dns, normal_dns = [], []
             for d in printable:
                 d["_awb_pairs"] = _awb_courier_pairs(d)
-                (express_dns if classify_dn(d, appliance_express).get("eligible")
+                # Kept on the batch row so the Express scan reuses it.
+                d["_express"] = classify_dn(d, appliance_express)
+                (express_dns if d["_express"].get("eligible")
                  else normal_dns).append(d)
 
         if express_dns:
@@ -0,0 +1,213 @@
+"""Durable work queue for deferred D2C invoicing.
+
+The label-fetch pass only records that a labelled, deferred Delivery Note is
+ready to invoice (one `D2C Invoice Queue` row per DN, so re-queueing is a
+no-op). A separate drainer raises the SHPSI27s, so a slow SI submit with IRN
+generation no longer eats into the label budget and each side scales on its
+own batch size and time budget.
+
+The drainer prefetches the Sales Order of every DN in its batch with one
+query and settles rows that need no invoice (not an SHP / replacement order,
+already billed) without loading the DN or locking the order. Failures back off
+exponentially; after MAX_ATTEMPTS the row is parked for an accounts user. The
+manual D2C Invoice Run screen stays the fallback, and its invoices simply
+settle the matching queue rows as Skipped.
+"""
+
+import time
+
+import frappe
+from frappe import _
+from frappe.utils import add_to_date, cint, flt, now_datetime
+
+from solara_wms.wms.d2c_fulfillment import (
+    OPD_REPLACEMENT_PREFIX,
+    _log,
+    _settings,
+    create_si_from_deferred_dn,
+)
+
+
+QUEUE_DOCTYPE = "D2C Invoice Queue"
+MAX_ATTEMPTS = 5
+BATCH_SIZE = 60
+TIME_BUDGET_SEC = 210
+MANAGER_ROLES = {"System Manager", "Accounts Manager"}
+
+
+def queue_deferred_invoices(dn_names):
+    """Queue the given DNs for invoicing, in the caller's transaction. DNs that
+    already have a queue row, in any state, are left alone. Returns the number
+    of new rows."""
+    dn_names = list(dict.fromkeys(dn_names))
+    if not dn_names:
+        return 0
+    existing = set(frappe.get_all(
+        QUEUE_DOCTYPE, filters={"name": ["in", dn_names]}, pluck="name"))
+    fresh = [name for name in dn_names if name not in existing]
+    if not fresh:
+        return 0
+    now, user = now_datetime(), frappe.session.user
+    frappe.db.bulk_insert(
+        QUEUE_DOCTYPE,
+        ["name", "delivery_note", "status", "attempts", "enqueued_at",
+         "creation", "modified", "owner", "modified_by", "docstatus"],
+        [(name, name, "Pending", 0, now, now, now, user, user, 0) for name in fresh],
+        ignore_duplicates=True,
+    )
+    return len(fresh)
+
+
+def drain_invoice_queue():
+    """Scheduler entry (*/5). Gated by auto_invoice_on_label: while it is off,
+    queued rows simply wait."""
+    try:
+        settings = _settings()
+        if not cint(settings.get("auto_invoice_on_label")):
+            return None
+        return _drain(
+            cint(settings.get("invoice_batch_size")) or BATCH_SIZE,
+            cint(settings.get("invoice_time_budget_sec")) or TIME_BUDGET_SEC,
+        )
+    except Exception:
+        frappe.db.rollback()
+        _log("D2C Invoice Queue", "FATAL (swallowed): " + frappe.get_traceback())
+        return None
+
+
+def _drain(limit=BATCH_SIZE, budget_sec=TIME_BUDGET_SEC):
+    rows = frappe.db.sql(
+        """
+        SELECT name
+          FROM `tabD2C Invoice Queue`
+         WHERE status = 'Pending'
+           AND (next_attempt_at IS NULL OR next_attempt_at <= %s)
+         ORDER BY enqueued_at, name
+         LIMIT %s
+        """,
+        (now_datetime(), limit),
+        as_dict=True,
+    )
+    result = {"invoiced": 0, "skipped": 0, "failed": 0, "parked": 0}
+    if not rows:
+        return result
+    orders = _sales_orders([row.name for row in rows])
+    deadline = time.monotonic() + budget_sec
+    for row in rows:
+        if time.monotonic() > deadline:
+            _log("D2C Invoice Queue", "time budget hit — rest of batch next run")
+            break
+        result[_invoice(row.name, orders.get(row.name))] += 1
+    if result["invoiced"] or result["failed"] or result["parked"]:
+        _log(
+            "D2C Invoice Queue",
+            "invoiced={invoiced} skipped={skipped} failed={failed} parked={parked}".format(
+                **result),
+        )
+    return result
+
+
+def _sales_orders(dn_names):
+    """DN -> its Sales Order's name and per_billed, for the whole batch at once.
+    A DN without an SO line is absent."""
+    rows = frappe.db.sql(
+        """
+        SELECT dni.parent AS delivery_note, so.name AS sales_order, so.per_billed
+          FROM `tabDelivery Note Item` dni
+          JOIN `tabSales Order` so ON so.name = dni.against_sales_order
+         WHERE dni.parent IN %s
+         ORDER BY dni.parent, dni.idx
+        """,
+        (tuple(dn_names),),
+        as_dict=True,
+    )
+    orders = {}
+    for row in rows:
+        orders.setdefault(row.delivery_note, row)
+    return orders
+
+
+def _invoiceable(order):
+    if not order:
+        return False
+    name = order.sales_order or ""
+    if not (name.startswith("SHP") or name.startswith(OPD_REPLACEMENT_PREFIX)):
+        return False
+    return flt(order.per_billed) <= 0
+
+
+def _invoice(name, order):
+    """Settle one queue row in its own transaction. Returns the outcome key."""
+    locked = frappe.db.sql(
+        """
+        SELECT name, attempts
+          FROM `tabD2C Invoice Queue`
+         WHERE name = %s AND status = 'Pending'
+         FOR UPDATE
+        """,
+        (name,),
+        as_dict=True,
+    )
+    if not locked:
+        frappe.db.commit()
+        return "skipped"
+    if not _invoiceable(order):
+        _settle(name, "Skipped", sales_order=order.sales_order if order else None)
+        return "skipped"
+    attempts = cint(locked[0].attempts) + 1
+    savepoint = "d2cinvq_" + name.replace("-", "_")[:40]
+    frappe.db.savepoint(savepoint)
+    try:
+        si_name = create_si_from_deferred_dn(name)
+    except Exception:
+        frappe.db.rollback(save_point=savepoint)
+        return _retry(name, attempts, frappe.get_traceback())
+    _settle(name, "Invoiced" if si_name else "Skipped", attempts=attempts,
+            sales_order=order.sales_order, sales_invoice=si_name)
+    return "invoiced" if si_name else "skipped"
+
+
+def _settle(name, status, **values):
+    frappe.db.set_value(
+        QUEUE_DOCTYPE,
+        name,
+        {"status": status, "settled_at": now_datetime(), "last_error": "", **values},
+        update_modified=False,
+    )
+    frappe.db.commit()
+
+
+def _retry(name, attempts, error):
+    parked = attempts >= MAX_ATTEMPTS
+    frappe.db.set_value(
+        QUEUE_DOCTYPE,
+        name,
+        {
+            "status": "Parked" if parked else "Pending",
+            "attempts": attempts,
+            "next_attempt_at": add_to_date(now_datetime(), minutes=2 ** attempts),
+            "last_error": error[-2000:],
+        },
+        update_modified=False,
+    )
+    if parked:
+        frappe.log_error(message=error, title="D2C invoice parked " + name)
+    frappe.db.commit()
+    return "parked" if parked else "failed"
+
+
+@frappe.whitelist(methods=["POST"])
+def requeue_deferred_invoice(delivery_note):
+    """Return a parked DN to the queue after its cause has been fixed."""
+    if not MANAGER_ROLES.intersection(frappe.get_roles()):
+        frappe.throw(_("Only an Accounts Manager can requeue D2C invoices"),
+                     frappe.PermissionError)
+    if frappe.db.get_value(QUEUE_DOCTYPE, delivery_note, "status") != "Parked":
+        frappe.throw(_("Only parked invoices can be requeued"))
+    frappe.db.set_value(
+        QUEUE_DOCTYPE,
+        delivery_note,
+        {"status": "Pending", "attempts": 0, "next_attempt_at": None},
+        update_modified=False,
+    )
+    return {"delivery_note": delivery_note, "status": "Pending"}
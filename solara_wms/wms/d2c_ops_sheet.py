@@ -12,9 +12,9 @@ site config wasn't available; frappe.conf still wins if a key is ever set there)
 (a frappe core dependency) + the Sheets v4 REST API directly — no gspread /
 discovery client needed on the bench.
 
-Exception categorisation calls the SAME gate helpers the release job runs
-(_candidate_sos / _order_box_count / _fully_covered_by_known_combos), so the
-sheet can never drift from deployed behaviour.
+Exception categorisation is the verdict the release job itself persisted in
+`D2C Release Exception` (see d2c_fulfillment._persist_release_exceptions), so
+the sheet can never drift from deployed behaviour and never re-runs the gates.
 """
 import json
 import re
@@ -36,6 +36,15 @@ EXCEPTIONS_HEADER = ["Sales Order", "Order Date", "Customer", "Amount",
                      "Category", "What to do"]
 AUTO_SHIPPED_HEADER = ["Shopify Order", "Sales Order", "Delivery Note", "Date",
                        "Released At", "Customer", "Amount", "Boxes", "AWB(s)", "Status"]
+# "What to do" per persisted release-gate category ({detail} = stored detail).
+EXCEPTION_ACTIONS = {
+    "BAD-DATA": "SO line without item_code — fix or cancel",
+    "ON-HOLD": "Shopify hold flag — clears on next sync",
+    "PPCOD": "Phase-1 exclusion — ship via manual sheet",
+    "BROKEN-PPCOD": "PPCOD with COD amount 0 — fix classification",
+    "MULTIBOX": "ship via manual sheet — {detail}",
+    "GUARD-FAILED": "{detail}",
+}
 
 
 def push_ops_sheet():
@@ -144,6 +153,9 @@ def _run_log_rows(days=3):
                         kv.get("attached", ""), kv.get("invoiced", ""),
                         kv.get("fulfilled", ""), kv.get("errors", ""),
                         kv.get("awb_shortfall", ""), ""])
+        elif r.method.startswith("D2C Invoice Queue") and "invoiced=" in (r.error or ""):
+            out.append([t, "invoices", "", "", "", "", "", "", "", "", "", "",
+                        "", kv.get("invoiced", ""), "", kv.get("failed", ""), "", ""])
         elif r.method.startswith("D2C AWB Guard"):
             out.append([t, "awb-guard", "", "", "", "", "", "", "", "", "", "",
                         "", "", "", "", "1", (r.error or "").split("\n")[0][:150]])
@@ -153,67 +165,36 @@ def _run_log_rows(days=3):
     return out
 
 
-def _recent_failures():
-    """SO -> first-line reason from the recent release logs (dedup, newest wins)."""
-    reasons = {}
-    for r in frappe.get_all(
-            "Error Log",
-            filters={"method": ["like", "D2C Release%"],
-                     "creation": [">=", add_days(nowdate(), -2)]},
-            fields=["error"], order_by="creation desc", limit_page_length=8):
-        m = re.search(r"failures=(\[.*\])\s*$", r.error or "", re.S)
-        if not m:
-            continue
-        try:
-            for f in json.loads(m.group(1)):
-                reasons.setdefault(f.get("so"), (f.get("err") or "").split("\n")[0][:120])
-        except Exception:
-            pass
-    return reasons
-
-
 def _exception_rows(settings):
-    """Categorise currently-pending SHP orders with the SAME gates the release
-    job applies — direct calls into d2c_fulfillment, zero re-implementation."""
-    limit = cint(settings.get("release_batch_size")) or 200
-    candidates = d2c._candidate_sos(settings, limit)
-    already = d2c._sos_with_existing_dn([c.name for c in candidates])
-    box_map = d2c._box_config(settings)
-    release_ppcod = cint(settings.get("release_ppcod"))
-    release_known = cint(settings.get("release_known_combos"))
-    failed_reasons = _recent_failures()
-
-    rows = []
-    for cand in candidates:
-        if cand.name in already:
-            continue
-        try:
-            so = frappe.get_doc("Sales Order", cand.name)
-        except Exception:
-            continue
-        base = [so.name, str(so.transaction_date), so.customer_name or "",
-                round(flt(so.grand_total), 2)]
-        order_type = (so.get("custom_order_type") or "")
-        if so.name in failed_reasons:
-            rows.append(base + ["GUARD-FAILED", failed_reasons[so.name]])
-        elif any(not it.item_code for it in so.items):
-            rows.append(base + ["BAD-DATA", "SO line without item_code — fix or cancel"])
-        elif cint(so.get("custom_shopify_hold")):
-            rows.append(base + ["ON-HOLD", "Shopify hold flag — clears on next sync"])
-        elif order_type == "PPCOD" and not release_ppcod:
-            rows.append(base + ["PPCOD", "Phase-1 exclusion — ship via manual sheet"])
-        elif (order_type == "PPCOD" and flt(so.get("custom_cod_amount")) < 0.5
-              and flt(so.get("grand_total")) > 0.5):
-            rows.append(base + ["BROKEN-PPCOD", "PPCOD with COD amount 0 — fix classification"])
-        else:
-            bc = d2c._order_box_count(so, box_map, settings)
-            if bc >= 2 and not (release_known and
-                                d2c._fully_covered_by_known_combos(so, box_map, settings)):
-                detail = "+".join(sorted({it.item_code for it in so.items if it.item_code})[:4])
-                rows.append(base + ["MULTIBOX ({0} boxes)".format(bc),
-                                    "ship via manual sheet — " + detail])
-        # anything else releases on the next */15 window — not an exception
-    return rows
+    """Currently-pending SHP orders the release gates held back, read from the
+    classification the release job persists on every */15 run — one query, no
+    gate re-evaluation. The join drops orders that have since been delivered,
+    cancelled or aged out of the lookback window."""
+    lookback = cint(settings.get("lookback_days")) or 3
+    statuses = d2c.RELEASABLE_STATUSES
+    rows = frappe.db.sql(
+        """SELECT ex.sales_order, ex.transaction_date, ex.customer_name,
+                  ex.grand_total, ex.category, ex.box_count, ex.detail
+             FROM `tabD2C Release Exception` ex
+             JOIN `tabSales Order` so ON so.name = ex.sales_order
+            WHERE so.docstatus = 1 AND so.per_delivered = 0
+              AND so.status IN ({0})
+              AND so.transaction_date >= %s
+            ORDER BY so.transaction_date ASC, so.creation ASC""".format(
+            ", ".join(["%s"] * len(statuses))),
+        tuple(statuses) + (add_days(nowdate(), -lookback),),
+        as_dict=True,
+    )
+    out = []
+    for r in rows:
+        category = r.category
+        if category == "MULTIBOX":
+            category = "MULTIBOX ({0} boxes)".format(cint(r.box_count))
+        action = EXCEPTION_ACTIONS.get(r.category, "{detail}").format(
+            detail=r.detail or "")
+        out.append([r.sales_order, str(r.transaction_date), r.customer_name or "",
+                    round(flt(r.grand_total), 2), category, action])
+    return out
 
 
 def _auto_shipped_rows(days=7):
@@ -14,6 +14,22 @@ import frappe
 from frappe.utils import add_to_date, cint, flt, now_datetime, nowdate
 
 from solara_wms.wms.d2c_dispatch import _resolve
+from solara_wms.wms.item_barcodes import barcodes_for
+
+
+QC_OPEN = ("Pending", "Failed")
+QUEUE_FIELDS = ("name", "awb", "shopify_order_number", "station", "status",
+                "sample_reason", "pieces_expected", "staged_at", "audited_at")
+# Inspector devices follow the queue through qc_queue_feed. Every insert or
+# save of a D2C Pack QC row takes the next feed_version from the QC_FEED_SERIES
+# counter and, after commit, pushes QC_FEED_EVENT so a subscribed device polls
+# only when there is news.
+QC_FEED_EVENT = "d2c_pack_qc_feed"
+QC_FEED_SERIES = "D2C-PACK-QC-FEED"
+QC_FEED_PAGE = 100
+QC_FEED_MAX_PAGE = 500
+# Today's QC control, cached per date so a new day starts from the default.
+QC_CONTROL_KEY = "solara_wms:pack_qc_control:"
 
 
 def _value(row, key, default=None):
@@ -56,8 +72,24 @@ def _recent_line_failure(station):
         fields=["name"], limit_page_length=1))
 
 
+def _cache():
+    cache = frappe.cache
+    return cache() if callable(cache) else cache
+
+
 def qc_control_state():
-    """Today's control defaults ON, so yesterday's pause never leaks forward."""
+    """Today's control defaults ON, so yesterday's pause never leaks forward.
+    Read on every pack scan and feed poll, so it is served from the cache
+    until qc_set_control changes it."""
+    key = QC_CONTROL_KEY + nowdate()
+    state = _cache().get_value(key)
+    if state is None:
+        state = _read_control_state()
+        _cache().set_value(key, state, expires_in_sec=86400)
+    return state
+
+
+def _read_control_state():
     rows = frappe.get_all(
         "D2C Pack QC Control", filters={"control_date": nowdate()},
         fields=["name", "enabled", "changed_at", "changed_by", "reason",
@@ -105,7 +137,9 @@ def qc_set_control(enabled=1, release_open=0, actor=None, reason=None):
     else:
         doc.save(ignore_permissions=True)
     frappe.db.commit()
+    _cache().delete_value(QC_CONTROL_KEY + nowdate())
     state = qc_control_state()
+    frappe.publish_realtime(QC_FEED_EVENT, {"control": state})
     state.update({"status": "ok", "released_now": released})
     return state
 
@@ -218,14 +252,7 @@ def qc_stage(code, station=None, pieces_confirmed=None, duration_sec=None, packe
 
 
 def _barcode_requirements(lines):
-    codes = sorted({_value(row, "item_code") for row in lines if _value(row, "item_code")})
-    grouped = {code: [] for code in codes}
-    if codes:
-        for row in frappe.get_all("Item Barcode", filters={"parent": ["in", codes]},
-                                  fields=["parent", "barcode"], limit_page_length=0):
-            barcode = (_value(row, "barcode") or "").strip()
-            if barcode:
-                grouped.setdefault(_value(row, "parent"), []).append(barcode)
+    grouped = barcodes_for({_value(row, "item_code") for row in lines})
     return [{"item_code": _value(row, "item_code"),
              "item_name": _value(row, "item_name") or _value(row, "item_code"),
              "qty": max(1, cint(round(flt(_value(row, "qty"))))),
@@ -275,26 +302,99 @@ def validate_scans(requirements, scans, manual_confirmed):
     return {"ok": True, "matched": matched, "manual": manual_used}
 
 
+def _queue_row(row, now):
+    out = {key: _value(row, key) for key in QUEUE_FIELDS}
+    staged = out["staged_at"]
+    out["wait_min"] = round(max(0, (now - staged).total_seconds()) / 60, 1) \
+        if staged else None
+    return out
+
+
 @frappe.whitelist()
 def qc_queue():
     rows = frappe.get_all(
-        "D2C Pack QC", filters={"status": ["in", ["Pending", "Failed"]]},
-        fields=["name", "awb", "shopify_order_number", "station", "status",
-                "sample_reason", "pieces_expected", "staged_at", "audited_at"],
-        order_by="staged_at asc", limit_page_length=100)
+        "D2C Pack QC", filters={"status": ["in", list(QC_OPEN)]},
+        fields=list(QUEUE_FIELDS), order_by="staged_at asc", limit_page_length=100)
     now = now_datetime()
-    out = []
-    for row in rows:
-        staged = _value(row, "staged_at")
-        out.append({key: _value(row, key) for key in (
-            "name", "awb", "shopify_order_number", "station", "status",
-            "sample_reason", "pieces_expected", "staged_at", "audited_at")})
-        out[-1]["wait_min"] = round(max(0, (now - staged).total_seconds()) / 60, 1) \
-            if staged else None
+    out = [_queue_row(row, now) for row in rows]
     return {"status": "ok", "count": len(out), "parcels": out,
             "control": qc_control_state()}
 
 
+def stamp_feed_version(doc):
+    """Give a D2C Pack QC row the next feed version (controller before_save).
+
+    The counter is one `tabSeries` row bumped with LAST_INSERT_ID, so a save
+    locks that single row until commit - versions still become visible in the
+    order they were handed out, without range-locking the D2C Pack QC index."""
+    frappe.db.sql(
+        """
+        INSERT INTO `tabSeries` (`name`, `current`) VALUES (%s, LAST_INSERT_ID(1))
+        ON DUPLICATE KEY UPDATE `current` = LAST_INSERT_ID(`current` + 1)
+        """,
+        (QC_FEED_SERIES,))
+    doc.feed_version = cint(frappe.db.sql("SELECT LAST_INSERT_ID()")[0][0])
+
+
+def publish_feed_version(version):
+    frappe.publish_realtime(QC_FEED_EVENT, {"version": cint(version)},
+                            after_commit=True)
+
+
+def _feed_rows(conditions, values, limit):
+    rows = frappe.db.sql(
+        """
+        SELECT {fields}, feed_version
+        FROM `tabD2C Pack QC`
+        WHERE {conditions}
+        ORDER BY feed_version ASC, name ASC
+        LIMIT %(limit)s
+        """.format(fields=", ".join("`{0}`".format(f) for f in QUEUE_FIELDS),
+                   conditions=conditions),
+        dict(values, limit=limit + 1), as_dict=True)
+    return rows[:limit], len(rows) > limit
+
+
+@frappe.whitelist()
+def qc_queue_feed(since=0, after=None, token=None, limit=QC_FEED_PAGE):
+    """Change feed of the QC queue for roaming inspector devices.
+
+    since=0 pages a snapshot of the open queue as of `token` (set by the first
+    page): pass back `after` and `token` while `more` is true, then poll with
+    since=token. since>0 returns every row inserted or changed after that
+    version, closed ones included so the device can drop them, in pages of
+    `limit`; poll again with the returned `token`. Devices subscribed to
+    QC_FEED_EVENT only need to poll when it fires."""
+    since = cint(since)
+    limit = min(max(cint(limit) or QC_FEED_PAGE, 1), QC_FEED_MAX_PAGE)
+    now = now_datetime()
+    if since > 0:
+        rows, more = _feed_rows("feed_version > %(since)s", {"since": since}, limit)
+        next_token = cint(rows[-1].feed_version) if rows else since
+        return {"status": "ok", "mode": "changes", "token": next_token, "more": more,
+                "parcels": [_queue_row(row, now) for row in rows],
+                "control": qc_control_state()}
+
+    if token is None or str(token).strip() == "":
+        head = frappe.db.sql("SELECT MAX(feed_version) FROM `tabD2C Pack QC`")
+        token = cint(head[0][0] if head else 0)
+    token = cint(token)
+    after_version, _sep, after_name = str(after or "").partition("|")
+    rows, more = _feed_rows(
+        """status IN %(open)s AND feed_version <= %(token)s
+        AND (feed_version > %(after_version)s
+             OR (feed_version = %(after_version)s AND name > %(after_name)s))""",
+        {"open": QC_OPEN, "token": token,
+         "after_version": cint(after_version) if after else -1,
+         "after_name": after_name}, limit)
+    last = rows[-1] if rows else None
+    return {"status": "ok", "mode": "snapshot", "token": token, "more": more,
+            "after": ("{0}|{1}".format(cint(last.feed_version), last.name)
+                      if last and more else None),
+            "parcels": [_queue_row(row, now) for row in rows],
+            "control": qc_control_state()}
+
+
 @frappe.whitelist()
 def qc_get(code):
     ctx, error = _parcel_context(code)
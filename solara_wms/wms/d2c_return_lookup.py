@@ -0,0 +1,433 @@
+"""Maintained lookup index for the returns desk.
+
+Resolving a scanned order number or forward AWB used to walk every linkage
+shape to the original Sales Invoice, load each candidate invoice, rebuild the
+delivered/already-returned map and read Item once per line - on every scan.
+``D2C Return Lookup`` keeps that answer per original Delivery Note (invoice,
+customer, AWBs and the returnable lines with their current caps), and
+``D2C Return Lookup Key`` maps every code a desk may scan - Shopify order
+number, forward AWB, Delivery Note, Sales Invoice, customer phone - to it, so
+a scan is one indexed join.
+
+Rows are written when the original invoice is submitted, refreshed when a
+return Delivery Note against it posts or is cancelled (the caps move) and when
+its AWBs are amended, and dropped on cancel. Writes and refreshes run as
+after-commit jobs, and only Shopify documents (``shopify_order_number`` set)
+are considered at all. A scan that misses the index
+falls back to the full resolution and indexes the order for the next scan, so
+history that predates the index heals as it is scanned;
+``rebuild_return_lookup`` backfills it in bulk.
+"""
+
+import json
+import re
+from collections import defaultdict
+
+import frappe
+from frappe.utils import add_days, cint, flt, now_datetime, nowdate
+
+from solara_wms.wms.d2c_dispatch import _resolve
+from solara_wms.wms.d2c_fulfillment import _awb_courier_pairs, _log
+from solara_wms.wms.doctype.return_intake.return_intake import ReturnIntake
+
+
+LOOKUP_DOCTYPE = "D2C Return Lookup"
+KEY_DOCTYPE = "D2C Return Lookup Key"
+ORDER_CODE = re.compile(r"^(SOL\d+)(?:[-_ ]?P(\d+))?(?:[-_ ]?R\d+)?$")
+PHONE_DIGITS = 10
+PHONE_CODE = re.compile(r"^\+?[\d\s-]+$")
+REBUILD_COMMIT_EVERY = 200
+REINDEX_QUEUE = "short"
+
+
+def find_sales_invoice(dn):
+    """Find the submitted original SI through every linkage shape used by Shopify."""
+    candidates = []
+
+    for row in frappe.get_all(
+            "Delivery Note Item",
+            filters={"parent": dn.name, "docstatus": 1,
+                     "against_sales_invoice": ["is", "set"]},
+            fields=["against_sales_invoice"], limit_page_length=0):
+        candidates.append(row.against_sales_invoice)
+
+    for row in frappe.get_all(
+            "Sales Invoice Item",
+            filters={"delivery_note": dn.name, "docstatus": 1},
+            fields=["parent"], limit_page_length=0):
+        candidates.append(row.parent)
+
+    sales_orders = sorted({row.against_sales_order for row in dn.items
+                           if row.get("against_sales_order")})
+    if sales_orders:
+        for row in frappe.get_all(
+                "Sales Invoice Item",
+                filters={"sales_order": ["in", sales_orders], "docstatus": 1},
+                fields=["parent"], limit_page_length=0):
+            candidates.append(row.parent)
+
+    candidates = [name for name in dict.fromkeys(candidates) if name]
+    if not candidates:
+        return None
+    # One read decides which candidate is a submitted original; only that one loads.
+    originals = set(frappe.get_all(
+        "Sales Invoice",
+        filters={"name": ["in", candidates], "docstatus": 1, "is_return": 0},
+        pluck="name"))
+    name = next((name for name in candidates if name in originals), None)
+    return frappe.get_doc("Sales Invoice", name) if name else None
+
+
+def max_returnable(si):
+    """Use the same source-link and prior-return rules as Return Intake itself."""
+    probe = ReturnIntake({"doctype": "Return Intake", "sales_invoice": si.name,
+                          "company": si.company})
+    delivered, _source, dns = probe._build_delivered_map(si)
+    already = probe._already_returned_map(dns, si.name)
+    return {code: max(0, flt(qty) - flt(already.get(code)))
+            for code, qty in delivered.items()}
+
+
+def _item_meta(item_codes):
+    if not item_codes:
+        return {}
+    return {row.name: row for row in frappe.get_all(
+        "Item", filters={"name": ["in", sorted(item_codes)]},
+        fields=["name", "item_name", "is_stock_item", "has_serial_no", "image"],
+        limit_page_length=0)}
+
+
+def expected_items(dn, si):
+    """Return order lines plus the physical packed-component checklist.
+
+    The accounting return must stay on the original Delivery Note parent line,
+    but warehouse QC must prove every component packed behind that line.  A
+    complete component checklist is therefore nested under each parent item.
+    """
+    packed_rows = dn.get("packed_items") or []
+    bundle_parents = {row.parent_item for row in packed_rows if row.get("parent_item")}
+    maxima = max_returnable(si)
+    meta = _item_meta({row.item_code for row in dn.items if row.item_code}
+                      | {row.get("item_code") for row in packed_rows if row.get("item_code")})
+    grouped = {}
+    for row in dn.items:
+        qty = abs(flt(row.qty))
+        if qty <= 0:
+            continue
+        item = meta.get(row.item_code) or {}
+        if not cint(item.get("is_stock_item")) and row.item_code not in bundle_parents:
+            continue
+        if row.item_code not in grouped:
+            grouped[row.item_code] = {
+                "item_code": row.item_code,
+                "item_name": row.item_name,
+                "image": item.get("image"),
+                "expected_qty": 0,
+                "max_returnable": flt(maxima.get(row.item_code)),
+                "serial_required": cint(item.get("has_serial_no")),
+            }
+        grouped[row.item_code]["expected_qty"] += qty
+    packed = defaultdict(dict)
+    for row in packed_rows:
+        parent = row.get("parent_item")
+        code = row.get("item_code")
+        qty = abs(flt(row.get("qty")))
+        if not parent or not code or qty <= 0:
+            continue
+        item = meta.get(code) or {}
+        component = packed[parent].setdefault(code, {
+            "parent_item_code": parent,
+            "item_code": code,
+            "item_name": item.get("item_name") or code,
+            "image": item.get("image"),
+            "expected_qty": 0,
+        })
+        component["expected_qty"] += qty
+
+    output = []
+    for item in grouped.values():
+        item["components"] = list(packed.get(item["item_code"], {}).values())
+        output.append(item)
+    return output
+
+
+def _phone(value):
+    digits = re.sub(r"\D", "", str(value or ""))
+    return digits[-PHONE_DIGITS:] if len(digits) >= PHONE_DIGITS else ""
+
+
+def _normalise(code):
+    """Scanned code -> (index key, parcel number or None)."""
+    up = (code or "").strip().upper()
+    match = ORDER_CODE.match(up)
+    if match:
+        return match.group(1), cint(match.group(2)) or None
+    return up, None
+
+
+def _keys(dn, si, pairs, phone):
+    keys = {
+        (dn.name.upper(), "Delivery Note"),
+        (si.name.upper(), "Sales Invoice"),
+    }
+    order = (dn.get("shopify_order_number") or "").strip().upper()
+    if order:
+        keys.add((order, "Order"))
+    keys.update((awb.strip().upper(), "AWB") for awb, _courier in pairs if awb)
+    if phone:
+        keys.add((phone, "Phone"))
+    return sorted(keys)
+
+
+def index_delivery_note(dn, si=None):
+    """(Re)write the lookup row and keys of one original Delivery Note; returns
+    the row, or None (and no row) when it has no submitted original invoice."""
+    si = si or find_sales_invoice(dn)
+    if not si:
+        drop([dn.name])
+        return None
+    pairs = _awb_courier_pairs(dn)
+    phone = _phone(dn.get("contact_mobile") or si.get("contact_mobile"))
+    now, user = now_datetime(), frappe.session.user
+    row = frappe._dict(
+        name=dn.name,
+        delivery_note=dn.name,
+        sales_invoice=si.name,
+        shopify_order_number=dn.get("shopify_order_number") or dn.get("shopify_order_id"),
+        customer_name=dn.get("customer_name") or si.get("customer_name"),
+        customer_phone=phone,
+        posting_date=dn.get("posting_date"),
+        courier=dn.get("courier_partner"),
+        awbs=json.dumps([[awb, courier] for awb, courier in pairs]),
+        returnable_items=json.dumps(expected_items(dn, si), default=str),
+        indexed_at=now,
+    )
+    drop([dn.name])
+    fields = list(row)
+    frappe.db.bulk_insert(
+        LOOKUP_DOCTYPE,
+        fields + ["creation", "modified", "owner", "modified_by", "docstatus"],
+        [tuple(row[f] for f in fields) + (now, now, user, user, 0)],
+    )
+    frappe.db.bulk_insert(
+        KEY_DOCTYPE,
+        ["name", "lookup_key", "key_type", "delivery_note",
+         "creation", "modified", "owner", "modified_by", "docstatus"],
+        [(frappe.generate_hash(length=12), key, key_type, dn.name, now, now, user, user, 0)
+         for key, key_type in _keys(dn, si, pairs, phone)],
+    )
+    return row
+
+
+def drop(dn_names):
+    dn_names = list(dn_names)
+    if not dn_names:
+        return
+    frappe.db.delete(KEY_DOCTYPE, {"delivery_note": ["in", dn_names]})
+    frappe.db.delete(LOOKUP_DOCTYPE, {"name": ["in", dn_names]})
+
+
+def reindex(dn_names):
+    for name in dict.fromkeys(dn_names):
+        if name and frappe.db.exists("Delivery Note", {"name": name, "docstatus": 1}):
+            index_delivery_note(frappe.get_doc("Delivery Note", name))
+        else:
+            drop([name])
+
+
+def _indexed(key):
+    # A scan of digits may be a numeric AWB or a phone typed in any format.
+    phone = _phone(key) if PHONE_CODE.match(key) else ""
+    rows = frappe.db.sql(
+        """
+        SELECT k.key_type, l.*
+          FROM `tabD2C Return Lookup Key` k
+          JOIN `tabD2C Return Lookup` l ON l.name = k.delivery_note
+         WHERE k.lookup_key IN %s
+         ORDER BY l.posting_date DESC, l.name DESC
+        """,
+        (tuple({key, phone} - {""}),),
+        as_dict=True,
+    )
+    # A phone number can collide with a numeric AWB; an exact order/AWB key wins.
+    exact = [row for row in rows if row.key_type != "Phone"]
+    return exact[:1] if exact else rows
+
+
+def _result(row, key, parcel):
+    pairs = [tuple(pair) for pair in json.loads(row.awbs or "[]")]
+    if parcel:
+        forward_awb = pairs[parcel - 1][0] if 0 < parcel <= len(pairs) else None
+    else:
+        forward_awb = next((awb for awb, _courier in pairs if awb.upper() == key), None)
+    forward_awb = forward_awb or (pairs[0][0] if pairs else None)
+    return {
+        "status": "ok",
+        "order": row.shopify_order_number,
+        "customer_name": row.customer_name,
+        "dn": row.delivery_note,
+        "sales_invoice": row.sales_invoice,
+        "forward_awb": forward_awb,
+        "courier": next((courier for awb, courier in pairs if awb == forward_awb), None)
+                   or row.courier,
+        "items": json.loads(row.returnable_items or "[]"),
+    }
+
+
+def resolve(code):
+    """Resolve a scanned order number / forward AWB / DN / SI / phone to its
+    original order and returnable lines. Returns a dict whose status is ok,
+    need_order (unknown code), ambiguous (a phone with several orders) or error."""
+    key, parcel = _normalise(code)
+    if not key:
+        return {"status": "need_order"}
+    rows = _indexed(key)
+    if len(rows) > 1:
+        return {
+            "status": "ambiguous",
+            "message": "{0} orders match this phone number. Scan the order number "
+                       "or the original AWB instead.".format(len(rows)),
+            "candidates": [{"order": row.shopify_order_number, "dn": row.delivery_note,
+                            "posting_date": row.posting_date} for row in rows[:10]],
+        }
+    if rows:
+        return _result(rows[0], key, parcel)
+
+    # Miss: resolve the slow way once and index the order for the next scan.
+    dn_name = _resolve(code)[0]
+    if not dn_name:
+        return {"status": "need_order"}
+    dn = frappe.get_doc("Delivery Note", dn_name)
+    row = index_delivery_note(dn)
+    if not row:
+        return {"status": "error",
+                "message": "The order was found, but no submitted original Sales Invoice is linked."}
+    return _result(row, key, parcel)
+
+
+# ─── Maintenance (doc_events; never block the ERP document) ───────
+
+def _safely(what, fn, *args):
+    try:
+        fn(*args)
+    except Exception:
+        _log("D2C Return Lookup", "{0} (swallowed): {1}".format(what, frappe.get_traceback()))
+
+
+def _invoice_delivery_notes(si):
+    """Original Delivery Notes an invoice covers, through the same three linkage
+    paths as Return Intake."""
+    names = {row.delivery_note for row in si.items if row.get("delivery_note")}
+    names.update(frappe.get_all(
+        "Delivery Note Item",
+        filters={"against_sales_invoice": si.name, "docstatus": 1},
+        pluck="parent"))
+    sales_orders = sorted({row.sales_order for row in si.items if row.get("sales_order")})
+    if sales_orders:
+        names.update(frappe.get_all(
+            "Delivery Note Item",
+            filters={"against_sales_order": ["in", sales_orders], "docstatus": 1},
+            pluck="parent"))
+    if not names:
+        return []
+    return frappe.get_all(
+        "Delivery Note",
+        filters={"name": ["in", sorted(names)], "docstatus": 1, "is_return": 0},
+        pluck="name")
+
+
+def _is_shopify(doc):
+    """Only Shopify orders reach the returns desk; every other invoice and DN
+    leaves the hook before it touches the database."""
+    return bool((doc.get("shopify_order_number") or "").strip())
+
+
+def _queue(method, name, **kwargs):
+    """Run an index refresh as its own job once the posting commits, so the
+    linkage walk never lengthens the submit transaction."""
+    _safely(name, lambda: frappe.enqueue(
+        "solara_wms.wms.d2c_return_lookup." + method,
+        queue=REINDEX_QUEUE,
+        job_id="d2c-return-lookup:" + name,
+        deduplicate=True,
+        enqueue_after_commit=True,
+        **kwargs,
+    ))
+
+
+def reindex_invoice(sales_invoice):
+    """Background job: refresh every original Delivery Note one invoice covers."""
+    reindex(_invoice_delivery_notes(frappe.get_doc("Sales Invoice", sales_invoice)))
+
+
+def on_sales_invoice_submit(doc, method=None):
+    if not _is_shopify(doc):
+        return
+    if cint(doc.get("is_return")):
+        if doc.get("return_against"):
+            _queue("reindex_invoice", doc.return_against, sales_invoice=doc.return_against)
+        return
+    _queue("reindex_invoice", doc.name, sales_invoice=doc.name)
+
+
+def on_sales_invoice_cancel(doc, method=None):
+    if not _is_shopify(doc):
+        return
+    if cint(doc.get("is_return")):
+        on_sales_invoice_submit(doc, method)
+        return
+    _safely(doc.name, lambda: drop(frappe.get_all(
+        LOOKUP_DOCTYPE, filters={"sales_invoice": doc.name}, pluck="name")))
+
+
+def on_delivery_note_submit(doc, method=None):
+    if not _is_shopify(doc):
+        return
+    if cint(doc.get("is_return")):
+        if doc.get("return_against"):
+            _queue("reindex", doc.return_against, dn_names=[doc.return_against])
+    elif any(row.get("against_sales_invoice") for row in doc.get("items") or []):
+        _queue("reindex", doc.name, dn_names=[doc.name])
+
+
+def on_delivery_note_update_after_submit(doc, method=None):
+    # Amended AWBs must reach the index; orders not yet indexed heal on scan.
+    if (_is_shopify(doc) and not cint(doc.get("is_return"))
+            and frappe.db.exists(LOOKUP_DOCTYPE, doc.name)):
+        _queue("reindex", doc.name, dn_names=[doc.name])
+
+
+def on_delivery_note_cancel(doc, method=None):
+    if not _is_shopify(doc):
+        return
+    if cint(doc.get("is_return")):
+        on_delivery_note_submit(doc, method)
+    else:
+        _safely(doc.name, drop, [doc.name])
+
+
+def rebuild_return_lookup(days=120):
+    """Backfill the index for Shopify Delivery Notes posted in the last `days`
+    days (bench execute solara_wms.wms.d2c_return_lookup.rebuild_return_lookup)."""
+    names = frappe.get_all(
+        "Delivery Note",
+        filters={"docstatus": 1, "is_return": 0,
+                 "shopify_order_number": ["is", "set"],
+                 "posting_date": [">=", add_days(nowdate(), -cint(days))]},
+        pluck="name",
+        order_by="posting_date desc",
+        limit_page_length=0,
+    )
+    indexed = 0
+    for position, name in enumerate(names, 1):
+        frappe.db.savepoint("return_lookup_rebuild")
+        try:
+            if index_delivery_note(frappe.get_doc("Delivery Note", name)):
+                indexed += 1
+        except Exception:
+            frappe.db.rollback(save_point="return_lookup_rebuild")
+            _log("D2C Return Lookup", "rebuild {0}: {1}".format(name, frappe.get_traceback()))
+        if position % REBUILD_COMMIT_EVERY == 0:
+            frappe.db.commit()
+    frappe.db.commit()
+    return {"delivery_notes": len(names), "indexed": indexed}
@@ -10,11 +10,9 @@ import json
 from collections import defaultdict
 
 import frappe
-from frappe.utils import cint, flt, now_datetime, today
+from frappe.utils import add_to_date, cint, flt, now_datetime, today
 
-from solara_wms.wms.d2c_dispatch import _resolve
-from solara_wms.wms.d2c_fulfillment import _awb_courier_pairs
-from solara_wms.wms.doctype.return_intake.return_intake import ReturnIntake
+from solara_wms.wms import d2c_return_lookup
 
 
 CUSTOMER_REASONS = {
@@ -26,6 +24,11 @@ CONDITIONS = {
     "Good", "Repairable", "Scrap", "Damaged", "Used", "Incomplete",
     "Wrong Item", "Missing / Empty",
 }
+INTAKE_QUEUE = "short"
+INTAKE_TIMEOUT = 300
+INTAKE_MAX_ATTEMPTS = 5
+INTAKE_STALE_MINUTES = 15    # a Queued parcel whose job never ran is re-enqueued after this
+INTAKE_PENDING = ("Queued", "Failed")
 FINDINGS = {
     "No fault found", "Transit damage", "Used / customer damage",
     "Missing accessories", "Wrong product", "Empty parcel", "Serial mismatch",
@@ -45,108 +48,6 @@ def _as_json(value, default):
     return parsed if isinstance(parsed, type(default)) else default
 
 
-def _find_sales_invoice(dn):
-    """Find the submitted original SI through every linkage shape used by Shopify."""
-    candidates = []
-
-    for row in frappe.get_all(
-            "Delivery Note Item",
-            filters={"parent": dn.name, "docstatus": 1,
-                     "against_sales_invoice": ["is", "set"]},
-            fields=["against_sales_invoice"], limit_page_length=0):
-        candidates.append(row.against_sales_invoice)
-
-    for row in frappe.get_all(
-            "Sales Invoice Item",
-            filters={"delivery_note": dn.name, "docstatus": 1},
-            fields=["parent"], limit_page_length=0):
-        candidates.append(row.parent)
-
-    sales_orders = sorted({row.against_sales_order for row in dn.items
-                           if row.get("against_sales_order")})
-    if sales_orders:
-        for row in frappe.get_all(
-                "Sales Invoice Item",
-                filters={"sales_order": ["in", sales_orders], "docstatus": 1},
-                fields=["parent"], limit_page_length=0):
-            candidates.append(row.parent)
-
-    seen = set()
-    for name in candidates:
-        if not name or name in seen:
-            continue
-        seen.add(name)
-        si = frappe.get_doc("Sales Invoice", name)
-        if si.docstatus == 1 and not si.is_return:
-            return si
-    return None
-
-
-def _max_returnable(si):
-    """Use the same source-link and prior-return rules as Return Intake itself."""
-    probe = ReturnIntake({"doctype": "Return Intake", "sales_invoice": si.name,
-                          "company": si.company})
-    delivered, _source, dns = probe._build_delivered_map(si)
-    already = probe._already_returned_map(dns, si.name)
-    return {code: max(0, flt(qty) - flt(already.get(code)))
-            for code, qty in delivered.items()}
-
-
-def _expected_items(dn, si):
-    """Return order lines plus the physical packed-component checklist.
-
-    The accounting return must stay on the original Delivery Note parent line,
-    but warehouse QC must prove every component packed behind that line.  A
-    complete component checklist is therefore nested under each parent item.
-    """
-    bundle_parents = {row.parent_item for row in (dn.get("packed_items") or [])
-                      if row.get("parent_item")}
-    maxima = _max_returnable(si)
-    grouped = {}
-    for row in dn.items:
-        qty = abs(flt(row.qty))
-        if qty <= 0:
-            continue
-        meta = frappe.db.get_value(
-            "Item", row.item_code, ["is_stock_item", "has_serial_no", "image"],
-            as_dict=True) or {}
-        if not cint(meta.get("is_stock_item")) and row.item_code not in bundle_parents:
-            continue
-        if row.item_code not in grouped:
-            grouped[row.item_code] = {
-                "item_code": row.item_code,
-                "item_name": row.item_name,
-                "image": meta.get("image"),
-                "expected_qty": 0,
-                "max_returnable": flt(maxima.get(row.item_code)),
-                "serial_required": cint(meta.get("has_serial_no")),
-            }
-        grouped[row.item_code]["expected_qty"] += qty
-    packed = defaultdict(dict)
-    for row in (dn.get("packed_items") or []):
-        parent = row.get("parent_item")
-        code = row.get("item_code")
-        qty = abs(flt(row.get("qty")))
-        if not parent or not code or qty <= 0:
-            continue
-        meta = frappe.db.get_value(
-            "Item", code, ["item_name", "image"], as_dict=True) or {}
-        component = packed[parent].setdefault(code, {
-            "parent_item_code": parent,
-            "item_code": code,
-            "item_name": meta.get("item_name") or code,
-            "image": meta.get("image"),
-            "expected_qty": 0,
-        })
-        component["expected_qty"] += qty
-
-    output = []
-    for item in grouped.values():
-        item["components"] = list(packed.get(item["item_code"], {}).values())
-        output.append(item)
-    return output
-
-
 def _channel(si):
     name = (si.name or "").upper()
     if name.startswith("SHP"):
@@ -178,42 +79,24 @@ def _snapshot_rows(expected_items):
 def _resolved_lookup(reverse_awb, lookup_code, allow_additional=False,
                      exclude_parcel=None):
     """Resolve a known order/AWB without creating or mutating a parcel."""
-    dn_name, forward_awb, _box_index, _box_count = _resolve(lookup_code)
-    if not dn_name:
+    found = d2c_return_lookup.resolve(lookup_code)
+    if found["status"] == "need_order":
         return {
             "status": "need_order",
             "reverse_awb": reverse_awb,
             "message": "Reverse AWB not mapped yet. Enter the Shopify order number or original AWB.",
         }
-
-    dn = frappe.get_doc("Delivery Note", dn_name)
-    si = _find_sales_invoice(dn)
-    if not si:
-        return {"status": "error", "reverse_awb": reverse_awb,
-                "message": "The order was found, but no submitted original Sales Invoice is linked."}
-    pairs = _awb_courier_pairs(dn)
-    items = _expected_items(dn, si)
-    if not items:
+    if found["status"] != "ok":
+        return dict(found, reverse_awb=reverse_awb)
+    if not found["items"]:
         return {"status": "error", "reverse_awb": reverse_awb,
                 "message": "No returnable physical items were found on this order."}
-    result = {
-        "status": "ok",
-        "reverse_awb": reverse_awb,
-        "lookup_code": lookup_code,
-        "order": dn.get("shopify_order_number") or dn.get("shopify_order_id"),
-        "customer_name": dn.get("customer_name") or si.get("customer_name"),
-        "dn": dn.name,
-        "sales_invoice": si.name,
-        "forward_awb": forward_awb or (pairs[0][0] if pairs else None),
-        "courier": next((courier for awb, courier in pairs if awb == forward_awb), None)
-                   or dn.get("courier_partner"),
-        "items": items,
-    }
+    result = dict(found, reverse_awb=reverse_awb, lookup_code=lookup_code)
     if not allow_additional:
         open_parcels = frappe.get_all(
             "D2C Return Parcel",
             filters={
-                "delivery_note": dn.name,
+                "delivery_note": result["dn"],
                 "status": ["in", ["QC In Progress", "Pending HQ Review"]],
             },
             fields=["name", "reverse_awb", "status", "return_intake", "received_at"],
@@ -370,7 +253,8 @@ def _parcel_payload(doc):
 
 @frappe.whitelist()
 def return_lookup(reverse_awb, order_code=None):
-    """Resolve a reverse AWB, with order/original-AWB fallback. Read-only."""
+    """Resolve a reverse AWB, with order/original-AWB fallback. Read-only, apart
+    from indexing an order the return lookup index did not know yet."""
     return _lookup(reverse_awb, order_code)
 
 
@@ -552,15 +436,19 @@ def _validate_good(row, raw):
 def return_finalize(parcel, item_results=None, component_results=None, evidence=None, return_type=None,
                     customer_reason=None, warehouse_finding=None, notes=None,
                     claim_required=0):
-    """Freeze QC evidence and create a Pending-HQ-Review Return Intake.
+    """Freeze QC evidence and queue the Pending-HQ-Review Return Intake.
 
-    This function deliberately never submits the Return Intake. Inventory only
-    moves when an HQ Returns Reviewer approves the existing workflow.
+    Only the physical receipt and its evidence are saved while the operator
+    waits; prepare_return_intake builds the Return Intake and the finance
+    linkage in the background. Neither ever submits the Return Intake.
+    Inventory only moves when an HQ Returns Reviewer approves the existing
+    workflow.
     """
     doc = frappe.get_doc("D2C Return Parcel", parcel)
-    if doc.return_intake:
+    if doc.return_intake or doc.intake_status:
         return {"status": "already", "parcel": doc.name,
                 "return_intake": doc.return_intake,
+                "intake_status": doc.intake_status,
                 "message": "This return is already pending HQ review."}
     if doc.status != "QC In Progress":
         return {"status": "error", "message": "This return parcel is not open for QC."}
@@ -712,13 +600,86 @@ def return_finalize(parcel, item_results=None, component_results=None, evidence=
         return {"status": "exception", "parcel": doc.name,
                 "message": "Recorded for investigation. No expected SKU was added to inventory."}
 
+    doc.status = "Pending HQ Review"
+    doc.inventory_status = "Pending HQ Approval"
+    doc.finance_status = "Pending Inventory"
+    doc.intake_status = "Queued"
+    doc.intake_rows = json.dumps(intake_rows)
+    doc.intake_attempts = 0
+    doc.intake_error = None
+    doc.intake_due_at = now_datetime()
+    doc.flags.ignore_permissions = True
+    doc.save(ignore_permissions=True)
+    _enqueue_intake(doc.name)
+    return {
+        "status": "pending_review",
+        "parcel": doc.name,
+        "return_intake": None,
+        "intake_status": doc.intake_status,
+        "exception": cint(has_exception),
+        "message": ("QC saved. The Return Intake is being prepared for HQ review; "
+                    "inventory remains unchanged until HQ approves it."),
+    }
+
+
+# ─── Return Intake preparation: one idempotent job per parcel ─────
+
+def _enqueue_intake(parcel):
+    frappe.enqueue(
+        "solara_wms.wms.d2c_returns.prepare_return_intake",
+        queue=INTAKE_QUEUE,
+        timeout=INTAKE_TIMEOUT,
+        job_id="d2c-return-intake:" + parcel,
+        deduplicate=True,
+        enqueue_after_commit=True,
+        parcel=parcel,
+    )
+
+
+def prepare_return_intake(parcel):
+    """Background job: create the Pending-HQ-Review Return Intake for one QC'd
+    parcel and derive its finance stage. Safe to run any number of times: the
+    parcel row is locked, and an intake already linked (or created by an
+    earlier run whose parcel update was lost) is reused, never duplicated."""
+    try:
+        _prepare_return_intake(parcel)
+    except Exception:
+        frappe.db.rollback()
+        _intake_failed(parcel, frappe.get_traceback())
+
+
+def _prepare_return_intake(parcel):
+    state = frappe.db.get_value("D2C Return Parcel", parcel,
+                                ["intake_status", "intake_attempts"], as_dict=True,
+                                for_update=True)
+    if not state or state.intake_status not in INTAKE_PENDING:
+        frappe.db.rollback()
+        return
+    doc = frappe.get_doc("D2C Return Parcel", parcel)
+    intake_name = doc.return_intake or frappe.db.get_value(
+        "Return Intake", {"return_parcel": parcel, "docstatus": ["<", 2]}, "name")
+    if not intake_name:
+        intake_name = _create_return_intake(doc)
+    frappe.db.set_value("D2C Return Parcel", parcel, {
+        "return_intake": intake_name,
+        "intake_status": "Ready",
+        "intake_attempts": cint(state.intake_attempts) + 1,
+        "intake_error": None,
+    })
+    doc.return_intake = intake_name
+    _refresh_finance_status(doc)
+    frappe.db.commit()
+
+
+def _create_return_intake(doc):
     si = frappe.get_doc("Sales Invoice", doc.sales_invoice)
+    evidence = _as_json(doc.evidence_urls, {})
     intake = frappe.get_doc({
         "doctype": "Return Intake",
-        # Insert in the workflow's legal initial state. The station then moves
-        # it to Pending HQ Review with a DB state update: applying the workflow
-        # action here would depend on the dashboard API user's desk roles, while
-        # the station endpoint already enforces the full QC/evidence contract.
+        # Insert in the workflow's legal initial state. The job then moves it
+        # to Pending HQ Review with a DB state update: applying the workflow
+        # action here would depend on the job user's desk roles, while the
+        # station endpoint already enforced the full QC/evidence contract.
         "workflow_state": "Draft",
         "sales_invoice": si.name,
         "customer": si.customer,
@@ -727,34 +688,68 @@ def return_finalize(parcel, item_results=None, component_results=None, evidence=
         "channel": _channel(si),
         "posting_date": today(),
         "return_parcel": doc.name,
-        "items": intake_rows,
+        "items": _as_json(doc.intake_rows, []),
         "qc_videos": [
-            {"video": evidence["label_photo_url"], "note": "Unopened parcel / reverse label"},
-            {"video": evidence["open_photo_url"], "note": "Opened parcel contents"},
-            {"video": evidence["qc_evidence_url"], "note": "QC / serial / damage evidence"},
+            {"video": evidence.get("label_photo_url"), "note": "Unopened parcel / reverse label"},
+            {"video": evidence.get("open_photo_url"), "note": "Opened parcel contents"},
+            {"video": evidence.get("qc_evidence_url"), "note": "QC / serial / damage evidence"},
         ],
         "remarks": ("Returns Station {0} · reverse AWB {1} · {2} · {3}"
-                    .format(doc.station or "", doc.reverse_awb, customer_reason,
-                            warehouse_finding or "finding recorded"))[:140],
+                    .format(doc.station or "", doc.reverse_awb, doc.customer_reason,
+                            doc.warehouse_finding or "finding recorded"))[:140],
     })
     intake.flags.ignore_permissions = True
     intake.insert(ignore_permissions=True)
     frappe.db.set_value("Return Intake", intake.name, "workflow_state", "Pending HQ Review")
-    intake.workflow_state = "Pending HQ Review"
+    return intake.name
+
+
+def _intake_failed(parcel, error):
+    """Back off 2^attempts minutes; park after INTAKE_MAX_ATTEMPTS."""
+    attempts = cint(frappe.db.get_value("D2C Return Parcel", parcel, "intake_attempts")) + 1
+    parked = attempts >= INTAKE_MAX_ATTEMPTS
+    frappe.db.set_value("D2C Return Parcel", parcel, {
+        "intake_status": "Parked" if parked else "Failed",
+        "intake_attempts": attempts,
+        "intake_error": (error or "")[-1000:],
+        "intake_due_at": add_to_date(now_datetime(), minutes=2 ** attempts),
+    })
+    frappe.db.commit()
+    frappe.log_error(message=error, title="D2C Return Intake {0}".format(parcel))
 
-    doc.return_intake = intake.name
-    doc.status = "Pending HQ Review"
-    doc.inventory_status = "Pending HQ Approval"
-    doc.finance_status = "Pending Inventory"
-    doc.flags.ignore_permissions = True
-    doc.save(ignore_permissions=True)
-    return {
-        "status": "pending_review",
-        "parcel": doc.name,
-        "return_intake": intake.name,
-        "exception": cint(has_exception),
-        "message": "QC saved. Inventory remains unchanged until HQ approves the Return Intake.",
-    }
+
+def retry_return_intakes():
+    """Scheduler entry (*/5): re-enqueue Failed parcels whose back-off has passed
+    and Queued parcels whose job was lost."""
+    now = now_datetime()
+    rows = frappe.get_all(
+        "D2C Return Parcel",
+        filters={"intake_status": ["in", INTAKE_PENDING], "intake_due_at": ["<=", now]},
+        fields=["name", "intake_status", "intake_due_at"],
+        order_by="intake_due_at asc",
+        limit_page_length=500,
+    )
+    stale_before = add_to_date(now, minutes=-INTAKE_STALE_MINUTES)
+    due = [row.name for row in rows
+           if row.intake_status == "Failed" or row.intake_due_at <= stale_before]
+    for name in due:
+        _enqueue_intake(name)
+    return due
+
+
+@frappe.whitelist(methods=["POST"])
+def requeue_return_intake(parcel):
+    """Give a Parked parcel a fresh set of attempts."""
+    allowed_roles = {"System Manager", "HQ Returns Reviewer"}
+    if not allowed_roles.intersection(set(frappe.get_roles())):
+        frappe.throw("Only an HQ Returns Reviewer can requeue a return intake.",
+                     frappe.PermissionError)
+    if frappe.db.get_value("D2C Return Parcel", parcel, "intake_status") not in ("Parked", "Failed"):
+        frappe.throw("Only a failed or parked return intake can be requeued.")
+    frappe.db.set_value("D2C Return Parcel", parcel, {
+        "intake_status": "Queued", "intake_attempts": 0, "intake_due_at": now_datetime()})
+    _enqueue_intake(parcel)
+    return {"status": "ok", "parcel": parcel, "intake_status": "Queued"}
 
 
 def _linked_credit_note(sales_invoice):
@@ -811,7 +806,8 @@ def return_finance_queue(finance_status=None, limit=250):
         filters=filters,
         fields=[
             "name", "status", "reverse_awb", "shopify_order_number", "return_type",
-            "sales_invoice", "delivery_note", "return_intake", "inventory_status",
+            "sales_invoice", "delivery_note", "return_intake", "intake_status",
+            "intake_error", "inventory_status",
             "credit_note", "credit_note_status", "refund_status", "finance_status",
             "customer_reason", "warehouse_finding", "claim_required", "exception",
             "received_at", "completed_at", "closed_at",
@@ -833,6 +829,9 @@ def return_finance_queue(finance_status=None, limit=250):
             "finance_notes": doc.finance_notes,
             "closed_at": doc.closed_at,
             "credit_note_amount": (cn.grand_total if cn else None),
+            "intake_status": doc.intake_status,
+            "intake_attempts": cint(doc.intake_attempts),
+            "intake_error": doc.intake_error,
         })
         output.append(payload)
     return {"rows": output, "count": len(output)}
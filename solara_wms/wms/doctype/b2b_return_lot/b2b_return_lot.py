@@ -1,5 +1,12 @@
+import frappe
 from frappe.model.document import Document
 
 
 class B2BReturnLot(Document):
     pass
+
+
+def on_doctype_update():
+    # Keyset pages of the returns queue: newest first, optionally per status.
+    frappe.db.add_index("B2B Return Lot", ["creation", "name"])
+    frappe.db.add_index("B2B Return Lot", ["status", "creation"])
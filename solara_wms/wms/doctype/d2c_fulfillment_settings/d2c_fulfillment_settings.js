@@ -8,9 +8,30 @@ frappe.ui.form.on("D2C Fulfillment Settings", {
             return `<b>${m.dry_run ? "Would release" : "Released"} ${m.created || 0}</b> `
                 + `· held ${held} (on-hold ${m.skipped_on_hold || 0} · PPCOD ${m.skipped_ppcod || 0} `
                 + `· multibox ${m.skipped_multibox || 0} · no-stock ${m.skipped_nostock || 0}) `
-                + `· bad-data ${m.skipped_bad_data || 0} · failed ${m.failed || 0}`;
+                + `· bad-data ${m.skipped_bad_data || 0} · failed ${m.failed || 0}`
+                + (m.skipped_in_flight ? ` · already submitting ${m.skipped_in_flight}` : "");
         };
 
+        // Live merged progress of a range release (pushed by every worker per day).
+        frappe.realtime.off("d2c_release_range_progress");
+        frappe.realtime.on("d2c_release_range_progress", (m) => {
+            const title = __("Range Release {0}", [m.name]);
+            if (m.status !== "Running") {
+                const failed = JSON.parse(m.failed_days || "[]");
+                frappe.hide_progress();
+                frappe.msgprint({
+                    title: title,
+                    message: fmt_release(m) + (failed.length
+                        ? "<br><br>" + __("Not released, re-run: {0}", [failed.join(", ")])
+                        : ""),
+                    indicator: failed.length ? "red" : "green",
+                });
+                return;
+            }
+            frappe.show_progress(title, m.days_done || 0, m.days_total || 1,
+                fmt_release(m), true);
+        });
+
         // SAFE: preview what would release, no writes, no customer emails.
         frm.add_custom_button(__("Preview (dry-run)"), () => {
             frm.call("preview_release").then((r) => {
@@ -38,13 +59,16 @@ frappe.ui.form.on("D2C Fulfillment Settings", {
                         () => {
                             frm.call("run_release_range",
                                 { from_date: v.from_date, to_date: v.to_date }).then((r) => {
+                                const m = r.message || {};
                                 frappe.msgprint({
                                     title: __("Range Release Queued"),
                                     message: __(
                                         "Releasing all orders from {0} to {1} in the background "
-                                        + "(oldest first). A summary posts to #shopify-shipping "
-                                        + "when done — then a wave / Prepare prints the pick list "
-                                        + "+ labels.", [v.from_date, v.to_date]),
+                                        + "({2} days across {3} parallel jobs). Progress shows here "
+                                        + "as each day finishes, and a summary posts to "
+                                        + "#shopify-shipping when done — then a wave / Prepare "
+                                        + "prints the pick list + labels.",
+                                        [v.from_date, v.to_date, m.days, m.workers]),
                                     indicator: "blue",
                                 });
                             });
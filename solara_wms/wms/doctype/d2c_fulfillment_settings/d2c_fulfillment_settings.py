@@ -16,8 +16,9 @@ class D2CFulfillmentSettings(Document):
     @frappe.whitelist()
     def run_release_range(self, from_date, to_date):
         """Queue a background release of every order ordered between from_date and
-        to_date (manual date-range pull). Returns immediately; a summary posts to
-        the wave Slack channel when the whole range is drained."""
+        to_date (manual date-range pull). Returns immediately; the range is
+        released day by day on parallel workers, progress is pushed to the caller
+        and a summary posts to the wave Slack channel when it is drained."""
         return d2c_fulfillment.enqueue_release_range(from_date, to_date)
 
     @frappe.whitelist()
@@ -0,0 +1,10 @@
+import frappe
+from frappe.model.document import Document
+
+
+class D2CInvoiceQueue(Document):
+    pass
+
+
+def on_doctype_update():
+    frappe.db.add_index("D2C Invoice Queue", ["status", "enqueued_at"])
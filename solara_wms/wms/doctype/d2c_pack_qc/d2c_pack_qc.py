@@ -1,7 +1,20 @@
 # Copyright (c) 2026, SOLARA and contributors
+import frappe
 from frappe.model.document import Document
 
 
 class D2CPackQC(Document):
-    pass
+    def before_save(self):
+        from solara_wms.wms.d2c_pack_qc import stamp_feed_version
+        stamp_feed_version(self)
 
+    def on_update(self):
+        from solara_wms.wms.d2c_pack_qc import publish_feed_version
+        publish_feed_version(self.feed_version)
+
+
+def on_doctype_update():
+    # qc_queue_feed reads changes in feed_version order; the snapshot pages
+    # the open queue the same way.
+    frappe.db.add_index("D2C Pack QC", ["feed_version"])
+    frappe.db.add_index("D2C Pack QC", ["status", "feed_version"])
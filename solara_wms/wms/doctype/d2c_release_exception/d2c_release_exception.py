@@ -0,0 +1,5 @@
+from frappe.model.document import Document
+
+
+class D2CReleaseException(Document):
+    pass
@@ -0,0 +1,10 @@
+import frappe
+from frappe.model.document import Document
+
+
+class D2CReleaseRange(Document):
+    pass
+
+
+def on_doctype_update():
+    frappe.db.add_index("D2C Release Range", ["status", "started_at"])
@@ -0,0 +1,10 @@
+import frappe
+from frappe.model.document import Document
+
+
+class D2CReleaseSubmit(Document):
+    pass
+
+
+def on_doctype_update():
+    frappe.db.add_index("D2C Release Submit", ["status", "queued_at"])
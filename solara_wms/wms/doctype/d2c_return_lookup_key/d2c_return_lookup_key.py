@@ -0,0 +1,11 @@
+import frappe
+from frappe.model.document import Document
+
+
+class D2CReturnLookupKey(Document):
+    pass
+
+
+def on_doctype_update():
+    frappe.db.add_index("D2C Return Lookup Key", ["lookup_key"])
+    frappe.db.add_index("D2C Return Lookup Key", ["delivery_note"])
@@ -1,7 +1,12 @@
 # Copyright (c) 2026, SOLARA and contributors
 
+import frappe
 from frappe.model.document import Document
 
 
 class D2CReturnParcel(Document):
     pass
+
+
+def on_doctype_update():
+    frappe.db.add_index("D2C Return Parcel", ["intake_status", "intake_due_at"])
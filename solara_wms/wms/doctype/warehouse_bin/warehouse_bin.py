@@ -9,6 +9,13 @@ from frappe.utils import flt
 from solara_wms.wms.location_domain import LocationMasterError, qr_payload
 
 
+def bin_document_name(warehouse, bin_code):
+    # Location codes such as FP-01 may be reused at another SOLARA site;
+    # the document identity is the warehouse + code pair.
+    key = "\x1f".join((warehouse or "", bin_code or ""))
+    return "WMS-BIN-" + hashlib.sha1(key.encode("utf-8")).hexdigest()[:16].upper()
+
+
 class WarehouseBin(Document):
     """
     Warehouse Bin - physical storage location within an ERPNext Warehouse.
@@ -31,14 +38,10 @@ class WarehouseBin(Document):
     """
 
     def autoname(self):
-        # Location codes such as FP-01 may be reused at another SOLARA site;
-        # the document identity is the warehouse + code pair.
         self.generate_bin_code_if_empty()
-        key = "\x1f".join((self.warehouse or "", self.bin_code or ""))
-        digest = hashlib.sha1(key.encode("utf-8")).hexdigest()[:16].upper()
-        self.name = "WMS-BIN-" + digest
+        self.name = bin_document_name(self.warehouse, self.bin_code)
         if not self.location_id:
-            self.location_id = "LEGACY-L" + digest[:8]
+            self.location_id = "LEGACY-L" + self.name[len("WMS-BIN-"):][:8]
 
     def validate(self):
         self.validate_location_identity()
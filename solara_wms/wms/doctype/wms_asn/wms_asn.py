@@ -3,6 +3,7 @@ from frappe import _
 from frappe.model.document import Document
 from frappe.utils import flt, now_datetime
 
+from solara_wms.wms.erp_outbox import enqueue_erp_draft
 from solara_wms.wms.safety import require_wms_mode
 
 
@@ -15,7 +16,7 @@ class WMSASN(Document):
               -> Putaway Created -> Completed
 
     On completion:
-      - Creates Purchase Receipt from received quantities
+      - Queues a draft Purchase Receipt from received quantities (WMS ERP Outbox)
       - Creates WMS Task (Putaway) for bin placement
     """
 
@@ -148,42 +149,52 @@ class WMSASN(Document):
 
     @frappe.whitelist()
     def complete_asn(self):
-        """Putaway Created -> Completed. Creates a draft Purchase Receipt."""
+        """Putaway Created -> Completed. Queues a draft Purchase Receipt."""
         require_wms_mode("Draft Handoff")
         if self.status != "Putaway Created":
             frappe.throw(_("Only ASNs with Putaway Created status can be completed"))
 
         error_log = []
+        outbox = None
 
         try:
-            pr = frappe.new_doc("Purchase Receipt")
-            pr.supplier = self.supplier
-            pr.company = (
-                frappe.defaults.get_user_default("company")
-                or "Win The Buy Box Private Limited"
-            )
-            pr.set_warehouse = self.warehouse
-
-            for row in self.items or []:
-                if flt(row.received_qty) <= 0:
-                    continue
-                pr.append("items", {
+            items = [
+                {
                     "item_code": row.item_code,
                     "qty": flt(row.received_qty),
                     "warehouse": self.warehouse,
                     "purchase_order": self.purchase_order or "",
                     "batch_no": row.batch_no or "",
                     "serial_no": row.serial_no or "",
-                })
+                }
+                for row in self.items or []
+                if flt(row.received_qty) > 0
+            ]
 
-            if not pr.items:
+            if not items:
                 error_log.append("No received items to create Purchase Receipt for.")
             else:
                 # Receiving confirmation is operational evidence, not approval
                 # to post inventory. The source PO/invoice and quantities must
                 # be reviewed before a Stock Manager submits this draft.
-                pr.insert()
-                self.purchase_receipt = pr.name
+                item_codes = {row["item_code"] for row in items}
+                outbox = enqueue_erp_draft(
+                    "Purchase Receipt",
+                    self.doctype,
+                    self.name,
+                    self.warehouse,
+                    {
+                        "supplier": self.supplier,
+                        "company": (
+                            frappe.defaults.get_user_default("company")
+                            or "Win The Buy Box Private Limited"
+                        ),
+                        "set_warehouse": self.warehouse,
+                        "items": items,
+                    },
+                    item_code=item_codes.pop() if len(item_codes) == 1 else None,
+                    source_field="purchase_receipt",
+                )
 
         except Exception as e:
             error_log.append(f"Purchase Receipt creation failed: {str(e)}")
@@ -199,16 +210,14 @@ class WMSASN(Document):
             )
         else:
             frappe.msgprint(
-                _("ASN completed. Purchase Receipt: {0}").format(
-                    f'<a href="/app/purchase-receipt/{self.purchase_receipt}">'
-                    f'{self.purchase_receipt}</a>'
-                ),
+                _("ASN completed. Purchase Receipt draft queued: {0}").format(outbox),
                 indicator="green"
             )
 
         return {
             "status": self.status,
             "purchase_receipt": self.purchase_receipt,
+            "erp_outbox": outbox,
             "putaway_task": self.putaway_task,
             "errors": error_log,
         }
@@ -36,29 +36,8 @@ class WMSCycleCount(Document):
         if not balances:
             frappe.throw(_("No WMS balances were found in this physical bin"))
         self.items = []
-        for balance in balances:
-            item = frappe.db.get_value(
-                "Item", balance.item_code, ["item_name", "stock_uom"], as_dict=True
-            )
-            valuation_rate = frappe.db.get_value(
-                "Bin",
-                {"item_code": balance.item_code, "warehouse": self.warehouse},
-                "valuation_rate",
-            )
-            self.append(
-                "items",
-                {
-                    "item_code": balance.item_code,
-                    "item_name": item.item_name if item else "",
-                    "uom": item.stock_uom if item else "",
-                    "bin": self.bin,
-                    "snapshot_balance": balance.name,
-                    "snapshot_movement": balance.last_movement,
-                    "book_qty": flt(balance.physical_qty),
-                    "valuation_rate": flt(valuation_rate),
-                    "row_status": "Pending",
-                },
-            )
+        for row in inventory_accuracy.snapshot_items(self.warehouse, self.bin, balances):
+            self.append("items", row)
         self.save()
         return {"items": len(self.items)}
 
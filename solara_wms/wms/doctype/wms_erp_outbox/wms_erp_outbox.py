@@ -0,0 +1,20 @@
+import hashlib
+
+import frappe
+from frappe.model.document import Document
+
+
+class WMSERPOutbox(Document):
+    """One pending ERPNext draft per source document, prepared off the floor path."""
+
+    def autoname(self):
+        identity = "::".join(
+            (self.source_doctype or "", self.source_name or "", self.message_type or "")
+        )
+        digest = hashlib.sha256(identity.encode("utf-8")).hexdigest()
+        self.name = "WMS-OBX-" + digest[:20].upper()
+
+
+def on_doctype_update():
+    # The drainer scans pending messages oldest first.
+    frappe.db.add_index("WMS ERP Outbox", ["status", "enqueued_at"])
@@ -0,0 +1,11 @@
+import hashlib
+
+from frappe.model.document import Document
+
+
+class WMSIdempotencyLedger(Document):
+    """One row per accepted shadow command key, pointing at its recorded result."""
+
+    def autoname(self):
+        digest = hashlib.sha256((self.idempotency_key or "").encode("utf-8")).hexdigest()
+        self.name = "WMS-IDEM-" + digest[:20].upper()
@@ -0,0 +1,5 @@
+from frappe.model.document import Document
+
+
+class WMSLocationImport(Document):
+    """One background location master import with its resume checkpoint."""
@@ -5,12 +5,16 @@ from frappe import _
 from frappe.model.document import Document
 
 
+def movement_name(idempotency_key):
+    digest = hashlib.sha256((idempotency_key or "").encode("utf-8")).hexdigest()
+    return "WMS-MOVE-" + digest[:20].upper()
+
+
 class WMSMovement(Document):
     """Append-only physical movement evidence."""
 
     def autoname(self):
-        digest = hashlib.sha256((self.idempotency_key or "").encode("utf-8")).hexdigest()
-        self.name = "WMS-MOVE-" + digest[:20].upper()
+        self.name = movement_name(self.idempotency_key)
 
     def validate(self):
         if not self.is_new():
@@ -21,3 +25,8 @@ class WMSMovement(Document):
     def on_trash(self):
         if not getattr(self.flags, "allow_wms_movement_delete", False):
             frappe.throw(_("WMS Movement is append-only and cannot be deleted"))
+
+
+def on_doctype_update():
+    # Velocity replenishment sums recent Pick movements per warehouse.
+    frappe.db.add_index("WMS Movement", ["warehouse", "movement_type", "posted_at"])
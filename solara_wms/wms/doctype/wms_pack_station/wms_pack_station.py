@@ -3,6 +3,7 @@ from frappe import _
 from frappe.model.document import Document
 from frappe.utils import flt, now_datetime
 
+from solara_wms.wms.item_barcodes import barcodes_for
 from solara_wms.wms.safety import require_wms_mode
 
 
@@ -41,18 +42,10 @@ class WMSPackStation(Document):
 
         so = frappe.get_doc("Sales Order", self.sales_order)
         self.items = []
+        barcodes = barcodes_for({so_item.item_code for so_item in so.items})
 
         for so_item in so.items:
-            # Try to get barcode
-            barcode = None
-            barcodes = frappe.get_all(
-                "Item Barcode",
-                filters={"parent": so_item.item_code, "parenttype": "Item"},
-                fields=["barcode"],
-                limit=1,
-            )
-            if barcodes:
-                barcode = barcodes[0].barcode
+            barcode = (barcodes.get(so_item.item_code) or [None])[0]
 
             self.append("items", {
                 "item_code": so_item.item_code,
@@ -0,0 +1,11 @@
+import hashlib
+
+from frappe.model.document import Document
+
+
+class WMSParcelPickSummary(Document):
+    """Per-AWB rollup of completed, unhanded pick work; derived, never evidence."""
+
+    def autoname(self):
+        digest = hashlib.sha256((self.awb or "").encode("utf-8")).hexdigest()
+        self.name = "WMS-PPS-" + digest[:20].upper()
@@ -3,6 +3,7 @@ from frappe import _
 from frappe.model.document import Document
 from frappe.utils import flt, now_datetime, today
 
+from solara_wms.wms.erp_outbox import enqueue_erp_draft
 from solara_wms.wms.safety import require_wms_mode
 
 
@@ -18,7 +19,7 @@ class WMSTask(Document):
       Count    -> StockTaking (cycle count with book_qty vs counted_qty)
       Transfer -> StockMove (move between locations, move_status 0->1)
 
-    ERPNext documents created on completion:
+    ERPNext drafts queued on completion (prepared by the WMS ERP Outbox):
       Putaway/Transfer -> Stock Entry (Material Transfer)
       Pick             -> Stock Entry (Material Transfer)
       Count            -> Stock Reconciliation (only if differences)
@@ -141,7 +142,7 @@ class WMSTask(Document):
 
         self.update_summary()
 
-        # Create the appropriate ERPNext document based on task_type
+        # Queue the appropriate ERPNext draft based on task_type
         error_log = []
         try:
             if self.task_type in ("Putaway", "Transfer"):
@@ -167,18 +168,13 @@ class WMSTask(Document):
                 indicator="orange"
             )
         else:
-            result_link = ""
-            if self.stock_entry:
-                result_link = (
-                    f' → <a href="/app/stock-entry/{self.stock_entry}">{self.stock_entry}</a>'
-                )
-            elif self.stock_reconciliation:
-                result_link = (
-                    f' → <a href="/app/stock-reconciliation/{self.stock_reconciliation}">'
-                    f'{self.stock_reconciliation}</a>'
+            queued = ""
+            if self.flags.erp_outbox:
+                queued = " " + _("ERP draft queued for preparation: {0}").format(
+                    ", ".join(self.flags.erp_outbox)
                 )
             frappe.msgprint(
-                _("Task completed successfully.{0}").format(result_link),
+                _("Task completed successfully.{0}").format(queued),
                 title=_("Task Completed"),
                 indicator="green"
             )
@@ -187,6 +183,7 @@ class WMSTask(Document):
             "status": self.status,
             "stock_entry": self.stock_entry,
             "stock_reconciliation": self.stock_reconciliation,
+            "erp_outbox": self.flags.erp_outbox or [],
             "errors": error_log,
         }
 
@@ -202,9 +199,27 @@ class WMSTask(Document):
 
     # ─── STOCK DOCUMENT CREATION ─────────────────────────────
 
+    def _queue_draft(self, message_type, payload, source_field, warehouse):
+        """Record the draft in this transaction; the outbox drainer prepares it
+        and writes its name back to `source_field`."""
+        item_codes = {row["item_code"] for row in payload["items"]}
+        name = enqueue_erp_draft(
+            message_type,
+            self.doctype,
+            self.name,
+            warehouse,
+            payload,
+            item_code=item_codes.pop() if len(item_codes) == 1 else None,
+            source_field=source_field,
+        )
+        self.flags.erp_outbox = (self.flags.erp_outbox or []) + [name]
+
+    def _company(self):
+        return frappe.defaults.get_user_default("company") or "Win The Buy Box Private Limited"
+
     def create_stock_entry_transfer(self, error_log):
         """
-        Create Stock Entry (Material Transfer) for Putaway/Transfer tasks.
+        Queue a Stock Entry (Material Transfer) draft for Putaway/Transfer tasks.
         Maps to ModernWMS:
           - StockMove: orig_goods_location_id -> dest_googs_location_id, move_status 0->1
           - StockProcess: ConfirmAdjustment subtracts source stock, adds target stock
@@ -215,37 +230,35 @@ class WMSTask(Document):
         if not self.source_warehouse or self.source_warehouse == self.target_warehouse:
             return
 
-        se = frappe.new_doc("Stock Entry")
-        se.stock_entry_type = "Material Transfer"
-        se.company = frappe.defaults.get_user_default("company") or "Win The Buy Box Private Limited"
-
-        for row in self.items:
-            if row.row_status != "Completed":
-                continue
-            se.append("items", {
+        items = [
+            {
                 "item_code": row.item_code,
                 "qty": flt(row.actual_qty) or flt(row.qty),
                 "s_warehouse": self.source_warehouse,
                 "t_warehouse": self.target_warehouse,
                 "batch_no": row.batch_no or "",
                 "serial_no": row.serial_no or "",
-            })
-
-        if not se.items:
+            }
+            for row in self.items
+            if row.row_status == "Completed"
+        ]
+        if not items:
             error_log.append("No completed items to create Stock Entry for.")
             return
 
-        try:
-            # Warehouse-floor confirmation must never post to the accounting
-            # stock ledger.  A Stock Manager reviews and submits this draft.
-            se.insert()
-            self.stock_entry = se.name
-        except Exception as e:
-            error_log.append(f"Stock Entry creation failed: {str(e)}")
+        # Warehouse-floor confirmation must never post to the accounting
+        # stock ledger.  A Stock Manager reviews and submits this draft.
+        self._queue_draft(
+            "Stock Entry",
+            {"stock_entry_type": "Material Transfer", "company": self._company(),
+             "items": items},
+            "stock_entry",
+            self.source_warehouse,
+        )
 
     def create_stock_entry_pick(self, error_log):
         """
-        Create Stock Entry (Material Transfer) for Pick tasks.
+        Queue a Stock Entry (Material Transfer) draft for Pick tasks.
         Moves items from source warehouse/bin to a staging/dispatch warehouse.
         Maps to ModernWMS Dispatch: pick_qty allocation -> stock decrement on delivery.
         """
@@ -255,40 +268,38 @@ class WMSTask(Document):
         if not self.target_warehouse or self.target_warehouse == self.source_warehouse:
             return
 
-        se = frappe.new_doc("Stock Entry")
-        se.stock_entry_type = "Material Transfer"
-        se.company = frappe.defaults.get_user_default("company") or "Win The Buy Box Private Limited"
-
-        for row in self.items:
-            if row.row_status != "Completed":
-                continue
-            se.append("items", {
+        items = [
+            {
                 "item_code": row.item_code,
                 "qty": flt(row.actual_qty) or flt(row.qty),
                 "s_warehouse": self.source_warehouse,
                 "t_warehouse": self.target_warehouse or self.source_warehouse,
                 "batch_no": row.batch_no or "",
                 "serial_no": row.serial_no or "",
-            })
-
-        if not se.items:
+            }
+            for row in self.items
+            if row.row_status == "Completed"
+        ]
+        if not items:
             error_log.append("No completed items to create Stock Entry for.")
             return
 
-        try:
-            se.insert()
-            self.stock_entry = se.name
-        except Exception as e:
-            error_log.append(f"Stock Entry creation failed: {str(e)}")
+        self._queue_draft(
+            "Stock Entry",
+            {"stock_entry_type": "Material Transfer", "company": self._company(),
+             "items": items},
+            "stock_entry",
+            self.source_warehouse,
+        )
 
     def create_stock_reconciliation(self, error_log):
         """
-        Create Stock Reconciliation for Count tasks with differences.
+        Queue a Stock Reconciliation draft for Count tasks with differences.
         Maps to ModernWMS StockTaking:
           - book_qty (our qty) vs counted_qty (our actual_qty)
           - difference_qty = counted_qty - book_qty
           - job_status false->true when completed
-        Only creates Stock Reconciliation if there are actual discrepancies.
+        Only queues a Stock Reconciliation if there are actual discrepancies.
         """
         items_with_diff = [
             row for row in self.items
@@ -299,25 +310,24 @@ class WMSTask(Document):
             # No differences found - count is clean, no reconciliation needed
             return
 
-        sr = frappe.new_doc("Stock Reconciliation")
-        sr.company = frappe.defaults.get_user_default("company") or "Win The Buy Box Private Limited"
-        sr.purpose = "Stock Reconciliation"
-
         warehouse = self.source_warehouse or self.target_warehouse
-
-        for row in items_with_diff:
-            sr.append("items", {
+        items = [
+            {
                 "item_code": row.item_code,
                 "warehouse": warehouse,
                 "qty": flt(row.actual_qty),
                 "batch_no": row.batch_no or "",
                 "serial_no": row.serial_no or "",
-            })
+            }
+            for row in items_with_diff
+        ]
 
-        try:
-            # Variances require independent review. Keep the reconciliation in
-            # draft; completing a count must not change financial stock.
-            sr.insert()
-            self.stock_reconciliation = sr.name
-        except Exception as e:
-            error_log.append(f"Stock Reconciliation creation failed: {str(e)}")
+        # Variances require independent review. Keep the reconciliation in
+        # draft; completing a count must not change financial stock.
+        self._queue_draft(
+            "Stock Reconciliation",
+            {"purpose": "Stock Reconciliation", "company": self._company(),
+             "items": items},
+            "stock_reconciliation",
+            warehouse,
+        )
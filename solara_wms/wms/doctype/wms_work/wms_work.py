@@ -34,3 +34,10 @@ class WMSWork(Document):
                         bin_name, self.warehouse
                     )
                 )
+
+
+def on_doctype_update():
+    # Pack bench lookups filter one parcel's completed, unhanded pick work.
+    frappe.db.add_index("WMS Work", ["parcel_awb", "status", "pack_handoff"])
+    # Wave picking joins a batch's Delivery Notes to their parcel pick work.
+    frappe.db.add_index("WMS Work", ["reference_name", "work_type"])
@@ -19,3 +19,8 @@ class WMSWorkEvent(Document):
     def on_trash(self):
         if not getattr(self.flags, "allow_wms_work_event_delete", False):
             frappe.throw(_("WMS Work Event is append-only and cannot be deleted"))
+
+
+def on_doctype_update():
+    # The cycle-count planner reads recent Pick Shortage events per warehouse.
+    frappe.db.add_index("WMS Work Event", ["warehouse", "event_type", "posted_at"])
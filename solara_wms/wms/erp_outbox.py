@@ -0,0 +1,204 @@
+"""Transactional outbox for ERPNext draft documents.
+
+Floor completions record the draft they want (Stock Entry, Stock
+Reconciliation, Purchase Receipt) as a `WMS ERP Outbox` row in their own
+transaction. A scheduler drainer prepares the drafts afterwards, so ERPNext
+validation never sits inside scanner latency and a failing draft never rolls
+back the floor evidence.
+
+Delivery is ordered per warehouse and item: a message waits while an older
+undelivered message for the same item (or an older multi-item message for the
+same warehouse) is still pending. Failures back off exponentially; after
+MAX_ATTEMPTS the message is parked for a Stock Manager and stops blocking.
+
+Drafts only. Nothing here submits a stock or accounting document.
+"""
+
+import json
+
+import frappe
+from frappe import _
+from frappe.utils import add_to_date, cint, now_datetime
+
+
+OUTBOX_DOCTYPE = "WMS ERP Outbox"
+DRAFT_DOCTYPES = ("Stock Entry", "Stock Reconciliation", "Purchase Receipt")
+MAX_ATTEMPTS = 5
+BATCH_SIZE = 200
+MANAGER_ROLES = {"System Manager", "Stock Manager"}
+
+
+def enqueue_erp_draft(
+    message_type,
+    source_doctype,
+    source_name,
+    warehouse,
+    payload,
+    item_code=None,
+    source_field=None,
+):
+    """Record one draft to prepare, in the caller's transaction.
+
+    Re-enqueueing the same source/draft pair is a no-op, so a retried
+    completion cannot queue two drafts.
+    """
+    if message_type not in DRAFT_DOCTYPES:
+        frappe.throw(_("{0} is not an outbox draft document").format(message_type))
+    doc = frappe.get_doc(
+        {
+            "doctype": OUTBOX_DOCTYPE,
+            "message_type": message_type,
+            "status": "Pending",
+            "warehouse": warehouse,
+            "item_code": item_code,
+            "source_doctype": source_doctype,
+            "source_name": source_name,
+            "source_field": source_field,
+            "payload": json.dumps(payload, sort_keys=True, default=str),
+            "attempts": 0,
+            "enqueued_at": now_datetime(),
+        }
+    )
+    doc.autoname()
+    if frappe.db.exists(OUTBOX_DOCTYPE, doc.name):
+        return doc.name
+    doc.insert(ignore_permissions=True)
+    return doc.name
+
+
+def drain_erp_outbox():
+    """Scheduler entry (every minute). Only Draft Handoff may prepare drafts;
+    in any other mode messages simply wait."""
+    mode = frappe.db.get_single_value("WMS Settings", "operating_mode") or "Disabled"
+    if mode != "Draft Handoff":
+        return
+    try:
+        _drain()
+    except Exception:
+        frappe.db.rollback()
+        frappe.log_error(frappe.get_traceback(), "WMS ERP Outbox drain failed")
+
+
+def _drain(limit=BATCH_SIZE):
+    rows = frappe.db.sql(
+        """
+        SELECT name, warehouse, item_code, next_attempt_at
+          FROM `tabWMS ERP Outbox`
+         WHERE status = 'Pending'
+         ORDER BY enqueued_at, creation, name
+         LIMIT %s
+        """,
+        (limit,),
+        as_dict=True,
+    )
+    now = now_datetime()
+    whole = set()
+    items = {}
+    handled = 0
+    for row in rows:
+        blocked_items = items.setdefault(row.warehouse, set())
+        if row.warehouse in whole or (
+            row.item_code in blocked_items if row.item_code else blocked_items
+        ):
+            continue
+        due = not row.next_attempt_at or row.next_attempt_at <= now
+        if due and _deliver(row.name):
+            handled += 1
+            continue
+        if row.item_code:
+            blocked_items.add(row.item_code)
+        else:
+            whole.add(row.warehouse)
+    return handled
+
+
+def _deliver(name):
+    """Prepare one draft in its own transaction. Returns False only while the
+    message stays pending (backing off); delivered and parked are final and
+    release the ordering key."""
+    locked = frappe.db.sql(
+        """
+        SELECT name, message_type, source_doctype, source_name, source_field,
+               payload, attempts
+          FROM `tabWMS ERP Outbox`
+         WHERE name = %s AND status = 'Pending'
+         FOR UPDATE
+        """,
+        (name,),
+        as_dict=True,
+    )
+    if not locked:
+        frappe.db.commit()
+        return True
+    message = locked[0]
+    attempts = cint(message.attempts) + 1
+    savepoint = "wms_outbox_" + name.replace("-", "_")
+    frappe.db.savepoint(savepoint)
+    try:
+        draft = frappe.get_doc(
+            {"doctype": message.message_type, **json.loads(message.payload)}
+        )
+        draft.insert()
+        if message.source_field:
+            frappe.db.set_value(
+                message.source_doctype,
+                message.source_name,
+                message.source_field,
+                draft.name,
+                update_modified=False,
+            )
+    except Exception:
+        frappe.db.rollback(save_point=savepoint)
+        error = frappe.get_traceback()
+        parked = attempts >= MAX_ATTEMPTS
+        frappe.db.set_value(
+            OUTBOX_DOCTYPE,
+            name,
+            {
+                "status": "Parked" if parked else "Pending",
+                "attempts": attempts,
+                "next_attempt_at": add_to_date(now_datetime(), minutes=2 ** attempts),
+                "last_error": error[-2000:],
+            },
+            update_modified=False,
+        )
+        if parked:
+            frappe.log_error(
+                message="{0} {1} -> {2}\n\n{3}".format(
+                    message.source_doctype, message.source_name,
+                    message.message_type, error),
+                title="WMS ERP Outbox parked " + name,
+            )
+        frappe.db.commit()
+        return parked
+    frappe.db.set_value(
+        OUTBOX_DOCTYPE,
+        name,
+        {
+            "status": "Delivered",
+            "attempts": attempts,
+            "result_name": draft.name,
+            "delivered_at": now_datetime(),
+            "last_error": "",
+        },
+        update_modified=False,
+    )
+    frappe.db.commit()
+    return True
+
+
+@frappe.whitelist(methods=["POST"])
+def requeue_erp_draft(name):
+    """Return a parked message to the queue after its cause has been fixed."""
+    if not MANAGER_ROLES.intersection(frappe.get_roles()):
+        frappe.throw(_("Only a Stock Manager can requeue ERP drafts"), frappe.PermissionError)
+    status = frappe.db.get_value(OUTBOX_DOCTYPE, name, "status")
+    if status != "Parked":
+        frappe.throw(_("Only parked outbox messages can be requeued"))
+    frappe.db.set_value(
+        OUTBOX_DOCTYPE,
+        name,
+        {"status": "Pending", "attempts": 0, "next_attempt_at": None},
+        update_modified=False,
+    )
+    return {"name": name, "status": "Pending"}
@@ -0,0 +1,150 @@
+"""In-memory Shopify Admin GraphQL for tests and the synthetic load test.
+
+Answers the calls the D2C fulfillment path makes - aliased order-state
+lookups, fulfillmentCreateV2 and fulfillmentTrackingInfoUpdateV2 - from a
+dict of orders, counts every call by kind, and meters query cost with the
+same leaky bucket the client models, so a test can drive it into THROTTLED
+and watch the client back off. Pure: no HTTP, no frappe.
+"""
+
+from solara_wms.wms.shopify_cost import CostBucket
+from solara_wms.wms.shopify_fulfillment_state import (
+    ALIAS_PATTERN,
+    MUTATION_COST,
+    query_cost,
+)
+
+
+class FakeShopifyGraphQL:
+    def __init__(self, maximum=1000, restore_rate=50, clock=None,
+                 open_unknown_orders=False):
+        self.bucket = CostBucket(maximum, maximum, restore_rate, 0.0)
+        self.clock = clock or (lambda: 0.0)
+        # Load test: any order looked up is an unfulfilled order with one open FO.
+        self.open_unknown_orders = open_unknown_orders
+        self.orders = {}
+        self.calls = {}
+        self.last_call = None
+        self.throttled = 0
+        self._fulfillment_seq = 0
+
+    def add_order(self, order_id, open_fulfillment_orders=1, fulfillments=()):
+        """fulfillments: (tracking numbers, status) pairs already on the order."""
+        order = {"fulfillment_orders": [], "fulfillments": []}
+        for index in range(open_fulfillment_orders):
+            order["fulfillment_orders"].append({
+                "id": "gid://shopify/FulfillmentOrder/{0}{1}".format(order_id, index),
+                "status": "OPEN",
+            })
+        self.orders[str(order_id)] = order
+        for numbers, status in fulfillments:
+            self._fulfill(order, list(numbers), status)
+        return order
+
+    def handle(self, payload):
+        """One POST body -> (HTTP status, response body)."""
+        self.last_call = None
+        query = (payload or {}).get("query") or ""
+        variables = (payload or {}).get("variables") or {}
+        if "fulfillmentCreateV2" in query:
+            return self._metered("fulfillment_create", MUTATION_COST,
+                                 lambda: self._create(variables))
+        if "fulfillmentTrackingInfoUpdateV2" in query:
+            return self._metered("tracking_update", MUTATION_COST,
+                                 lambda: self._update_tracking(variables))
+        aliases = ALIAS_PATTERN.findall(query)
+        if aliases:
+            return self._metered("order_states", query_cost(len(aliases)),
+                                 lambda: self._order_states(aliases))
+        return 200, {"errors": [{"message": "unsupported query in fake Shopify"}]}
+
+    def _metered(self, kind, cost, answer):
+        self.calls[kind] = self.calls.get(kind, 0) + 1
+        self.last_call = kind
+        now = self.clock()
+        if self.bucket.level(now) < cost:
+            self.throttled += 1
+            return 200, {
+                "errors": [{"message": "Throttled", "extensions": {"code": "THROTTLED"}}],
+                "extensions": self._cost(cost, 0, now),
+            }
+        self.bucket.spend(cost, now)
+        return 200, {"data": answer(), "extensions": self._cost(cost, cost, now)}
+
+    def _cost(self, requested, actual, now):
+        return {"cost": {
+            "requestedQueryCost": requested,
+            "actualQueryCost": actual,
+            "throttleStatus": {
+                "maximumAvailable": self.bucket.maximum,
+                "currentlyAvailable": int(self.bucket.level(now)),
+                "restoreRate": self.bucket.restore_rate,
+            },
+        }}
+
+    def _order_states(self, aliases):
+        data = {}
+        for alias, order_id in aliases:
+            order = self.orders.get(order_id)
+            if order is None and self.open_unknown_orders:
+                order = self.add_order(order_id)
+            if order is None:
+                data[alias] = None
+                continue
+            data[alias] = {
+                "fulfillments": [
+                    {"id": f["id"], "status": f["status"],
+                     "trackingInfo": [{"number": n} for n in f["numbers"]]}
+                    for f in order["fulfillments"]
+                ],
+                "fulfillmentOrders": {"edges": [
+                    {"node": dict(fo)} for fo in order["fulfillment_orders"]
+                ]},
+            }
+        return data
+
+    def _fulfill(self, order, numbers, status="SUCCESS"):
+        self._fulfillment_seq += 1
+        fulfillment = {
+            "id": "gid://shopify/Fulfillment/{0}".format(self._fulfillment_seq),
+            "status": status,
+            "numbers": numbers,
+        }
+        order["fulfillments"].append(fulfillment)
+        return fulfillment
+
+    def _find_order(self, predicate):
+        return next((order for order in self.orders.values() if predicate(order)), None)
+
+    def _create(self, variables):
+        spec = variables.get("f") or {}
+        ids = [line["fulfillmentOrderId"] for line in spec.get("lineItemsByFulfillmentOrder") or []]
+        order = self._find_order(lambda o: any(
+            fo["id"] in ids and fo["status"] == "OPEN" for fo in o["fulfillment_orders"]))
+        if order is None:
+            return {"fulfillmentCreateV2": {
+                "fulfillment": None,
+                "userErrors": [{"message": "Fulfillment order is not open"}]}}
+        for fo in order["fulfillment_orders"]:
+            if fo["id"] in ids:
+                fo["status"] = "CLOSED"
+        tracking = spec.get("trackingInfo") or {}
+        numbers = tracking.get("numbers") or [tracking.get("number")]
+        fulfillment = self._fulfill(order, [n for n in numbers if n])
+        return {"fulfillmentCreateV2": {
+            "fulfillment": {"id": fulfillment["id"], "status": "SUCCESS"},
+            "userErrors": []}}
+
+    def _update_tracking(self, variables):
+        gid = variables.get("f")
+        for order in self.orders.values():
+            for fulfillment in order["fulfillments"]:
+                if fulfillment["id"] == gid:
+                    # Shopify replaces the whole trackingInfo array.
+                    fulfillment["numbers"] = list((variables.get("t") or {}).get("numbers") or [])
+                    return {"fulfillmentTrackingInfoUpdateV2": {
+                        "fulfillment": {"id": gid, "trackingInfo": [
+                            {"number": n} for n in fulfillment["numbers"]]},
+                        "userErrors": []}}
+        return {"fulfillmentTrackingInfoUpdateV2": {
+            "fulfillment": None, "userErrors": [{"message": "Fulfillment not found"}]}}
@@ -8,7 +8,7 @@ from decimal import Decimal
 
 import frappe
 from frappe import _
-from frappe.utils import flt, now_datetime
+from frappe.utils import add_days, cint, flt, now_datetime
 
 from solara_wms.wms.inventory_domain import (
     BalanceState,
@@ -23,6 +23,12 @@ from solara_wms.wms.safety import require_wms_mode
 
 BALANCE_DOCTYPE = "WMS Bin Balance"
 MOVEMENT_DOCTYPE = "WMS Movement"
+LEDGER_DOCTYPE = "WMS Idempotency Ledger"
+# Longest a scanner or mobile client may hold a command offline and resend it.
+# Ledger rows are never archived sooner, whatever
+# WMS Settings.idempotency_retention_days says, so a legitimate retry always
+# finds its key and replays.
+IDEMPOTENCY_RETRY_WINDOW_DAYS = 14
 
 
 class IdempotencyConflict(frappe.ValidationError):
@@ -97,22 +103,97 @@ def _movement_result(doc, replayed=False):
     }
 
 
+def _ledger_name(idempotency_key):
+    doc = frappe.new_doc(LEDGER_DOCTYPE)
+    doc.idempotency_key = idempotency_key
+    doc.autoname()
+    return doc.name
+
+
+def _ledger_entry(idempotency_key, expected_hash, command, different_request):
+    """Resolve a command key with one primary-key read of the ledger.
+
+    Returns the recorded entry for a faithful replay, None for a new key, and
+    raises IdempotencyConflict when the key belongs to another command family
+    or to a different request body.
+    """
+    entry = frappe.db.get_value(
+        LEDGER_DOCTYPE,
+        _ledger_name(idempotency_key),
+        ["command", "request_hash", "result_doctype", "result_name"],
+        as_dict=True,
+    )
+    if not entry:
+        return None
+    if entry.command != command:
+        if entry.command == "Movement":
+            _conflict(_("Idempotency Key was already used for a physical movement"))
+        _conflict(_("Idempotency Key was already used for a work command"))
+    if entry.request_hash != expected_hash:
+        _conflict(different_request)
+    return entry
+
+
+def _record_idempotency(idempotency_key, hash_value, command, result_doctype, result_name):
+    """Claim the key in the command's own transaction; a concurrent duplicate
+    fails on the primary key and rolls back with it."""
+    now = now_datetime()
+    frappe.db.sql(
+        """
+        INSERT INTO `tabWMS Idempotency Ledger`
+            (name, creation, modified, owner, modified_by, docstatus, idx,
+             idempotency_key, request_hash, command, result_doctype, result_name,
+             recorded_at)
+        VALUES (%s, %s, %s, %s, %s, 0, 0, %s, %s, %s, %s, %s, %s)
+        """,
+        (
+            _ledger_name(idempotency_key),
+            now,
+            now,
+            frappe.session.user,
+            frappe.session.user,
+            idempotency_key,
+            hash_value,
+            command,
+            result_doctype,
+            result_name,
+            now,
+        ),
+    )
+
+
+def archive_idempotency_ledger():
+    """Nightly scheduler entry: drop ledger rows past the retention window.
+
+    Retention is floored at IDEMPOTENCY_RETRY_WINDOW_DAYS, so only keys no
+    client can still be retrying are dropped. A key resent after that fails on
+    its movement or work event's unique key instead of replaying; it is never
+    applied twice.
+    """
+    days = cint(
+        frappe.db.get_single_value("WMS Settings", "idempotency_retention_days")
+    )
+    if days <= 0:
+        return
+    days = max(days, IDEMPOTENCY_RETRY_WINDOW_DAYS)
+    frappe.db.sql(
+        "DELETE FROM `tabWMS Idempotency Ledger` WHERE recorded_at < %s",
+        (add_days(now_datetime(), -days),),
+    )
+
+
 def _existing_movement(idempotency_key, expected_hash):
-    name = frappe.db.get_value(
-        MOVEMENT_DOCTYPE, {"idempotency_key": idempotency_key}, "name"
+    entry = _ledger_entry(
+        idempotency_key,
+        expected_hash,
+        "Movement",
+        _("Idempotency Key was already used for a different movement request"),
     )
-    if not name:
-        if frappe.db.exists("DocType", "WMS Work Event") and frappe.db.get_value(
-            "WMS Work Event", {"idempotency_key": idempotency_key}, "name"
-        ):
-            _conflict(_("Idempotency Key was already used for a work command"))
+    if not entry:
         return None
-    doc = frappe.get_doc(MOVEMENT_DOCTYPE, name)
-    if doc.request_hash != expected_hash:
-        _conflict(
-            _("Idempotency Key was already used for a different movement request")
-        )
-    return _movement_result(doc, replayed=True)
+    return _movement_result(
+        frappe.get_doc(MOVEMENT_DOCTYPE, entry.result_name), replayed=True
+    )
 
 
 def _movement_doc(payload, hash_value, **values):
@@ -213,6 +294,7 @@ def seed_bin_balance(
         }
     )
     balance.insert(ignore_permissions=True)
+    _record_idempotency(key, hash_value, "Movement", MOVEMENT_DOCTYPE, movement.name)
     result = _movement_result(movement)
     result["target_balance"] = balance.name
     return result
@@ -223,7 +305,7 @@ def _locked_balances(names):
     rows = frappe.db.sql(
         f"""
         SELECT name, warehouse, bin, item_code, physical_qty, allocated_qty,
-               hold_qty, available_qty
+               hold_qty, available_qty, last_movement
           FROM `tabWMS Bin Balance`
          WHERE name IN ({placeholders})
          ORDER BY name
@@ -360,6 +442,7 @@ def move_internal(
         """,
         (movement.name, frappe.session.user, source_name, target_name),
     )
+    _record_idempotency(key, hash_value, "Movement", MOVEMENT_DOCTYPE, movement.name)
     result = _movement_result(movement)
     result["source_balance"] = source_name
     result["target_balance"] = target_name
@@ -2,6 +2,8 @@
 
 Nothing in this module creates or submits an ERP stock document.  A mismatch is
 evidence to investigate; it is never authority for an automatic adjustment.
+Only variances a manager classified for adjustment, and whose two counts
+agree, are posted to WMS balances, as one Count Adjustment movement group.
 """
 
 from collections import defaultdict
@@ -10,9 +12,19 @@ import frappe
 from frappe import _
 from frappe.utils import flt, now_datetime
 
-from solara_wms.wms.inventory import IdempotencyConflict, _balance_name
+from solara_wms.wms.doctype.wms_movement.wms_movement import movement_name
+from solara_wms.wms.inventory import (
+    IdempotencyConflict,
+    _balance_name,
+    _ledger_entry,
+    _locked_balances,
+    _record_idempotency,
+    _require_shadow_write,
+)
 from solara_wms.wms.inventory_domain import (
+    BalanceState,
     InventoryInvariantError,
+    apply_count_adjustment,
     canonical_qty,
     decimal_qty,
     evaluate_blind_count,
@@ -20,11 +32,18 @@ from solara_wms.wms.inventory_domain import (
     request_hash,
 )
 from solara_wms.wms.safety import require_wms_mode
+from solara_wms.wms.work import SPLIT_KEY_MAX_LENGTH, _split_hash, _split_key
 
 
 COUNT_DOCTYPE = "WMS Cycle Count"
+ITEM_DOCTYPE = "WMS Cycle Count Item"
+ITEM_SNAPSHOT_FIELDS = (
+    "item_code", "item_name", "uom", "bin", "snapshot_balance", "snapshot_movement",
+    "book_qty", "valuation_rate", "row_status",
+)
 ENTRY_DOCTYPE = "WMS Count Entry"
 BALANCE_DOCTYPE = "WMS Bin Balance"
+MOVEMENT_DOCTYPE = "WMS Movement"
 COUNTER_ROLES = {"System Manager", "Stock Manager", "Stock User"}
 MANAGER_ROLES = {"System Manager", "Stock Manager"}
 
@@ -86,6 +105,44 @@ def _entry_result(doc, replayed=False):
     }
 
 
+def snapshot_items(warehouse, bin_name, balances):
+    """Count rows for `balances`, with Item and Atlas Bin details in two reads."""
+    item_codes = sorted({balance.item_code for balance in balances})
+    items = {
+        row.name: row
+        for row in frappe.get_all(
+            "Item",
+            filters={"name": ["in", item_codes]},
+            fields=["name", "item_name", "stock_uom"],
+        )
+    } if item_codes else {}
+    rates = {
+        row.item_code: flt(row.valuation_rate)
+        for row in frappe.get_all(
+            "Bin",
+            filters={"warehouse": warehouse, "item_code": ["in", item_codes]},
+            fields=["item_code", "valuation_rate"],
+        )
+    } if item_codes else {}
+    rows = []
+    for balance in balances:
+        item = items.get(balance.item_code)
+        rows.append(
+            {
+                "item_code": balance.item_code,
+                "item_name": item.item_name if item else "",
+                "uom": item.stock_uom if item else "",
+                "bin": bin_name,
+                "snapshot_balance": balance.name,
+                "snapshot_movement": balance.last_movement,
+                "book_qty": flt(balance.physical_qty),
+                "valuation_rate": rates.get(balance.item_code, 0),
+                "row_status": "Pending",
+            }
+        )
+    return rows
+
+
 @frappe.whitelist(methods=["POST"])
 def start_blind_count(cycle_count):
     locked = _locked_count(cycle_count)
@@ -95,7 +152,7 @@ def start_blind_count(cycle_count):
     if not locked.bin:
         frappe.throw(_("A physical bin is required for a blind count"))
 
-    doc = frappe.get_doc(COUNT_DOCTYPE, cycle_count)
+    doc = locked
     balances = frappe.db.sql(
         """SELECT name, item_code, physical_qty, last_movement
              FROM `tabWMS Bin Balance`
@@ -109,31 +166,27 @@ def start_blind_count(cycle_count):
     if not balances:
         frappe.throw(_("The selected physical bin has no WMS balance to count"))
 
-    doc.items = []
-    for balance in balances:
-        atlas = frappe.db.get_value(
-            "Bin",
-            {"warehouse": doc.warehouse, "item_code": balance.item_code},
-            ["valuation_rate"],
-            as_dict=True,
-        )
-        doc.append(
-            "items",
-            {
-                "item_code": balance.item_code,
-                "bin": doc.bin,
-                "snapshot_balance": balance.name,
-                "snapshot_movement": balance.last_movement,
-                "book_qty": flt(balance.physical_qty),
-                "valuation_rate": flt(atlas.valuation_rate) if atlas else 0,
-                "row_status": "Pending",
-            },
-        )
-    doc.status = "In Progress"
-    doc.snapshot_at = now_datetime()
-    doc.started_by = frappe.session.user
-    doc.review_status = ""
-    doc.save(ignore_permissions=True)
+    rows = snapshot_items(doc.warehouse, doc.bin, balances)
+    now = now_datetime()
+    frappe.db.delete(ITEM_DOCTYPE, {"parent": doc.name, "parenttype": COUNT_DOCTYPE})
+    frappe.db.bulk_insert(
+        ITEM_DOCTYPE,
+        [*ITEM_SNAPSHOT_FIELDS, "name", "parent", "parenttype", "parentfield", "idx",
+         "creation", "modified", "owner", "modified_by", "docstatus"],
+        [
+            (*(row[field] for field in ITEM_SNAPSHOT_FIELDS), frappe.generate_hash(length=10),
+             doc.name, COUNT_DOCTYPE, "items", idx, now, now, frappe.session.user,
+             frappe.session.user, 0)
+            for idx, row in enumerate(rows, 1)
+        ],
+    )
+    frappe.db.set_value(
+        COUNT_DOCTYPE,
+        doc.name,
+        {"status": "In Progress", "snapshot_at": now, "started_by": frappe.session.user,
+         "review_status": "", "total_items": len(rows), "items_with_variance": 0,
+         "total_variance_value": 0},
+    )
     return get_blind_count_task(cycle_count)
 
 
@@ -269,18 +322,22 @@ def submit_blind_count(
     return _entry_result(entry)
 
 
-def _balance_unchanged(row, warehouse):
-    name = row.snapshot_balance or _balance_name(warehouse, row.bin, row.item_code)
-    current = frappe.db.sql(
-        """SELECT physical_qty, last_movement
-             FROM `tabWMS Bin Balance`
-            WHERE name = %s FOR UPDATE""",
-        name,
-        as_dict=True,
-    )
+def _locked_snapshot(doc):
+    """Lock every balance the count touches in one ordered statement.
+
+    Returns {count item row name: locked balance row or None}.
+    """
+    names = {
+        row.name: row.snapshot_balance or _balance_name(doc.warehouse, row.bin, row.item_code)
+        for row in doc.items
+    }
+    locked = _locked_balances(set(names.values())) if names else {}
+    return {row_name: locked.get(name) for row_name, name in names.items()}
+
+
+def _balance_unchanged(row, current):
     if not current:
         return not row.snapshot_balance and flt(row.book_qty) == 0
-    current = current[0]
     return (
         flt(current.physical_qty) == flt(row.book_qty)
         and (current.last_movement or "") == (row.snapshot_movement or "")
@@ -294,14 +351,18 @@ def finalize_blind_count(cycle_count):
     if locked.status not in ("In Progress", "Recount Required"):
         frappe.throw(_("Only an active blind count can be finalized"))
     doc = frappe.get_doc(COUNT_DOCTYPE, cycle_count)
-    invalid = [r for r in doc.items if not _balance_unchanged(r, doc.warehouse)]
+    current = _locked_snapshot(doc)
+    invalid = [r for r in doc.items if not _balance_unchanged(r, current[r.name])]
     if invalid:
-        for row in invalid:
-            frappe.db.set_value(
-                "WMS Cycle Count Item", row.name,
-                {"row_status": "Invalidated", "error_message": "Balance moved after snapshot"},
-                update_modified=False,
-            )
+        frappe.db.bulk_update(
+            ITEM_DOCTYPE,
+            {
+                row.name: {"row_status": "Invalidated",
+                           "error_message": "Balance moved after snapshot"}
+                for row in invalid
+            },
+            update_modified=False,
+        )
         frappe.db.set_value(
             COUNT_DOCTYPE, doc.name,
             {"status": "Invalidated", "review_status": "Investigation Required"},
@@ -312,6 +373,7 @@ def finalize_blind_count(cycle_count):
     needs_recount = []
     review = []
     variance_value = 0
+    updates = {}
     for row in doc.items:
         if not row.counted_at:
             frappe.throw(_("Every listed item requires a zero or positive count"))
@@ -325,26 +387,22 @@ def finalize_blind_count(cycle_count):
             frappe.throw(_(str(exc)))
         status = result["status"]
         variance = result["variance_qty"]
-        frappe.db.set_value(
-            "WMS Cycle Count Item",
-            row.name,
-            {
-                "row_status": status,
-                "variance_qty": float(variance),
-                "variance_pct": (
-                    float(variance / decimal_qty(row.book_qty) * 100)
-                    if flt(row.book_qty) else (100 if variance else 0)
-                ),
-                "variance_value": float(variance) * flt(row.valuation_rate),
-                "review_status": "Pending" if variance else "Resolved",
-            },
-            update_modified=False,
-        )
+        updates[row.name] = {
+            "row_status": status,
+            "variance_qty": float(variance),
+            "variance_pct": (
+                float(variance / decimal_qty(row.book_qty) * 100)
+                if flt(row.book_qty) else (100 if variance else 0)
+            ),
+            "variance_value": float(variance) * flt(row.valuation_rate),
+            "review_status": "Pending" if variance else "Resolved",
+        }
         variance_value += float(variance) * flt(row.valuation_rate)
         if status == "Recount Required":
             needs_recount.append(row.item_code)
         elif status in ("Confirmed Variance", "Counter Disagreement"):
             review.append(row.item_code)
+    frappe.db.bulk_update(ITEM_DOCTYPE, updates, update_modified=False)
 
     if needs_recount:
         status, review_status = "Recount Required", "Recount Pending"
@@ -364,6 +422,173 @@ def finalize_blind_count(cycle_count):
             "recount_items": needs_recount, "review_items": review}
 
 
+def _adjustment_result(cycle_count, key, replayed=False):
+    movements = frappe.get_all(
+        MOVEMENT_DOCTYPE,
+        filters={"reference_doctype": COUNT_DOCTYPE, "reference_name": cycle_count,
+                 "movement_type": "Count Adjustment",
+                 "idempotency_key": ["like", key + "#%"]},
+        fields=["name", "item_code", "source_bin", "target_bin", "qty",
+                "source_before", "source_after", "target_before", "target_after"],
+        order_by="idempotency_key asc",
+    )
+    return {
+        "cycle_count": cycle_count,
+        "idempotency_key": key,
+        "movements": [
+            {
+                "movement": row.name,
+                "item_code": row.item_code,
+                "delta_qty": flt(row.qty) if row.target_bin else -flt(row.qty),
+                "before_qty": flt(row.target_before if row.target_bin else row.source_before),
+                "after_qty": flt(row.target_after if row.target_bin else row.source_after),
+            }
+            for row in movements
+        ],
+        "replayed": bool(replayed),
+    }
+
+
+@frappe.whitelist(methods=["POST"])
+def post_count_adjustments(idempotency_key, cycle_count, notes=None):
+    """Apply every approved count variance of one count as a movement group.
+
+    Only rows classified for adjustment approval whose first count and
+    independent recount agree are adjusted; the book becomes the confirmed
+    count through one ordered lock, one bulk movement insert and one balance
+    update. WMS balances only: Atlas stock is corrected by its own reviewed
+    Stock Reconciliation.
+    """
+    key = _key(idempotency_key)
+    if len(key) > SPLIT_KEY_MAX_LENGTH:
+        frappe.throw(
+            _("Adjustment Idempotency Key must be at most {0} characters").format(
+                SPLIT_KEY_MAX_LENGTH
+            )
+        )
+    locked = _locked_count(cycle_count)
+    _require_shadow_write(locked.warehouse)
+    payload = {
+        "command": "Count Adjustment",
+        "idempotency_key": key,
+        "cycle_count": cycle_count,
+        "notes": notes or "",
+    }
+    hash_value = request_hash(payload)
+    if _ledger_entry(
+        key, hash_value, "Movement",
+        _("Idempotency Key was already used for a different adjustment"),
+    ):
+        return _adjustment_result(cycle_count, key, replayed=True)
+    if locked.status != "Variance Review":
+        frappe.throw(_("Only a count in Variance Review can be adjusted"))
+
+    doc = frappe.get_doc(COUNT_DOCTYPE, cycle_count)
+    approved = [r for r in doc.items if r.review_status == "Adjustment Approval Required"]
+    if not approved:
+        frappe.throw(_("No variance on this count is approved for adjustment"))
+    current = _locked_snapshot(doc)
+    plans = []
+    for row in approved:
+        try:
+            result = evaluate_blind_count(
+                row.book_qty, row.counted_qty, row.recount_qty if row.recounted_at else None
+            )
+        except InventoryInvariantError as exc:
+            frappe.throw(_(str(exc)))
+        if result["accepted_qty"] is None:
+            frappe.throw(
+                _("Item {0} has no agreed count; it needs a matching recount before adjustment").format(
+                    row.item_code
+                )
+            )
+        balance = current[row.name]
+        if not balance or not _balance_unchanged(row, balance):
+            frappe.throw(
+                _("Balance for item {0} moved after the snapshot; recount before adjusting").format(
+                    row.item_code
+                )
+            )
+        try:
+            after, delta = apply_count_adjustment(
+                BalanceState.from_values(
+                    balance.physical_qty, balance.allocated_qty, balance.hold_qty
+                ),
+                result["accepted_qty"],
+            )
+        except InventoryInvariantError as exc:
+            frappe.throw(_("Item {0}: {1}").format(row.item_code, _(str(exc))))
+        if delta:
+            plans.append((row, balance, after, delta))
+
+    now, user = now_datetime(), frappe.session.user
+    movements = []
+    for n, (row, balance, after, delta) in enumerate(plans, start=1):
+        movement_key = _split_key(key, n)
+        gain = delta > 0
+        movements.append(
+            {
+                "name": movement_name(movement_key),
+                "movement_type": "Count Adjustment",
+                "status": "Posted",
+                "warehouse": doc.warehouse,
+                "item_code": row.item_code,
+                "source_bin": None if gain else row.bin,
+                "target_bin": row.bin if gain else None,
+                "qty": float(abs(delta)),
+                "idempotency_key": movement_key,
+                "request_hash": _split_hash(payload, n),
+                "source_before": 0 if gain else flt(balance.physical_qty),
+                "source_after": 0 if gain else float(after.physical),
+                "target_before": flt(balance.physical_qty) if gain else 0,
+                "target_after": float(after.physical) if gain else 0,
+                "reference_doctype": COUNT_DOCTYPE,
+                "reference_name": doc.name,
+                "posted_at": now,
+                "posted_by": user,
+                "notes": notes or "",
+            }
+        )
+    if movements:
+        fields = [*movements[0], "creation", "modified", "owner", "modified_by", "docstatus"]
+        frappe.db.bulk_insert(
+            MOVEMENT_DOCTYPE,
+            fields,
+            [(*movement.values(), now, now, user, user, 0) for movement in movements],
+        )
+        frappe.db.bulk_update(
+            BALANCE_DOCTYPE,
+            {
+                balance.name: {
+                    "physical_qty": float(after.physical),
+                    "available_qty": float(after.available),
+                    "last_movement": movement["name"],
+                    "last_updated_by": user,
+                }
+                for (row, balance, after, delta), movement in zip(plans, movements)
+            },
+        )
+    frappe.db.bulk_update(
+        ITEM_DOCTYPE,
+        {row.name: {"review_status": "Resolved"} for row in approved},
+        update_modified=False,
+    )
+    adjusted = {row.name for row in approved}
+    open_rows = [
+        r.review_status for r in doc.items
+        if r.name not in adjusted and r.review_status not in ("", "Resolved")
+    ]
+    if not open_rows:
+        values = {"status": "Completed", "review_status": "Resolved"}
+    elif "Pending" in open_rows:
+        values = {"review_status": "Investigation Required"}
+    else:
+        values = {"review_status": "Source Correction Required"}
+    frappe.db.set_value(COUNT_DOCTYPE, doc.name, values)
+    _record_idempotency(key, hash_value, "Movement", COUNT_DOCTYPE, doc.name)
+    return _adjustment_result(cycle_count, key)
+
+
 @frappe.whitelist(methods=["POST"])
 def classify_variance(
     cycle_count,
@@ -1,7 +1,7 @@
 """Pure inventory invariants shared by WMS services and unit tests."""
 
 from dataclasses import dataclass
-from decimal import Decimal, InvalidOperation
+from decimal import ROUND_CEILING, Decimal, InvalidOperation
 import hashlib
 import json
 from collections import defaultdict
@@ -280,6 +280,29 @@ def complete_allocated_move(source: BalanceState, target: BalanceState, qty):
     return source_after, target_after
 
 
+def apply_count_adjustment(balance: BalanceState, counted_qty):
+    """Set physical quantity to a confirmed count; returns (after, delta).
+
+    Allocated and held quantity are untouched, so a count below them is
+    refused: those units must be released or re-picked before the book drops.
+    """
+    balance.validate()
+    counted = decimal_qty(counted_qty)
+    if counted < 0:
+        raise InventoryInvariantError("Count quantities cannot be negative")
+    if counted < balance.allocated + balance.held:
+        raise InventoryInvariantError(
+            f"Counted quantity {canonical_qty(counted)} is below allocated plus held "
+            f"quantity {canonical_qty(balance.allocated + balance.held)}"
+        )
+    after = BalanceState(
+        physical=counted,
+        allocated=balance.allocated,
+        held=balance.held,
+    ).validate()
+    return after, counted - balance.physical
+
+
 def plan_replenishment(
     source: BalanceState,
     target: BalanceState,
@@ -305,3 +328,109 @@ def plan_replenishment(
     if planned <= 0:
         raise InventoryInvariantError("No available quantity can be replenished")
     return planned
+
+
+def velocity_replenishment_policy(
+    picked_qty,
+    lookback_hours,
+    open_demand_qty,
+    lead_time_hours,
+    cover_hours,
+    minimum_qty=0,
+    maximum_qty=0,
+):
+    """Home min/max from recent pick velocity and released, unpicked demand.
+
+    The minimum is what the face will be asked for before a replenishment
+    can land: velocity over the lead time plus demand already released. The
+    maximum adds `cover_hours` of velocity on top. The Item Location minimum
+    stays a floor and its maximum, when set, is the face capacity.
+    """
+    picked = decimal_qty(picked_qty)
+    demand = decimal_qty(open_demand_qty)
+    hours = decimal_qty(lookback_hours)
+    lead = decimal_qty(lead_time_hours)
+    cover = decimal_qty(cover_hours)
+    if picked < 0 or demand < 0:
+        raise InventoryInvariantError("Velocity and demand cannot be negative")
+    if hours <= 0 or lead < 0 or cover <= 0:
+        raise InventoryInvariantError("Invalid replenishment trigger window")
+    rate = picked / hours
+    minimum = max(
+        decimal_qty(minimum_qty),
+        (rate * lead + demand).to_integral_value(rounding=ROUND_CEILING),
+    )
+    maximum = max(
+        minimum,
+        (rate * (lead + cover) + demand).to_integral_value(rounding=ROUND_CEILING),
+    )
+    capacity = decimal_qty(maximum_qty)
+    if capacity > 0:
+        minimum = min(minimum, capacity)
+        maximum = min(maximum, capacity)
+    return minimum, maximum
+
+
+@dataclass(frozen=True)
+class PickCandidate:
+    """One bin that may serve a pick line, with its allocation preference."""
+
+    bin: str
+    available: Decimal
+    role_rank: int = 0
+    priority: int = 0
+    route_sequence: int = 0
+
+    def preference(self):
+        return (self.role_rank, self.priority, self.route_sequence, self.bin)
+
+
+def plan_pick_allocation(qty, candidates):
+    """Split one pick line across bins, Home faces before Overflow before Reserve.
+
+    Role tiers are spent in rank order; a lower tier is only touched for what
+    the tiers above it cannot supply, so pick faces stay the first source and
+    Reserve stock moves through replenishment. Inside a tier a bin that covers
+    what is left takes it in one stop: lowest priority value, then a bin the
+    pick empties (no remnant left behind), then the earliest on the route.
+    Otherwise the tier's fullest bin is drained whole (preference breaks ties)
+    and the search repeats, so a tier is split across as few bins as possible
+    and at most one bin overall is left partially picked. Splits are returned
+    in route order as (bin, qty).
+    """
+    requested = decimal_qty(qty)
+    if requested <= 0:
+        raise InventoryInvariantError("Pick quantity must be greater than zero")
+    pool = sorted(
+        (c for c in candidates if decimal_qty(c.available) > 0),
+        key=PickCandidate.preference,
+    )
+    total = sum((decimal_qty(c.available) for c in pool), Decimal("0"))
+    if total < requested:
+        raise InventoryInvariantError(
+            f"Insufficient available quantity across bins: {canonical_qty(total)} "
+            f"available, {canonical_qty(requested)} requested"
+        )
+    splits = []
+    remaining = requested
+    while remaining > 0:
+        tier = [c for c in pool if c.role_rank == pool[0].role_rank]
+        covering = [c for c in tier if decimal_qty(c.available) >= remaining]
+        if covering:
+            chosen = min(
+                covering,
+                key=lambda c: (
+                    c.priority,
+                    decimal_qty(c.available) != remaining,
+                    c.route_sequence,
+                    c.bin,
+                ),
+            )
+            splits.append((chosen, remaining))
+            break
+        chosen = min(tier, key=lambda c: (-decimal_qty(c.available), c.preference()))
+        pool.remove(chosen)
+        splits.append((chosen, decimal_qty(chosen.available)))
+        remaining -= decimal_qty(chosen.available)
+    splits.sort(key=lambda split: (split[0].route_sequence, split[0].bin))
+    return [(candidate.bin, split_qty) for candidate, split_qty in splits]
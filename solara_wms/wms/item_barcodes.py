@@ -0,0 +1,99 @@
+# Copyright (c) 2026, SOLARA and contributors
+# For license information, please see license.txt
+"""Item Barcode (EAN) resolution shared by every scan station.
+
+The Item Barcode table is read once into a two-way index - item -> barcodes in
+idx order, barcode -> items - and kept in the site cache until an Item's
+barcodes change. A scan, a pack-QC requirement list or a B2B carton plan then
+costs one cache read however many items it touches; frappe keeps a
+request-local copy, so repeat reads in the same request do not reach Redis.
+
+Reverse lookups are case-insensitive, like the MariaDB collation the old
+`filters={"barcode": ...}` queries relied on.
+"""
+import frappe
+
+
+INDEX_KEY = "solara_wms:item_barcode_index"
+
+
+def _cache():
+    cache = frappe.cache
+    return cache() if callable(cache) else cache
+
+
+def _clean(value):
+    return str(value or "").strip()
+
+
+def _build_index():
+    items, owners = {}, {}
+    for row in frappe.get_all(
+            "Item Barcode", filters={"parenttype": "Item"},
+            fields=["parent", "barcode"], order_by="parent asc, idx asc",
+            limit_page_length=0):
+        barcode = _clean(row.barcode)
+        if not barcode:
+            continue
+        codes = items.setdefault(row.parent, [])
+        if barcode not in codes:
+            codes.append(barcode)
+        parents = owners.setdefault(barcode.upper(), [])
+        if row.parent not in parents:
+            parents.append(row.parent)
+    return {"items": items, "barcodes": owners}
+
+
+def _index():
+    return _cache().get_value(INDEX_KEY, generator=_build_index)
+
+
+def barcodes_for(item_codes):
+    """{item_code: [barcodes in idx order]} for every code asked for; an item
+    without barcodes maps to an empty list."""
+    items = _index()["items"]
+    return {code: list(items.get(code) or []) for code in item_codes if code}
+
+
+def first_barcode(item_code):
+    """The item's primary (lowest idx) barcode, or None."""
+    return (barcodes_for([item_code]).get(item_code) or [None])[0]
+
+
+def items_for_barcode(barcode):
+    """Item codes carrying this barcode - more than one means the master data
+    maps a physical barcode ambiguously and the caller must stop."""
+    barcode = _clean(barcode)
+    if not barcode:
+        return []
+    return list(_index()["barcodes"].get(barcode.upper()) or [])
+
+
+def invalidate():
+    _cache().delete_value(INDEX_KEY)
+
+
+def _doc_barcodes(doc):
+    return [_clean(row.barcode) for row in (doc.get("barcodes") or []) if _clean(row.barcode)]
+
+
+def on_item_update(doc, method=None):
+    """Item on_update: drop the index only when this item's barcodes moved."""
+    index = _cache().get_value(INDEX_KEY)
+    if index is None:
+        return
+    current = []
+    for barcode in _doc_barcodes(doc):
+        if barcode not in current:
+            current.append(barcode)
+    if (index.get("items") or {}).get(doc.name, []) != current:
+        invalidate()
+
+
+def on_item_trash(doc, method=None):
+    if _doc_barcodes(doc):
+        invalidate()
+
+
+def on_item_rename(doc, method=None, old=None, new=None, merge=False):
+    invalidate()
@@ -0,0 +1,420 @@
+"""Synthetic D2C day at N x July volume, for TEST sites only.
+
+    bench --site solara-test execute solara_wms.wms.load_test.run_synthetic_day \\
+        --kwargs "{'multiple': 4}"
+
+The run clones recent SHP Sales Orders into a day of orders (load_test_plan),
+then drives the real jobs in floor order and times every unit of work:
+
+    release   _run_release(inline) -> _make_and_submit_dn per SO
+    labels    _fetch_d2c_labels -> _attach_label_for_dn per DN
+    invoices  d2c_invoice_queue._drain -> _invoice per queued DN
+    waves     prepare_todays_shipments per wave
+    pack      pack_verify_submit per parcel AWB
+    dispatch  scan_dispatch per parcel AWB
+    fulfil    sync_dispatched_shopify_fulfillments -> fulfill_dispatched_dn
+
+All outbound HTTP is answered in-process by FakeCommerce (ClickPost label and
+order APIs, Shopify REST/GraphQL); nothing leaves the bench. AWBs that the
+courier script would mint are stamped synthetically. Every created document
+carries the run tag in shopify_order_id so a run is easy to find and purge.
+
+Refuses to start unless site config sets `allow_wms_load_test: 1`.
+"""
+
+import contextlib
+import json
+import time
+import urllib.parse
+
+import frappe
+from frappe import _
+from frappe.utils import cint, nowdate
+
+from solara_wms.wms import (
+    d2c_dispatch,
+    d2c_fulfillment as d2c,
+    d2c_invoice_queue,
+    d2c_pack_verify,
+)
+from solara_wms.wms.fake_shopify import FakeShopifyGraphQL
+from solara_wms.wms.load_test_plan import (
+    StageStats,
+    format_report,
+    plan_synthetic_day,
+    synthetic_awbs,
+)
+
+
+FAKE_LABEL_HOST = "labels.loadtest.invalid"
+# Smallest well-formed one-page PDF; pypdf merges it like a courier label.
+FAKE_LABEL_PDF = (
+    b"%PDF-1.4\n1 0 obj<</Type/Catalog/Pages 2 0 R>>endobj\n"
+    b"2 0 obj<</Type/Pages/Kids[3 0 R]/Count 1>>endobj\n"
+    b"3 0 obj<</Type/Page/Parent 2 0 R/MediaBox[0 0 288 432]>>endobj\n"
+    b"trailer<</Root 1 0 R>>\n%%EOF\n"
+)
+TEMPLATE_LIMIT = 200
+
+
+class FakeCommerce:
+    """In-process stand-in for every HTTP call the D2C jobs make.
+
+    Installed over requests.Session.request, which requests.get/post and
+    frappe.integrations.utils all route through. Unknown hosts get a 503 and
+    are counted, so a new integration shows up in the report instead of
+    silently reaching production.
+    """
+
+    def __init__(self, latency_ms=0):
+        self.latency = max(0, latency_ms) / 1000.0
+        self.calls = {}
+        self.unrouted = []
+        # Unmetered: the load test times our code, not Shopify's rate limit.
+        self.shopify = FakeShopifyGraphQL(maximum=10 ** 9, restore_rate=10 ** 9,
+                                          open_unknown_orders=True)
+
+    @contextlib.contextmanager
+    def installed(self):
+        import requests
+
+        original = requests.sessions.Session.request
+        fake = self
+
+        def request(session, method, url, **kwargs):
+            return fake.handle(method, url, **kwargs)
+
+        requests.sessions.Session.request = request
+        try:
+            yield self
+        finally:
+            requests.sessions.Session.request = original
+
+    def handle(self, method, url, params=None, data=None, json=None, **_kwargs):
+        if self.latency:
+            time.sleep(self.latency)
+        parsed = urllib.parse.urlparse(url)
+        body = json if json is not None else _json_body(data)
+        route = self._route(method.upper(), parsed, params or {}, body)
+        if route is None:
+            self.unrouted.append("{0} {1}".format(method.upper(), parsed.netloc))
+            return _response(503, {"errors": "unrouted in load test"})
+        name, status, payload = route
+        self.calls[name] = self.calls.get(name, 0) + 1
+        return _response(status, payload)
+
+    def _route(self, method, parsed, params, body):
+        host, path = parsed.netloc, parsed.path
+        if host == FAKE_LABEL_HOST:
+            return "label_pdf", 200, FAKE_LABEL_PDF
+        if "clickpost" in host and "shippinglabel" in path:
+            waybill = params.get("waybill") or ""
+            return "clickpost_label", 200, {
+                "meta": {"success": True, "status": 200},
+                "result": {"shipping_label": "https://{0}/{1}.pdf".format(
+                    FAKE_LABEL_HOST, waybill)},
+            }
+        if "clickpost" in host and method == "POST":
+            reference = str((body or {}).get("reference_number") or "")
+            return "clickpost_order", 200, {
+                "meta": {"success": True, "status": 200},
+                "result": {"waybill": "LTCP" + reference,
+                           "label": "https://{0}/{1}.pdf".format(
+                               FAKE_LABEL_HOST, reference)},
+            }
+        if "shopify" in host and path.endswith("/fulfillments.json"):
+            return "shopify_fulfillments", 200, {"fulfillments": []}
+        if "shopify" in host and path.endswith("/graphql.json"):
+            status, payload = self.shopify.handle(body)
+            return "shopify_" + (self.shopify.last_call or "graphql"), status, payload
+        if "hooks.slack.com" in host:
+            return "slack", 200, {"ok": True}
+        return None
+
+
+class _QueryCounter:
+    """Counts frappe.db.sql calls while installed (get_all/get_value/set_value
+    and document IO all end there)."""
+
+    def __init__(self):
+        self.count = 0
+
+    @contextlib.contextmanager
+    def installed(self):
+        db = frappe.db
+        original = db.sql
+
+        def sql(*args, **kwargs):
+            self.count += 1
+            return original(*args, **kwargs)
+
+        db.sql = sql
+        try:
+            yield self
+        finally:
+            db.sql = original
+
+
+class _Run:
+    def __init__(self, run_tag, queries):
+        self.run_tag = run_tag
+        self.queries = queries
+        self.stages = {}
+
+    def stage(self, name):
+        return self.stages.setdefault(name, StageStats(name))
+
+    def timed(self, stage, function):
+        """Wrap `function` so each call is one latency/query sample."""
+        stats = self.stage(stage)
+
+        def wrapper(*args, **kwargs):
+            before, started = self.queries.count, time.perf_counter()
+            try:
+                return function(*args, **kwargs)
+            except Exception:
+                stats.errors += 1
+                raise
+            finally:
+                stats.record(time.perf_counter() - started, self.queries.count - before)
+
+        return wrapper
+
+    @contextlib.contextmanager
+    def wall(self, stage):
+        started = time.perf_counter()
+        try:
+            yield self.stage(stage)
+        finally:
+            self.stage(stage).wall_seconds += time.perf_counter() - started
+
+
+@contextlib.contextmanager
+def _swapped(module, attribute, replacement):
+    original = getattr(module, attribute)
+    setattr(module, attribute, replacement)
+    try:
+        yield
+    finally:
+        setattr(module, attribute, original)
+
+
+def run_synthetic_day(multiple=4, baseline=None, seed=0, waves=3,
+                      http_latency_ms=0, shift_hours=10, max_passes=200):
+    """Replay one synthetic day and return the per-stage report."""
+    if not cint(frappe.conf.get("allow_wms_load_test")):
+        frappe.throw(_("Load tests are disabled on this site (allow_wms_load_test)"))
+    settings = d2c._settings()
+    run_tag = "LT" + frappe.generate_hash(length=6).upper()
+    templates = _template_orders(settings)
+    plan = plan_synthetic_day(
+        templates, multiple=float(multiple), seed=cint(seed), run_tag=run_tag,
+        **({"baseline": cint(baseline)} if baseline else {}))
+
+    fake = FakeCommerce(latency_ms=cint(http_latency_ms))
+    counter = _QueryCounter()
+    run = _Run(run_tag, counter)
+    with fake.installed(), counter.installed():
+        _generate(run, plan)
+        _release(run, settings, max_passes)
+        parcels = _stamp_awbs(run)
+        _labels(run, max_passes)
+        _invoices(run, max_passes)
+        _waves(run, cint(waves))
+        _scan(run, "pack", parcels, lambda awb: d2c_pack_verify.pack_verify_submit(
+            awb, photo_url="/files/{0}-box.jpg".format(run_tag), station="LOADTEST"))
+        _scan(run, "dispatch", parcels, d2c_dispatch.scan_dispatch)
+        _fulfil(run, len(plan), max_passes)
+
+    day_units = {"generate": len(plan), "release": len(plan), "labels": len(plan),
+                 "invoices": len(plan),
+                 "waves": cint(waves), "pack": len(parcels), "dispatch": len(parcels),
+                 "fulfil": len(plan)}
+    summaries = [stats.summary(day_units.get(name), shift_hours)
+                 for name, stats in run.stages.items()]
+    report = {
+        "run_tag": run_tag,
+        "multiple": multiple,
+        "orders": len(plan),
+        "parcels": len(parcels),
+        "templates": len(templates),
+        "disabled_toggles": _disabled_toggles(settings),
+        "http_calls": fake.calls,
+        "unrouted_http": sorted(set(fake.unrouted)),
+        "stages": summaries,
+        "table": format_report(summaries),
+    }
+    d2c._log("D2C Load Test", json.dumps(
+        {k: v for k, v in report.items() if k != "table"}, default=str)[:10000])
+    return report
+
+
+def _template_orders(settings):
+    names = frappe.get_all(
+        "Sales Order",
+        filters={"name": ["like", d2c._prefix(settings) + "%"], "docstatus": 1},
+        pluck="name",
+        order_by="creation desc",
+        limit_page_length=TEMPLATE_LIMIT,
+    )
+    if not names:
+        frappe.throw(_("No submitted SHP Sales Orders to use as templates"))
+    return names
+
+
+def _disabled_toggles(settings):
+    toggles = ("label_fetch_enabled", "auto_fulfill_shopify", "auto_invoice_on_label")
+    return [toggle for toggle in toggles if not cint(settings.get(toggle))]
+
+
+def _generate(run, plan):
+    today = nowdate()
+    cache = {}
+    create = run.timed("generate", _clone_order)
+    with run.wall("generate"):
+        for order in plan:
+            if order["template"] not in cache:
+                cache[order["template"]] = frappe.get_doc("Sales Order", order["template"])
+            try:
+                create(cache[order["template"]], order, today)
+            except Exception:
+                frappe.db.rollback()
+            if order["seq"] % 50 == 0:
+                frappe.db.commit()
+    frappe.db.commit()
+
+
+def _clone_order(template, order, today):
+    so = frappe.copy_doc(template)
+    so.transaction_date = today
+    so.delivery_date = today
+    for row in so.items:
+        row.delivery_date = today
+    for fieldname, value in (("shopify_order_id", order["shopify_order_id"]),
+                             ("shopify_order_number", order["shopify_order_id"]),
+                             ("po_no", order["shopify_order_id"])):
+        if so.meta.has_field(fieldname):
+            so.set(fieldname, value)
+    so.flags.ignore_permissions = True
+    so.insert(ignore_permissions=True)
+    so.submit()
+    return so.name
+
+
+def _release(run, settings, max_passes):
+    today = nowdate()
+    with _swapped(d2c, "_make_and_submit_dn",
+                  run.timed("release", d2c._make_and_submit_dn)), run.wall("release"):
+        for _pass in range(max_passes):
+            res = d2c._run_release(settings, from_date=today, to_date=today,
+                                   inline=True)
+            if not res.get("created"):
+                break
+
+
+def _run_dns(run, fields=("name",)):
+    return frappe.get_all(
+        "Delivery Note",
+        filters={"docstatus": 1, "shopify_order_id": ["like", run.run_tag + "-%"]},
+        fields=list(fields),
+        order_by="name",
+        limit_page_length=0,
+    )
+
+
+def _stamp_awbs(run):
+    """Stand-in for the courier script: every released DN gets one synthetic
+    AWB per box unless the fake ClickPost order API already minted them."""
+    parcels = []
+    meta = frappe.get_meta("Delivery Note")
+    fields = ["name", "shopify_order_id", "awb_number", "courier_partner"]
+    fields += [f for f in ("custom_box_count", "custom_awb_2", "custom_awb_list")
+               if meta.has_field(f)]
+    for dn in _run_dns(run, fields):
+        pairs = d2c._awb_courier_pairs(dn)
+        box_count = cint(dn.get("custom_box_count")) or 1
+        if len(pairs) < box_count:
+            seq = cint(str(dn.shopify_order_id).rsplit("-", 1)[-1])
+            awbs = synthetic_awbs(run.run_tag, seq, box_count)
+            values = {"awb_number": awbs[0], "courier_partner": "Delhivery"}
+            if meta.has_field("custom_awb_list"):
+                values["custom_awb_list"] = json.dumps(
+                    [{"awb": awb, "courier": "Delhivery"} for awb in awbs])
+            frappe.db.set_value("Delivery Note", dn.name, values, update_modified=False)
+            pairs = [(awb, "Delhivery") for awb in awbs]
+        parcels.extend(awb for awb, _courier in pairs)
+    frappe.db.commit()
+    return parcels
+
+
+def _labels(run, max_passes):
+    with _swapped(d2c, "_attach_label_for_dn",
+                  run.timed("labels", d2c._attach_label_for_dn)), run.wall("labels"):
+        for _pass in range(max_passes):
+            result = d2c._fetch_d2c_labels() or {}
+            if not (result.get("attached") or result.get("inv_queued")):
+                break
+
+
+def _invoices(run, max_passes):
+    with _swapped(d2c_invoice_queue, "_invoice",
+                  run.timed("invoices", d2c_invoice_queue._invoice)), run.wall("invoices"):
+        for _pass in range(max_passes):
+            result = d2c_invoice_queue._drain()
+            if not (result["invoiced"] or result["skipped"]):
+                break
+
+
+def _waves(run, waves):
+    prepare = run.timed("waves", d2c.prepare_todays_shipments)
+    with run.wall("waves"):
+        for wave in range(1, max(1, waves) + 1):
+            prepare(run_type="Wave", wave_tag="{0}-{1}".format(run.run_tag, wave))
+            frappe.db.commit()
+
+
+def _scan(run, stage, parcels, scan):
+    timed = run.timed(stage, scan)
+    with run.wall(stage):
+        for awb in parcels:
+            try:
+                outcome = timed(awb)
+            except Exception:
+                frappe.db.rollback()
+                continue
+            if (outcome or {}).get("status") not in ("ok", "mismatch", "duplicate"):
+                run.stage(stage).errors += 1
+            frappe.db.commit()
+
+
+def _fulfil(run, orders, max_passes):
+    with _swapped(d2c, "fulfill_dispatched_dn",
+                  run.timed("fulfil", d2c.fulfill_dispatched_dn)), run.wall("fulfil"):
+        for _pass in range(max_passes):
+            result = d2c.sync_dispatched_shopify_fulfillments(days=1, limit=100) or {}
+            if not result.get("synced") or run.stage("fulfil").units >= orders:
+                break
+
+
+def _json_body(data):
+    if not data:
+        return None
+    try:
+        return json.loads(data)
+    except (TypeError, ValueError):
+        return None
+
+
+def _response(status, payload):
+    import requests
+
+    response = requests.models.Response()
+    response.status_code = status
+    if isinstance(payload, bytes):
+        response._content = payload
+        response.headers["Content-Type"] = "application/pdf"
+    else:
+        response._content = json.dumps(payload).encode("utf-8")
+        response.headers["Content-Type"] = "application/json"
+    response.encoding = "utf-8"
+    return response
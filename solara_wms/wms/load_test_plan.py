@@ -0,0 +1,138 @@
+"""Pure planning and statistics for the synthetic D2C day (see load_test.py).
+
+Nothing here touches Frappe, so the order plan and the report maths are unit
+tested without a bench.
+"""
+
+import math
+import random
+from dataclasses import dataclass, field
+
+
+# July 2026 HYD volume. The architecture target (3,200-6,000 parcels/day) is
+# roughly four times this.
+BASELINE_ORDERS_PER_DAY = 1000
+# Relative order intake per site-time hour (0..23); the evening Shopify peak
+# dominates, the small hours stay near zero.
+HOURLY_WEIGHTS = (
+    1, 1, 1, 1, 1, 1, 2, 3, 4, 5, 6, 6, 6, 6, 5, 5, 5, 6, 7, 8, 9, 8, 5, 2,
+)
+
+
+def plan_synthetic_day(
+    templates,
+    multiple=4,
+    baseline=BASELINE_ORDERS_PER_DAY,
+    seed=0,
+    run_tag="LT",
+):
+    """Deterministic order plan for one synthetic day.
+
+    Orders are sampled with replacement from `templates` (recent real Sales
+    Orders), so the item, box and payment mix follows production. Each order
+    gets a unique fake Shopify id and an arrival minute drawn from
+    HOURLY_WEIGHTS. Same inputs and seed -> same plan.
+    """
+    templates = list(templates)
+    if not templates:
+        raise ValueError("at least one template Sales Order is required")
+    if multiple <= 0 or baseline <= 0:
+        raise ValueError("multiple and baseline must be positive")
+    count = int(round(baseline * multiple))
+    rng = random.Random(seed)
+    hours = rng.choices(range(24), weights=HOURLY_WEIGHTS, k=count)
+    plan = []
+    for seq, hour in enumerate(hours, start=1):
+        plan.append({
+            "seq": seq,
+            "template": rng.choice(templates),
+            "arrival_minute": hour * 60 + rng.randrange(60),
+            "shopify_order_id": "{0}-{1:06d}".format(run_tag, seq),
+        })
+    plan.sort(key=lambda order: (order["arrival_minute"], order["seq"]))
+    return plan
+
+
+def synthetic_awbs(run_tag, seq, box_count):
+    """One fake courier AWB per box; never collides with a real waybill."""
+    return [
+        "{0}{1:06d}B{2}".format(run_tag, seq, box)
+        for box in range(1, max(1, int(box_count or 1)) + 1)
+    ]
+
+
+def percentile(values, pct):
+    """Nearest-rank percentile; None for an empty sample."""
+    ordered = sorted(values)
+    if not ordered:
+        return None
+    rank = max(1, math.ceil(pct / 100.0 * len(ordered)))
+    return ordered[min(rank, len(ordered)) - 1]
+
+
+@dataclass
+class StageStats:
+    """Latency and query samples for one pipeline stage."""
+
+    name: str
+    latencies: list = field(default_factory=list)
+    queries: list = field(default_factory=list)
+    wall_seconds: float = 0.0
+    errors: int = 0
+
+    def record(self, seconds, query_count=0):
+        self.latencies.append(seconds)
+        self.queries.append(query_count)
+
+    @property
+    def units(self):
+        return len(self.latencies)
+
+    def summary(self, day_units=None, shift_hours=10):
+        """Throughput, p50/p95/max latency, queries per unit, and the headroom
+        against doing `day_units` of this stage inside one shift."""
+        throughput = self.units / self.wall_seconds * 60 if self.wall_seconds else 0.0
+        required = (day_units or self.units) / (shift_hours * 60.0)
+        return {
+            "stage": self.name,
+            "units": self.units,
+            "errors": self.errors,
+            "wall_seconds": round(self.wall_seconds, 3),
+            "per_minute": round(throughput, 1),
+            "required_per_minute": round(required, 1),
+            "headroom": round(throughput / required, 2) if required else None,
+            "p50_ms": _ms(percentile(self.latencies, 50)),
+            "p95_ms": _ms(percentile(self.latencies, 95)),
+            "max_ms": _ms(max(self.latencies) if self.latencies else None),
+            "queries_per_unit": (
+                round(sum(self.queries) / len(self.queries), 1) if self.queries else 0
+            ),
+            "queries_p95": percentile(self.queries, 95),
+        }
+
+
+def format_report(summaries):
+    """Fixed-width text table of StageStats.summary() rows."""
+    columns = (
+        ("stage", 14), ("units", 7), ("errors", 7), ("per_minute", 11),
+        ("required_per_minute", 9), ("headroom", 9), ("p50_ms", 9),
+        ("p95_ms", 9), ("max_ms", 9), ("queries_per_unit", 9), ("queries_p95", 8),
+    )
+    headers = {
+        "per_minute": "per_min", "required_per_minute": "need/min",
+        "queries_per_unit": "q/unit", "queries_p95": "q_p95",
+    }
+    lines = ["".join(headers.get(key, key).rjust(width) if index else
+                     headers.get(key, key).ljust(width)
+                     for index, (key, width) in enumerate(columns))]
+    for row in summaries:
+        lines.append("".join(
+            ("" if row[key] is None else str(row[key])).rjust(width) if index else
+            str(row[key]).ljust(width)
+            for index, (key, width) in enumerate(columns)
+        ))
+    return "\n".join(lines)
+
+
+def _ms(seconds):
+    return None if seconds is None else round(seconds * 1000, 1)
@@ -94,12 +94,17 @@ def validate_location_row(row):
     }
 
 
-def validate_location_rows(rows):
+def validate_location_rows(rows, start=1, seen=None):
+    """Validate one batch of rows; returns (normalized, errors).
+
+    A large import validates chunk by chunk: `start` is the file row number of
+    the chunk's first row and `seen` carries the (location_ids, display_codes)
+    sets across chunks so duplicates are caught anywhere in the file.
+    """
     normalized = []
     errors = []
-    location_ids = set()
-    display_codes = set()
-    for index, row in enumerate(rows or [], 1):
+    location_ids, display_codes = seen if seen is not None else (set(), set())
+    for index, row in enumerate(rows or [], start):
         try:
             value = validate_location_row(row)
             if value["location_id"] in location_ids:
@@ -112,3 +117,21 @@ def validate_location_rows(rows):
         except LocationMasterError as exc:
             errors.append({"row": index, "error": str(exc)})
     return normalized, errors
+
+
+def location_row_chunks(rows, size):
+    """Yield (first row number, rows) batches of at most `size` from any
+    iterable, without materialising it."""
+    if size < 1:
+        raise LocationMasterError("Chunk size must be at least 1")
+    chunk = []
+    start = 1
+    for index, row in enumerate(rows, 1):
+        if not chunk:
+            start = index
+        chunk.append(row)
+        if len(chunk) == size:
+            yield start, chunk
+            chunk = []
+    if chunk:
+        yield start, chunk
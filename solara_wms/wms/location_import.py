@@ -0,0 +1,322 @@
+"""Streaming location master import from a CSV file, for whole-site masters.
+
+The JSON endpoints in location_master stop at 1000 rows. A CSV attached as a
+private File is read row by row and handled in CHUNK_SIZE chunks: each chunk
+is validated through validate_location_rows (duplicates tracked across the
+whole file), checked against Warehouse Bin with set-based queries and written
+as Draft locations with one bulk insert.
+
+The import runs as a background job recorded on a `WMS Location Import`. The
+job first re-validates the whole file against the preview's confirmation
+hash, then commits once per chunk and advances `processed_rows`; a failed or
+interrupted run resumes from that checkpoint. Rows that cannot be imported
+are written to a CSV error report attached to the import.
+"""
+
+import csv
+import hashlib
+import io
+import json
+
+import frappe
+from frappe import _
+from frappe.utils import cint, now_datetime
+
+from solara_wms.wms.location_domain import (
+    location_row_chunks,
+    validate_location_rows,
+)
+from solara_wms.wms.location_master import _classify, _insert_drafts, _warehouse
+
+
+IMPORT_DOCTYPE = "WMS Location Import"
+CHUNK_SIZE = 500
+MAX_FILE_ROWS = 100000
+# Errors returned inline by the preview; the full list is in the report.
+PREVIEW_ERRORS = 100
+REPORT_COLUMNS = ("row", "location_id", "error")
+
+
+def _require_disabled_mode():
+    if frappe.db.get_single_value("WMS Settings", "operating_mode") != "Disabled":
+        frappe.throw(_("Location master import requires WMS operating mode Disabled"))
+
+
+def _header(value):
+    return str(value or "").strip().lower().replace(" ", "_")
+
+
+def _csv_rows(file_url):
+    """Stream the CSV's data rows as dicts keyed by snake_case headers."""
+    name = frappe.db.get_value("File", {"file_url": file_url}, "name")
+    if not name:
+        frappe.throw(_("Location file {0} was not found").format(file_url))
+    path = frappe.get_doc("File", name).get_full_path()
+    with open(path, encoding="utf-8-sig", newline="") as handle:
+        reader = csv.reader(handle)
+        header = [_header(column) for column in next(reader, [])]
+        if "location_id" not in header or "display_code" not in header:
+            frappe.throw(_("Location CSV needs location_id and display_code columns"))
+        for count, values in enumerate(reader, 1):
+            if count > MAX_FILE_ROWS:
+                frappe.throw(
+                    _("Location CSV exceeds {0} rows; split it by hall or zone").format(
+                        MAX_FILE_ROWS
+                    )
+                )
+            if any(value.strip() for value in values):
+                yield dict(zip(header, values))
+
+
+def _chunks(file_url):
+    return location_row_chunks(_csv_rows(file_url), CHUNK_SIZE)
+
+
+def _row_numbers(start, size, errors):
+    """File row numbers of the rows validate_location_rows accepted."""
+    failed = {error["row"] for error in errors}
+    return [number for number in range(start, start + size) if number not in failed]
+
+
+def _located(errors, normalized, numbers):
+    """Give existence conflicts (keyed by Location ID) their file row number."""
+    row_of = {row["location_id"]: number for row, number in zip(normalized, numbers)}
+    return [{**error, "row": row_of.get(error["location_id"])} for error in errors]
+
+
+def _scan(file_url, warehouse):
+    """Validate the whole file without writing; returns totals, errors, hash.
+
+    The hash covers the normalized rows only (not Skip / Create Draft), so a
+    partly imported file still confirms against its original preview.
+    """
+    digest = hashlib.sha256()
+    seen = (set(), set())
+    result = {"total_rows": 0, "create": 0, "skip": 0, "errors": []}
+    for start, chunk in _chunks(file_url):
+        normalized, errors = validate_location_rows(chunk, start=start, seen=seen)
+        conflicts = _classify(normalized, warehouse)
+        numbers = _row_numbers(start, len(chunk), errors)
+        result["errors"].extend(errors)
+        result["errors"].extend(_located(conflicts, normalized, numbers))
+        for row in normalized:
+            result["create" if row.pop("action") == "Create Draft" else "skip"] += 1
+            digest.update(json.dumps(row, sort_keys=True).encode("utf-8") + b"\n")
+        result["total_rows"] += len(chunk)
+    if not result["total_rows"]:
+        frappe.throw(_("Location CSV has no data rows"))
+    result["errors"].sort(key=lambda error: error.get("row") or 0)
+    result["confirmation_hash"] = digest.hexdigest()
+    return result
+
+
+def _report_content(errors):
+    out = io.StringIO()
+    writer = csv.DictWriter(out, fieldnames=REPORT_COLUMNS, extrasaction="ignore")
+    writer.writeheader()
+    writer.writerows(errors)
+    return out.getvalue()
+
+
+def _save_report(file_name, errors, attached_to=None):
+    doc = frappe.get_doc(
+        {
+            "doctype": "File",
+            "file_name": file_name,
+            "is_private": 1,
+            "content": _report_content(errors),
+            "attached_to_doctype": IMPORT_DOCTYPE if attached_to else None,
+            "attached_to_name": attached_to,
+        }
+    )
+    doc.insert(ignore_permissions=True)
+    return doc.file_url
+
+
+def _replace_report(doc, errors):
+    """Save the import's cumulative error report over the previous one."""
+    if doc.error_report:
+        old = frappe.db.get_value(
+            "File",
+            {"file_url": doc.error_report, "attached_to_doctype": IMPORT_DOCTYPE,
+             "attached_to_name": doc.name},
+            "name",
+        )
+        if old:
+            frappe.delete_doc("File", old, ignore_permissions=True, force=True)
+    return _save_report(doc.name + "-errors.csv", errors, doc.name)
+
+
+def _read_report(file_url):
+    """Errors already reported by an earlier run of the same import."""
+    if not file_url:
+        return []
+    name = frappe.db.get_value("File", {"file_url": file_url}, "name")
+    if not name:
+        return []
+    content = frappe.get_doc("File", name).get_content()
+    if isinstance(content, bytes):
+        content = content.decode("utf-8")
+    return [
+        {**row, "row": cint(row.get("row")) or None}
+        for row in csv.DictReader(io.StringIO(content))
+    ]
+
+
+@frappe.whitelist(methods=["POST"])
+def preview_location_master_file(file_url, warehouse):
+    """Validate an uploaded location CSV and return its confirmation hash.
+
+    Writes no location; the full error list is saved as a downloadable CSV.
+    """
+    frappe.only_for("System Manager")
+    warehouse = _warehouse(warehouse)
+    result = _scan(file_url, warehouse)
+    errors = result.pop("errors")
+    report = None
+    if errors:
+        report = _save_report(
+            "location-master-errors-{0}.csv".format(result["confirmation_hash"][:12]),
+            errors,
+        )
+    return {
+        "warehouse": warehouse,
+        "file_url": file_url,
+        **result,
+        "error_count": len(errors),
+        "errors": errors[:PREVIEW_ERRORS],
+        "error_report": report,
+        "writes": 0,
+    }
+
+
+def _enqueue(name):
+    frappe.enqueue(
+        "solara_wms.wms.location_import.run_location_import",
+        queue="long",
+        timeout=3600,
+        job_id="wms-location-import:" + name,
+        deduplicate=True,
+        enqueue_after_commit=True,
+        import_name=name,
+    )
+
+
+@frappe.whitelist(methods=["POST"])
+def enqueue_location_master_import(file_url, warehouse, confirmation):
+    """Queue a background import of a previewed location CSV."""
+    frappe.only_for("System Manager")
+    warehouse = _warehouse(warehouse)
+    _require_disabled_mode()
+    confirmation = str(confirmation or "").strip()
+    if not confirmation:
+        frappe.throw(_("Confirmation hash from the file preview is required"))
+    doc = frappe.get_doc(
+        {
+            "doctype": IMPORT_DOCTYPE,
+            "warehouse": warehouse,
+            "import_file": file_url,
+            "confirmation_hash": confirmation,
+            "status": "Queued",
+        }
+    )
+    doc.insert(ignore_permissions=True)
+    _enqueue(doc.name)
+    return {"import": doc.name, "status": doc.status}
+
+
+@frappe.whitelist(methods=["POST"])
+def resume_location_master_import(import_name):
+    """Re-queue a failed import; it continues after its last committed chunk."""
+    frappe.only_for("System Manager")
+    _require_disabled_mode()
+    doc = frappe.get_doc(IMPORT_DOCTYPE, import_name)
+    if doc.status == "Completed":
+        frappe.throw(_("Location import {0} is already complete").format(doc.name))
+    if doc.status == "Failed":
+        doc.db_set({"status": "Queued", "last_error": None})
+    _enqueue(doc.name)
+    return {"import": doc.name, "status": doc.status, "processed_rows": doc.processed_rows}
+
+
+@frappe.whitelist(methods=["GET"])
+def get_location_master_import(import_name):
+    frappe.only_for("System Manager")
+    return frappe.db.get_value(
+        IMPORT_DOCTYPE,
+        import_name,
+        [
+            "name", "warehouse", "status", "total_rows", "processed_rows",
+            "created_count", "skipped_count", "error_count", "error_report",
+            "started_at", "finished_at", "last_error",
+        ],
+        as_dict=True,
+    )
+
+
+def _fail(doc, message, errors=None):
+    values = {"status": "Failed", "last_error": message, "finished_at": now_datetime()}
+    if errors:
+        values["error_count"] = len(errors)
+        values["error_report"] = _replace_report(doc, errors)
+    doc.db_set(values)
+    frappe.db.commit()
+
+
+def run_location_import(import_name):
+    """Background job: verify the file once, then import it chunk by chunk."""
+    doc = frappe.get_doc(IMPORT_DOCTYPE, import_name)
+    if doc.status not in ("Queued", "Running"):
+        return
+    try:
+        _require_disabled_mode()
+        doc.db_set({"status": "Running", "started_at": doc.started_at or now_datetime()})
+        frappe.db.commit()
+        if not cint(doc.processed_rows):
+            scan = _scan(doc.import_file, doc.warehouse)
+            if scan["errors"]:
+                _fail(doc, _("Location file has {0} error(s)").format(len(scan["errors"])), scan["errors"])
+                return
+            if scan["confirmation_hash"] != doc.confirmation_hash:
+                _fail(doc, _("Confirmation hash does not match the current location file"))
+                return
+            doc.db_set("total_rows", scan["total_rows"])
+            frappe.db.commit()
+        _apply(doc)
+    except Exception:
+        frappe.db.rollback()
+        frappe.log_error(title="WMS location import " + import_name, message=frappe.get_traceback())
+        _fail(doc, frappe.get_traceback()[-1000:])
+
+
+def _apply(doc):
+    errors = _read_report(doc.error_report)
+    created = cint(doc.created_count)
+    skipped = cint(doc.skipped_count)
+    processed = cint(doc.processed_rows)
+    for start, chunk in _chunks(doc.import_file):
+        if start + len(chunk) - 1 <= processed:
+            continue
+        normalized, chunk_errors = validate_location_rows(chunk, start=start)
+        conflicts = _classify(normalized, doc.warehouse)
+        numbers = _row_numbers(start, len(chunk), chunk_errors)
+        # Rows that changed under us since verification are reported, not written.
+        blocked = {error["location_id"] for error in conflicts}
+        importable = [row for row in normalized if row["location_id"] not in blocked]
+        skipped += sum(1 for row in importable if row["action"] == "Skip")
+        names, lost = _insert_drafts(doc.warehouse, importable)
+        created += len(names)
+        chunk_errors.extend(_located(conflicts + lost, normalized, numbers))
+        values = {
+            "processed_rows": start + len(chunk) - 1,
+            "created_count": created,
+            "skipped_count": skipped,
+        }
+        if chunk_errors:
+            errors.extend(chunk_errors)
+            values["error_count"] = len(errors)
+            values["error_report"] = _replace_report(doc, errors)
+        doc.db_set(values)
+        frappe.db.commit()
+    doc.db_set({"status": "Completed", "finished_at": now_datetime(), "last_error": None})
+    frappe.db.commit()
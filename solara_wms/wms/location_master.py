@@ -10,6 +10,7 @@ import frappe
 from frappe import _
 from frappe.utils import now_datetime
 
+from solara_wms.wms.doctype.warehouse_bin.warehouse_bin import bin_document_name
 from solara_wms.wms.location_domain import (
     LocationMasterError,
     location_id_from_scan,
@@ -17,12 +18,22 @@ from solara_wms.wms.location_domain import (
 )
 
 
+# Rows per set-based existence query and per bulk insert.
+LOOKUP_CHUNK = 500
+MASTER_FIELDS = (
+    "warehouse", "bin_code", "hall_code", "zone_code", "zone_type", "bay_module",
+    "route_sequence",
+)
+
+
 def _rows(value):
     parsed = frappe.parse_json(value) if isinstance(value, str) else value
     if not isinstance(parsed, list):
         frappe.throw(_("Location rows must be a JSON array"))
     if not parsed or len(parsed) > 1000:
-        frappe.throw(_("Location import must contain between 1 and 1000 rows"))
+        frappe.throw(
+            _("Location import must contain between 1 and 1000 rows; upload a CSV for larger masters")
+        )
     return parsed
 
 
@@ -33,20 +44,40 @@ def _warehouse(warehouse):
     return row.name
 
 
-def _preview(rows, warehouse):
-    normalized, errors = validate_location_rows(_rows(rows))
+def _existing_locations(warehouse, rows):
+    """Existing bins matching the rows, keyed by Location ID and by display code.
+
+    Two IN queries per LOOKUP_CHUNK rows instead of two lookups per row.
+    """
+    by_id = {}
+    by_code = {}
+    for i in range(0, len(rows), LOOKUP_CHUNK):
+        chunk = rows[i:i + LOOKUP_CHUNK]
+        for row in frappe.get_all(
+            "Warehouse Bin",
+            filters={"location_id": ["in", [r["location_id"] for r in chunk]]},
+            fields=["name", "location_id", *MASTER_FIELDS],
+        ):
+            by_id[row.location_id] = row
+        for row in frappe.get_all(
+            "Warehouse Bin",
+            filters={
+                "warehouse": warehouse,
+                "bin_code": ["in", [r["display_code"] for r in chunk]],
+            },
+            fields=["name", "location_id", "bin_code"],
+        ):
+            by_code[row.bin_code] = row
+    return by_id, by_code
+
+
+def _classify(normalized, warehouse):
+    """Mark each validated row Skip or Create Draft; returns master-data conflicts."""
+    errors = []
+    by_id, by_code = _existing_locations(warehouse, normalized)
     for row in normalized:
-        existing_id = frappe.db.get_value(
-            "Warehouse Bin", {"location_id": row["location_id"]},
-            [
-                "name", "warehouse", "bin_code", "hall_code", "zone_code",
-                "zone_type", "bay_module", "route_sequence",
-            ], as_dict=True,
-        )
-        existing_code = frappe.db.get_value(
-            "Warehouse Bin", {"warehouse": warehouse, "bin_code": row["display_code"]},
-            ["name", "location_id"], as_dict=True,
-        )
+        existing_id = by_id.get(row["location_id"])
+        existing_code = by_code.get(row["display_code"])
         if existing_id:
             expected = (
                 warehouse, row["display_code"], row["hall_code"], row["zone_code"],
@@ -62,9 +93,82 @@ def _preview(rows, warehouse):
         elif existing_code and existing_code.location_id != row["location_id"]:
             errors.append({"location_id": row["location_id"], "error": "Display Code already belongs to another Location ID"})
         row["action"] = "Skip" if existing_id else "Create Draft"
+    return errors
+
+
+def _preview(rows, warehouse):
+    normalized, errors = validate_location_rows(_rows(rows))
+    errors.extend(_classify(normalized, warehouse))
     return normalized, errors
 
 
+def _draft_values(warehouse, row):
+    return {
+        "name": bin_document_name(warehouse, row["display_code"]),
+        "warehouse": warehouse,
+        "location_id": row["location_id"],
+        "qr_payload": row["qr_payload"],
+        "barcode": row["qr_payload"],
+        "bin_code": row["display_code"],
+        "hall_code": row["hall_code"],
+        "zone_code": row["zone_code"],
+        "zone_type": row["zone_type"],
+        "bay_module": row["bay_module"],
+        "commissioning_status": "Draft",
+        "status": "Blocked",
+        "is_active": 0,
+        "route_sequence": row["route_sequence"],
+        "bin_length": row["length_ft"] * 30.48,
+        "bin_width": row["width_ft"] * 30.48,
+        "bin_volume": 0,
+        "floor_area_sq_ft": row["floor_area_sq_ft"],
+        "notes": row["notes"],
+    }
+
+
+def _insert_drafts(warehouse, rows):
+    """Bulk-insert Draft locations for rows marked Create Draft.
+
+    The rows were validated by location_domain and classified against the
+    table, so the per-document controller has nothing left to check; the
+    deterministic name and the unique Location ID make a concurrent insert of
+    the same location a no-op. Returns (created names, conflicts) where a
+    conflict is a row another writer claimed between preview and insert.
+    """
+    drafts = [_draft_values(warehouse, row) for row in rows if row["action"] == "Create Draft"]
+    if not drafts:
+        return [], []
+    now, user = now_datetime(), frappe.session.user
+    fields = [*drafts[0], "creation", "modified", "owner", "modified_by", "docstatus"]
+    for i in range(0, len(drafts), LOOKUP_CHUNK):
+        frappe.db.bulk_insert(
+            "Warehouse Bin",
+            fields,
+            [
+                (*draft.values(), now, now, user, user, 0)
+                for draft in drafts[i:i + LOOKUP_CHUNK]
+            ],
+            ignore_duplicates=True,
+        )
+    stored = {}
+    for i in range(0, len(drafts), LOOKUP_CHUNK):
+        for row in frappe.get_all(
+            "Warehouse Bin",
+            filters={"name": ["in", [d["name"] for d in drafts[i:i + LOOKUP_CHUNK]]]},
+            fields=["name", "location_id"],
+        ):
+            stored[row.name] = row
+    created = []
+    conflicts = []
+    for draft in drafts:
+        row = stored.get(draft["name"])
+        if row and row.location_id == draft["location_id"]:
+            created.append(draft["name"])
+        else:
+            conflicts.append({"location_id": draft["location_id"], "error": "Location was created by another import; preview again"})
+    return created, conflicts
+
+
 @frappe.whitelist()
 def preview_location_master(rows, warehouse):
     frappe.only_for("System Manager")
@@ -93,33 +197,13 @@ def import_location_master(rows, warehouse, confirmation):
     expected = hashlib.sha256(frappe.as_json(normalized).encode("utf-8")).hexdigest()
     if confirmation != expected:
         frappe.throw(_("Confirmation hash does not match the current location preview"))
-    created = []
-    skipped = []
-    for row in normalized:
-        existing = frappe.db.get_value("Warehouse Bin", {"location_id": row["location_id"]}, "name")
-        if existing:
-            skipped.append(existing)
-            continue
-        doc = frappe.get_doc({
-            "doctype": "Warehouse Bin",
-            "warehouse": warehouse,
-            "location_id": row["location_id"],
-            "bin_code": row["display_code"],
-            "hall_code": row["hall_code"],
-            "zone_code": row["zone_code"],
-            "zone_type": row["zone_type"],
-            "bay_module": row["bay_module"],
-            "commissioning_status": "Draft",
-            "status": "Blocked",
-            "is_active": 0,
-            "route_sequence": row["route_sequence"],
-            "bin_length": row["length_ft"] * 30.48,
-            "bin_width": row["width_ft"] * 30.48,
-            "floor_area_sq_ft": row["floor_area_sq_ft"],
-            "notes": row["notes"],
-        })
-        doc.insert(ignore_permissions=True)
-        created.append(doc.name)
+    created, conflicts = _insert_drafts(warehouse, normalized)
+    if conflicts:
+        frappe.throw(_("{0} location(s) were created by another import; preview again").format(len(conflicts)))
+    by_id, _by_code = _existing_locations(
+        warehouse, [row for row in normalized if row["action"] == "Skip"]
+    )
+    skipped = [by_id[row["location_id"]].name for row in normalized if row["action"] == "Skip"]
     return {"warehouse": warehouse, "created": created, "skipped": skipped, "commissioning_status": "Draft", "writes": len(created)}
 
 
@@ -1,6 +1,7 @@
 """Opt-in completed-pick handoff to the existing D2C pack/dispatch flow."""
 
 import hashlib
+import json
 
 import frappe
 from frappe import _
@@ -9,19 +10,21 @@ from frappe.utils import now_datetime
 from solara_wms.wms.inventory_domain import (
     InventoryInvariantError,
     canonical_qty,
+    decimal_qty,
     match_pack_handoff,
     request_hash,
 )
+from solara_wms.wms.safety import wms_gate_settings
 
 
 HANDOFF_DOCTYPE = "WMS Pack Handoff"
+SUMMARY_DOCTYPE = "WMS Parcel Pick Summary"
 
 
 def pick_handoff_required():
-    mode = frappe.db.get_single_value("WMS Settings", "operating_mode") or "Disabled"
-    enabled = frappe.db.get_single_value(
-        "WMS Settings", "require_pick_handoff_for_pack"
-    )
+    settings = wms_gate_settings()
+    mode = settings.operating_mode
+    enabled = settings.require_pick_handoff_for_pack
     return mode in ("Shadow", "Draft Handoff") and bool(int(enabled or 0))
 
 
@@ -40,10 +43,20 @@ def _delivery_warehouse(dn):
     return next(iter(warehouses))
 
 
-def _completed_pick_rows(delivery_note, awb, warehouse, lock=False):
-    suffix = " FOR UPDATE" if lock else ""
-    return frappe.db.sql(
-        f"""
+def _handoff_warehouse(dn):
+    warehouse = _delivery_warehouse(dn)
+    pilot = wms_gate_settings().pilot_warehouse
+    if pilot and warehouse != pilot:
+        raise InventoryInvariantError(
+            f"D2C parcel warehouse {warehouse} is outside pilot warehouse {pilot}"
+        )
+    return warehouse
+
+
+# Served by the (parcel_awb, status, pack_handoff) index on WMS Work; the line
+# join rides frappe's own `parent` index on the child table. test_pack_handoff
+# pins the plan.
+COMPLETED_PICK_SQL = """
         SELECT w.name AS work, l.item_code, l.executed_qty
           FROM `tabWMS Work` w
           JOIN `tabWMS Work Line` l
@@ -56,13 +69,134 @@ def _completed_pick_rows(delivery_note, awb, warehouse, lock=False):
            AND w.parcel_awb = %s
            AND (w.pack_handoff IS NULL OR w.pack_handoff = '')
          ORDER BY w.name
-         {suffix}
-        """,
+"""
+
+
+def _completed_pick_rows(delivery_note, awb, warehouse, lock=False):
+    suffix = " FOR UPDATE" if lock else ""
+    return frappe.db.sql(
+        COMPLETED_PICK_SQL + suffix,
         (warehouse, delivery_note, awb),
         as_dict=True,
     )
 
 
+def _summary_name(awb):
+    doc = frappe.new_doc(SUMMARY_DOCTYPE)
+    doc.awb = awb
+    doc.autoname()
+    return doc.name
+
+
+def record_completed_pick(awb, delivery_note, warehouse, work, item_code, qty):
+    """Fold one completed parcel pick into its AWB summary.
+
+    Called inside the completing scan's transaction. The summary row is created
+    idempotently and then locked, so concurrent pickers on one parcel serialise
+    on that row only. An AWB already summarised for another delivery note or
+    warehouse is logged and left alone - the pick itself stands, and the pack
+    bench reads that parcel from `COMPLETED_PICK_SQL` instead.
+    """
+    name = _summary_name(awb)
+    now = now_datetime()
+    frappe.db.sql(
+        """
+        INSERT INTO `tabWMS Parcel Pick Summary`
+               (name, awb, delivery_note, warehouse, work_count,
+                completed_works, completed_items, updated_at,
+                creation, modified, owner, modified_by, docstatus)
+        VALUES (%s, %s, %s, %s, 0, '[]', '{}', %s, %s, %s, %s, %s, 0)
+        ON DUPLICATE KEY UPDATE name = name
+        """,
+        (name, awb, delivery_note, warehouse, now, now, now,
+         frappe.session.user, frappe.session.user),
+    )
+    row = frappe.db.sql(
+        """
+        SELECT delivery_note, warehouse, completed_works, completed_items
+          FROM `tabWMS Parcel Pick Summary`
+         WHERE name = %s
+         FOR UPDATE
+        """,
+        (name,),
+        as_dict=True,
+    )[0]
+    if row.delivery_note != delivery_note or row.warehouse != warehouse:
+        frappe.log_error(
+            message="Work {0} ({1} in {2}) not summarised: AWB {3} is already "
+            "summarised for {4} in {5}".format(
+                work, delivery_note, warehouse, awb, row.delivery_note,
+                row.warehouse),
+            title="WMS Parcel Pick Summary skipped " + awb,
+        )
+        return
+    works = json.loads(row.completed_works or "[]")
+    if work in works:
+        return
+    works.append(work)
+    items = json.loads(row.completed_items or "{}")
+    items[item_code] = canonical_qty(
+        decimal_qty(items.get(item_code, "0")) + decimal_qty(qty)
+    )
+    frappe.db.sql(
+        """
+        UPDATE `tabWMS Parcel Pick Summary`
+           SET work_count = %s, completed_works = %s, completed_items = %s,
+               updated_at = %s, modified = %s
+         WHERE name = %s
+        """,
+        (len(works), json.dumps(sorted(works)), json.dumps(items, sort_keys=True),
+         now, now, name),
+    )
+
+
+def _live_rows(delivery_note, awb, warehouse):
+    """Completed, unhanded picks aggregated straight from WMS Work."""
+    works, items = [], {}
+    for row in _completed_pick_rows(delivery_note, awb, warehouse):
+        if row.work not in works:
+            works.append(row.work)
+        items[row.item_code] = canonical_qty(
+            decimal_qty(items.get(row.item_code, "0")) + decimal_qty(row.executed_qty)
+        )
+    return works, [
+        frappe._dict(item_code=item, executed_qty=qty)
+        for item, qty in sorted(items.items())
+    ]
+
+
+def _summary_rows(delivery_note, awb, warehouse):
+    """Completed, unhanded picks for one parcel from its summary (one PK read).
+
+    A parcel with no summary, or whose summary belongs to another delivery note
+    or warehouse, falls back to the work query so a skipped or missing summary
+    never hides picks that are really there.
+    """
+    summary = frappe.db.get_value(
+        SUMMARY_DOCTYPE,
+        _summary_name(awb),
+        ["delivery_note", "warehouse", "pack_handoff", "completed_works",
+         "completed_items"],
+        as_dict=True,
+    )
+    if summary and summary.pack_handoff:
+        return [], []
+    if (
+        not summary
+        or summary.delivery_note != delivery_note
+        or summary.warehouse != warehouse
+    ):
+        return _live_rows(delivery_note, awb, warehouse)
+    items = json.loads(summary.completed_items or "{}")
+    return (
+        json.loads(summary.completed_works or "[]"),
+        [
+            frappe._dict(item_code=item, executed_qty=qty)
+            for item, qty in sorted(items.items())
+        ],
+    )
+
+
 def _match(lines, rows):
     return match_pack_handoff(
         [{"item_code": row["item_code"], "qty": row["qty"]} for row in lines],
@@ -88,19 +222,14 @@ def pack_handoff_status(dn, awb, lines):
             "pick_handoff_consumed": True,
         }
     try:
-        warehouse = _delivery_warehouse(dn)
-        pilot = frappe.db.get_single_value("WMS Settings", "pilot_warehouse")
-        if pilot and warehouse != pilot:
-            raise InventoryInvariantError(
-                f"D2C parcel warehouse {warehouse} is outside pilot warehouse {pilot}"
-            )
-        rows = _completed_pick_rows(dn.name, awb, warehouse)
+        warehouse = _handoff_warehouse(dn)
+        works, rows = _summary_rows(dn.name, awb, warehouse)
         matched = _match(lines, rows)
         return {
             "pick_handoff_required": True,
             "pick_handoff_ready": True,
             "pick_handoff_warehouse": warehouse,
-            "pick_handoff_work": [row.work for row in rows],
+            "pick_handoff_work": works,
             "pick_handoff_items": {
                 item: canonical_qty(qty) for item, qty in matched.items()
             },
@@ -126,12 +255,7 @@ def consume_pack_handoff(dn, awb, lines, pack_verify):
         return existing.name
 
     try:
-        warehouse = _delivery_warehouse(dn)
-        pilot = frappe.db.get_single_value("WMS Settings", "pilot_warehouse")
-        if pilot and warehouse != pilot:
-            raise InventoryInvariantError(
-                f"D2C parcel warehouse {warehouse} is outside pilot warehouse {pilot}"
-            )
+        warehouse = _handoff_warehouse(dn)
         rows = _completed_pick_rows(dn.name, awb, warehouse, lock=True)
         matched = _match(lines, rows)
     except InventoryInvariantError as exc:
@@ -172,23 +296,43 @@ def consume_pack_handoff(dn, awb, lines, pack_verify):
         }
     )
     handoff.insert(ignore_permissions=True)
-    now = now_datetime()
-    for row in rows:
-        frappe.db.sql(
-            """
-            UPDATE `tabWMS Work`
-               SET pack_handoff = %s, packed_at = %s,
-                   modified = %s, modified_by = %s
-             WHERE name = %s AND status = 'Completed'
-               AND (pack_handoff IS NULL OR pack_handoff = '')
-            """,
-            (handoff.name, now, now, frappe.session.user, row.work),
-        )
-        if frappe.db.sql("SELECT ROW_COUNT()")[0][0] != 1:
-            frappe.throw(_("Completed pick work changed concurrently; rescan the parcel"))
+    _claim_works(handoff.name, [row.work for row in rows])
+    frappe.db.sql(
+        """
+        UPDATE `tabWMS Parcel Pick Summary`
+           SET pack_handoff = %s, updated_at = %s
+         WHERE name = %s
+        """,
+        (handoff.name, now_datetime(), _summary_name(awb)),
+    )
     return handoff.name
 
 
+def _claim_works(handoff_name, works):
+    """Stamp every locked work with the handoff in one conditional UPDATE.
+
+    A multi-SKU parcel costs the same two round trips as a single-SKU one; the
+    affected-row count must equal the claimed set or the whole claim fails.
+    """
+    works = sorted(set(works))
+    if not works:
+        return
+    now = now_datetime()
+    placeholders = ", ".join(["%s"] * len(works))
+    frappe.db.sql(
+        f"""
+        UPDATE `tabWMS Work`
+           SET pack_handoff = %s, packed_at = %s,
+               modified = %s, modified_by = %s
+         WHERE name IN ({placeholders}) AND status = 'Completed'
+           AND (pack_handoff IS NULL OR pack_handoff = '')
+        """,
+        (handoff_name, now, now, frappe.session.user, *works),
+    )
+    if frappe.db.sql("SELECT ROW_COUNT()")[0][0] != len(works):
+        frappe.throw(_("Completed pick work changed concurrently; rescan the parcel"))
+
+
 @frappe.whitelist(methods=["GET"])
 def dispatch_pack_handoff_status(awb):
     """Fail-closed dispatch gate when the opt-in WMS pack pilot is active."""
@@ -1,10 +1,16 @@
 import re
+from dataclasses import replace
 
 import frappe
 from frappe import _
-from frappe.utils import flt
+from frappe.utils import cint, flt
 
-from solara_wms.wms.utils import get_available_qty
+from solara_wms.wms.inventory_domain import (
+    InventoryInvariantError,
+    PickCandidate,
+    decimal_qty,
+    plan_pick_allocation,
+)
 
 
 # ─── HELPERS ──────────────────────────────────────────────────────
@@ -56,72 +62,142 @@ def _zone_sort_value(zone_type):
 
 # ─── BIN ALLOCATION ──────────────────────────────────────────────
 
+# WMS Item Location roles a pick may draw from, best first. Receiving,
+# Returns and Quarantine stock is never allocated to an order.
+PICK_ROLE_RANK = {
+    "Home": 0,
+    "Overflow": 1,
+    "Reserve": 2,
+}
+
+
+def _pick_candidates(warehouse, item_codes):
+    """
+    Pickable physical balances per item, from WMS Bin Balance.
+
+    A balance qualifies when its bin is an active Home/Overflow/Reserve
+    WMS Item Location for the item and the Warehouse Bin is open for
+    movement. One query for all items.
+
+    Returns:
+        dict of item_code -> list of (balance name, PickCandidate)
+    """
+    item_codes = sorted(set(item_codes))
+    if not (warehouse and item_codes):
+        return {}
+    roles = sorted(PICK_ROLE_RANK)
+    rows = frappe.db.sql(
+        """
+        SELECT bal.name, bal.item_code, bal.bin, bal.available_qty,
+               loc.location_role, loc.priority, wb.route_sequence
+          FROM `tabWMS Bin Balance` bal
+          JOIN `tabWMS Item Location` loc
+            ON loc.warehouse = bal.warehouse
+           AND loc.item_code = bal.item_code
+           AND loc.bin = bal.bin
+           AND loc.is_active = 1
+           AND loc.location_role IN ({roles})
+          JOIN `tabWarehouse Bin` wb
+            ON wb.name = bal.bin
+           AND wb.is_active = 1
+           AND wb.status NOT IN ('Blocked', 'Maintenance')
+         WHERE bal.warehouse = %s
+           AND bal.item_code IN ({items})
+           AND bal.available_qty > 0
+        """.format(
+            roles=", ".join(["%s"] * len(roles)),
+            items=", ".join(["%s"] * len(item_codes)),
+        ),
+        tuple(roles) + (warehouse,) + tuple(item_codes),
+        as_dict=True,
+    )
+    candidates = {}
+    for row in rows:
+        candidates.setdefault(row.item_code, []).append((
+            row.name,
+            PickCandidate(
+                bin=row.bin,
+                available=decimal_qty(row.available_qty),
+                role_rank=PICK_ROLE_RANK[row.location_role],
+                priority=cint(row.priority),
+                route_sequence=cint(row.route_sequence),
+            ),
+        ))
+    return candidates
+
+
 def allocate_bins_for_items(items, warehouse):
     """
     Auto-assign source bins for items that don't have one.
 
     Strategy:
-    - Query active Warehouse Bins in the warehouse
-    - Prefer Picking zone, then Stocking, etc.
-    - Within same zone, prefer older bins (FIFO by creation date)
-    - Check ERPNext Bin for available stock at warehouse level
+    - Availability is the physical WMS Bin Balance, not the ERPNext
+      warehouse-level Bin
+    - Only active Home, Overflow and Reserve item locations qualify, spent
+      in that order: Overflow and Reserve only supply what the tiers above
+      cannot; within a tier one covering bin wins, by Item Location priority
+    - A line is otherwise split into one row per bin, as few as each tier
+      allows, leaving at most one bin partially picked
+      (plan_pick_allocation); the extra rows start unpicked, and a partly
+      picked line is never split
     - Items that already have source_bin pass through unchanged
 
+    This is a plan for the route preview; it reserves nothing. Shadow pick
+    work reserves through work.create_split_pick_work.
+
     Args:
         items: list of dicts with item_code, qty, source_bin, etc.
         warehouse: source warehouse name
 
     Returns:
-        list of items with source_bin populated where possible
+        list of items with source_bin populated where possible; split lines
+        appear as several rows of the same item
     """
     if not warehouse:
         return items
 
-    # Get all active bins in this warehouse with location data
-    bins = frappe.get_all(
-        "Warehouse Bin",
-        filters={"warehouse": warehouse, "is_active": 1},
-        fields=[
-            "name", "bin_code", "zone_type",
-            "aisle", "rack", "shelf", "level",
-            "creation",
-        ],
-        order_by="creation asc",
-    )
-
-    if not bins:
-        return items
+    pending = [i for i in items if not i.get("source_bin")]
+    candidates = _pick_candidates(warehouse, [i["item_code"] for i in pending])
 
-    # Sort bins by zone priority (Picking first) then by creation (FIFO)
-    bins.sort(key=lambda b: (_zone_sort_value(b.zone_type), b.creation))
+    # Lines of the same item draw down one shared pool, in input order
+    remaining = {
+        code: {c.bin: c for _name, c in rows} for code, rows in candidates.items()
+    }
 
+    allocated = []
     for item in items:
-        # Skip items that already have a source bin assigned
         if item.get("source_bin"):
+            allocated.append(item)
             continue
 
-        # Check if item has available stock at the warehouse level
-        stock_info = get_available_qty(item["item_code"], warehouse)
-        if flt(stock_info.get("available_qty", 0)) <= 0:
+        pool = remaining.get(item["item_code"], {})
+        try:
+            splits = plan_pick_allocation(item.get("qty"), pool.values())
+        except InventoryInvariantError as exc:
+            item["error_message"] = _("{0} in {1}: {2}").format(
+                item["item_code"], warehouse, str(exc)
+            )
+            allocated.append(item)
+            continue
+
+        if len(splits) > 1 and flt(item.get("actual_qty")):
+            # Progress recorded against the line cannot be shared out
+            # between bins; leave it for the picker to finish as it stands.
             item["error_message"] = _(
-                "No available stock for {0} in {1}"
+                "{0} is partly picked and no single bin in {1} covers it"
             ).format(item["item_code"], warehouse)
+            allocated.append(item)
             continue
 
-        # Assign the first suitable bin (zone-priority, FIFO)
-        # Since ERPNext tracks stock at warehouse level (not per-bin),
-        # we assign the best bin based on zone priority for routing
-        if bins:
-            best_bin = bins[0]  # Already sorted by zone priority + creation
-            item["source_bin"] = best_bin.name
+        for index, (bin_name, qty) in enumerate(splits):
+            pool[bin_name] = replace(pool[bin_name], available=pool[bin_name].available - qty)
+            row = dict(item, source_bin=bin_name, qty=flt(qty))
+            if index:
+                row.update(actual_qty=0, difference_qty=0, row_status="Pending",
+                           error_message="")
+            allocated.append(row)
 
-            # Prefer Picking-zone bins specifically
-            for b in bins:
-                if b.zone_type == "Picking":
-                    item["source_bin"] = b.name
-                    break
-
-    return items
+    return allocated
 
 
 # ─── SERPENTINE SORT ──────────────────────────────────────────────
@@ -0,0 +1,348 @@
+"""Velocity-driven Reserve-to-Home replenishment.
+
+Home min/max are recomputed from recent WMS Movement picks and from Delivery
+Notes that are released but not yet picked, so a face is refilled before a
+wave drains it instead of after a pick shortage. Runs every 15 minutes and,
+debounced per face, after pick scans. Work is allocated through the same path
+as create_replenishment_work; no ERP document is touched.
+"""
+
+import hashlib
+
+import frappe
+from frappe.utils import add_days, add_to_date, cint, flt, now_datetime, nowdate
+
+from solara_wms.wms.inventory import _require_shadow_write, _validate_bin
+from solara_wms.wms.inventory_domain import (
+    InventoryInvariantError,
+    request_hash,
+    velocity_replenishment_policy,
+)
+from solara_wms.wms.work import _allocate_replenishment, _existing_work
+
+
+SETTINGS_FIELDS = (
+    "operating_mode",
+    "pilot_warehouse",
+    "replenishment_trigger_enabled",
+    "replenishment_lookback_days",
+    "replenishment_forecast_days",
+    "replenishment_lead_time_hours",
+    "replenishment_cover_hours",
+)
+AUTO_NOTE = "Velocity replenishment trigger"
+# Auto work keys repeat within one window, so a retried job replays.
+KEY_WINDOW_MINUTES = 10
+# Last velocity minimum per face, written by each evaluation so a pick scan
+# can tell, without enqueueing, that the face is still above its trigger.
+TRIGGER_KEY = "wms-replenish-min:{0}:{1}:{2}"
+TRIGGER_TTL_SECONDS = 30 * 60
+
+
+def _settings():
+    values = frappe.db.get_value("WMS Settings", None, SETTINGS_FIELDS, as_dict=True)
+    return values or frappe._dict()
+
+
+def _enabled(settings, warehouse=None):
+    return (
+        cint(settings.replenishment_trigger_enabled)
+        and settings.operating_mode in ("Shadow", "Draft Handoff")
+        and settings.pilot_warehouse
+        and (warehouse is None or warehouse == settings.pilot_warehouse)
+    )
+
+
+def scheduled_replenishment():
+    """15-minute sweep over every Home face in the pilot warehouse."""
+    settings = _settings()
+    if not _enabled(settings):
+        return
+    result = run_replenishment_trigger(settings.pilot_warehouse, settings)
+    if result["created"] or result["failed"]:
+        frappe.logger("solara_wms").info(
+            "WMS velocity replenishment: " + frappe.as_json(result)
+        )
+
+
+def _cache():
+    cache = frappe.cache
+    return cache() if callable(cache) else cache
+
+
+def queue_replenishment_check(warehouse, item_code, bin_name):
+    """Re-evaluate one face once the pick that drew it down has committed.
+
+    Nothing is queued while the trigger is off, when the picked bin is not a
+    Home face, or while the face still holds its capacity or its last
+    computed minimum. The job id collapses a burst of scans on the same face
+    into one check.
+    """
+    if not _enabled(_settings(), warehouse):
+        return False
+    face = frappe.db.sql(
+        """
+        SELECT home.maximum_qty, IFNULL(bal.physical_qty, 0) AS physical_qty
+          FROM `tabWMS Item Location` home
+          LEFT JOIN `tabWMS Bin Balance` bal
+            ON bal.warehouse = home.warehouse
+           AND bal.bin = home.bin
+           AND bal.item_code = home.item_code
+         WHERE home.warehouse = %s
+           AND home.item_code = %s
+           AND home.bin = %s
+           AND home.location_role = 'Home'
+           AND home.is_active = 1
+         LIMIT 1
+        """,
+        (warehouse, item_code, bin_name),
+        as_dict=True,
+    )
+    if not face:
+        return False
+    physical = flt(face[0].physical_qty)
+    if flt(face[0].maximum_qty) > 0 and physical >= flt(face[0].maximum_qty):
+        return False
+    minimum = _cache().get_value(TRIGGER_KEY.format(warehouse, item_code, bin_name))
+    if minimum is not None and physical >= flt(minimum):
+        return False
+    frappe.enqueue(
+        "solara_wms.wms.replenishment.replenish_home_bin",
+        queue="short",
+        job_id="wms-replenish:{0}:{1}:{2}".format(warehouse, item_code, bin_name),
+        deduplicate=True,
+        enqueue_after_commit=True,
+        warehouse=warehouse,
+        item_code=item_code,
+        bin_name=bin_name,
+    )
+    return True
+
+
+def replenish_home_bin(warehouse, item_code, bin_name):
+    settings = _settings()
+    if not _enabled(settings, warehouse):
+        return None
+    return run_replenishment_trigger(
+        warehouse, settings, item_code=item_code, bin_name=bin_name
+    )
+
+
+def run_replenishment_trigger(warehouse, settings, item_code=None, bin_name=None):
+    """Create Reserve-to-Home work for every Home face below its trigger.
+
+    Each face is allocated under its own savepoint; one that fails (say its
+    Reserve bin is blocked) is logged and the sweep carries on.
+    """
+    _require_shadow_write(warehouse)
+    homes = _home_locations(warehouse, item_code, bin_name)
+    result = {"faces": len(homes), "created": 0, "in_flight": 0, "not_due": 0,
+              "no_reserve": 0, "failed": 0, "works": []}
+    if not homes:
+        return result
+    now = now_datetime()
+    lookback_days = cint(settings.replenishment_lookback_days) or 7
+    velocity = _pick_velocity(
+        warehouse, add_to_date(now, days=-lookback_days), item_code
+    )
+    demand = _released_demand(
+        warehouse, cint(settings.replenishment_forecast_days) or 3, item_code
+    )
+    in_flight = _open_replenishment_targets(warehouse)
+    window = now.strftime("%Y%m%d%H") + "{0:02d}".format(
+        now.minute // KEY_WINDOW_MINUTES * KEY_WINDOW_MINUTES
+    )
+
+    for home in homes:
+        if (home.item_code, home.bin) in in_flight:
+            result["in_flight"] += 1
+            continue
+        try:
+            minimum, maximum = velocity_replenishment_policy(
+                velocity.get((home.item_code, home.bin), 0),
+                lookback_days * 24,
+                demand.get(home.item_code, 0),
+                flt(settings.replenishment_lead_time_hours),
+                flt(settings.replenishment_cover_hours) or 8,
+                home.minimum_qty,
+                home.maximum_qty,
+            )
+        except InventoryInvariantError:
+            result["failed"] += 1
+            continue
+        _cache().set_value(TRIGGER_KEY.format(warehouse, home.item_code, home.bin),
+                           float(minimum), expires_in_sec=TRIGGER_TTL_SECONDS)
+        if minimum <= 0 or flt(home.physical_qty) >= minimum:
+            result["not_due"] += 1
+            continue
+        if not home.reserve_bin:
+            # Every Reserve for the item is empty: nothing to move yet.
+            result["no_reserve"] += 1
+            continue
+        savepoint = "wms_replenish_" + hashlib.sha1(
+            (home.item_code + home.bin).encode("utf-8")
+        ).hexdigest()[:12]
+        frappe.db.savepoint(savepoint)
+        try:
+            work = _create_velocity_work(
+                warehouse, home, minimum, maximum, window,
+                urgent=flt(home.physical_qty) < flt(demand.get(home.item_code, 0)),
+            )
+        except Exception:
+            frappe.db.rollback(save_point=savepoint)
+            result["failed"] += 1
+            frappe.log_error(
+                title="WMS velocity replenishment {0} {1}".format(home.item_code, home.bin),
+                message=frappe.get_traceback(),
+            )
+            continue
+        result["created"] += 1
+        result["works"].append(work["work"])
+    return result
+
+
+def _create_velocity_work(warehouse, home, minimum, maximum, window, urgent=False):
+    key = "replen-auto:" + hashlib.sha256(
+        "|".join((warehouse, home.item_code, home.bin, window)).encode("utf-8")
+    ).hexdigest()[:40]
+    payload = {
+        "command": "Velocity Replenishment",
+        "idempotency_key": key,
+        "warehouse": warehouse,
+        "item_code": home.item_code,
+        "source_bin": home.reserve_bin,
+        "target_bin": home.bin,
+        "device_id": "",
+        "notes": AUTO_NOTE,
+    }
+    hash_value = request_hash(payload)
+    replay = _existing_work(key, hash_value)
+    if replay:
+        return replay
+    _validate_bin(warehouse, home.reserve_bin)
+    _validate_bin(warehouse, home.bin)
+    return _allocate_replenishment(
+        payload,
+        hash_value,
+        minimum,
+        maximum,
+        home.replenish_qty,
+        priority="Urgent" if urgent else "High",
+        notes=AUTO_NOTE,
+    )
+
+
+def _home_locations(warehouse, item_code=None, bin_name=None):
+    """Active Home faces with their Home physical qty and the one Reserve to
+    refill them from: the preferred active Reserve bin with available stock
+    (NULL when every Reserve is empty). One row per face, so the work key
+    (warehouse, item, Home bin, window) is unique per sweep."""
+    conditions = ""
+    values = [warehouse]
+    if item_code:
+        conditions += " AND home.item_code = %s"
+        values.append(item_code)
+    if bin_name:
+        conditions += " AND home.bin = %s"
+        values.append(bin_name)
+    return frappe.db.sql(
+        """
+        SELECT home.item_code, home.bin, home.minimum_qty, home.maximum_qty,
+               home.replenish_qty,
+               (SELECT reserve.bin
+                  FROM `tabWMS Item Location` reserve
+                  JOIN `tabWMS Bin Balance` stock
+                    ON stock.warehouse = reserve.warehouse
+                   AND stock.bin = reserve.bin
+                   AND stock.item_code = reserve.item_code
+                 WHERE reserve.warehouse = home.warehouse
+                   AND reserve.item_code = home.item_code
+                   AND reserve.location_role = 'Reserve'
+                   AND reserve.is_active = 1
+                   AND stock.available_qty > 0
+                 ORDER BY reserve.priority, stock.available_qty DESC, reserve.bin
+                 LIMIT 1) AS reserve_bin,
+               IFNULL(bal.physical_qty, 0) AS physical_qty
+          FROM `tabWMS Item Location` home
+          LEFT JOIN `tabWMS Bin Balance` bal
+            ON bal.warehouse = home.warehouse
+           AND bal.bin = home.bin
+           AND bal.item_code = home.item_code
+         WHERE home.warehouse = %s
+           AND home.location_role = 'Home'
+           AND home.is_active = 1{0}
+         ORDER BY home.item_code
+        """.format(conditions),
+        tuple(values),
+        as_dict=True,
+    )
+
+
+def _pick_velocity(warehouse, since, item_code=None):
+    """Units picked per (item, bin) since `since`, from posted Pick movements."""
+    rows = frappe.db.sql(
+        """
+        SELECT item_code, source_bin, SUM(qty) AS picked
+          FROM `tabWMS Movement`
+         WHERE warehouse = %s
+           AND movement_type = 'Pick'
+           AND status = 'Posted'
+           AND posted_at >= %s{0}
+         GROUP BY item_code, source_bin
+        """.format(" AND item_code = %s" if item_code else ""),
+        (warehouse, since, item_code) if item_code else (warehouse, since),
+        as_dict=True,
+    )
+    return {(row.item_code, row.source_bin): flt(row.picked) for row in rows}
+
+
+def _released_demand(warehouse, days, item_code=None):
+    """Stock qty per item on submitted, undispatched Delivery Notes from this
+    warehouse that no pick work has been created for yet."""
+    meta = frappe.get_meta("Delivery Note")
+    conditions = ""
+    for fieldname in ("custom_dispatched", "custom_pack_verified"):
+        if meta.has_field(fieldname):
+            conditions += " AND IFNULL(dn.{0}, 0) = 0".format(fieldname)
+    values = [warehouse, add_days(nowdate(), -max(days, 1))]
+    if item_code:
+        conditions += " AND dni.item_code = %s"
+        values.append(item_code)
+    rows = frappe.db.sql(
+        """
+        SELECT dni.item_code, SUM(dni.stock_qty) AS qty
+          FROM `tabDelivery Note Item` dni
+          JOIN `tabDelivery Note` dn ON dn.name = dni.parent
+         WHERE dni.warehouse = %s
+           AND dn.docstatus = 1
+           AND dn.is_return = 0
+           AND dn.posting_date >= %s{0}
+           AND NOT EXISTS (
+                SELECT 1 FROM `tabWMS Work` w
+                 WHERE w.reference_name = dn.name
+                   AND w.work_type = 'Pick'
+                   AND w.reference_doctype = 'Delivery Note'
+                   AND w.status != 'Cancelled')
+         GROUP BY dni.item_code
+        """.format(conditions),
+        tuple(values),
+        as_dict=True,
+    )
+    return {row.item_code: flt(row.qty) for row in rows}
+
+
+def _open_replenishment_targets(warehouse):
+    rows = frappe.db.sql(
+        """
+        SELECT l.item_code, l.target_bin
+          FROM `tabWMS Work` w
+          JOIN `tabWMS Work Line` l
+            ON l.parent = w.name AND l.parenttype = 'WMS Work'
+         WHERE w.warehouse = %s
+           AND w.work_type = 'Replenishment'
+           AND w.status IN ('Allocated', 'In Progress')
+        """,
+        (warehouse,),
+        as_dict=True,
+    )
+    return {(row.item_code, row.target_bin) for row in rows}
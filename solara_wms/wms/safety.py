@@ -2,9 +2,24 @@
 
 import frappe
 from frappe import _
+from frappe.utils.caching import request_cache
 
 
 SETTINGS_DOCTYPE = "WMS Settings"
+GATE_FIELDS = ("operating_mode", "pilot_warehouse", "require_pick_handoff_for_pack")
+
+
+@request_cache
+def wms_gate_settings():
+    """Execution-gate fields of WMS Settings in one read, memoized per request.
+
+    Scanner paths consult the gate several times per command; a settings
+    change still takes effect on the very next request.
+    """
+    values = frappe.db.get_value(SETTINGS_DOCTYPE, None, GATE_FIELDS, as_dict=True)
+    values = values or frappe._dict()
+    values.operating_mode = values.get("operating_mode") or "Disabled"
+    return values
 
 
 def require_wms_mode(*allowed_modes):
@@ -0,0 +1,88 @@
+"""Client-side model of Shopify's leaky-bucket rate limits.
+
+Shopify meters the Admin GraphQL API in query-cost points and the REST API
+in calls. Both are leaky buckets: a capacity, a level that drains with every
+request, and a restore rate. Every GraphQL response reports the real bucket
+in `extensions.cost.throttleStatus` and every REST response in the
+`X-Shopify-Shop-Api-Call-Limit` header, so the model re-anchors on each
+response and only extrapolates the refill in between.
+
+Pure: callers pass the clock (seconds), so the bucket can be persisted
+between jobs and tested without sleeping.
+"""
+
+from dataclasses import asdict, dataclass
+
+
+@dataclass
+class CostBucket:
+    maximum: float
+    available: float
+    restore_rate: float
+    updated_at: float = 0.0
+
+    @classmethod
+    def from_state(cls, state):
+        return cls(**{key: float(state[key]) for key in
+                      ("maximum", "available", "restore_rate", "updated_at")})
+
+    def state(self):
+        return asdict(self)
+
+    def level(self, now):
+        elapsed = max(now - self.updated_at, 0)
+        return min(self.maximum, self.available + elapsed * self.restore_rate)
+
+    def spend(self, cost, now):
+        self.available = self.level(now) - cost
+        self.updated_at = now
+
+    def wait_for(self, cost, now):
+        """Seconds until `cost` is affordable; 0 when it already is. A cost
+        above the capacity waits for a full bucket."""
+        short = min(cost, self.maximum) - self.level(now)
+        if short <= 0:
+            return 0.0
+        if self.restore_rate <= 0:
+            return float("inf")
+        return short / self.restore_rate
+
+    def affordable(self, cost_each, window, now):
+        """How many requests of `cost_each` fit in the next `window` seconds."""
+        if cost_each <= 0:
+            raise ValueError("Request cost must be positive")
+        budget = self.level(now) + max(window, 0) * self.restore_rate
+        return max(int(budget // cost_each), 0)
+
+    def observe_graphql(self, body, now):
+        """Re-anchor on a GraphQL body's `extensions.cost.throttleStatus`.
+        Returns False when the body carries no cost report."""
+        status = (((body or {}).get("extensions") or {}).get("cost") or {}).get(
+            "throttleStatus")
+        if not status:
+            return False
+        self.maximum = float(status.get("maximumAvailable") or self.maximum)
+        self.available = float(status.get("currentlyAvailable") or 0)
+        self.restore_rate = float(status.get("restoreRate") or self.restore_rate)
+        self.updated_at = now
+        return True
+
+    def observe_rest(self, call_limit, now):
+        """Re-anchor on an `X-Shopify-Shop-Api-Call-Limit` header ("32/40")."""
+        try:
+            used, capacity = (float(part) for part in str(call_limit).split("/"))
+        except (TypeError, ValueError):
+            return False
+        self.maximum = capacity
+        self.available = capacity - used
+        self.updated_at = now
+        return True
+
+
+def is_throttled(body):
+    """True when a GraphQL body was rejected for cost (200 + THROTTLED)."""
+    errors = (body or {}).get("errors")
+    if not isinstance(errors, list):
+        return False
+    return any(((error or {}).get("extensions") or {}).get("code") == "THROTTLED"
+               for error in errors)
@@ -0,0 +1,174 @@
+"""Velocity slotting recommendations for Home pick faces.
+
+Read-only. The analyser counts pick visits per item, scores the current Home
+placement with slotting_domain's route-position travel model and proposes a
+bounded set of Home swaps. Each swap is returned as the two move_internal
+calls (and the Item Location re-pointing) a supervisor would run; nothing
+is moved here.
+"""
+
+import hashlib
+
+import frappe
+from frappe import _
+from frappe.utils import add_days, cint, flt, nowdate
+
+from solara_wms.wms.slotting_domain import (
+    Placement,
+    project_swaps,
+    propose_swaps,
+)
+
+
+MANAGER_ROLES = {"System Manager", "Stock Manager"}
+# Below this many pick visits in the window, WMS history is too thin and the
+# analyser counts Delivery Note lines instead.
+MIN_PICK_VISITS = 200
+MAX_SWAPS = 50
+
+
+def _home_faces(warehouse):
+    return frappe.db.sql(
+        """
+        SELECT loc.name AS item_location, loc.item_code, loc.bin,
+               IFNULL(loc.priority, 0) AS priority,
+               IFNULL(wb.route_sequence, 0) AS route_sequence,
+               IFNULL(wb.bay_module, '') AS bay_module,
+               IFNULL(bal.physical_qty, 0) AS physical_qty,
+               IFNULL(bal.available_qty, 0) AS available_qty
+          FROM `tabWMS Item Location` loc
+          JOIN `tabWarehouse Bin` wb ON wb.name = loc.bin
+          LEFT JOIN `tabWMS Bin Balance` bal
+            ON bal.warehouse = loc.warehouse
+           AND bal.bin = loc.bin
+           AND bal.item_code = loc.item_code
+         WHERE loc.warehouse = %s
+           AND loc.location_role = 'Home'
+           AND loc.is_active = 1
+           AND wb.is_active = 1
+        """,
+        (warehouse,),
+        as_dict=True,
+    )
+
+
+def _primary_faces(rows):
+    """One Home face per item: the one picking drains first (lowest priority
+    value, then earliest on the route). Visits are counted per item, so an item
+    with several Home faces is scored - and swapped - on that face alone."""
+    faces = {}
+    for row in rows:
+        current = faces.get(row.item_code)
+        rank = (cint(row.priority), cint(row.route_sequence), row.bin)
+        if current is None or rank < (
+                cint(current.priority), cint(current.route_sequence), current.bin):
+            faces[row.item_code] = row
+    return faces
+
+
+def _movement_visits(warehouse, since):
+    rows = frappe.db.sql(
+        """
+        SELECT item_code, COUNT(*) AS visits
+          FROM `tabWMS Movement`
+         WHERE warehouse = %s
+           AND movement_type = 'Pick'
+           AND status = 'Posted'
+           AND posted_at >= %s
+         GROUP BY item_code
+        """,
+        (warehouse, since),
+        as_dict=True,
+    )
+    return {row.item_code: cint(row.visits) for row in rows}
+
+
+def _delivery_note_visits(warehouse, since):
+    rows = frappe.db.sql(
+        """
+        SELECT dni.item_code, COUNT(*) AS visits
+          FROM `tabDelivery Note Item` dni
+          JOIN `tabDelivery Note` dn ON dn.name = dni.parent
+         WHERE dni.warehouse = %s
+           AND dn.docstatus = 1
+           AND dn.is_return = 0
+           AND dn.posting_date >= %s
+         GROUP BY dni.item_code
+        """,
+        (warehouse, since),
+        as_dict=True,
+    )
+    return {row.item_code: cint(row.visits) for row in rows}
+
+
+def _pick_visits(warehouse, lookback_days):
+    since = add_days(nowdate(), -lookback_days)
+    visits = _movement_visits(warehouse, since)
+    if sum(visits.values()) >= MIN_PICK_VISITS:
+        return visits, "WMS Movement"
+    return _delivery_note_visits(warehouse, since), "Delivery Note"
+
+
+def _move_plan(warehouse, face, target_bin, batch):
+    """move_internal arguments that carry one item's free Home stock across."""
+    key = "slotting:" + hashlib.sha256(
+        "|".join((batch, warehouse, face.item_code, face.bin, target_bin)).encode("utf-8")
+    ).hexdigest()[:40]
+    return {
+        "idempotency_key": key,
+        "warehouse": warehouse,
+        "item_code": face.item_code,
+        "source_bin": face.bin,
+        "target_bin": target_bin,
+        "qty": flt(face.available_qty),
+        "blocked_qty": flt(face.physical_qty) - flt(face.available_qty),
+        "notes": _("Velocity slotting swap {0}").format(batch),
+    }
+
+
+@frappe.whitelist(methods=["GET"])
+def get_slotting_recommendations(warehouse, lookback_days=30, max_swaps=10):
+    """Score current Home placement and propose the best swaps.
+
+    `blocked_qty` on a move is allocated or held stock that must be picked or
+    released before the face can be emptied.
+    """
+    if not MANAGER_ROLES.intersection(frappe.get_roles()):
+        frappe.throw(_("Only a Stock Manager can review slotting"), frappe.PermissionError)
+    lookback_days = max(cint(lookback_days), 1)
+    max_swaps = min(max(cint(max_swaps), 1), MAX_SWAPS)
+    faces = _primary_faces(_home_faces(warehouse))
+    visits, source = _pick_visits(warehouse, lookback_days)
+    placements = [
+        Placement(
+            item_code=face.item_code,
+            bin=face.bin,
+            route_sequence=cint(face.route_sequence),
+            visits=visits.get(face.item_code, 0),
+            slot_class=face.bay_module,
+        )
+        for face in faces.values()
+    ]
+    swaps = propose_swaps(placements, max_swaps=max_swaps)
+    batch = "{0}-{1}".format(nowdate(), hashlib.sha1(
+        frappe.as_json(swaps).encode("utf-8")).hexdigest()[:8])
+    for swap in swaps:
+        fast = faces[swap["fast_item"]]
+        slow = faces[swap["slow_item"]]
+        swap["moves"] = [
+            _move_plan(warehouse, fast, slow.bin, batch),
+            _move_plan(warehouse, slow, fast.bin, batch),
+        ]
+        swap["item_location_updates"] = [
+            {"item_location": fast.item_location, "bin": slow.bin},
+            {"item_location": slow.item_location, "bin": fast.bin},
+        ]
+    return {
+        "warehouse": warehouse,
+        "lookback_days": lookback_days,
+        "visit_source": source,
+        "faces": len(placements),
+        "pick_visits": sum(p.visits for p in placements),
+        "swaps": swaps,
+        **project_swaps(placements, swaps),
+    }
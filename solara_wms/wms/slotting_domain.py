@@ -0,0 +1,85 @@
+"""Pure velocity slotting: score Home placement by travel and propose swaps.
+
+The travel model is the one pick routes already walk: a bin's route_sequence
+is its distance along the serpentine path from the pick start, and every pick
+visit to an item costs its Home bin's position. Placement cost is therefore
+sum(visits x route_sequence); fast movers belong at the front of the route.
+"""
+
+from dataclasses import dataclass
+
+
+@dataclass(frozen=True)
+class Placement:
+    """One item's current Home face."""
+
+    item_code: str
+    bin: str
+    route_sequence: int
+    visits: int
+    slot_class: str = ""
+
+
+def placement_cost(placements):
+    return sum(p.visits * p.route_sequence for p in placements)
+
+
+def propose_swaps(placements, max_swaps=10):
+    """Best disjoint pairwise Home swaps, largest travel saving first.
+
+    Only faces of the same slot class (bay module) are exchanged, so an item
+    never lands in a bin it physically does not fit. Swapping a faster item
+    forward and a slower one back saves
+    (visits_fast - visits_slow) x (route_slow_bin - route_fast_bin).
+    """
+    candidates = []
+    ordered = sorted(placements, key=lambda p: (p.item_code, p.bin))
+    for i, first in enumerate(ordered):
+        for second in ordered[i + 1:]:
+            if first.slot_class != second.slot_class or first.bin == second.bin:
+                continue
+            gain = (first.visits - second.visits) * (
+                first.route_sequence - second.route_sequence
+            )
+            if gain > 0:
+                candidates.append((gain, first, second))
+    candidates.sort(key=lambda c: (-c[0], c[1].item_code, c[2].item_code))
+
+    swaps = []
+    used = set()
+    for gain, first, second in candidates:
+        if len(swaps) >= max_swaps:
+            break
+        if first.item_code in used or second.item_code in used:
+            continue
+        used.update((first.item_code, second.item_code))
+        fast, slow = (first, second) if first.visits > second.visits else (second, first)
+        swaps.append(
+            {
+                "gain": gain,
+                "fast_item": fast.item_code,
+                "fast_from_bin": fast.bin,
+                "slow_item": slow.item_code,
+                "slow_from_bin": slow.bin,
+            }
+        )
+    return swaps
+
+
+def project_swaps(placements, swaps):
+    """Travel before and after applying `swaps` to `placements`."""
+    position = {p.bin: p.route_sequence for p in placements}
+    moved = {}
+    for swap in swaps:
+        moved[swap["fast_item"]] = swap["slow_from_bin"]
+        moved[swap["slow_item"]] = swap["fast_from_bin"]
+    before = placement_cost(placements)
+    after = sum(
+        p.visits * position[moved.get(p.item_code, p.bin)] for p in placements
+    )
+    return {
+        "travel_before": before,
+        "travel_after": after,
+        "reduction": before - after,
+        "reduction_pct": round((before - after) * 100.0 / before, 1) if before else 0.0,
+    }
@@ -14,6 +14,7 @@ if "frappe" not in sys.modules:
     fake.utils.cint = lambda value: int(float(value or 0))
     fake.utils.flt = lambda value: float(value or 0)
     fake.utils.now_datetime = datetime.now
+    fake.utils.get_datetime = lambda value=None: value or datetime.now()
     sys.modules["frappe"] = fake
     sys.modules["frappe.utils"] = fake.utils
 
@@ -89,19 +90,19 @@ class TestB2BOutboundRules(TestCase):
         }
         original_prekit = outbound._prekit_bundle_codes
         original_master = outbound._item_master
-        original_ean = outbound._ean
+        original_barcodes = outbound.barcodes_for
         outbound._prekit_bundle_codes = lambda: {combo}
         outbound._item_master = lambda code: masters[code]
-        outbound._ean = lambda code: {
-            "SOL-AF-501": "8906162884118",
-            combo: "8906162885917",
-        }[code]
+        outbound.barcodes_for = lambda codes: {
+            code: {"SOL-AF-501": ["8906162884118"], combo: ["8906162885917"]}[code]
+            for code in codes
+        }
         try:
             rows = outbound._physical_items(source)
         finally:
             outbound._prekit_bundle_codes = original_prekit
             outbound._item_master = original_master
-            outbound._ean = original_ean
+            outbound.barcodes_for = original_barcodes
 
         self.assertEqual(sum(row["expected_qty"] for row in rows), 300)
         self.assertEqual(projected_cartons(rows), 300)
@@ -114,11 +115,9 @@ class TestB2BOutboundRules(TestCase):
         )
 
     def test_physical_barcode_must_match_an_item_on_the_po(self):
-        original_get_all = getattr(outbound.frappe, "get_all", None)
+        original_lookup = outbound.items_for_barcode
         original_throw = getattr(outbound.frappe, "throw", None)
-        outbound.frappe.get_all = lambda *args, **kwargs: [
-            SimpleNamespace(parent="SOL-CAST-IRON-101")
-        ]
+        outbound.items_for_barcode = lambda barcode: ["SOL-CAST-IRON-101"]
         outbound.frappe.throw = lambda message: (_ for _ in ()).throw(ValueError(message))
         job = SimpleNamespace(items=[
             SimpleNamespace(item_code="SOL-TRIPLY-101", ean="8900000000001")
@@ -127,10 +126,7 @@ class TestB2BOutboundRules(TestCase):
             with self.assertRaisesRegex(ValueError, "WRONG PRODUCT"):
                 _match_job_item(job, "8900000000002")
         finally:
-            if original_get_all is None:
-                delattr(outbound.frappe, "get_all")
-            else:
-                outbound.frappe.get_all = original_get_all
+            outbound.items_for_barcode = original_lookup
             if original_throw is None:
                 delattr(outbound.frappe, "throw")
             else:
@@ -177,9 +173,9 @@ class TestB2BOutboundRules(TestCase):
                 outbound.frappe.throw = original_throw
 
     def test_item_code_is_not_accepted_as_physical_scan_evidence(self):
-        original_get_all = getattr(outbound.frappe, "get_all", None)
+        original_lookup = outbound.items_for_barcode
         original_throw = getattr(outbound.frappe, "throw", None)
-        outbound.frappe.get_all = lambda *args, **kwargs: []
+        outbound.items_for_barcode = lambda barcode: []
         outbound.frappe.throw = lambda message: (_ for _ in ()).throw(ValueError(message))
         job = SimpleNamespace(items=[
             SimpleNamespace(item_code="SOL-TRIPLY-101", ean="8900000000001")
@@ -188,10 +184,7 @@ class TestB2BOutboundRules(TestCase):
             with self.assertRaisesRegex(ValueError, "do not type the expected SKU"):
                 _match_job_item(job, "SOL-TRIPLY-101")
         finally:
-            if original_get_all is None:
-                delattr(outbound.frappe, "get_all")
-            else:
-                outbound.frappe.get_all = original_get_all
+            outbound.items_for_barcode = original_lookup
             if original_throw is None:
                 delattr(outbound.frappe, "throw")
             else:
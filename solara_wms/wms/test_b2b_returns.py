@@ -87,3 +87,92 @@ class TestB2BReturnControls(TestCase):
     def test_parser_rejects_wrong_json_shape(self):
         self.assertEqual(b2b_returns._parse('[{"x": 1}]', list, []), [{"x": 1}])
         self.assertEqual(b2b_returns._parse('{"x": 1}', list, []), [])
+
+
+class _Lot(_Row):
+    def __init__(self, values):
+        super().__init__(**{key: None for key in (
+            "name", "platform_document_no", "purchase_order", "sales_order",
+            "delivery_note", "sales_invoice", "draft_stock_entry", "return_intake",
+            "exception", "exception_reason", "cartons")})
+        self.__dict__.update(values)
+        self.name = "B2B-RET-2026-00001"
+        self.items = [_Row(**dict(
+            {key: None for key in ("item_name", "good_qty", "repairable_qty", "scrap_qty",
+                                   "investigation_qty", "warehouse_finding",
+                                   "accessories_complete", "visual_pass", "power_test",
+                                   "function_test", "notes")}, **row))
+            for row in values["items"]]
+        self.flags = _Row()
+        self.inserted = False
+
+    def insert(self, ignore_permissions=False):
+        self.inserted = True
+
+
+class TestB2BReturnStart(TestCase):
+    @patch.object(b2b_returns, "_company", return_value="SOLARA")
+    @patch.object(b2b_returns.frappe, "get_doc", side_effect=_Lot)
+    @patch.object(b2b_returns.frappe.db, "get_value", return_value="Cast Iron Tawa")
+    @patch.object(b2b_returns.frappe.db, "exists", return_value=True)
+    @patch.object(b2b_returns.frappe, "get_all", return_value=[])
+    @patch("solara_wms.wms.item_barcodes._index", return_value={
+        "items": {"SOL-CI-101": ["8906162884118", "8906162884125"]}, "barcodes": {}})
+    def test_new_lot_takes_the_primary_ean_from_the_index(
+            self, _index, _get_all, _exists, _get_value, get_doc, _company):
+        out = b2b_returns.b2b_return_start(
+            "Blinkit", "Consignment Return", " RTV-1001 ",
+            '[{"item_code": "SOL-CI-101", "expected_qty": 4},'
+            ' {"item_code": "SOL-CI-101", "expected_qty": 1, "ean": "CUSTOM-1"}]',
+            expected_cartons=2, source_warehouse="Blinkit Consignment - SOL")
+
+        self.assertEqual(out["status"], "started")
+        self.assertEqual(out["platform_return_id"], "RTV-1001")
+        self.assertEqual([row["ean"] for row in out["items"]],
+                         ["8906162884118", "CUSTOM-1"])
+        self.assertEqual(get_doc.call_args.args[0]["status"], "QC In Progress")
+        _index.assert_called_once()
+
+
+class TestB2BReturnQueue(TestCase):
+    @patch.object(b2b_returns.frappe.db, "sql")
+    def test_summary_folds_grouped_counts(self, sql):
+        sql.return_value = [
+            b2b_returns.frappe._dict(status="QC In Progress", channel="Blinkit",
+                                     inventory_treatment="Consignment Return", lots=40,
+                                     exceptions=2, expected_cartons=120, received_cartons=90),
+            b2b_returns.frappe._dict(status="Pending HQ Review", channel="Blinkit",
+                                     inventory_treatment="Outright Return", lots=5,
+                                     exceptions=None, expected_cartons=10, received_cartons=10),
+        ]
+
+        out = b2b_returns.b2b_return_queue_summary(channel="Blinkit")
+
+        self.assertEqual(sql.call_args.args[1], {"channel": "Blinkit"})
+        self.assertEqual((out["total"], out["exceptions"], out["received_cartons"]),
+                         (45, 2, 100))
+        self.assertEqual(out["by_channel"], {"Blinkit": 45})
+        self.assertEqual(out["by_treatment"],
+                         {"Consignment Return": 40, "Outright Return": 5})
+
+    @patch.object(b2b_returns.frappe.db, "sql")
+    def test_page_is_keyset_paginated(self, sql):
+        sql.return_value = [
+            b2b_returns.frappe._dict(lot="B2B-RET-2026-0000{0}".format(n),
+                                     creation="2026-10-0{0} 10:00:00".format(n),
+                                     exception=0, expected_qty=4, received_qty=4)
+            for n in (3, 2, 1)
+        ]
+
+        out = b2b_returns.b2b_return_queue_page(status="QC In Progress", limit=2,
+                                                after="2026-10-04 09:00:00|B2B-RET-2026-00004")
+
+        values = sql.call_args.args[1]
+        self.assertEqual((values["limit"], values["status"]), (3, "QC In Progress"))
+        self.assertEqual((values["after_creation"], values["after_name"]),
+                         ("2026-10-04 09:00:00", "B2B-RET-2026-00004"))
+        self.assertEqual(out["count"], 2)
+        self.assertEqual(out["next_after"], "2026-10-02 10:00:00|B2B-RET-2026-00002")
+
+        sql.return_value = sql.return_value[:1]
+        self.assertIsNone(b2b_returns.b2b_return_queue_page(limit=2)["next_after"])
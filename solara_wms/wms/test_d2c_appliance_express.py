@@ -1,5 +1,13 @@
+import json
+from datetime import datetime
+from types import SimpleNamespace
 from unittest import TestCase
+from unittest.mock import patch
 
+import frappe
+
+from solara_wms.wms import d2c_appliance_express as express
+from solara_wms.wms import d2c_pack_verify
 from solara_wms.wms.d2c_appliance_express import classify_lines, express_config
 
 
@@ -140,3 +148,46 @@ class TestApplianceExpressEligibility(TestCase):
     def test_two_appliances_stay_normal(self):
         out = classify_lines([row("SOL-AF-501", qty=2)])
         self.assertFalse(out["eligible"])
+
+
+class TestStoredExpressVerdict(TestCase):
+    @patch.object(express.frappe, "local", SimpleNamespace(site="solara.test"), create=True)
+    def test_config_is_parsed_once_per_settings_version(self):
+        settings = frappe._dict(modified="2026-10-19 09:00:00",
+                                appliance_express_skus="sol-af-501")
+        first = express_config(settings)
+        settings.appliance_express_skus = "SOL-JUC-121"
+        self.assertIs(express_config(settings), first)
+
+        settings.modified = "2026-10-19 09:05:00"
+        self.assertEqual(express_config(settings)["appliance_skus"], {"SOL-JUC-121"})
+
+    @patch.object(express, "_barcodes", return_value=["8906162884118"])
+    @patch.object(express, "classify_lines")
+    @patch.object(express.frappe.db, "sql")
+    @patch.object(express, "express_config")
+    @patch.object(d2c_pack_verify, "pack_verify_get")
+    def test_scan_reuses_the_wave_verdict_until_the_dn_changes(
+        self, scan, config, sql, classify, _barcodes
+    ):
+        config.return_value = dict(express_config({}), qc_enabled=True)
+        scan.return_value = {"status": "ok", "dn": "DN-AF", "awb": "AWB-1",
+                             "printed_batch": "D2CPB-0001", "box_count": 1,
+                             "pieces": [row("SOL-AF-501")]}
+        wave = {"eligible": True, "kind": "single_appliance", "bundle": None,
+                "carton_item": "SOL-AF-501", "reason": "Approved single appliance carton"}
+        at_wave = datetime(2026, 10, 19, 8, 0)
+        sql.return_value = [frappe._dict(express_verdict=json.dumps(wave),
+                                         dn_modified=at_wave, modified=at_wave)]
+
+        out = express.appliance_express_get("AWB-1")
+
+        classify.assert_not_called()
+        self.assertEqual(out["express"], wave)
+        self.assertEqual(sql.call_args.args[1], ("D2CPB-0001", "DN-AF"))
+
+        classify.return_value = dict(wave, kind="appliance_order")
+        sql.return_value[0].modified = datetime(2026, 10, 19, 8, 30)
+        self.assertEqual(express.appliance_express_get("AWB-1")["express"]["kind"],
+                         "appliance_order")
+        classify.assert_called_once()
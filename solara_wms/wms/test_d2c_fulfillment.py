@@ -1,9 +1,13 @@
+import json
+from datetime import datetime
+from types import SimpleNamespace
 from unittest import TestCase
 from unittest.mock import MagicMock, patch
 
 import frappe
 
 from solara_wms.wms import d2c_fulfillment as fulfillment
+from solara_wms.wms.fake_shopify import FakeShopifyGraphQL
 from solara_wms.wms import d2c_dispatch as dispatch
 from solara_wms.wms import shopify_cancellations as cancellations
 
@@ -314,6 +318,324 @@ class TestOpdReplacementEvidence(TestCase):
         get_all.assert_not_called()
 
 
+class TestReleaseExceptionClassification(TestCase):
+    def _so(self, name, **values):
+        base = dict(name=name, transaction_date="2026-10-18", customer_name="C",
+                    grand_total=999, items=[_Row(item_code="SOL-AF-501", qty=1,
+                                                 delivered_qty=0)])
+        base.update(values)
+        return _Row(**base)
+
+    @patch.object(fulfillment, "_dispatch_dn_submits")
+    @patch.object(fulfillment, "_prune_release_exceptions")
+    @patch.object(fulfillment, "_persist_release_exceptions")
+    @patch.object(fulfillment.frappe, "get_doc")
+    @patch.object(fulfillment, "_sos_with_existing_dn", return_value={"SHP-3"})
+    @patch.object(fulfillment, "_candidate_sos")
+    def test_gate_verdicts_are_persisted_once_per_run(
+        self, candidates, _existing, get_doc, persist, prune, _dispatch
+    ):
+        candidates.return_value = [frappe._dict(name=n)
+                                   for n in ("SHP-1", "SHP-2", "SHP-3")]
+        docs = {
+            "SHP-1": self._so("SHP-1", custom_shopify_hold=1),
+            "SHP-2": self._so("SHP-2", custom_order_type="PPCOD"),
+        }
+        get_doc.side_effect = lambda doctype, name: docs[name]
+        settings = frappe._dict(release_batch_size=10, require_stock=0)
+
+        res = fulfillment._run_release(settings, dry_run=True)
+
+        # A preview counts the verdicts but leaves the live Exceptions tab alone.
+        self.assertEqual(res["skipped_on_hold"], 1)
+        self.assertEqual(res["skipped_ppcod"], 1)
+        persist.assert_not_called()
+        prune.assert_not_called()
+
+        fulfillment._run_release(settings)
+
+        persist.assert_called_once()
+        prune.assert_called_once()
+        evaluated, exceptions = persist.call_args.args
+        self.assertEqual(evaluated, ["SHP-1", "SHP-2", "SHP-3"])
+        self.assertEqual(
+            [(row["sales_order"], row["category"]) for row in exceptions],
+            [("SHP-1", "ON-HOLD"), ("SHP-2", "PPCOD")],
+        )
+
+
+class TestReleaseExceptionPrune(TestCase):
+    @patch.object(fulfillment.frappe.db, "sql")
+    def test_orders_that_left_the_candidate_set_lose_their_row(self, sql):
+        fulfillment._prune_release_exceptions()
+
+        query, values = sql.call_args.args
+        self.assertIn("DELETE e FROM `tabD2C Release Exception` e", query)
+        for gone in ("so.name IS NULL", "so.docstatus != 1", "so.per_delivered > 0",
+                     "so.skip_delivery_note = 1", "so.status NOT IN %(statuses)s"):
+            self.assertIn(gone, query)
+        self.assertEqual(values, {"statuses": fulfillment.RELEASABLE_STATUSES})
+
+
+class TestAsyncDnSubmit(TestCase):
+    def setUp(self):
+        patcher = patch.object(fulfillment, "_prune_release_exceptions")
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    @patch.object(fulfillment.frappe, "enqueue")
+    @patch.object(fulfillment, "_dn_submit_queue", return_value="d2c_dn_submit")
+    @patch.object(fulfillment.frappe.db, "bulk_update")
+    @patch.object(fulfillment, "_submitted_dns", return_value={"SHP-1": "DN-1"})
+    @patch.object(fulfillment.frappe.db, "sql")
+    def test_dispatch_fills_free_slots_and_recovers_lost_jobs(
+        self, sql, _landed, bulk_update, _queue, enqueue
+    ):
+        now = fulfillment.now_datetime()
+        old = fulfillment.add_to_date(now, minutes=-60)
+        sql.return_value = [
+            frappe._dict(name="SHP-1", status="Submitting", attempts=1,
+                         queued_at=old, started_at=old),
+            frappe._dict(name="SHP-2", status="Submitting", attempts=1,
+                         queued_at=old, started_at=old),
+            frappe._dict(name="SHP-3", status="Submitting", attempts=1,
+                         queued_at=old, started_at=now),
+            frappe._dict(name="SHP-4", status="Queued", attempts=0,
+                         queued_at=now, started_at=None),
+            frappe._dict(name="SHP-5", status="Queued", attempts=2,
+                         queued_at=old, started_at=None),
+        ]
+
+        handed = fulfillment._dispatch_dn_submits(
+            frappe._dict(dn_submit_concurrency=3))
+
+        # SHP-1's DN landed; SHP-2's job was lost and it goes back in line.
+        self.assertEqual(handed, ["SHP-2", "SHP-5"])
+        updates = bulk_update.call_args.args[1]
+        self.assertEqual(updates["SHP-1"]["status"], "Submitted")
+        self.assertEqual(updates["SHP-1"]["delivery_note"], "DN-1")
+        self.assertEqual(updates["SHP-5"]["attempts"], 3)
+        self.assertNotIn("SHP-4", updates)
+        self.assertEqual(
+            [c.kwargs["job_id"] for c in enqueue.call_args_list],
+            ["d2c-dn-submit:SHP-2", "d2c-dn-submit:SHP-5"],
+        )
+
+    @patch.object(fulfillment, "_dispatch_dn_submits")
+    @patch.object(fulfillment, "_order_box_count", return_value=1)
+    @patch.object(fulfillment, "_make_and_submit_dn")
+    @patch.object(fulfillment, "_queue_dn_submit", side_effect=[True, False])
+    @patch.object(fulfillment, "_persist_release_exceptions")
+    @patch.object(fulfillment.frappe, "get_doc")
+    @patch.object(fulfillment, "_sos_with_existing_dn", return_value=set())
+    @patch.object(fulfillment, "_candidate_sos")
+    def test_release_queues_submits_instead_of_submitting_inline(
+        self, candidates, _existing, get_doc, _persist, queue, submit, _boxes, dispatch_
+    ):
+        candidates.return_value = [frappe._dict(name=n) for n in ("SHP-1", "SHP-2")]
+        get_doc.side_effect = lambda doctype, name: _Row(
+            name=name, items=[_Row(item_code="SOL-AF-501", qty=1, delivered_qty=0)])
+        settings = frappe._dict(release_batch_size=10, require_stock=0)
+
+        res = fulfillment._run_release(settings)
+
+        submit.assert_not_called()
+        self.assertEqual(res["created_dns"], [{"so": "SHP-1", "dn": "(queued)"}])
+        self.assertEqual(res["skipped_in_flight"], 1)
+        dispatch_.assert_called_once_with(settings)
+
+
+    @patch.object(fulfillment, "_dispatch_dn_submits")
+    @patch.object(fulfillment, "_order_box_count", return_value=1)
+    @patch.object(fulfillment.frappe.db, "set_value")
+    @patch.object(fulfillment.frappe.db, "get_value")
+    @patch.object(fulfillment, "_persist_release_exceptions")
+    @patch.object(fulfillment.frappe, "get_doc")
+    @patch.object(fulfillment, "_sos_with_existing_dn", return_value=set())
+    @patch.object(fulfillment, "_candidate_sos")
+    def test_failed_submit_keeps_its_exception_and_parks_after_max_attempts(
+        self, candidates, _existing, get_doc, persist, get_value, set_value, _boxes, _dispatch
+    ):
+        candidates.return_value = [frappe._dict(name="SHP-1")]
+        get_doc.side_effect = lambda doctype, name: _Row(
+            name=name, items=[_Row(item_code="SOL-AF-501", qty=1, delivered_qty=0)])
+        settings = frappe._dict(release_batch_size=10, require_stock=0)
+        old = fulfillment.add_to_date(fulfillment.now_datetime(), minutes=-60)
+
+        # Failed inside the retry window: not re-queued, GUARD-FAILED row kept.
+        get_value.return_value = frappe._dict(
+            status="Failed", finished_at=fulfillment.now_datetime(), attempts=1)
+        res = fulfillment._run_release(settings)
+        self.assertEqual(res["skipped_in_flight"], 1)
+        self.assertEqual(persist.call_args.args[0], [])
+
+        # Past the window but out of attempts: parked, still not re-queued.
+        get_value.return_value = frappe._dict(
+            status="Failed", finished_at=old, attempts=fulfillment.DN_SUBMIT_MAX_ATTEMPTS)
+        res = fulfillment._run_release(settings)
+        self.assertEqual(res["skipped_in_flight"], 1)
+        self.assertEqual(persist.call_args.args[0], [])
+        set_value.assert_not_called()
+
+        # Past the window with attempts left: queued again for another try.
+        get_value.return_value = frappe._dict(status="Failed", finished_at=old, attempts=2)
+        res = fulfillment._run_release(settings)
+        self.assertEqual(res["created_dns"], [{"so": "SHP-1", "dn": "(queued)"}])
+        self.assertEqual(set_value.call_args.args[2]["status"], "Queued")
+
+    @patch.object(fulfillment, "_dispatch_dn_submits")
+    @patch.object(fulfillment, "_settings")
+    @patch.object(fulfillment, "_persist_release_exceptions")
+    @patch.object(fulfillment, "_make_and_submit_dn")
+    @patch.object(fulfillment, "_submitted_dns", return_value={})
+    @patch.object(fulfillment.frappe.db, "set_value")
+    @patch.object(fulfillment.frappe.db, "get_value")
+    @patch.object(fulfillment.frappe, "set_user", create=True)
+    def test_last_failed_attempt_writes_a_parked_exception(
+        self, _user, get_value, set_value, _landed, submit, persist, _settings, _dispatch
+    ):
+        get_value.side_effect = [
+            frappe._dict(status="Submitting", warehouse="WH", box_count=1,
+                         parcel_plan=None, attempts=fulfillment.DN_SUBMIT_MAX_ATTEMPTS),
+            frappe._dict(name="SHP-1", customer_name="C", grand_total=999),
+        ]
+
+        def fail(so_name, warehouse, res, *args):
+            res["failures"].append({"so": so_name, "err": "COD guard: hold"})
+        submit.side_effect = fail
+
+        fulfillment._submit_queued_dn("SHP-1")
+
+        self.assertEqual(set_value.call_args.args[2]["status"], "Failed")
+        evaluated, exceptions = persist.call_args.args
+        self.assertEqual(evaluated, ["SHP-1"])
+        self.assertEqual(exceptions[0]["category"], "GUARD-FAILED")
+        self.assertTrue(exceptions[0]["detail"].startswith("parked after 5 attempts"))
+
+
+class TestShardedRangeRelease(TestCase):
+    @patch.object(fulfillment.frappe, "enqueue")
+    @patch.object(fulfillment.frappe, "get_doc")
+    @patch.object(fulfillment, "_settings")
+    def test_range_is_split_into_day_claiming_workers(self, settings, get_doc, enqueue):
+        settings.return_value = frappe._dict(release_range_workers=4, dry_run=0)
+        get_doc.return_value.insert.return_value = frappe._dict(name="D2CRR-00001")
+
+        out = fulfillment.enqueue_release_range("2026-10-01", "2026-10-02")
+
+        run = get_doc.call_args.args[0]
+        self.assertEqual((run["days_total"], run["workers"]), (2, 2))
+        self.assertEqual(str(run["next_date"]), "2026-10-01")
+        self.assertEqual((out["days"], out["workers"]), (2, 2))
+        self.assertEqual(
+            [c.kwargs["job_id"] for c in enqueue.call_args_list],
+            ["d2c-release-range:D2CRR-00001:0", "d2c-release-range:D2CRR-00001:1"],
+        )
+        with self.assertRaises(frappe.ValidationError):
+            fulfillment.enqueue_release_range("2026-10-02", "2026-10-01")
+
+    @patch.object(fulfillment, "_run_release")
+    def test_day_drains_until_nothing_releases_and_dry_run_counts_once(self, run_release):
+        run_release.side_effect = [
+            {"created": 200, "skipped_on_hold": 2},
+            {"created": 35, "failed": 1},
+            {"created": 0},
+        ]
+
+        counts = fulfillment._release_range_day({}, "2026-10-01", 0)
+
+        self.assertEqual(run_release.call_count, 3)
+        self.assertEqual(run_release.call_args.kwargs,
+                         {"dry_run": 0, "from_date": "2026-10-01", "to_date": "2026-10-01"})
+        self.assertEqual((counts["created"], counts["skipped_on_hold"], counts["failed"]),
+                         (235, 2, 1))
+
+        run_release.reset_mock(side_effect=True)
+        run_release.return_value = {"created": 50}
+        self.assertEqual(fulfillment._release_range_day({}, "2026-10-01", 1)["created"], 50)
+        run_release.assert_called_once()
+
+
+    @patch.object(fulfillment, "_finish_range_worker")
+    @patch.object(fulfillment, "_record_range_day")
+    @patch.object(fulfillment, "_release_range_day", return_value={"created": 3})
+    @patch.object(fulfillment, "_claim_range_day")
+    @patch.object(fulfillment, "_log")
+    @patch.object(fulfillment, "_settings", return_value={})
+    @patch.object(fulfillment.frappe, "set_user", create=True)
+    def test_worker_always_counts_itself_out(
+            self, _user, _settings, log, claim, _day, record, finish):
+        claim.side_effect = [("2026-10-01", 0), RuntimeError("worker killed")]
+
+        fulfillment._release_range_job("D2CRR-00001")
+
+        record.assert_called_once_with("D2CRR-00001", "2026-10-01", {"created": 3})
+        finish.assert_called_once_with("D2CRR-00001", {})
+        self.assertIn("worker stopped", log.call_args.args[1])
+
+    @patch.object(fulfillment, "_log")
+    @patch.object(fulfillment, "now_datetime",
+                  return_value=datetime(2026, 10, 19, 12, 0))
+    @patch.object(fulfillment.frappe.db, "set_value")
+    @patch.object(fulfillment.frappe.db, "get_value")
+    def test_stale_day_is_handed_out_again_then_given_up(
+            self, get_value, set_value, _now, log):
+        get_value.return_value = frappe._dict(
+            next_date="2026-10-04", to_date="2026-10-05", dry_run=0, failed_days=None,
+            in_flight_days=json.dumps({
+                "2026-10-01": {"claimed_at": "2026-10-19 08:00:00", "attempts": 2},
+                "2026-10-02": {"claimed_at": "2026-10-19 09:00:00", "attempts": 1},
+                "2026-10-03": {"claimed_at": "2026-10-19 11:30:00", "attempts": 1},
+            }))
+
+        self.assertEqual(fulfillment._claim_range_day("D2CRR-00001"), ("2026-10-02", 0))
+
+        values = set_value.call_args.args[2]
+        self.assertNotIn("next_date", values)
+        self.assertEqual(json.loads(values["failed_days"]), ["2026-10-01"])
+        in_flight = json.loads(values["in_flight_days"])
+        self.assertEqual(sorted(in_flight), ["2026-10-02", "2026-10-03"])
+        self.assertEqual(in_flight["2026-10-02"],
+                         {"claimed_at": "2026-10-19 12:00:00", "attempts": 2})
+        self.assertIn("2026-10-01 failed", log.call_args.args[1])
+
+    @patch.object(fulfillment, "_post_range_summary")
+    @patch.object(fulfillment, "_publish_range_progress",
+                  return_value=frappe._dict(name="D2CRR-00001"))
+    @patch.object(fulfillment.frappe.db, "set_value")
+    @patch.object(fulfillment.frappe.db, "get_value")
+    def test_run_closes_only_when_no_day_is_left_or_in_flight(
+            self, get_value, set_value, _progress, summary):
+        row = dict(status="Running", workers_done=1, next_date="2026-10-06",
+                   to_date="2026-10-05", failed_days='["2026-10-01"]')
+        get_value.return_value = frappe._dict(
+            row, in_flight_days='{"2026-10-05": {"claimed_at": "2026-10-19 11:00:00"}}')
+        fulfillment._finish_range_worker("D2CRR-00001", {})
+        self.assertEqual(set_value.call_args.args[2], {"workers_done": 2})
+        summary.assert_not_called()
+
+        get_value.return_value = frappe._dict(row, in_flight_days="{}")
+        fulfillment._finish_range_worker("D2CRR-00001", {})
+        self.assertEqual(set_value.call_args.args[2]["status"], "Failed")
+        summary.assert_called_once()
+
+    @patch.object(fulfillment, "now_datetime",
+                  return_value=datetime(2026, 10, 19, 12, 0))
+    @patch.object(fulfillment.frappe, "enqueue")
+    @patch.object(fulfillment.frappe, "get_all")
+    def test_dead_runs_get_a_resume_worker(self, get_all, enqueue, _now):
+        get_all.return_value = [
+            frappe._dict(name="D2CRR-LIVE", in_flight_days=json.dumps(
+                {"2026-10-01": {"claimed_at": "2026-10-19 11:30:00"}})),
+            frappe._dict(name="D2CRR-STALE", in_flight_days=json.dumps(
+                {"2026-10-01": {"claimed_at": "2026-10-19 10:00:00"}})),
+            frappe._dict(name="D2CRR-IDLE", in_flight_days=None),
+        ]
+
+        self.assertEqual(fulfillment.resume_release_ranges(), ["D2CRR-STALE", "D2CRR-IDLE"])
+        self.assertEqual(enqueue.call_args.kwargs["job_id"], "d2c-release-range:D2CRR-IDLE:resume")
+
+
 class TestOpdReplacementWaveScope(TestCase):
     @patch.object(fulfillment.frappe, "get_all")
     @patch.object(fulfillment.frappe, "get_meta")
@@ -589,7 +911,7 @@ class TestDispatchGatedShopifyFulfillment(TestCase):
         result = fulfillment.sync_dispatched_shopify_fulfillments(days=14, limit=40)
 
         self.assertEqual(result["synced"], 1)
-        fulfill_one.assert_called_once_with("DN-OLD-BILLED")
+        fulfill_one.assert_called_once_with("DN-OLD-BILLED", state=None)
         filters = get_all.call_args.kwargs["filters"]
         self.assertEqual(filters["custom_dispatched"], 1)
         self.assertEqual(filters["custom_shopify_fulfilled"], 0)
@@ -600,6 +922,91 @@ class TestDispatchGatedShopifyFulfillment(TestCase):
         )
 
 
+class _Cache:
+    def __init__(self):
+        self.values = {}
+
+    def get_value(self, key):
+        return self.values.get(key)
+
+    def set_value(self, key, value, expires_in_sec=None):
+        self.values[key] = value
+
+
+class TestBatchedShopifyLookups(TestCase):
+    """Many DNs share one aliased order-state lookup; only the mutations each
+    order still needs go out, and a THROTTLED lookup is retried after the
+    modelled bucket has refilled."""
+
+    def setUp(self):
+        self.clock = [1000.0]
+        self.shop = FakeShopifyGraphQL(maximum=50, restore_rate=10,
+                                       clock=lambda: self.clock[0])
+        fake_time = SimpleNamespace(
+            time=lambda: self.clock[0], monotonic=lambda: self.clock[0],
+            sleep=lambda seconds: self.clock.__setitem__(0, self.clock[0] + seconds))
+        for target, kwargs in (
+            ("requests.post", {"side_effect": self._post}),
+            ("solara_wms.wms.d2c_fulfillment.time", {"new": fake_time}),
+        ):
+            patcher = patch(target, **kwargs)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        for attribute, value in (
+            ("_shopify_context", lambda: ({}, "https://shop/admin/api/2024-01/graphql.json")),
+            ("_settings", lambda: {}),
+            ("_log", lambda *args: None),
+            ("_awb_courier_pairs", lambda dn: dn["pairs"]),
+        ):
+            patcher = patch.object(fulfillment, attribute, value)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        cache = _Cache()
+        patcher = patch.object(fulfillment.frappe, "cache", lambda: cache)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def _post(self, url, data=None, headers=None, timeout=None):
+        status, body = self.shop.handle(json.loads(data))
+        return MagicMock(status_code=status, json=lambda: body)
+
+    def _dn(self, oid, *awbs):
+        return {"name": "DN-" + oid, "shopify_order_id": oid,
+                "pairs": [(awb, "Shadowfax") for awb in awbs]}
+
+    def test_one_lookup_then_only_the_needed_mutations(self):
+        self.shop.bucket.maximum = self.shop.bucket.available = 1000
+        self.shop.add_order("1")
+        self.shop.add_order("2", open_fulfillment_orders=0,
+                            fulfillments=[(["AWB-2"], "SUCCESS")])
+        self.shop.add_order("3", open_fulfillment_orders=0,
+                            fulfillments=[(["AWB-3"], "SUCCESS")])
+
+        states = fulfillment._shopify_order_states(["1", "2", "3"])
+        outcomes = [
+            fulfillment.push_shopify_fulfillment(dn, state=states[dn["shopify_order_id"]])
+            for dn in (self._dn("1", "AWB-1"), self._dn("2", "AWB-2"),
+                       self._dn("3", "AWB-3", "AWB-3B"))
+        ]
+
+        self.assertEqual(outcomes, ["created", "in_sync", "repaired"])
+        self.assertEqual(self.shop.calls, {
+            "order_states": 1, "fulfillment_create": 1, "tracking_update": 1})
+        self.assertEqual(self.shop.throttled, 0)
+
+    def test_throttled_lookup_waits_for_the_bucket_and_retries_once(self):
+        for oid in ("1", "2", "3"):
+            self.shop.add_order(oid)
+        self.shop.bucket.spend(37, self.clock[0])
+
+        states = fulfillment._shopify_order_states(["1", "2", "3"])
+
+        self.assertEqual(sorted(states), ["1", "2", "3"])
+        self.assertEqual(self.shop.throttled, 1)
+        self.assertEqual(self.shop.calls, {"order_states": 2})
+        self.assertEqual(self.clock[0], 1003.0)
+
+
 class TestReprintBatchRelinks(TestCase):
     """A reprint must be a DROP-IN replacement for the batch's existing links.
 
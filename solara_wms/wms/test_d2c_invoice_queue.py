@@ -0,0 +1,76 @@
+from unittest import TestCase
+from unittest.mock import patch
+
+import frappe
+
+from solara_wms.wms import d2c_invoice_queue as invoice_queue
+
+
+class TestQueueDeferredInvoices(TestCase):
+    @patch.object(invoice_queue.frappe.db, "bulk_insert")
+    @patch.object(invoice_queue.frappe, "get_all", return_value=["DN-1"])
+    def test_only_dns_without_a_queue_row_are_inserted(self, _get_all, bulk_insert):
+        self.assertEqual(
+            invoice_queue.queue_deferred_invoices(["DN-1", "DN-2", "DN-2"]), 1)
+
+        values = bulk_insert.call_args.args[2]
+        self.assertEqual([row[:4] for row in values], [("DN-2", "DN-2", "Pending", 0)])
+        self.assertTrue(bulk_insert.call_args.kwargs["ignore_duplicates"])
+
+
+class TestDrainInvoiceQueue(TestCase):
+    def _sql(self, pending, orders, attempts=0):
+        def sql(query, values=None, as_dict=False):
+            if "FROM `tabDelivery Note Item`" in query:
+                return orders
+            if "FOR UPDATE" in query:
+                return [frappe._dict(name=values[0], attempts=attempts)]
+            return [frappe._dict(name=name) for name in pending]
+        return sql
+
+    @patch.object(invoice_queue.frappe.db, "set_value")
+    @patch.object(invoice_queue, "create_si_from_deferred_dn", return_value="SHPSI27-1")
+    @patch.object(invoice_queue.frappe.db, "sql")
+    def test_prefetched_orders_settle_without_an_invoice_attempt(
+        self, sql, create_si, set_value
+    ):
+        sql.side_effect = self._sql(
+            ["DN-1", "DN-2", "DN-3"],
+            [
+                frappe._dict(delivery_note="DN-1", sales_order="SHP-1", per_billed=0),
+                frappe._dict(delivery_note="DN-2", sales_order="SHP-2", per_billed=100),
+                frappe._dict(delivery_note="DN-3", sales_order="SO-3", per_billed=0),
+            ],
+        )
+
+        result = invoice_queue._drain()
+
+        self.assertEqual(result, {"invoiced": 1, "skipped": 2, "failed": 0, "parked": 0})
+        create_si.assert_called_once_with("DN-1")
+        settled = {call.args[1]: call.args[2] for call in set_value.call_args_list}
+        self.assertEqual(settled["DN-1"]["status"], "Invoiced")
+        self.assertEqual(settled["DN-1"]["sales_invoice"], "SHPSI27-1")
+        self.assertEqual(settled["DN-2"]["status"], "Skipped")
+        self.assertEqual(settled["DN-3"]["status"], "Skipped")
+        # One prefetch for the whole batch, not one SO read per DN.
+        self.assertEqual(
+            sum("tabDelivery Note Item" in call.args[0] for call in sql.call_args_list), 1)
+
+    @patch.object(invoice_queue.frappe.db, "set_value")
+    @patch.object(invoice_queue, "create_si_from_deferred_dn",
+                  side_effect=RuntimeError("IRN portal down"))
+    @patch.object(invoice_queue.frappe.db, "sql")
+    def test_failures_back_off_then_park(self, sql, _create_si, set_value):
+        orders = [frappe._dict(delivery_note="DN-1", sales_order="SHP-1", per_billed=0)]
+        sql.side_effect = self._sql(["DN-1"], orders, attempts=1)
+
+        self.assertEqual(invoice_queue._drain()["failed"], 1)
+        values = set_value.call_args.args[2]
+        self.assertEqual(values["status"], "Pending")
+        self.assertEqual(values["attempts"], 2)
+        self.assertIsNotNone(values["next_attempt_at"])
+
+        sql.side_effect = self._sql(
+            ["DN-1"], orders, attempts=invoice_queue.MAX_ATTEMPTS - 1)
+        self.assertEqual(invoice_queue._drain()["parked"], 1)
+        self.assertEqual(set_value.call_args.args[2]["status"], "Parked")
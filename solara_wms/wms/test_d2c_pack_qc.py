@@ -1,5 +1,10 @@
+from datetime import datetime
 from unittest import TestCase
+from unittest.mock import MagicMock, patch
 
+import frappe
+
+from solara_wms.wms import d2c_pack_qc as pack_qc
 from solara_wms.wms.d2c_pack_qc import sampling_decision, validate_scans
 
 
@@ -54,3 +59,72 @@ class TestPackQCScanValidation(TestCase):
 
         self.assertTrue(validate_scans(allowed, [], {"FREEBIE": 1})["ok"])
         self.assertFalse(validate_scans(blocked, [], {"SKU-1": 1})["ok"])
+
+
+def _qc(version, name, status="Pending"):
+    return frappe._dict(name=name, awb="AWB-" + name, status=status, station="Line 1",
+                        staged_at=datetime(2026, 10, 19, 9, 0), feed_version=version)
+
+
+@patch.object(pack_qc, "now_datetime", return_value=datetime(2026, 10, 19, 9, 30))
+@patch.object(pack_qc, "qc_control_state", return_value={"enabled": True})
+class TestPackQCQueueFeed(TestCase):
+    @patch.object(pack_qc.frappe.db, "sql")
+    def test_changes_since_a_token_page_in_version_order(self, sql, _control, _now):
+        sql.return_value = [_qc(41, "PACKQC-00007", "Passed"), _qc(42, "PACKQC-00009"),
+                            _qc(43, "PACKQC-00010")]
+
+        out = pack_qc.qc_queue_feed(since=40, limit=2)
+
+        self.assertEqual(sql.call_args.args[1], {"since": 40, "limit": 3})
+        self.assertEqual((out["mode"], out["token"], out["more"]), ("changes", 42, True))
+        self.assertEqual([row["status"] for row in out["parcels"]], ["Passed", "Pending"])
+        self.assertEqual(out["parcels"][1]["wait_min"], 30.0)
+
+        sql.return_value = []
+        quiet = pack_qc.qc_queue_feed(since=43)
+        self.assertEqual((quiet["token"], quiet["parcels"], quiet["more"]), (43, [], False))
+
+    @patch.object(pack_qc.frappe.db, "sql")
+    def test_snapshot_pages_the_open_queue_as_of_its_token(self, sql, _control, _now):
+        sql.side_effect = [[(57,)], [_qc(3, "PACKQC-00001"), _qc(3, "PACKQC-00002")]]
+
+        first = pack_qc.qc_queue_feed(limit=1)
+
+        self.assertEqual((first["mode"], first["token"], first["more"]), ("snapshot", 57, True))
+        self.assertEqual(first["after"], "3|PACKQC-00001")
+        self.assertEqual(sql.call_args.args[1]["after_version"], -1)
+
+        sql.side_effect = None
+        sql.return_value = [_qc(3, "PACKQC-00002")]
+        last = pack_qc.qc_queue_feed(after=first["after"], token=57, limit=1)
+
+        values = sql.call_args.args[1]
+        self.assertEqual((values["token"], values["after_version"], values["after_name"]),
+                         (57, 3, "PACKQC-00001"))
+        self.assertEqual((last["token"], last["more"], last["after"]), (57, False, None))
+
+
+class TestPackQCFeedVersion(TestCase):
+    @patch.object(pack_qc.frappe.db, "sql", side_effect=[None, ((42,),)])
+    def test_each_save_bumps_the_single_row_counter(self, sql):
+        doc = frappe._dict()
+        pack_qc.stamp_feed_version(doc)
+        self.assertEqual(doc.feed_version, 42)
+        bump, values = sql.call_args_list[0].args
+        self.assertIn("LAST_INSERT_ID(`current` + 1)", bump)
+        self.assertNotIn("D2C Pack QC", bump)
+        self.assertEqual(values, (pack_qc.QC_FEED_SERIES,))
+        self.assertEqual(sql.call_args.args[0], "SELECT LAST_INSERT_ID()")
+
+    @patch.object(pack_qc, "nowdate", return_value="2026-10-19")
+    @patch.object(pack_qc.frappe, "get_all", return_value=[], create=True)
+    def test_control_state_is_read_once_per_day(self, get_all, _today):
+        cache = MagicMock()
+        cache.get_value.side_effect = [None, {"enabled": True, "control_date": "2026-10-19"}]
+        with patch.object(pack_qc, "_cache", return_value=cache):
+            self.assertTrue(pack_qc.qc_control_state()["enabled"])
+            self.assertTrue(pack_qc.qc_control_state()["enabled"])
+        get_all.assert_called_once()
+        self.assertEqual(cache.set_value.call_args.args[0],
+                         pack_qc.QC_CONTROL_KEY + "2026-10-19")
@@ -0,0 +1,126 @@
+import json
+from unittest import TestCase
+from unittest.mock import patch
+
+import frappe
+
+from solara_wms.wms import d2c_return_lookup as lookup
+
+
+def _row(key_type="Order", **values):
+    row = {
+        "key_type": key_type,
+        "name": "SHPDN27-00010",
+        "delivery_note": "SHPDN27-00010",
+        "sales_invoice": "SHPSI27-00010",
+        "shopify_order_number": "SOL1001",
+        "customer_name": "Asha",
+        "posting_date": "2026-10-01",
+        "courier": "Delhivery",
+        "awbs": json.dumps([["AWB-1", "Delhivery"], ["AWB-2", "Shadowfax"]]),
+        "returnable_items": json.dumps([{"item_code": "SOL-AF-501", "expected_qty": 1,
+                              "max_returnable": 1, "components": []}]),
+    }
+    row.update(values)
+    return frappe._dict(row)
+
+
+class TestReturnLookupIndex(TestCase):
+    @patch.object(lookup, "_resolve")
+    @patch.object(lookup.frappe.db, "sql")
+    def test_indexed_scan_answers_from_one_read(self, sql, slow_resolve):
+        sql.return_value = [_row()]
+
+        out = lookup.resolve(" sol1001-p2 ")
+
+        slow_resolve.assert_not_called()
+        self.assertEqual(sql.call_args.args[1], (("SOL1001",),))
+        self.assertEqual((out["status"], out["dn"], out["sales_invoice"]),
+                         ("ok", "SHPDN27-00010", "SHPSI27-00010"))
+        self.assertEqual((out["forward_awb"], out["courier"]), ("AWB-2", "Shadowfax"))
+        self.assertEqual(out["items"][0]["max_returnable"], 1)
+
+        sql.return_value = [_row(key_type="AWB")]
+        self.assertEqual(lookup.resolve("awb-1")["forward_awb"], "AWB-1")
+
+    @patch.object(lookup.frappe.db, "sql")
+    def test_phone_with_several_orders_asks_for_the_order(self, sql):
+        sql.return_value = [_row("Phone"), _row("Phone", name="SHPDN27-00011",
+                                                delivery_note="SHPDN27-00011")]
+        out = lookup.resolve("+91 98765 43210")
+        self.assertEqual(set(sql.call_args.args[1][0]), {"+91 98765 43210", "9876543210"})
+        self.assertEqual(out["status"], "ambiguous")
+        self.assertEqual(len(out["candidates"]), 2)
+
+        # A numeric AWB that happens to equal a phone number still resolves.
+        sql.return_value = [_row("Phone"), _row("AWB", name="SHPDN27-00012",
+                                                delivery_note="SHPDN27-00012")]
+        self.assertEqual(lookup.resolve("9876543210")["dn"], "SHPDN27-00012")
+
+    @patch.object(lookup.frappe.db, "bulk_insert")
+    @patch.object(lookup, "drop")
+    @patch.object(lookup, "expected_items", return_value=[])
+    @patch.object(lookup, "_awb_courier_pairs",
+                  return_value=[("awb-1", "Delhivery"), ("AWB-2", "Shadowfax")])
+    @patch.object(lookup, "_resolve", return_value=("SHPDN27-00010", "awb-1", 1, 2))
+    @patch.object(lookup, "find_sales_invoice")
+    @patch.object(lookup.frappe, "get_doc")
+    @patch.object(lookup.frappe.db, "sql", return_value=[])
+    def test_miss_resolves_once_and_indexes_every_scan_code(
+        self, _sql, get_doc, find_si, _slow, _pairs, _items, _drop, bulk_insert
+    ):
+        get_doc.return_value = frappe._dict(
+            name="SHPDN27-00010", shopify_order_number="SOL1001",
+            contact_mobile="+91 98765-43210", customer_name="Asha",
+            posting_date="2026-10-01", courier_partner="Delhivery")
+        find_si.return_value = frappe._dict(name="SHPSI27-00010")
+
+        out = lookup.resolve("awb-1")
+
+        self.assertEqual((out["status"], out["forward_awb"]), ("ok", "awb-1"))
+        key_rows = bulk_insert.call_args_list[1].args[2]
+        self.assertEqual(
+            sorted((row[1], row[2]) for row in key_rows),
+            [("9876543210", "Phone"), ("AWB-1", "AWB"), ("AWB-2", "AWB"),
+             ("SHPDN27-00010", "Delivery Note"), ("SHPSI27-00010", "Sales Invoice"),
+             ("SOL1001", "Order")],
+        )
+
+
+class TestReturnLookupHooks(TestCase):
+    @patch.object(lookup.frappe.db, "exists")
+    @patch.object(lookup.frappe, "get_all")
+    @patch.object(lookup.frappe, "enqueue")
+    def test_non_shopify_documents_never_reach_the_index(self, enqueue, get_all, exists):
+        doc = frappe._dict(name="SINV-0001", shopify_order_number="", is_return=0,
+                           items=[frappe._dict(against_sales_invoice="SINV-0001")])
+
+        lookup.on_sales_invoice_submit(doc)
+        lookup.on_sales_invoice_cancel(doc)
+        lookup.on_delivery_note_submit(doc)
+        lookup.on_delivery_note_update_after_submit(doc)
+        lookup.on_delivery_note_cancel(doc)
+
+        enqueue.assert_not_called()
+        get_all.assert_not_called()
+        exists.assert_not_called()
+
+    @patch.object(lookup.frappe, "get_all")
+    @patch.object(lookup.frappe, "enqueue")
+    def test_shopify_postings_reindex_after_commit(self, enqueue, get_all):
+        lookup.on_sales_invoice_submit(frappe._dict(
+            name="SHPSI27-00011", shopify_order_number="SOL1001", is_return=1,
+            return_against="SHPSI27-00010"))
+        lookup.on_delivery_note_submit(frappe._dict(
+            name="SHPDN27-00010", shopify_order_number="SOL1001", is_return=0,
+            items=[frappe._dict(against_sales_invoice="SHPSI27-00010")]))
+
+        get_all.assert_not_called()
+        (invoice, invoice_kwargs), (dn, dn_kwargs) = (
+            (c.args[0], c.kwargs) for c in enqueue.call_args_list)
+        self.assertTrue(invoice.endswith(".reindex_invoice"))
+        self.assertEqual(invoice_kwargs["sales_invoice"], "SHPSI27-00010")
+        self.assertTrue(dn.endswith(".reindex"))
+        self.assertEqual(dn_kwargs["dn_names"], ["SHPDN27-00010"])
+        for kwargs in (invoice_kwargs, dn_kwargs):
+            self.assertTrue(kwargs["enqueue_after_commit"] and kwargs["deduplicate"])
@@ -100,3 +100,59 @@ class TestReturnQcGuardrails(TestCase):
         self.assertEqual(cleaned["courier"], "Delhivery")
         self.assertEqual(cleaned["sender_phone"], "4321")
         self.assertEqual(cleaned["observed_serial_number"], "AF-001")
+
+
+class TestReturnIntakePreparation(TestCase):
+    @patch.object(returns, "_refresh_finance_status")
+    @patch.object(returns, "_create_return_intake")
+    @patch.object(returns.frappe.db, "commit")
+    @patch.object(returns.frappe.db, "set_value")
+    @patch.object(returns.frappe, "get_doc")
+    @patch.object(returns.frappe.db, "get_value")
+    def test_preparation_is_idempotent_per_parcel(
+        self, get_value, get_doc, set_value, _commit, create, refresh
+    ):
+        # Already prepared: nothing is loaded or created.
+        get_value.return_value = returns.frappe._dict(intake_status="Ready", intake_attempts=1)
+        returns._prepare_return_intake("RETP-00001")
+        get_doc.assert_not_called()
+
+        # An earlier run created the intake but lost the parcel update: reuse it.
+        get_value.side_effect = [
+            returns.frappe._dict(intake_status="Queued", intake_attempts=0),
+            "RINT-0009",
+        ]
+        get_doc.return_value = _Row(name="RETP-00001", return_intake=None)
+        returns._prepare_return_intake("RETP-00001")
+
+        create.assert_not_called()
+        self.assertEqual(set_value.call_args.args[2]["return_intake"], "RINT-0009")
+        self.assertEqual(set_value.call_args.args[2]["intake_status"], "Ready")
+        refresh.assert_called_once()
+
+    @patch.object(returns.frappe, "log_error")
+    @patch.object(returns.frappe.db, "commit")
+    @patch.object(returns.frappe.db, "set_value")
+    @patch.object(returns.frappe.db, "get_value")
+    def test_failures_back_off_then_park(self, get_value, set_value, _commit, _log):
+        get_value.return_value = 1
+        returns._intake_failed("RETP-00001", "boom")
+        update = set_value.call_args.args[2]
+        self.assertEqual((update["intake_status"], update["intake_attempts"]), ("Failed", 2))
+
+        get_value.return_value = returns.INTAKE_MAX_ATTEMPTS - 1
+        returns._intake_failed("RETP-00001", "boom")
+        self.assertEqual(set_value.call_args.args[2]["intake_status"], "Parked")
+
+    @patch.object(returns, "_enqueue_intake")
+    @patch.object(returns.frappe, "get_all")
+    def test_retry_picks_failed_rows_and_lost_queued_jobs(self, get_all, enqueue):
+        now = returns.now_datetime()
+        get_all.return_value = [
+            returns.frappe._dict(name="RETP-1", intake_status="Failed", intake_due_at=now),
+            returns.frappe._dict(name="RETP-2", intake_status="Queued", intake_due_at=now),
+            returns.frappe._dict(name="RETP-3", intake_status="Queued",
+                                 intake_due_at=returns.add_to_date(now, minutes=-60)),
+        ]
+        self.assertEqual(returns.retry_return_intakes(), ["RETP-1", "RETP-3"])
+        self.assertEqual(enqueue.call_count, 2)
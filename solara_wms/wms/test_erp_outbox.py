@@ -0,0 +1,121 @@
+from datetime import datetime
+from unittest import TestCase
+from unittest.mock import patch
+
+from solara_wms.wms import erp_outbox
+
+
+NOW = datetime(2026, 10, 19, 12, 0)
+
+
+def _row(name, warehouse="HYD", item_code=None, next_attempt_at=None):
+    return erp_outbox.frappe._dict(
+        name=name, warehouse=warehouse, item_code=item_code,
+        next_attempt_at=next_attempt_at,
+    )
+
+
+@patch.object(erp_outbox, "now_datetime", return_value=NOW)
+class TestOutboxOrdering(TestCase):
+    def _drain(self, rows, failing=()):
+        delivered = []
+
+        def deliver(name):
+            delivered.append(name)
+            return name not in failing
+
+        with patch.object(erp_outbox.frappe.db, "sql", return_value=rows), \
+                patch.object(erp_outbox, "_deliver", side_effect=deliver):
+            erp_outbox._drain()
+        return delivered
+
+    def test_failed_message_holds_back_later_messages_for_its_item_only(self, _now):
+        delivered = self._drain(
+            [
+                _row("OBX-1", item_code="SKU-1"),
+                _row("OBX-2", item_code="SKU-1"),
+                _row("OBX-3", item_code="SKU-2"),
+            ],
+            failing={"OBX-1"},
+        )
+
+        self.assertEqual(delivered, ["OBX-1", "OBX-3"])
+
+    def test_backing_off_multi_item_draft_holds_its_whole_warehouse(self, _now):
+        delivered = self._drain(
+            [
+                _row("OBX-1", next_attempt_at=datetime(2026, 10, 19, 12, 5)),
+                _row("OBX-2", item_code="SKU-1"),
+                _row("OBX-3", warehouse="BLR", item_code="SKU-1"),
+            ]
+        )
+
+        self.assertEqual(delivered, ["OBX-3"])
+
+    def test_single_item_backoff_holds_later_multi_item_draft(self, _now):
+        delivered = self._drain(
+            [
+                _row("OBX-1", item_code="SKU-1", next_attempt_at=datetime(2026, 10, 19, 13)),
+                _row("OBX-2"),
+                _row("OBX-3", item_code="SKU-2"),
+            ]
+        )
+
+        self.assertEqual(delivered, ["OBX-3"])
+
+
+@patch.object(erp_outbox, "now_datetime", return_value=NOW)
+@patch.object(erp_outbox.frappe.db, "commit")
+@patch.object(erp_outbox.frappe.db, "rollback")
+@patch.object(erp_outbox.frappe.db, "savepoint")
+@patch.object(erp_outbox.frappe, "get_traceback", return_value="Traceback: invalid item")
+@patch.object(erp_outbox.frappe, "log_error")
+@patch.object(erp_outbox.frappe.db, "set_value")
+@patch.object(erp_outbox.frappe, "get_doc")
+@patch.object(erp_outbox.frappe.db, "sql")
+class TestOutboxRetries(TestCase):
+    def _message(self, attempts):
+        return [erp_outbox.frappe._dict(
+            name="OBX-1", message_type="Stock Entry", source_doctype="WMS Task",
+            source_name="TASK-1", source_field="stock_entry",
+            payload='{"items": []}', attempts=attempts,
+        )]
+
+    def test_failure_backs_off_and_stays_pending(
+        self, sql, get_doc, set_value, log_error, *_mocks
+    ):
+        sql.return_value = self._message(attempts=1)
+        get_doc.return_value.insert.side_effect = ValueError("invalid item")
+
+        self.assertFalse(erp_outbox._deliver("OBX-1"))
+
+        values = set_value.call_args.args[2]
+        self.assertEqual(values["status"], "Pending")
+        self.assertEqual(values["attempts"], 2)
+        self.assertEqual(values["next_attempt_at"], datetime(2026, 10, 19, 12, 4))
+        log_error.assert_not_called()
+
+    def test_poison_message_is_parked_and_releases_its_key(
+        self, sql, get_doc, set_value, log_error, *_mocks
+    ):
+        sql.return_value = self._message(attempts=erp_outbox.MAX_ATTEMPTS - 1)
+        get_doc.return_value.insert.side_effect = ValueError("invalid item")
+
+        self.assertTrue(erp_outbox._deliver("OBX-1"))
+
+        self.assertEqual(set_value.call_args.args[2]["status"], "Parked")
+        log_error.assert_called_once()
+
+    def test_delivered_draft_is_linked_back_to_its_source(
+        self, sql, get_doc, set_value, *_mocks
+    ):
+        sql.return_value = self._message(attempts=0)
+        get_doc.return_value.name = "MAT-STE-0001"
+
+        self.assertTrue(erp_outbox._deliver("OBX-1"))
+
+        self.assertEqual(
+            set_value.call_args_list[0].args[:4],
+            ("WMS Task", "TASK-1", "stock_entry", "MAT-STE-0001"),
+        )
+        self.assertEqual(set_value.call_args_list[1].args[2]["status"], "Delivered")
@@ -0,0 +1,127 @@
+from types import SimpleNamespace
+from unittest import TestCase
+from unittest.mock import patch
+
+from solara_wms.wms import inventory_accuracy
+
+
+def _row(name, item, book, counted, recount=None, **values):
+    return inventory_accuracy.frappe._dict(
+        name=name, item_code=item, bin="BIN-A", snapshot_balance="BAL-" + item,
+        snapshot_movement="MOVE-0", book_qty=book, counted_qty=counted,
+        counted_at="2026-10-19 10:00:00", recount_qty=recount,
+        recounted_at="2026-10-19 10:05:00" if recount is not None else None,
+        valuation_rate=10, **values,
+    )
+
+
+def _balance(item, physical, allocated=0, held=0, last_movement="MOVE-0"):
+    return inventory_accuracy.frappe._dict(
+        name="BAL-" + item, physical_qty=physical, allocated_qty=allocated,
+        hold_qty=held, last_movement=last_movement,
+    )
+
+
+def _count(items, status="In Progress"):
+    return SimpleNamespace(
+        name="CC-1", warehouse="HYD", bin="BIN-A", status=status, items=items,
+    )
+
+
+def _raise(message, *args, **kwargs):
+    raise ValueError(message)
+
+
+@patch.object(inventory_accuracy, "_require_scope")
+@patch.object(inventory_accuracy.frappe.db, "set_value")
+class TestFinalizeBlindCount(TestCase):
+    def _finalize(self, items, balances):
+        count = _count(items)
+        with patch.object(inventory_accuracy, "_locked_count", return_value=count), \
+                patch.object(inventory_accuracy.frappe, "get_doc", return_value=count), \
+                patch.object(inventory_accuracy, "_locked_balances",
+                             return_value={b.name: b for b in balances}) as lock, \
+                patch.object(inventory_accuracy.frappe.db, "bulk_update") as bulk:
+            result = inventory_accuracy.finalize_blind_count("CC-1")
+        return result, lock, bulk
+
+    def test_every_balance_is_locked_once_and_rows_are_written_in_one_batch(self, set_value, _scope):
+        result, lock, bulk = self._finalize(
+            [_row("R1", "SKU-1", 10, 10), _row("R2", "SKU-2", 5, 3, recount=3)],
+            [_balance("SKU-1", 10), _balance("SKU-2", 5)],
+        )
+
+        lock.assert_called_once_with({"BAL-SKU-1", "BAL-SKU-2"})
+        bulk.assert_called_once()
+        updates = bulk.call_args.args[1]
+        self.assertEqual(updates["R1"]["row_status"], "Matched")
+        self.assertEqual(updates["R2"]["row_status"], "Confirmed Variance")
+        self.assertEqual(updates["R2"]["variance_qty"], -2)
+        self.assertEqual(result["status"], "Variance Review")
+        self.assertEqual(result["review_items"], ["SKU-2"])
+
+    def test_a_balance_moved_after_snapshot_invalidates_the_count(self, set_value, _scope):
+        result, _lock, bulk = self._finalize(
+            [_row("R1", "SKU-1", 10, 10), _row("R2", "SKU-2", 5, 5)],
+            [_balance("SKU-1", 10), _balance("SKU-2", 5, last_movement="MOVE-9")],
+        )
+
+        self.assertEqual(result["status"], "Invalidated")
+        self.assertEqual(result["invalidated_items"], ["SKU-2"])
+        self.assertEqual(list(bulk.call_args.args[1]), ["R2"])
+
+
+@patch.object(inventory_accuracy, "_require_shadow_write")
+@patch.object(inventory_accuracy, "_ledger_entry", return_value=None)
+@patch.object(inventory_accuracy, "_record_idempotency")
+@patch.object(inventory_accuracy.frappe.db, "set_value")
+@patch.object(inventory_accuracy.frappe, "throw", side_effect=_raise)
+class TestPostCountAdjustments(TestCase):
+    def _post(self, items, balances):
+        count = _count(items, status="Variance Review")
+        with patch.object(inventory_accuracy, "_locked_count", return_value=count), \
+                patch.object(inventory_accuracy.frappe, "get_doc", return_value=count), \
+                patch.object(inventory_accuracy, "_locked_balances",
+                             return_value={b.name: b for b in balances}), \
+                patch.object(inventory_accuracy.frappe.db, "bulk_insert") as insert, \
+                patch.object(inventory_accuracy.frappe.db, "bulk_update") as bulk, \
+                patch.object(inventory_accuracy, "_adjustment_result",
+                             return_value={"replayed": False}):
+            inventory_accuracy.post_count_adjustments("count-adjust-0001", "CC-1")
+        return insert, bulk
+
+    def test_approved_variances_post_as_one_movement_group(self, _throw, set_value, record, *_):
+        approved = "Adjustment Approval Required"
+        insert, bulk = self._post(
+            [
+                _row("R1", "SKU-1", 10, 8, recount=8, review_status=approved),
+                _row("R2", "SKU-2", 5, 7, recount=7, review_status=approved),
+                _row("R3", "SKU-3", 4, 4, review_status="Resolved"),
+            ],
+            [_balance("SKU-1", 10, allocated=2), _balance("SKU-2", 5), _balance("SKU-3", 4)],
+        )
+
+        insert.assert_called_once()
+        fields, values = insert.call_args.args[1:3]
+        movements = [dict(zip(fields, row)) for row in values]
+        self.assertEqual(
+            [(m["item_code"], m["source_bin"], m["target_bin"], m["qty"]) for m in movements],
+            [("SKU-1", "BIN-A", None, 2.0), ("SKU-2", None, "BIN-A", 2.0)],
+        )
+        self.assertEqual(
+            [m["idempotency_key"] for m in movements],
+            ["count-adjust-0001#1", "count-adjust-0001#2"],
+        )
+        balances = bulk.call_args_list[0].args[1]
+        self.assertEqual(balances["BAL-SKU-1"]["available_qty"], 6.0)
+        self.assertEqual(balances["BAL-SKU-2"]["physical_qty"], 7.0)
+        self.assertEqual(set_value.call_args.args[2], {"status": "Completed", "review_status": "Resolved"})
+        record.assert_called_once()
+
+    def test_count_below_allocated_stock_is_refused(self, *_):
+        with self.assertRaisesRegex(ValueError, "below allocated plus held"):
+            self._post(
+                [_row("R1", "SKU-1", 10, 1, recount=1,
+                      review_status="Adjustment Approval Required")],
+                [_balance("SKU-1", 10, allocated=3)],
+            )
@@ -0,0 +1,72 @@
+from unittest import TestCase
+from unittest.mock import patch
+
+import frappe
+
+from solara_wms.wms import item_barcodes
+
+
+class _Cache:
+    """Site cache stand-in that counts reads."""
+
+    def __init__(self):
+        self.values = {}
+        self.reads = 0
+
+    def get_value(self, key, generator=None):
+        self.reads += 1
+        if key not in self.values and generator:
+            self.values[key] = generator()
+        return self.values.get(key)
+
+    def delete_value(self, key):
+        self.values.pop(key, None)
+
+
+def _rows():
+    return [
+        frappe._dict(parent="SOL-AF-501", barcode="8906162884118"),
+        frappe._dict(parent="SOL-AF-501", barcode=" 8906162884125 "),
+        frappe._dict(parent="SOL-TRIPLY-101", barcode="ab-100"),
+        frappe._dict(parent="SOL-CAST-IRON-101", barcode="AB-100"),
+        frappe._dict(parent="SOL-CVR-1", barcode=""),
+    ]
+
+
+class TestItemBarcodeIndex(TestCase):
+    def setUp(self):
+        self.cache = _Cache()
+        patcher = patch.object(item_barcodes, "_cache", return_value=self.cache)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    @patch.object(item_barcodes.frappe, "get_all", side_effect=lambda *a, **k: _rows())
+    def test_bulk_and_reverse_lookups_share_one_table_read(self, get_all):
+        self.assertEqual(
+            item_barcodes.barcodes_for(["SOL-AF-501", "SOL-CVR-1", "SOL-NEW"]),
+            {"SOL-AF-501": ["8906162884118", "8906162884125"],
+             "SOL-CVR-1": [], "SOL-NEW": []},
+        )
+        self.assertEqual(self.cache.reads, 1)
+        self.assertEqual(item_barcodes.first_barcode("SOL-AF-501"), "8906162884118")
+        self.assertEqual(sorted(item_barcodes.items_for_barcode(" Ab-100 ")),
+                         ["SOL-CAST-IRON-101", "SOL-TRIPLY-101"])
+        self.assertEqual(item_barcodes.items_for_barcode(""), [])
+        self.assertEqual(get_all.call_count, 1)
+
+    @patch.object(item_barcodes.frappe, "get_all", side_effect=lambda *a, **k: _rows())
+    def test_only_a_barcode_change_drops_the_index(self, get_all):
+        item_barcodes.barcodes_for(["SOL-AF-501"])
+        unchanged = frappe._dict(name="SOL-AF-501", barcodes=[
+            frappe._dict(barcode="8906162884118"), frappe._dict(barcode="8906162884125")])
+        item_barcodes.on_item_update(unchanged)
+        self.assertIn(item_barcodes.INDEX_KEY, self.cache.values)
+
+        unchanged.barcodes.pop()
+        item_barcodes.on_item_update(unchanged)
+        self.assertNotIn(item_barcodes.INDEX_KEY, self.cache.values)
+
+        item_barcodes.barcodes_for(["SOL-AF-501"])
+        self.assertEqual(get_all.call_count, 2)
+        item_barcodes.on_item_rename(unchanged, "after_rename", "SOL-AF-501", "SOL-AF-502")
+        self.assertNotIn(item_barcodes.INDEX_KEY, self.cache.values)
@@ -0,0 +1,127 @@
+from unittest import TestCase
+from unittest.mock import patch
+
+from solara_wms.wms import pack_handoff
+
+
+class TestBatchedHandoffClaim(TestCase):
+    @patch.object(pack_handoff.frappe.db, "sql")
+    def test_multi_sku_parcel_claims_in_constant_round_trips(self, sql):
+        sql.side_effect = [None, ((3,),)]
+
+        pack_handoff._claim_works(
+            "WMS-HANDOFF-1", ["WMS-WORK-C", "WMS-WORK-A", "WMS-WORK-B"])
+
+        self.assertEqual(sql.call_count, 2)
+        query, values = sql.call_args_list[0].args
+        self.assertIn("name IN (%s, %s, %s)", query)
+        self.assertIn("pack_handoff IS NULL", query)
+        self.assertEqual(values[0], "WMS-HANDOFF-1")
+        self.assertEqual(values[-3:], ("WMS-WORK-A", "WMS-WORK-B", "WMS-WORK-C"))
+
+    @patch.object(
+        pack_handoff.frappe, "throw",
+        side_effect=lambda message, *args, **kwargs: (_ for _ in ()).throw(
+            ValueError(message)),
+    )
+    @patch.object(pack_handoff.frappe.db, "sql")
+    def test_partial_claim_fails_the_whole_handoff(self, sql, _throw):
+        sql.side_effect = [None, ((1,),)]
+
+        with self.assertRaisesRegex(ValueError, "changed concurrently"):
+            pack_handoff._claim_works("WMS-HANDOFF-1", ["WMS-WORK-A", "WMS-WORK-B"])
+
+
+
+class TestParcelPickSummary(TestCase):
+    @patch.object(pack_handoff, "_summary_name", return_value="WMS-PPS-1")
+    @patch.object(pack_handoff.frappe.db, "get_value")
+    def test_status_reads_one_summary_row(self, get_value, _name):
+        get_value.return_value = pack_handoff.frappe._dict(
+            delivery_note="DN-1", warehouse="HYD", pack_handoff=None,
+            completed_works='["WMS-WORK-A", "WMS-WORK-B"]',
+            completed_items='{"SKU-1": "2", "SKU-2": "1"}',
+        )
+
+        works, rows = pack_handoff._summary_rows("DN-1", "AWB-1", "HYD")
+
+        get_value.assert_called_once()
+        self.assertEqual(works, ["WMS-WORK-A", "WMS-WORK-B"])
+        self.assertEqual(
+            pack_handoff._match(
+                [{"item_code": "SKU-1", "qty": 2}, {"item_code": "SKU-2", "qty": 1}],
+                rows,
+            ),
+            {"SKU-1": pack_handoff.decimal_qty(2), "SKU-2": pack_handoff.decimal_qty(1)},
+        )
+
+    @patch.object(pack_handoff, "_summary_name", return_value="WMS-PPS-1")
+    @patch.object(pack_handoff.frappe.db, "sql")
+    @patch.object(pack_handoff.frappe.db, "get_value")
+    def test_consumed_summary_has_no_pending_picks(self, get_value, sql, _name):
+        get_value.return_value = pack_handoff.frappe._dict(
+            delivery_note="DN-1", warehouse="HYD", pack_handoff="WMS-PACK-1",
+            completed_works='["WMS-WORK-A"]', completed_items='{"SKU-1": "1"}')
+
+        self.assertEqual(pack_handoff._summary_rows("DN-1", "AWB-1", "HYD"), ([], []))
+        sql.assert_not_called()
+
+    @patch.object(pack_handoff, "_summary_name", return_value="WMS-PPS-1")
+    @patch.object(pack_handoff.frappe.db, "sql")
+    @patch.object(pack_handoff.frappe.db, "get_value")
+    def test_missing_or_foreign_summary_reads_the_work_query(self, get_value, sql, _name):
+        sql.return_value = [
+            pack_handoff.frappe._dict(work="WMS-WORK-A", item_code="SKU-1", executed_qty=1),
+            pack_handoff.frappe._dict(work="WMS-WORK-B", item_code="SKU-1", executed_qty=2),
+        ]
+        for summary in (None, pack_handoff.frappe._dict(
+                delivery_note="DN-2", warehouse="HYD", pack_handoff=None,
+                completed_works="[]", completed_items="{}")):
+            get_value.return_value = summary
+
+            works, rows = pack_handoff._summary_rows("DN-1", "AWB-1", "HYD")
+
+            self.assertEqual(works, ["WMS-WORK-A", "WMS-WORK-B"])
+            self.assertEqual([(row.item_code, row.executed_qty) for row in rows],
+                             [("SKU-1", "3")])
+            self.assertEqual(sql.call_args.args[1], ("HYD", "DN-1", "AWB-1"))
+
+    @patch.object(pack_handoff.frappe, "log_error")
+    @patch.object(pack_handoff, "_summary_name", return_value="WMS-PPS-1")
+    @patch.object(pack_handoff.frappe.db, "sql")
+    def test_foreign_awb_is_logged_not_raised_mid_scan(self, sql, _name, log_error):
+        sql.side_effect = [None, [pack_handoff.frappe._dict(
+            delivery_note="DN-2", warehouse="HYD", completed_works="[]",
+            completed_items="{}")]]
+
+        pack_handoff.record_completed_pick(
+            "AWB-1", "DN-1", "HYD", "WMS-WORK-A", "SKU-1", 1)
+
+        self.assertIn("ON DUPLICATE KEY UPDATE", sql.call_args_list[0].args[0])
+        self.assertNotIn("IGNORE", sql.call_args_list[0].args[0])
+        self.assertEqual(sql.call_count, 2)
+        log_error.assert_called_once()
+
+
+class TestCompletedPickQueryPlan(TestCase):
+    """Regression guard: the parcel lookup must stay on its indexes."""
+
+    def test_completed_pick_lookup_uses_parcel_and_parent_indexes(self):
+        from frappe.modules import load_doctype_module
+
+        load_doctype_module("WMS Work").on_doctype_update()
+        plan = pack_handoff.frappe.db.sql(
+            "EXPLAIN " + pack_handoff.COMPLETED_PICK_SQL,
+            ("HYD", "DN-PLAN", "AWB-PLAN"),
+            as_dict=True,
+        )
+        work = next(row for row in plan if row.get("table") == "w")
+        self.assertIn(
+            "parcel_awb_status_pack_handoff_index",
+            work.get("possible_keys") or "",
+        )
+        self.assertNotEqual(work.get("type"), "ALL")
+        # The line join needs nothing beyond frappe's child-table parent index.
+        line = next(row for row in plan if row.get("table") == "l")
+        self.assertIn("parent", (line.get("possible_keys") or "").split(","))
+        self.assertNotEqual(line.get("type"), "ALL")
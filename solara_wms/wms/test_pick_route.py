@@ -0,0 +1,39 @@
+from decimal import Decimal
+from unittest import TestCase
+from unittest.mock import patch
+
+from solara_wms.wms import pick_route
+from solara_wms.wms.inventory_domain import PickCandidate
+
+
+def _candidates(*bins):
+    return {"SKU-1": [("BAL-" + name, PickCandidate(name, Decimal(qty), 0, 10, seq))
+                      for name, qty, seq in bins]}
+
+
+class TestAllocateBins(TestCase):
+    @patch.object(pick_route, "_pick_candidates",
+                  return_value=_candidates(("H-1", 4, 100), ("H-2", 6, 200)))
+    def test_extra_split_rows_start_unpicked(self, _candidates):
+        rows = pick_route.allocate_bins_for_items([
+            {"item_code": "SKU-1", "qty": 10, "actual_qty": 0, "row_status": "Pending",
+             "difference_qty": -10, "error_message": "Short at last wave"},
+        ], "HYD")
+
+        self.assertEqual([(r["source_bin"], r["qty"]) for r in rows],
+                         [("H-1", 4.0), ("H-2", 6.0)])
+        self.assertEqual((rows[1]["actual_qty"], rows[1]["difference_qty"],
+                          rows[1]["row_status"], rows[1]["error_message"]),
+                         (0, 0, "Pending", ""))
+
+    @patch.object(pick_route, "_pick_candidates",
+                  return_value=_candidates(("H-1", 4, 100), ("H-2", 6, 200)))
+    def test_partly_picked_line_is_not_split(self, _candidates):
+        rows = pick_route.allocate_bins_for_items([
+            {"item_code": "SKU-1", "qty": 10, "actual_qty": 3, "row_status": "Partial"},
+        ], "HYD")
+
+        self.assertEqual(len(rows), 1)
+        self.assertFalse(rows[0].get("source_bin"))
+        self.assertEqual(rows[0]["actual_qty"], 3)
+        self.assertIn("partly picked", rows[0]["error_message"])
@@ -0,0 +1,103 @@
+from unittest import TestCase
+from unittest.mock import MagicMock, patch
+
+from solara_wms.wms import replenishment
+
+
+SETTINGS = replenishment.frappe._dict(
+    operating_mode="Shadow", pilot_warehouse="HYD",
+    replenishment_trigger_enabled=1, replenishment_lookback_days=2,
+    replenishment_forecast_days=3, replenishment_lead_time_hours=2,
+    replenishment_cover_hours=8,
+)
+
+
+def _home(item, physical, bin=None, reserve=True):
+    return replenishment.frappe._dict(
+        item_code=item, bin=bin or "HOME-" + item,
+        reserve_bin="RES-" + item if reserve else None,
+        minimum_qty=0, maximum_qty=100, replenish_qty=0, physical_qty=physical,
+    )
+
+
+@patch.object(replenishment, "_cache", return_value=MagicMock())
+@patch.object(replenishment, "_require_shadow_write")
+@patch.object(replenishment.frappe.db, "savepoint")
+@patch.object(replenishment.frappe.db, "rollback")
+class TestVelocityTrigger(TestCase):
+    def _run(self, homes, velocity, demand, in_flight=()):
+        with patch.object(replenishment, "_home_locations", return_value=homes), \
+                patch.object(replenishment, "_pick_velocity", return_value=velocity), \
+                patch.object(replenishment, "_released_demand", return_value=demand), \
+                patch.object(replenishment, "_open_replenishment_targets",
+                             return_value=set(in_flight)), \
+                patch.object(replenishment, "_create_velocity_work",
+                             side_effect=lambda warehouse, home, *args, **kwargs:
+                             {"work": "WORK-" + home.item_code}) as create:
+            result = replenishment.run_replenishment_trigger("HYD", SETTINGS)
+        return result, create
+
+    def test_face_that_cannot_cover_lead_time_and_released_demand_is_refilled(self, *_):
+        # SKU-1 picks 96 in 48h -> 2/h: trigger = 4 + 10 released = 14.
+        result, create = self._run(
+            [_home("SKU-1", 12), _home("SKU-2", 30)],
+            {("SKU-1", "HOME-SKU-1"): 96, ("SKU-2", "HOME-SKU-2"): 96},
+            {"SKU-1": 10},
+        )
+
+        self.assertEqual(result["works"], ["WORK-SKU-1"])
+        self.assertEqual(result["not_due"], 1)
+        home, minimum, maximum = create.call_args.args[1:4]
+        self.assertEqual((home.item_code, minimum, maximum), ("SKU-1", 14, 30))
+        self.assertFalse(create.call_args.kwargs["urgent"])
+
+    def test_face_with_work_in_flight_or_no_demand_is_left_alone(self, *_):
+        result, create = self._run(
+            [_home("SKU-1", 0), _home("SKU-2", 0)],
+            {("SKU-1", "HOME-SKU-1"): 96},
+            {},
+            in_flight={("SKU-1", "HOME-SKU-1")},
+        )
+
+        create.assert_not_called()
+        self.assertEqual((result["in_flight"], result["not_due"]), (1, 1))
+
+    def test_empty_reserve_is_skipped_without_a_failure(self, *_):
+        with patch.object(replenishment.frappe, "log_error") as log_error:
+            result, create = self._run([_home("SKU-1", 0, reserve=False)],
+                                       {("SKU-1", "HOME-SKU-1"): 96}, {"SKU-1": 10})
+
+        create.assert_not_called()
+        log_error.assert_not_called()
+        self.assertEqual((result["no_reserve"], result["failed"]), (1, 0))
+
+
+@patch.object(replenishment.frappe, "enqueue")
+@patch.object(replenishment, "_settings", return_value=SETTINGS)
+class TestQueueReplenishmentCheck(TestCase):
+    def _queue(self, face, minimum=None):
+        cache = MagicMock()
+        cache.get_value.return_value = minimum
+        with patch.object(replenishment.frappe.db, "sql", return_value=face), \
+                patch.object(replenishment, "_cache", return_value=cache):
+            return replenishment.queue_replenishment_check("HYD", "SKU-1", "HOME-1")
+
+    def test_scan_is_not_queued_when_off_or_the_face_is_not_due(self, settings, enqueue):
+        face = [replenishment.frappe._dict(maximum_qty=100, physical_qty=40)]
+        self.assertFalse(self._queue(face, minimum=14))
+        self.assertFalse(self._queue([]))
+        self.assertFalse(self._queue(
+            [replenishment.frappe._dict(maximum_qty=100, physical_qty=100)]))
+        settings.return_value = replenishment.frappe._dict(
+            SETTINGS, replenishment_trigger_enabled=0)
+        self.assertFalse(self._queue(face))
+        enqueue.assert_not_called()
+
+    def test_face_below_its_last_minimum_queues_one_deduplicated_check(self, _s, enqueue):
+        face = [replenishment.frappe._dict(maximum_qty=100, physical_qty=10)]
+        self.assertTrue(self._queue(face, minimum=14))
+        self.assertTrue(self._queue(face))
+
+        kwargs = enqueue.call_args.kwargs
+        self.assertEqual(kwargs["job_id"], "wms-replenish:HYD:SKU-1:HOME-1")
+        self.assertTrue(kwargs["deduplicate"] and kwargs["enqueue_after_commit"])
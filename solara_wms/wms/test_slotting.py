@@ -0,0 +1,29 @@
+from unittest import TestCase
+
+import frappe
+
+from solara_wms.wms import slotting
+
+
+def _face(item_code, bin, priority=0, route_sequence=0):
+    return frappe._dict(item_code=item_code, bin=bin, priority=priority,
+                        route_sequence=route_sequence)
+
+
+class TestPrimaryHomeFaces(TestCase):
+    def test_each_item_keeps_the_face_picking_drains_first(self):
+        faces = slotting._primary_faces([
+            _face("SKU-1", "H-09", priority=0, route_sequence=90),
+            _face("SKU-1", "H-02", priority=1, route_sequence=20),
+            _face("SKU-1", "H-05", priority=0, route_sequence=50),
+            _face("SKU-2", "H-07", route_sequence=70),
+        ])
+
+        self.assertEqual({item: face.bin for item, face in faces.items()},
+                         {"SKU-1": "H-05", "SKU-2": "H-07"})
+
+    def test_row_order_does_not_change_the_choice(self):
+        rows = [_face("SKU-1", "H-04", route_sequence=40),
+                _face("SKU-1", "H-03", route_sequence=40)]
+        self.assertEqual(slotting._primary_faces(rows)["SKU-1"].bin, "H-03")
+        self.assertEqual(slotting._primary_faces(rows[::-1])["SKU-1"].bin, "H-03")
@@ -0,0 +1,70 @@
+from unittest import TestCase
+from unittest.mock import patch
+
+from solara_wms.wms import wave_pick
+
+
+def _raise(message, *args, **kwargs):
+    raise ValueError(message)
+
+
+def _row(work, awb, position, qty, status="Allocated", item="SKU-1", bin="BIN-A"):
+    return wave_pick.frappe._dict(
+        work=work, status=status, parcel_awb=awb, delivery_note="DN-" + awb,
+        batch_position=position, state=status, item_code=item, source_bin=bin,
+        allocated_qty=qty, route_sequence=100,
+    )
+
+
+def _executed(payload, hash_value, qty, notes=None):
+    return {
+        "work": payload["work"],
+        "event": "EVT-" + payload["idempotency_key"],
+        "event_qty": float(qty),
+        "status_after": "Completed",
+        "work_state": {"parcel_awb": "AWB-" + payload["work"][-1]},
+    }
+
+
+@patch.object(wave_pick, "_require_shadow_write")
+@patch.object(wave_pick, "_validate_bin")
+@patch.object(wave_pick, "resolve_location_scan",
+              return_value=wave_pick.frappe._dict(name="BIN-A"))
+@patch.object(wave_pick.frappe.db, "exists", return_value=True)
+@patch.object(wave_pick, "_existing_splits", return_value=[])
+class TestWavePickScan(TestCase):
+    ROWS = [
+        _row("W-2", "AWB-2", 2, 2),
+        _row("W-1", "AWB-1", 1, 1),
+        _row("W-3", "AWB-3", 3, 1, status="Completed"),
+    ]
+
+    def test_one_bin_visit_is_sorted_back_to_parcel_work(self, *_mocks):
+        with patch.object(wave_pick, "_wave_rows", return_value=self.ROWS), \
+                patch.object(wave_pick, "_execute_pick_scan",
+                             side_effect=_executed) as execute:
+            result = wave_pick.scan_wave_pick(
+                "wave-0001-abcd", "HYD", "D2CB-1", "BIN-A", "SKU-1", qty=3)
+
+        shares = [
+            (call.args[0]["work"], call.args[0]["idempotency_key"], call.args[2])
+            for call in execute.call_args_list
+        ]
+        self.assertEqual(shares, [
+            ("W-1", "wave-0001-abcd#1", 1),
+            ("W-2", "wave-0001-abcd#2", 2),
+        ])
+        self.assertEqual(
+            [(p["slot"], p["parcel_awb"], p["qty"]) for p in result["put_wall"]],
+            [(1, "AWB-1", 1.0), (2, "AWB-2", 2.0)],
+        )
+
+    @patch.object(wave_pick.frappe, "throw", side_effect=_raise)
+    def test_scan_beyond_open_demand_executes_nothing(self, *_mocks):
+        with patch.object(wave_pick, "_wave_rows", return_value=self.ROWS), \
+                patch.object(wave_pick, "_execute_pick_scan") as execute, \
+                self.assertRaisesRegex(ValueError, "exceeds open parcel demand"):
+            wave_pick.scan_wave_pick(
+                "wave-0002-abcd", "HYD", "D2CB-1", "BIN-A", "SKU-1", qty=4)
+
+        execute.assert_not_called()
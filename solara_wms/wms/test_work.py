@@ -0,0 +1,217 @@
+from unittest import TestCase
+from unittest.mock import patch
+
+from solara_wms.wms import inventory, work
+from solara_wms.wms.inventory_domain import PickCandidate
+
+
+def _raise(message, *args, **kwargs):
+    raise ValueError(message)
+
+
+def _fake_sql(work_row, line_row, balance_row):
+    def sql(query, values=None, as_dict=False):
+        if "ROW_COUNT()" in query:
+            return ((1,),)
+        if "FOR UPDATE" in query and "`tabWMS Work Line`" in query:
+            return [work.frappe._dict(line_row)]
+        if "FOR UPDATE" in query and "`tabWMS Work`" in query:
+            return [work.frappe._dict(work_row)]
+        if "FOR UPDATE" in query and "`tabWMS Bin Balance`" in query:
+            return [work.frappe._dict(balance_row)]
+        return None
+
+    return sql
+
+
+def _fake_get_doc(values):
+    doc = work.frappe._dict(values)
+    doc.name = {
+        "WMS Movement": "WMS-MOV-1",
+        "WMS Work Event": "WMS-EVT-1",
+    }[values["doctype"]]
+    doc.insert = lambda **kwargs: None
+    return doc
+
+
+class TestScanPickQueryBudget(TestCase):
+    """One pick scan is the floor's hot path; its round trips are pinned so a
+    regression (say, re-reading the work for the response) fails loudly."""
+
+    WORK = {
+        "name": "WMS-WORK-1", "work_type": "Pick", "status": "Allocated",
+        "priority": "Medium", "warehouse": "HYD", "assigned_to": None,
+        "reference_doctype": "Delivery Note", "reference_name": "DN-1",
+        "parcel_awb": None, "pack_handoff": None, "packed_at": None,
+        "created_event": "WMS-EVT-0", "last_event": "WMS-EVT-0",
+    }
+    LINE = {
+        "name": "LINE-1", "state": "Allocated", "item_code": "SKU-1",
+        "source_bin": "BIN-A", "target_bin": None, "requested_qty": 2,
+        "allocated_qty": 2, "executed_qty": 0,
+    }
+    BALANCE = {
+        "name": "WMS-BAL-1", "warehouse": "HYD", "bin": "BIN-A",
+        "item_code": "SKU-1", "physical_qty": 5, "allocated_qty": 2,
+        "hold_qty": 0, "available_qty": 3,
+    }
+
+    def _scan(self, qty):
+        with patch.object(work, "_require_shadow_write"), \
+                patch.object(work, "resolve_location_scan",
+                             return_value=work.frappe._dict(name="BIN-A")), \
+                patch.object(work, "_validate_bin"), \
+                patch.object(work, "_balance_name", return_value="WMS-BAL-1"), \
+                patch.object(inventory, "_ledger_name", return_value="WMS-IDEM-1"), \
+                patch.object(work, "_queue_replenishment_check") as replenish, \
+                patch.object(work.frappe, "get_doc", side_effect=_fake_get_doc) as get_doc, \
+                patch.object(work.frappe.db, "get_value", return_value=None) as get_value, \
+                patch.object(work.frappe.db, "get_all") as get_all, \
+                patch.object(work.frappe.db, "sql",
+                             side_effect=_fake_sql(self.WORK, self.LINE, self.BALANCE)) as sql:
+            result = work.scan_pick(
+                "scan-0001-abcd", "HYD", "WMS-WORK-1", "BIN-A", "SKU-1", qty=qty)
+        self.assertEqual(get_doc.call_count, 2)  # movement + work event inserts
+        replenish.assert_called_once_with("HYD", "SKU-1", "BIN-A")
+        return result, sql, get_value, get_all
+
+    def test_partial_scan_stays_within_budget(self):
+        result, sql, get_value, get_all = self._scan(1)
+
+        # One ledger read; lock work, line and balance; guarded balance update
+        # + ROW_COUNT; line update; balance last_movement; ledger insert; work
+        # update.
+        self.assertEqual(get_value.call_count, 1)
+        self.assertEqual(sql.call_count, 9)
+        get_all.assert_not_called()
+        self.assertEqual(result["work_state"]["status"], "In Progress")
+        self.assertEqual(result["work_state"]["last_event"], "WMS-EVT-1")
+        self.assertEqual(result["work_state"]["line"]["allocated_qty"], 1)
+        self.assertEqual(result["work_state"]["line"]["executed_qty"], 1)
+
+    def test_completing_scan_reports_written_state_without_requery(self):
+        result, sql, get_value, get_all = self._scan(2)
+
+        self.assertEqual(sql.call_count, 9)
+        get_all.assert_not_called()
+        state = result["work_state"]
+        self.assertEqual(state["status"], "Completed")
+        self.assertEqual(state["line"]["state"], "Completed")
+        self.assertEqual(state["line"]["allocated_qty"], 0)
+        self.assertEqual(state["line"]["executed_qty"], 2)
+        self.assertFalse(state["replayed"])
+
+
+@patch.object(inventory, "_ledger_name", return_value="WMS-IDEM-1")
+@patch.object(inventory.frappe, "throw", side_effect=_raise)
+class TestIdempotencyLedger(TestCase):
+    def _entry(self, command="Work", request_hash="hash-1"):
+        return inventory.frappe._dict(
+            command=command, request_hash=request_hash,
+            result_doctype="WMS Work Event", result_name="WMS-EVT-1",
+        )
+
+    @patch.object(work, "_event_result", return_value={"replayed": True})
+    @patch.object(work.frappe, "get_doc")
+    @patch.object(inventory.frappe.db, "get_value")
+    def test_replay_is_one_ledger_read(self, get_value, get_doc, _result, _throw, _name):
+        get_value.return_value = self._entry()
+
+        self.assertEqual(
+            work._existing_event("scan-0001-abcd", "hash-1"), {"replayed": True})
+
+        get_value.assert_called_once()
+        self.assertEqual(get_value.call_args.args[:2], ("WMS Idempotency Ledger", "WMS-IDEM-1"))
+        get_doc.assert_called_once_with("WMS Work Event", "WMS-EVT-1")
+
+    @patch.object(inventory.frappe.db, "get_value")
+    def test_movement_key_cannot_drive_work(self, get_value, _throw, _name):
+        get_value.return_value = self._entry(command="Movement")
+
+        with self.assertRaisesRegex(ValueError, "physical movement"):
+            work._existing_event("move-0001-abcd", "hash-1")
+
+    @patch.object(inventory.frappe.db, "get_value")
+    def test_changed_body_is_a_conflict(self, get_value, _throw, _name):
+        get_value.return_value = self._entry(request_hash="hash-0")
+
+        with self.assertRaisesRegex(ValueError, "different work"):
+            work._existing_work("work-0001-abcd", "hash-1")
+
+
+class TestSplitPickWork(TestCase):
+    def _balance(self, name, bin_name, physical, allocated=0):
+        return work.frappe._dict(
+            name=name, bin=bin_name, physical_qty=physical,
+            allocated_qty=allocated, hold_qty=0,
+        )
+
+    def _created(self, payload, hash_value, work_type, warehouse, item_code,
+                 source_bin, qty, **kwargs):
+        return {
+            "work": "WORK-" + payload["idempotency_key"],
+            "event": "EVT-" + payload["idempotency_key"],
+            "allocated_after": float(qty),
+            "work_state": {"line": {"source_bin": source_bin}},
+        }
+
+    def test_line_is_split_on_locked_availability_with_one_key_per_work(self):
+        candidates = {"SKU-1": [
+            ("BAL-A", PickCandidate("BIN-A", 99, route_sequence=200)),
+            ("BAL-B", PickCandidate("BIN-B", 99, route_sequence=100)),
+        ]}
+        # Another picker took most of BIN-A between the read and the lock.
+        locked = {
+            "BAL-A": self._balance("BAL-A", "BIN-A", 10, allocated=8),
+            "BAL-B": self._balance("BAL-B", "BIN-B", 4),
+        }
+        with patch.object(work, "_require_shadow_write"), \
+                patch.object(work, "_existing_work", return_value=None), \
+                patch.object(work, "_pick_candidates", return_value=candidates), \
+                patch.object(work, "_locked_balances", return_value=locked) as lock, \
+                patch.object(work, "_set_balance_allocation") as reserve, \
+                patch.object(work, "_create_work", side_effect=self._created):
+            result = work.create_split_pick_work("pick-0001-abcd", "HYD", "SKU-1", 6)
+
+        lock.assert_called_once_with(["BAL-A", "BAL-B"])
+        self.assertEqual(
+            [(call.args[0], call.args[2].allocated) for call in reserve.call_args_list],
+            [("BAL-B", 4), ("BAL-A", 10)],
+        )
+        self.assertEqual(
+            [(s["work"], s["source_bin"], s["qty"]) for s in result["splits"]],
+            [("WORK-pick-0001-abcd#1", "BIN-B", 4.0),
+             ("WORK-pick-0001-abcd#2", "BIN-A", 2.0)],
+        )
+
+    @patch.object(work.frappe, "throw", side_effect=_raise)
+    def test_shortfall_reserves_nothing(self, _throw):
+        candidates = {"SKU-1": [("BAL-A", PickCandidate("BIN-A", 3))]}
+        with patch.object(work, "_require_shadow_write"), \
+                patch.object(work, "_existing_work", return_value=None), \
+                patch.object(work, "_pick_candidates", return_value=candidates), \
+                patch.object(work, "_locked_balances",
+                             return_value={"BAL-A": self._balance("BAL-A", "BIN-A", 3)}), \
+                patch.object(work, "_set_balance_allocation") as reserve, \
+                self.assertRaisesRegex(ValueError, "across bins"):
+            work.create_split_pick_work("pick-0002-abcd", "HYD", "SKU-1", 5)
+
+        reserve.assert_not_called()
+
+
+@patch.object(inventory.frappe.db, "sql")
+@patch.object(inventory.frappe.db, "get_single_value")
+class TestIdempotencyLedgerArchive(TestCase):
+    @patch.object(inventory, "now_datetime", return_value="2026-10-19 02:00:00")
+    @patch.object(inventory, "add_days", side_effect=lambda when, days: days)
+    def test_never_archives_inside_the_client_retry_window(
+            self, _add_days, _now, get_single_value, sql):
+        for setting, kept in ((3, inventory.IDEMPOTENCY_RETRY_WINDOW_DAYS), (45, 45)):
+            get_single_value.return_value = setting
+            inventory.archive_idempotency_ledger()
+            self.assertEqual(sql.call_args.args[1], (-kept,))
+
+    def test_zero_retention_keeps_the_ledger(self, get_single_value, sql):
+        get_single_value.return_value = 0
+        inventory.archive_idempotency_ledger()
+        sql.assert_not_called()
@@ -2,6 +2,8 @@ import frappe
 from frappe import _
 from frappe.utils import flt
 
+from solara_wms.wms.item_barcodes import first_barcode
+
 
 def is_stock_frozen(item_code=None, warehouse=None, bin_code=None, batch_no=None):
     """
@@ -84,18 +86,7 @@ def get_item_barcode(item_code):
     Get barcode for an item from the Item Barcode child table.
     Returns the first barcode found, or None.
     """
-    barcodes = frappe.get_all(
-        "Item Barcode",
-        filters={"parent": item_code, "parenttype": "Item"},
-        fields=["barcode", "barcode_type"],
-        order_by="idx asc",
-        limit=1,
-    )
-
-    if barcodes:
-        return barcodes[0].barcode
-
-    return None
+    return first_barcode(item_code)
 
 
 def get_book_qty(item_code, warehouse):
@@ -0,0 +1,97 @@
+"""Pure wave consolidation for D2C batch picking.
+
+Per-parcel pick work stays the unit of record (pack handoff consumes it by
+parcel AWB). A wave only changes how the picker walks: demand for the same
+item in the same bin is visited once, and the picked quantity is sorted back
+to parcels through numbered put-wall slots.
+"""
+
+from decimal import Decimal
+
+from solara_wms.wms.inventory_domain import (
+    InventoryInvariantError,
+    canonical_qty,
+    decimal_qty,
+)
+
+
+def put_wall_slots(parcels):
+    """Slot 1..N per parcel AWB, in batch order.
+
+    `parcels` is an iterable of (batch_position, parcel_awb). Slots are
+    assigned from every parcel in the wave, open or already picked, so a
+    parcel keeps its slot for the whole wave.
+    """
+    slots = {}
+    for _position, awb in sorted(set(parcels)):
+        if awb not in slots:
+            slots[awb] = len(slots) + 1
+    return slots
+
+
+def consolidate_wave_picks(demands, slots):
+    """Group open parcel demand into one pick per bin and item.
+
+    `demands` are mappings with work, parcel_awb, delivery_note, item_code,
+    source_bin, route_sequence and open_qty. Picks come back in route order;
+    each carries its put-wall breakdown in slot order.
+    """
+    picks = {}
+    for demand in demands:
+        open_qty = decimal_qty(demand["open_qty"])
+        if open_qty <= 0:
+            continue
+        key = (demand["source_bin"], demand["item_code"])
+        pick = picks.setdefault(
+            key,
+            {
+                "source_bin": demand["source_bin"],
+                "item_code": demand["item_code"],
+                "route_sequence": demand.get("route_sequence") or 0,
+                "qty": Decimal("0"),
+                "parcels": [],
+            },
+        )
+        pick["qty"] += open_qty
+        pick["parcels"].append(
+            {
+                "slot": slots[demand["parcel_awb"]],
+                "parcel_awb": demand["parcel_awb"],
+                "delivery_note": demand["delivery_note"],
+                "work": demand["work"],
+                "qty": open_qty,
+            }
+        )
+    ordered = sorted(
+        picks.values(),
+        key=lambda pick: (pick["route_sequence"], pick["source_bin"], pick["item_code"]),
+    )
+    for pick in ordered:
+        pick["parcels"].sort(key=lambda parcel: (parcel["slot"], parcel["work"]))
+    return ordered
+
+
+def distribute_wave_scan(qty, parcels):
+    """Sort one consolidated scan back to parcels, lowest slot first.
+
+    Returns (work, qty) shares. A scan larger than the open demand is refused
+    whole rather than leaving surplus stock unaccounted for on the cart.
+    """
+    remaining = decimal_qty(qty)
+    if remaining <= 0:
+        raise InventoryInvariantError("Pick quantity must be greater than zero")
+    open_qty = sum((decimal_qty(parcel["qty"]) for parcel in parcels), Decimal("0"))
+    if remaining > open_qty:
+        raise InventoryInvariantError(
+            f"Wave pick exceeds open parcel demand: {canonical_qty(open_qty)} open, "
+            f"{canonical_qty(remaining)} scanned"
+        )
+    shares = []
+    for parcel in parcels:
+        if remaining <= 0:
+            break
+        share = min(remaining, decimal_qty(parcel["qty"]))
+        if share > 0:
+            shares.append((parcel["work"], share))
+            remaining -= share
+    return shares
@@ -0,0 +1,219 @@
+"""Consolidated wave picking across the parcels of a D2C Prepare Batch.
+
+The picker gets one stop per bin and item for the whole wave and a put-wall
+breakdown of where each unit goes. The per-parcel Pick work underneath is
+unchanged: a consolidated scan is recorded as one Pick Scan event per parcel
+share (keyed `<idempotency_key>#<n>`), so parcel_awb traceability and
+consume_pack_handoff work exactly as for single-parcel picking.
+"""
+
+import frappe
+from frappe import _
+from frappe.utils import cint, flt
+
+from solara_wms.wms.inventory import (
+    _idempotency_key,
+    _require_shadow_write,
+    _validate_bin,
+)
+from solara_wms.wms.inventory_domain import canonical_qty, decimal_qty
+from solara_wms.wms.location_master import resolve_location_scan
+from solara_wms.wms.wave_domain import (
+    consolidate_wave_picks,
+    distribute_wave_scan,
+    put_wall_slots,
+)
+from solara_wms.wms.work import (
+    SPLIT_KEY_MAX_LENGTH,
+    _decimal,
+    _domain,
+    _execute_pick_scan,
+    _existing_splits,
+    _split_hash,
+    _split_key,
+)
+
+
+BATCH_DOCTYPE = "D2C Prepare Batch"
+OPEN_STATES = ("Allocated", "In Progress")
+# A consolidated scan fans out to at most one share per parcel in the stop.
+MAX_WAVE_SHARES = 500
+
+
+def _wave_rows(batch, warehouse):
+    """Every parcel Pick work of the batch's Delivery Notes, in one query.
+
+    Completed work is included so put-wall slots stay stable as the wave
+    progresses; only open lines carry demand.
+    """
+    return frappe.db.sql(
+        """
+        SELECT w.name AS work, w.status, w.parcel_awb,
+               w.reference_name AS delivery_note, bdn.idx AS batch_position,
+               l.state, l.item_code, l.source_bin, l.allocated_qty,
+               wb.route_sequence
+          FROM `tabD2C Prepare Batch DN` bdn
+          JOIN `tabWMS Work` w
+            ON w.reference_doctype = 'Delivery Note'
+           AND w.reference_name = bdn.delivery_note
+          JOIN `tabWMS Work Line` l
+            ON l.parent = w.name AND l.parenttype = 'WMS Work'
+          LEFT JOIN `tabWarehouse Bin` wb ON wb.name = l.source_bin
+         WHERE bdn.parent = %s AND bdn.parenttype = %s
+           AND w.work_type = 'Pick'
+           AND w.warehouse = %s
+           AND w.status != 'Cancelled'
+           AND IFNULL(w.parcel_awb, '') != ''
+        """,
+        (batch, BATCH_DOCTYPE, warehouse),
+        as_dict=True,
+    )
+
+
+def _wave_plan(batch, warehouse):
+    if not frappe.db.exists(BATCH_DOCTYPE, batch):
+        frappe.throw(_("D2C Prepare Batch {0} does not exist").format(batch))
+    rows = _wave_rows(batch, warehouse)
+    slots = put_wall_slots((cint(row.batch_position), row.parcel_awb) for row in rows)
+    demands = [
+        {
+            "work": row.work,
+            "parcel_awb": row.parcel_awb,
+            "delivery_note": row.delivery_note,
+            "item_code": row.item_code,
+            "source_bin": row.source_bin,
+            "route_sequence": cint(row.route_sequence),
+            "open_qty": row.allocated_qty,
+        }
+        for row in rows
+        if row.status in OPEN_STATES and row.state in OPEN_STATES
+    ]
+    return slots, consolidate_wave_picks(demands, slots)
+
+
+def _float_qty(pick):
+    return {
+        **pick,
+        "qty": flt(pick["qty"]),
+        "parcels": [{**p, "qty": flt(p["qty"])} for p in pick["parcels"]],
+    }
+
+
+@frappe.whitelist(methods=["GET"])
+def get_wave_pick_list(batch, warehouse):
+    """Consolidated pick list for a batch: one stop per bin and item, in route
+    order, with each stop's put-wall breakdown."""
+    slots, picks = _wave_plan(batch, warehouse)
+    return {
+        "batch": batch,
+        "warehouse": warehouse,
+        "parcels": len(slots),
+        "put_wall": [{"slot": slot, "parcel_awb": awb} for awb, slot in
+                     sorted(slots.items(), key=lambda item: item[1])],
+        "picks": [_float_qty(pick) for pick in picks],
+    }
+
+
+def _wave_scan_result(payload, results, slots, replayed=False):
+    put_wall = []
+    for result in results:
+        awb = result["work_state"]["parcel_awb"]
+        put_wall.append(
+            {
+                "slot": slots.get(awb),
+                "parcel_awb": awb,
+                "work": result["work"],
+                "qty": result["event_qty"],
+                "event": result["event"],
+                "work_status": result["status_after"],
+            }
+        )
+    return {
+        "idempotency_key": payload["idempotency_key"],
+        "batch": payload["batch"],
+        "scanned_bin": payload["scanned_bin"],
+        "item_code": payload["scanned_item_code"],
+        "qty": flt(payload["qty"]),
+        "put_wall": put_wall,
+        "replayed": bool(replayed),
+    }
+
+
+@frappe.whitelist(methods=["POST"])
+def scan_wave_pick(
+    idempotency_key,
+    warehouse,
+    batch,
+    scanned_bin,
+    scanned_item_code,
+    qty=1,
+    device_id=None,
+    notes=None,
+):
+    """One consolidated scan at a wave stop, sorted back to parcels.
+
+    The quantity fills the stop's parcels lowest put-wall slot first; each
+    share is an ordinary Pick Scan on that parcel's work in this transaction,
+    so a failure on any share rolls the whole scan back.
+    """
+    _require_shadow_write(warehouse)
+    key = _idempotency_key(idempotency_key)
+    if len(key) > SPLIT_KEY_MAX_LENGTH:
+        frappe.throw(
+            _("Wave pick Idempotency Key must be at most {0} characters").format(
+                SPLIT_KEY_MAX_LENGTH
+            )
+        )
+    scanned_bin = resolve_location_scan(warehouse, scanned_bin).name
+    _validate_bin(warehouse, scanned_bin)
+    scan_qty = _decimal(qty)
+    if scan_qty <= 0:
+        frappe.throw(_("Pick Quantity must be greater than zero"))
+    payload = {
+        "command": "Wave Pick Scan",
+        "idempotency_key": key,
+        "warehouse": warehouse,
+        "batch": batch,
+        "scanned_bin": scanned_bin,
+        "scanned_item_code": scanned_item_code,
+        "qty": canonical_qty(scan_qty),
+        "device_id": (device_id or "").strip(),
+        "notes": notes or "",
+    }
+    replayed = _existing_splits(payload, limit=MAX_WAVE_SHARES)
+    slots, picks = _wave_plan(batch, warehouse)
+    if replayed:
+        return _wave_scan_result(payload, replayed, slots, replayed=True)
+    stop = next(
+        (
+            pick
+            for pick in picks
+            if pick["source_bin"] == scanned_bin and pick["item_code"] == scanned_item_code
+        ),
+        None,
+    )
+    if not stop:
+        frappe.throw(
+            _("No open wave demand for {0} in bin {1}").format(scanned_item_code, scanned_bin)
+        )
+
+    shares = _domain(distribute_wave_scan, scan_qty, stop["parcels"])
+    results = []
+    for share, (work, share_qty) in enumerate(shares, start=1):
+        share_payload = {
+            "command": "Pick Scan",
+            "idempotency_key": _split_key(key, share),
+            "warehouse": warehouse,
+            "work": work,
+            "scanned_bin": scanned_bin,
+            "scanned_item_code": scanned_item_code,
+            "qty": canonical_qty(share_qty),
+            "device_id": payload["device_id"],
+            "notes": payload["notes"],
+        }
+        results.append(
+            _execute_pick_scan(
+                share_payload, _split_hash(payload, share), decimal_qty(share_qty), notes
+            )
+        )
+    return _wave_scan_result(payload, results, slots)
@@ -5,18 +5,19 @@ ERPNext stock documents.
 """
 
 import hashlib
+from dataclasses import replace
 
 import frappe
 from frappe import _
 from frappe.utils import flt, now_datetime
 
 from solara_wms.wms.inventory import (
-    MOVEMENT_DOCTYPE,
     _balance_name,
-    _conflict,
     _idempotency_key,
+    _ledger_entry,
     _locked_balances,
     _movement_doc,
+    _record_idempotency,
     _require_shadow_write,
     _validate_bin,
 )
@@ -28,16 +29,22 @@ from solara_wms.wms.inventory_domain import (
     complete_allocated_move,
     decimal_qty,
     execute_allocated_pick,
+    plan_pick_allocation,
     plan_replenishment,
     release_allocation,
     request_hash,
 )
 from solara_wms.wms.location_master import resolve_location_scan
+from solara_wms.wms.pack_handoff import record_completed_pick
+from solara_wms.wms.pick_route import _pick_candidates
 
 
 WORK_DOCTYPE = "WMS Work"
 WORK_LINE_DOCTYPE = "WMS Work Line"
 WORK_EVENT_DOCTYPE = "WMS Work Event"
+# A split pick keys each of its works "<key>#<n>"; the ledger key is 140 wide.
+MAX_PICK_SPLITS = 20
+SPLIT_KEY_MAX_LENGTH = 136
 
 
 def _decimal(value):
@@ -54,17 +61,6 @@ def _domain(function, *args):
         frappe.throw(_(str(exc)))
 
 
-def _ensure_creation_key_available(idempotency_key):
-    if frappe.db.get_value(
-        MOVEMENT_DOCTYPE, {"idempotency_key": idempotency_key}, "name"
-    ):
-        _conflict(_("Idempotency Key was already used for a physical movement"))
-    if frappe.db.get_value(
-        WORK_EVENT_DOCTYPE, {"idempotency_key": idempotency_key}, "name"
-    ):
-        _conflict(_("Idempotency Key was already used for a work command"))
-
-
 def _work_line(work_name):
     rows = frappe.db.get_all(
         WORK_LINE_DOCTYPE,
@@ -87,43 +83,59 @@ def _work_line(work_name):
     return rows[0]
 
 
-def _work_result(work_name, replayed=False):
-    work = frappe.db.get_value(
-        WORK_DOCTYPE,
-        work_name,
-        [
-            "name",
-            "work_type",
-            "status",
-            "priority",
-            "warehouse",
-            "assigned_to",
-            "reference_doctype",
-            "reference_name",
-            "parcel_awb",
-            "pack_handoff",
-            "packed_at",
-            "created_event",
-            "last_event",
-        ],
-        as_dict=True,
-    )
-    if not work:
-        frappe.throw(_("WMS Work {0} does not exist").format(work_name))
-    line = _work_line(work_name)
+WORK_RESULT_FIELDS = (
+    "name",
+    "work_type",
+    "status",
+    "priority",
+    "warehouse",
+    "assigned_to",
+    "reference_doctype",
+    "reference_name",
+    "parcel_awb",
+    "pack_handoff",
+    "packed_at",
+    "created_event",
+    "last_event",
+)
+LINE_RESULT_FIELDS = (
+    "name",
+    "state",
+    "item_code",
+    "source_bin",
+    "target_bin",
+    "requested_qty",
+    "allocated_qty",
+    "executed_qty",
+)
+
+
+def _work_state(work, line, replayed=False):
+    """Shape one work and its line for the scanner, from rows already in hand."""
     return {
-        **dict(work),
+        **{field: work.get(field) for field in WORK_RESULT_FIELDS},
         "line": {
-            **dict(line),
-            "requested_qty": flt(line.requested_qty),
-            "allocated_qty": flt(line.allocated_qty),
-            "executed_qty": flt(line.executed_qty),
+            **{field: line.get(field) for field in LINE_RESULT_FIELDS},
+            "requested_qty": flt(line.get("requested_qty")),
+            "allocated_qty": flt(line.get("allocated_qty")),
+            "executed_qty": flt(line.get("executed_qty")),
         },
         "replayed": bool(replayed),
     }
 
 
-def _event_result(doc, replayed=False):
+def _work_result(work_name, replayed=False):
+    work = frappe.db.get_value(
+        WORK_DOCTYPE, work_name, list(WORK_RESULT_FIELDS), as_dict=True
+    )
+    if not work:
+        frappe.throw(_("WMS Work {0} does not exist").format(work_name))
+    return _work_state(work, _work_line(work_name), replayed=replayed)
+
+
+def _event_result(doc, replayed=False, work_state=None):
+    """Command response. Handlers pass the in-transaction work state they just
+    wrote; only replays and reads fall back to querying the work."""
     result = {
         "event": doc.name,
         "event_type": doc.event_type,
@@ -142,38 +154,31 @@ def _event_result(doc, replayed=False):
         "movement": doc.movement,
         "replayed": bool(replayed),
     }
-    result["work_state"] = _work_result(doc.work)
+    result["work_state"] = work_state or _work_result(doc.work)
     return result
 
 
 def _existing_work(idempotency_key, expected_hash):
-    row = frappe.db.get_value(
-        WORK_DOCTYPE,
-        {"creation_idempotency_key": idempotency_key},
-        ["name", "creation_request_hash", "created_event"],
-        as_dict=True,
-    )
-    if not row:
-        return None
-    if row.creation_request_hash != expected_hash:
-        _conflict(_("Idempotency Key was already used for different work"))
-    if not row.created_event:
-        frappe.throw(_("WMS Work creation evidence is missing"))
-    return _event_result(
-        frappe.get_doc(WORK_EVENT_DOCTYPE, row.created_event), replayed=True
+    return _existing_event(
+        idempotency_key,
+        expected_hash,
+        _("Idempotency Key was already used for different work"),
     )
 
 
-def _existing_event(idempotency_key, expected_hash):
-    name = frappe.db.get_value(
-        WORK_EVENT_DOCTYPE, {"idempotency_key": idempotency_key}, "name"
+def _existing_event(idempotency_key, expected_hash, different_request=None):
+    entry = _ledger_entry(
+        idempotency_key,
+        expected_hash,
+        "Work",
+        different_request
+        or _("Idempotency Key was already used for a different work command"),
     )
-    if not name:
+    if not entry:
         return None
-    doc = frappe.get_doc(WORK_EVENT_DOCTYPE, name)
-    if doc.request_hash != expected_hash:
-        _conflict(_("Idempotency Key was already used for a different work command"))
-    return _event_result(doc, replayed=True)
+    return _event_result(
+        frappe.get_doc(WORK_EVENT_DOCTYPE, entry.result_name), replayed=True
+    )
 
 
 def _work_event(payload, hash_value, **values):
@@ -188,6 +193,9 @@ def _work_event(payload, hash_value, **values):
         }
     )
     doc.insert(ignore_permissions=True)
+    _record_idempotency(
+        payload["idempotency_key"], hash_value, "Work", WORK_EVENT_DOCTYPE, doc.name
+    )
     return doc
 
 
@@ -284,7 +292,8 @@ def _create_work(
         """,
         (event.name, event.name, work.name),
     )
-    return _event_result(event)
+    work.created_event = work.last_event = event.name
+    return _event_result(event, work_state=_work_state(work, work.lines[0]))
 
 
 def _location_policy(warehouse, item_code, bin_name, location_role):
@@ -315,14 +324,20 @@ def _location_policy(warehouse, item_code, bin_name, location_role):
     return row
 
 
+def _queue_replenishment_check(warehouse, item_code, bin_name):
+    from solara_wms.wms.replenishment import queue_replenishment_check
+
+    queue_replenishment_check(warehouse, item_code, bin_name)
+
+
 def _locked_work(work_name):
     work_rows = frappe.db.sql(
         """
-        SELECT name, work_type, status, warehouse
+        SELECT {0}
           FROM `tabWMS Work`
          WHERE name = %s
          FOR UPDATE
-        """,
+        """.format(", ".join(WORK_RESULT_FIELDS)),
         (work_name,),
         as_dict=True,
     )
@@ -389,7 +404,6 @@ def create_pick_work(
     replay = _existing_work(key, hash_value)
     if replay:
         return replay
-    _ensure_creation_key_available(key)
 
     balance_name = _balance_name(warehouse, source_bin, item_code)
     locked = _locked_balances([balance_name])
@@ -419,6 +433,148 @@ def create_pick_work(
     )
 
 
+def _split_key(idempotency_key, split):
+    return "{0}#{1}".format(idempotency_key, split)
+
+
+def _split_hash(payload, split):
+    return request_hash({**payload, "split": split})
+
+
+def _split_pick_result(payload, results, replayed=False):
+    return {
+        "idempotency_key": payload["idempotency_key"],
+        "warehouse": payload["warehouse"],
+        "item_code": payload["item_code"],
+        "requested_qty": flt(payload["qty"]),
+        "splits": [
+            {
+                "work": result["work"],
+                "source_bin": result["work_state"]["line"]["source_bin"],
+                "qty": result["allocated_after"],
+                "event": result["event"],
+            }
+            for result in results
+        ],
+        "works": results,
+        "replayed": bool(replayed),
+    }
+
+
+def _existing_splits(payload, limit=MAX_PICK_SPLITS):
+    """Replayed results of a command recorded as `<key>#1..n` events."""
+    results = []
+    for split in range(1, limit + 1):
+        replay = _existing_work(
+            _split_key(payload["idempotency_key"], split), _split_hash(payload, split)
+        )
+        if not replay:
+            break
+        results.append(replay)
+    return results
+
+
+@frappe.whitelist(methods=["POST"])
+def create_split_pick_work(
+    idempotency_key,
+    warehouse,
+    item_code,
+    qty,
+    priority="Medium",
+    assigned_to=None,
+    reference_doctype=None,
+    reference_name=None,
+    parcel_awb=None,
+    device_id=None,
+    notes=None,
+):
+    """Allocate one pick line from the bins the allocation engine chooses.
+
+    Candidates are the item's Home/Overflow/Reserve balances; the line is
+    split across several bins only when no single bin covers it. Every
+    candidate balance is locked in one ordered statement before anything is
+    reserved, so the whole line is allocated or none of it is. Each split is a
+    one-line Pick work keyed `<idempotency_key>#<n>`.
+    """
+    _require_shadow_write(warehouse)
+    key = _idempotency_key(idempotency_key)
+    if len(key) > SPLIT_KEY_MAX_LENGTH:
+        frappe.throw(
+            _("Split pick Idempotency Key must be at most {0} characters").format(
+                SPLIT_KEY_MAX_LENGTH
+            )
+        )
+    allocation_qty = _decimal(qty)
+    if allocation_qty <= 0:
+        frappe.throw(_("Pick Quantity must be greater than zero"))
+    parcel_awb = (parcel_awb or "").strip()
+    if parcel_awb and (reference_doctype != "Delivery Note" or not reference_name):
+        frappe.throw(_("Parcel AWB pick work requires a Delivery Note reference"))
+    payload = {
+        "command": "Allocate Split Pick",
+        "idempotency_key": key,
+        "warehouse": warehouse,
+        "item_code": item_code,
+        "qty": canonical_qty(allocation_qty),
+        "priority": priority or "Medium",
+        "assigned_to": assigned_to or "",
+        "reference_doctype": reference_doctype or "",
+        "reference_name": reference_name or "",
+        "parcel_awb": parcel_awb,
+        "device_id": (device_id or "").strip(),
+        "notes": notes or "",
+    }
+    replayed = _existing_splits(payload)
+    if replayed:
+        return _split_pick_result(payload, replayed, replayed=True)
+
+    candidates = _pick_candidates(warehouse, [item_code]).get(item_code, [])
+    locked = _locked_balances([name for name, _candidate in candidates]) if candidates else {}
+    balances = {}
+    pool = []
+    for balance_name, candidate in candidates:
+        row = locked.get(balance_name)
+        if not row:
+            continue
+        before = BalanceState.from_values(
+            row.physical_qty, row.allocated_qty, row.hold_qty
+        )
+        balances[candidate.bin] = (balance_name, before)
+        pool.append(replace(candidate, available=before.available))
+    splits = _domain(plan_pick_allocation, allocation_qty, pool)
+    if len(splits) > MAX_PICK_SPLITS:
+        frappe.throw(
+            _("{0} would need {1} bins; replenish the pick face first").format(
+                item_code, len(splits)
+            )
+        )
+
+    results = []
+    for split, (source_bin, split_qty) in enumerate(splits, start=1):
+        balance_name, before = balances[source_bin]
+        after = _domain(allocate_balance, before, split_qty)
+        _set_balance_allocation(balance_name, before, after)
+        results.append(
+            _create_work(
+                {**payload, "idempotency_key": _split_key(key, split)},
+                _split_hash(payload, split),
+                "Pick",
+                warehouse,
+                item_code,
+                source_bin,
+                split_qty,
+                priority=priority,
+                assigned_to=assigned_to,
+                reference_doctype=reference_doctype,
+                reference_name=reference_name,
+                parcel_awb=parcel_awb,
+                device_id=payload["device_id"],
+                notes=notes,
+            )
+        )
+    return _split_pick_result(payload, results)
+
+
 @frappe.whitelist(methods=["POST"])
 def create_replenishment_work(
     idempotency_key,
@@ -456,8 +612,37 @@ def create_replenishment_work(
     replay = _existing_work(key, hash_value)
     if replay:
         return replay
-    _ensure_creation_key_available(key)
+    return _allocate_replenishment(
+        payload,
+        hash_value,
+        home.minimum_qty,
+        home.maximum_qty,
+        home.replenish_qty,
+        priority=priority,
+        assigned_to=assigned_to,
+        notes=notes,
+    )
+
 
+def _allocate_replenishment(
+    payload,
+    hash_value,
+    minimum_qty,
+    maximum_qty,
+    replenish_qty=0,
+    priority="Medium",
+    assigned_to=None,
+    notes=None,
+):
+    """Reserve the planned quantity on the Reserve balance and open the work.
+
+    The Home policy bounds are passed in so the velocity trigger can supply
+    its own min/max; explicit requests use the Item Location's.
+    """
+    warehouse = payload["warehouse"]
+    item_code = payload["item_code"]
+    source_bin = payload["source_bin"]
+    target_bin = payload["target_bin"]
     source_name = _balance_name(warehouse, source_bin, item_code)
     target_name = _balance_name(warehouse, target_bin, item_code)
     locked = _locked_balances([source_name, target_name])
@@ -475,9 +660,9 @@ def create_replenishment_work(
         plan_replenishment,
         source,
         target,
-        home.minimum_qty,
-        home.maximum_qty,
-        home.replenish_qty,
+        minimum_qty,
+        maximum_qty,
+        replenish_qty,
     )
     source_after = _domain(allocate_balance, source, qty)
     _set_balance_allocation(source_name, source, source_after)
@@ -514,10 +699,6 @@ def release_work(idempotency_key, warehouse, work, device_id=None, notes=None):
     replay = _existing_event(key, hash_value)
     if replay:
         return replay
-    if frappe.db.get_value(
-        MOVEMENT_DOCTYPE, {"idempotency_key": key}, "name"
-    ):
-        _conflict(_("Idempotency Key was already used for a physical movement"))
 
     work_row, line = _locked_work(work)
     if work_row.warehouse != warehouse:
@@ -588,7 +769,9 @@ def release_work(idempotency_key, warehouse, work, device_id=None, notes=None):
         """,
         (event.name, now_datetime(), frappe.session.user, work),
     )
-    return _event_result(event)
+    work_row.update(status="Cancelled", last_event=event.name)
+    line.update(state="Cancelled", allocated_qty=0)
+    return _event_result(event, work_state=_work_state(work_row, line))
 
 
 @frappe.whitelist(methods=["POST"])
@@ -614,10 +797,6 @@ def complete_replenishment(
     replay = _existing_event(key, hash_value)
     if replay:
         return replay
-    if frappe.db.get_value(
-        MOVEMENT_DOCTYPE, {"idempotency_key": key}, "name"
-    ):
-        _conflict(_("Idempotency Key was already used for a physical movement"))
 
     work_row, line = _locked_work(work)
     if work_row.warehouse != warehouse:
@@ -768,7 +947,9 @@ def complete_replenishment(
             work,
         ),
     )
-    return _event_result(event)
+    work_row.update(status="Completed", last_event=event.name)
+    line.update(state="Completed", allocated_qty=0, executed_qty=float(qty))
+    return _event_result(event, work_state=_work_state(work_row, line))
 
 
 PICK_SHORTAGE_CODES = {
@@ -814,9 +995,20 @@ def scan_pick(
     replay = _existing_event(key, hash_value)
     if replay:
         return replay
-    if frappe.db.get_value(MOVEMENT_DOCTYPE, {"idempotency_key": key}, "name"):
-        _conflict(_("Idempotency Key was already used for a physical movement"))
+    return _execute_pick_scan(payload, hash_value, scan_qty, notes)
+
+
+def _execute_pick_scan(payload, hash_value, scan_qty, notes=None):
+    """Apply one validated pick scan to its work, balance and parcel summary.
 
+    Shared by scan_pick and the consolidated wave scan, which records each
+    parcel's share as its own event under a derived key.
+    """
+    key = payload["idempotency_key"]
+    warehouse = payload["warehouse"]
+    work = payload["work"]
+    scanned_bin = payload["scanned_bin"]
+    scanned_item_code = payload["scanned_item_code"]
     work_row, line = _locked_work(work)
     if work_row.warehouse != warehouse:
         frappe.throw(_("WMS Work does not belong to warehouse {0}").format(warehouse))
@@ -952,7 +1144,21 @@ def scan_pick(
         """,
         tuple(parameters),
     )
-    return _event_result(event)
+    _queue_replenishment_check(warehouse, line.item_code, line.source_bin)
+    if state_after == "Completed" and work_row.parcel_awb:
+        record_completed_pick(
+            work_row.parcel_awb,
+            work_row.reference_name,
+            warehouse,
+            work,
+            line.item_code,
+            executed,
+        )
+    work_row.update(status=state_after, last_event=event.name)
+    line.update(
+        state=state_after, allocated_qty=float(remaining), executed_qty=float(executed)
+    )
+    return _event_result(event, work_state=_work_state(work_row, line))
 
 
 @frappe.whitelist(methods=["POST"])
@@ -991,8 +1197,6 @@ def close_pick_shortage(
     replay = _existing_event(key, hash_value)
     if replay:
         return replay
-    if frappe.db.get_value(MOVEMENT_DOCTYPE, {"idempotency_key": key}, "name"):
-        _conflict(_("Idempotency Key was already used for a physical movement"))
 
     work_row, line = _locked_work(work)
     if work_row.warehouse != warehouse:
@@ -1077,7 +1281,10 @@ def close_pick_shortage(
         """,
         (event.name, now, frappe.session.user, now, frappe.session.user, work),
     )
-    return _event_result(event)
+    _queue_replenishment_check(warehouse, line.item_code, line.source_bin)
+    work_row.update(status="Short", last_event=event.name)
+    line.update(state="Short", allocated_qty=0)
+    return _event_result(event, work_state=_work_state(work_row, line))
 
 
 @frappe.whitelist(methods=["GET"])
@@ -0,0 +1,67 @@
+import pytest
+
+from solara_wms.wms.cycle_count_domain import (
+    CountCandidate,
+    CycleCountPlanError,
+    bin_class,
+    classify_abc,
+    plan_daily_counts,
+)
+
+
+CYCLES = {"A": 30, "B": 90, "C": 180}
+
+
+def test_value_and_velocity_both_promote_an_item_to_a():
+    classes = classify_abc(
+        {
+            "SKU-DEAR": (90000, 1),
+            "SKU-FAST": (500, 400),
+            "SKU-MID": (5000, 60),
+            "SKU-SLOW": (100, 2),
+            "SKU-DEAD": (0, 0),
+        }
+    )
+
+    assert classes["SKU-DEAR"] == "A"
+    assert classes["SKU-FAST"] == "A"
+    assert classes["SKU-MID"] == "B"
+    assert classes["SKU-DEAD"] == "C"
+    assert bin_class([classes["SKU-SLOW"], classes["SKU-MID"]]) == "B"
+    assert bin_class([]) == "C"
+
+
+def test_flagged_bins_come_first_and_shifts_are_balanced_within_budget():
+    candidates = [
+        CountCandidate("BIN-C", "C", items=2, days_since_count=400),
+        CountCandidate("BIN-A", "A", items=1, days_since_count=20),
+        CountCandidate("BIN-SHORT", "B", items=3, days_since_count=5, shortages=1),
+        CountCandidate("BIN-NEW", "A", items=4),
+        CountCandidate("BIN-FRESH", "A", items=1, days_since_count=3),
+        CountCandidate("BIN-BIG", "C", items=40, days_since_count=200),
+    ]
+
+    plan = plan_daily_counts(
+        candidates, CYCLES, capacity_minutes=40, shifts=2,
+        minutes_per_bin=5, minutes_per_item=1,
+    )
+
+    assert [(p["bin"], p["shift"], p["reason"]) for p in plan["planned"]] == [
+        ("BIN-SHORT", 1, "Pick shortage"),
+        ("BIN-NEW", 2, "Never counted"),
+        ("BIN-C", 1, "Overdue"),
+        ("BIN-A", 2, "Due"),
+    ]
+    assert plan["deferred"] == ["BIN-BIG"]
+    assert plan["shift_minutes"] == [15, 15]
+    assert "BIN-FRESH" not in [p["bin"] for p in plan["planned"]] + plan["deferred"]
+    assert plan["required_minutes"] == round(
+        6 / 30 + 8 / 90 + 7 / 180 + 9 / 30 + 6 / 30 + 45 / 180, 1
+    )
+
+
+def test_plan_rejects_invalid_budgets():
+    with pytest.raises(CycleCountPlanError, match="shift"):
+        plan_daily_counts([], CYCLES, 60, shifts=0)
+    with pytest.raises(CycleCountPlanError, match="cycle"):
+        plan_daily_counts([], {"A": 30, "B": 0, "C": 90}, 60)
@@ -0,0 +1,56 @@
+import pytest
+
+from solara_wms.wms.load_test_plan import (
+    StageStats,
+    format_report,
+    percentile,
+    plan_synthetic_day,
+    synthetic_awbs,
+)
+
+
+def test_plan_scales_baseline_and_is_deterministic():
+    plan = plan_synthetic_day(["SHP-1", "SHP-2"], multiple=4, baseline=250, seed=7)
+
+    assert len(plan) == 1000
+    assert plan == plan_synthetic_day(["SHP-1", "SHP-2"], multiple=4, baseline=250, seed=7)
+    assert len({order["shopify_order_id"] for order in plan}) == 1000
+    minutes = [order["arrival_minute"] for order in plan]
+    assert minutes == sorted(minutes)
+    assert 0 <= minutes[0] and minutes[-1] < 24 * 60
+
+
+def test_plan_rejects_empty_templates_and_non_positive_volume():
+    with pytest.raises(ValueError):
+        plan_synthetic_day([])
+    with pytest.raises(ValueError):
+        plan_synthetic_day(["SHP-1"], multiple=0)
+
+
+def test_synthetic_awbs_are_one_per_box_and_tagged():
+    assert synthetic_awbs("LTAB12", 42, 3) == [
+        "LTAB12000042B1", "LTAB12000042B2", "LTAB12000042B3"]
+    assert synthetic_awbs("LTAB12", 42, 0) == ["LTAB12000042B1"]
+
+
+def test_percentile_is_nearest_rank():
+    assert percentile([], 95) is None
+    assert percentile([5, 1, 3, 2, 4], 50) == 3
+    assert percentile(list(range(1, 101)), 95) == 95
+    assert percentile([7], 99) == 7
+
+
+def test_stage_summary_reports_headroom_against_the_shift():
+    stats = StageStats("pack")
+    for _ in range(60):
+        stats.record(0.5, query_count=12)
+    stats.wall_seconds = 30.0
+
+    summary = stats.summary(day_units=6000, shift_hours=10)
+
+    assert summary["per_minute"] == 120.0
+    assert summary["required_per_minute"] == 10.0
+    assert summary["headroom"] == 12.0
+    assert summary["p95_ms"] == 500.0
+    assert summary["queries_per_unit"] == 12.0
+    assert "pack" in format_report([summary])
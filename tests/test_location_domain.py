@@ -3,6 +3,7 @@ import pytest
 from solara_wms.wms.location_domain import (
     LocationMasterError,
     location_id_from_scan,
+    location_row_chunks,
     qr_payload,
     validate_location_row,
     validate_location_rows,
@@ -50,3 +51,28 @@ def test_import_rejects_duplicate_identity_and_display_code():
     rows, errors = validate_location_rows([base_row(), base_row()])
     assert len(rows) == 1
     assert errors == [{"row": 2, "error": "Duplicate Location ID in import"}]
+
+
+def test_chunked_validation_numbers_rows_and_catches_cross_chunk_duplicates():
+    rows = [
+        base_row(),
+        base_row(location_id="HYD-L0002", display_code="HYD-FW-CW-A02"),
+        base_row(location_id="HYD-L0003", display_code="HYD-FW-CW-A01"),
+        base_row(location_id="HYD-L0004", display_code="HYD-FW-CW-A04", zone_type="Attic"),
+    ]
+    chunks = list(location_row_chunks(iter(rows), 2))
+    assert [(start, len(chunk)) for start, chunk in chunks] == [(1, 2), (3, 2)]
+
+    seen = (set(), set())
+    results = [validate_location_rows(chunk, start=start, seen=seen) for start, chunk in chunks]
+
+    assert [len(normalized) for normalized, _errors in results] == [2, 0]
+    assert results[1][1] == [
+        {"row": 3, "error": "Duplicate Display Code in import"},
+        {"row": 4, "error": "Zone Type is invalid"},
+    ]
+
+
+def test_row_chunks_reject_empty_size():
+    with pytest.raises(LocationMasterError, match="at least 1"):
+        list(location_row_chunks([base_row()], 0))
@@ -0,0 +1,60 @@
+import pytest
+
+from solara_wms.wms.shopify_cost import CostBucket, is_throttled
+
+
+def _body(available, maximum=2000, rate=100):
+    return {
+        "data": {},
+        "extensions": {"cost": {
+            "requestedQueryCost": 12,
+            "actualQueryCost": 10,
+            "throttleStatus": {
+                "maximumAvailable": maximum,
+                "currentlyAvailable": available,
+                "restoreRate": rate,
+            },
+        }},
+    }
+
+
+def test_bucket_reanchors_on_throttle_status_and_refills_between_calls():
+    bucket = CostBucket(1000, 1000, 50, updated_at=0)
+
+    assert bucket.observe_graphql(_body(40), now=10)
+    assert (bucket.maximum, bucket.restore_rate) == (2000, 100)
+    assert bucket.level(10) == 40
+    assert bucket.level(12) == 240
+    assert bucket.level(100) == 2000
+    assert bucket.wait_for(140, now=10) == 1.0
+    assert bucket.wait_for(30, now=10) == 0
+
+    bucket.spend(30, now=10)
+    assert bucket.level(10) == 10
+    assert not bucket.observe_graphql({"data": {}}, now=11)
+
+
+def test_batch_is_sized_to_budget_now_plus_restore_over_the_tick():
+    bucket = CostBucket(1000, 100, 50, updated_at=0)
+
+    assert bucket.affordable(22, window=240, now=0) == (100 + 240 * 50) // 22
+    drained = CostBucket(1000, 0, 0, updated_at=0)
+    assert drained.affordable(22, window=240, now=0) == 0
+    assert drained.wait_for(1, now=0) == float("inf")
+    with pytest.raises(ValueError):
+        bucket.affordable(0, window=240, now=0)
+
+
+def test_rest_call_limit_header_and_throttled_errors():
+    bucket = CostBucket(40, 40, 2, updated_at=0)
+
+    assert bucket.observe_rest("32/40", now=5)
+    assert bucket.level(5) == 8
+    assert bucket.wait_for(10, now=5) == 1.0
+    assert not bucket.observe_rest(None, now=6)
+
+    assert is_throttled({"errors": [{"message": "Throttled",
+                                     "extensions": {"code": "THROTTLED"}}]})
+    assert not is_throttled({"errors": [{"message": "Field missing"}]})
+    assert not is_throttled({"errors": "Not Found"})
+    assert not is_throttled(None)
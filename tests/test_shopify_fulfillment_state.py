@@ -0,0 +1,58 @@
+from solara_wms.wms.fake_shopify import FakeShopifyGraphQL
+from solara_wms.wms.shopify_cost import is_throttled
+from solara_wms.wms.shopify_fulfillment_state import (
+    OrderState,
+    fulfillment_action,
+    order_states_query,
+    parse_order_states,
+    query_cost,
+)
+
+
+def test_one_aliased_query_reads_every_order_state():
+    shop = FakeShopifyGraphQL()
+    shop.add_order("101")
+    shop.add_order("102", open_fulfillment_orders=0, fulfillments=[(["A1"], "SUCCESS")])
+    query, aliases = order_states_query(["101", "102", "999"])
+
+    status, body = shop.handle({"query": query})
+    states = parse_order_states(body, aliases)
+
+    assert status == 200
+    assert shop.calls == {"order_states": 1}
+    assert set(states) == {"101", "102"}
+    assert states["101"].open_fulfillment_orders == ["gid://shopify/FulfillmentOrder/1010"]
+    assert states["102"].fulfillments == [("1", "success", {"A1"})]
+    assert body["extensions"]["cost"]["requestedQueryCost"] == query_cost(3)
+
+
+def test_action_creates_repairs_or_leaves_foreign_fulfillments_alone():
+    fresh = OrderState(open_fulfillment_orders=["FO-1"])
+    ours_short = OrderState(fulfillments=[("7", "success", {"A1", "A2"})])
+    foreign = OrderState(fulfillments=[("8", "success", {"X9"})])
+    cancelled = OrderState(fulfillments=[("9", "cancelled", {"A1", "A2", "A3"})],
+                           open_fulfillment_orders=["FO-2"])
+
+    assert fulfillment_action(fresh, ["A1"]) == ("create", ["FO-1"])
+    assert fulfillment_action(ours_short, ["A1", "A2"]) == ("in_sync", None)
+    assert fulfillment_action(ours_short, ["A1", "A2", "A3"]) == ("repair", "7")
+    assert fulfillment_action(foreign, ["A1"]) == ("no_open_fo", None)
+    assert fulfillment_action(cancelled, ["A1", "A2", "A3"]) == ("create", ["FO-2"])
+
+
+def test_fake_server_throttles_past_its_budget_and_recovers_with_time():
+    now = [0.0]
+    shop = FakeShopifyGraphQL(maximum=50, restore_rate=10, clock=lambda: now[0])
+    for order_id in ("1", "2", "3", "4"):
+        shop.add_order(order_id)
+    query, _aliases = order_states_query(["1", "2", "3"])
+
+    assert not is_throttled(shop.handle({"query": query})[1])
+    status, body = shop.handle({"query": query})
+    assert is_throttled(body)
+    assert body["extensions"]["cost"]["throttleStatus"]["currentlyAvailable"] == 7
+    assert shop.throttled == 1
+
+    now[0] = 4.0
+    assert not is_throttled(shop.handle({"query": query})[1])
+    assert shop.calls == {"order_states": 3}
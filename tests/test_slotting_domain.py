@@ -0,0 +1,56 @@
+from solara_wms.wms.slotting_domain import (
+    Placement,
+    placement_cost,
+    project_swaps,
+    propose_swaps,
+)
+
+
+def test_fast_mover_at_the_back_is_swapped_with_a_slow_one_up_front():
+    placements = [
+        Placement("SKU-FAST", "BIN-90", 90, visits=50),
+        Placement("SKU-SLOW", "BIN-10", 10, visits=2),
+        Placement("SKU-MID", "BIN-50", 50, visits=20),
+    ]
+
+    swaps = propose_swaps(placements, max_swaps=1)
+
+    assert swaps == [{
+        "gain": 48 * 80,
+        "fast_item": "SKU-FAST",
+        "fast_from_bin": "BIN-90",
+        "slow_item": "SKU-SLOW",
+        "slow_from_bin": "BIN-10",
+    }]
+    projection = project_swaps(placements, swaps)
+    assert projection["travel_before"] == placement_cost(placements) == 5520
+    assert projection["reduction"] == 48 * 80
+    assert projection["reduction_pct"] == 69.6
+
+
+def test_swaps_are_disjoint_bounded_and_respect_slot_class():
+    placements = [
+        Placement("SKU-A", "BIN-90", 90, visits=50, slot_class="S-5X6"),
+        Placement("SKU-B", "BIN-10", 10, visits=1, slot_class="L-10X12"),
+        Placement("SKU-C", "BIN-20", 20, visits=2, slot_class="S-5X6"),
+        Placement("SKU-D", "BIN-80", 80, visits=40, slot_class="S-5X6"),
+        Placement("SKU-E", "BIN-30", 30, visits=3, slot_class="S-5X6"),
+    ]
+
+    swaps = propose_swaps(placements, max_swaps=5)
+
+    assert [(s["fast_item"], s["slow_item"]) for s in swaps] == [
+        ("SKU-A", "SKU-C"),
+        ("SKU-D", "SKU-E"),
+    ]
+    assert propose_swaps(placements, max_swaps=1) == swaps[:1]
+
+
+def test_placement_already_ordered_by_velocity_needs_no_swaps():
+    placements = [
+        Placement("SKU-A", "BIN-10", 10, visits=9),
+        Placement("SKU-B", "BIN-20", 20, visits=5),
+    ]
+
+    assert propose_swaps(placements) == []
+    assert project_swaps(placements, [])["reduction"] == 0
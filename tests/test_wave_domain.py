@@ -0,0 +1,58 @@
+from decimal import Decimal
+
+import pytest
+
+from solara_wms.wms.inventory_domain import InventoryInvariantError
+from solara_wms.wms.wave_domain import (
+    consolidate_wave_picks,
+    distribute_wave_scan,
+    put_wall_slots,
+)
+
+
+def demand(work, awb, item="SKU-1", bin="BIN-A", qty=1, route=100, dn=None):
+    return {
+        "work": work,
+        "parcel_awb": awb,
+        "delivery_note": dn or "DN-" + awb,
+        "item_code": item,
+        "source_bin": bin,
+        "route_sequence": route,
+        "open_qty": qty,
+    }
+
+
+def test_put_wall_slots_follow_batch_order_and_are_stable_per_parcel():
+    slots = put_wall_slots([(2, "AWB-B"), (1, "AWB-A2"), (1, "AWB-A1"), (2, "AWB-B")])
+
+    assert slots == {"AWB-A1": 1, "AWB-A2": 2, "AWB-B": 3}
+
+
+def test_same_bin_and_item_is_visited_once_for_the_whole_wave():
+    slots = {"AWB-1": 1, "AWB-2": 2, "AWB-3": 3}
+    picks = consolidate_wave_picks(
+        [
+            demand("W-3", "AWB-3", qty=2),
+            demand("W-1", "AWB-1", qty=1),
+            demand("W-2", "AWB-2", item="SKU-2", bin="BIN-B", route=50),
+            demand("W-4", "AWB-2", qty=0),
+        ],
+        slots,
+    )
+
+    assert [(p["source_bin"], p["item_code"], p["qty"]) for p in picks] == [
+        ("BIN-B", "SKU-2", Decimal("1")),
+        ("BIN-A", "SKU-1", Decimal("3")),
+    ]
+    assert [(p["slot"], p["work"]) for p in picks[1]["parcels"]] == [(1, "W-1"), (3, "W-3")]
+
+
+def test_scan_is_sorted_back_to_parcels_lowest_slot_first():
+    parcels = [{"work": "W-1", "qty": 2}, {"work": "W-2", "qty": 3}]
+
+    assert distribute_wave_scan(4, parcels) == [
+        ("W-1", Decimal("2")),
+        ("W-2", Decimal("2")),
+    ]
+    with pytest.raises(InventoryInvariantError, match="exceeds open parcel demand"):
+        distribute_wave_scan(6, parcels)
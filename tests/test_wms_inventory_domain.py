@@ -8,16 +8,20 @@ from solara_wms.wms.inventory_domain import (
     BalanceState,
     InventoryInvariantError,
     allocate_balance,
+    apply_count_adjustment,
     apply_internal_move,
     canonical_qty,
     complete_allocated_move,
     evaluate_blind_count,
     execute_allocated_pick,
     match_pack_handoff,
+    PickCandidate,
+    plan_pick_allocation,
     plan_replenishment,
     release_allocation,
     reconcile_inventory_bridge,
     request_hash,
+    velocity_replenishment_policy,
 )
 
 
@@ -166,6 +170,87 @@ def test_replenishment_is_not_created_at_or_above_minimum():
         )
 
 
+def test_velocity_policy_covers_lead_time_and_released_demand():
+    # 240 picked over 48h -> 5/h; 2h lead, 8h cover, 12 already released.
+    assert velocity_replenishment_policy(240, 48, 12, 2, 8) == (
+        Decimal("22"),
+        Decimal("62"),
+    )
+
+
+def test_velocity_policy_keeps_item_location_floor_and_capacity():
+    assert velocity_replenishment_policy(0, 48, 0, 2, 8, minimum_qty=10) == (
+        Decimal("10"),
+        Decimal("10"),
+    )
+    assert velocity_replenishment_policy(
+        240, 48, 12, 2, 8, minimum_qty=5, maximum_qty=40
+    ) == (Decimal("22"), Decimal("40"))
+    with pytest.raises(InventoryInvariantError, match="trigger window"):
+        velocity_replenishment_policy(10, 0, 0, 2, 8)
+
+
+def _candidate(bin, available, role_rank=0, priority=10, route_sequence=0):
+    return PickCandidate(bin, Decimal(available), role_rank, priority, route_sequence)
+
+
+def test_pick_allocation_prefers_one_home_bin_that_is_emptied():
+    splits = plan_pick_allocation(
+        6,
+        [
+            _candidate("BIN-FAR", 6, route_sequence=900),
+            _candidate("BIN-NEAR", 40, route_sequence=100),
+            _candidate("BIN-RESERVE", 6, role_rank=2),
+        ],
+    )
+
+    assert splits == [("BIN-FAR", Decimal("6"))]
+
+
+def test_pick_allocation_drains_home_before_splitting_into_reserve():
+    splits = plan_pick_allocation(
+        10,
+        [
+            _candidate("BIN-RESERVE", 50, role_rank=2, route_sequence=100),
+            _candidate("BIN-HOME-B", 3, route_sequence=300),
+            _candidate("BIN-HOME-A", 4, priority=1, route_sequence=500),
+        ],
+    )
+
+    # Route order for the picker; only the Reserve bin is left partially picked.
+    assert splits == [
+        ("BIN-RESERVE", Decimal("3")),
+        ("BIN-HOME-B", Decimal("3")),
+        ("BIN-HOME-A", Decimal("4")),
+    ]
+
+
+def test_pick_allocation_splits_a_tier_into_its_fewest_bins():
+    splits = plan_pick_allocation(
+        9,
+        [
+            _candidate("BIN-HOME-A", 2, route_sequence=100),
+            _candidate("BIN-HOME-B", 3, route_sequence=200),
+            _candidate("BIN-HOME-C", 6, route_sequence=300),
+            _candidate("BIN-RESERVE", 40, role_rank=2, route_sequence=400),
+        ],
+    )
+
+    # Home can supply it all: two Home stops, no Reserve, and no third stop.
+    assert splits == [("BIN-HOME-B", Decimal("3")), ("BIN-HOME-C", Decimal("6"))]
+
+
+def test_pick_allocation_conserves_quantity_or_refuses_the_whole_line():
+    candidates = [_candidate("BIN-A", 2), _candidate("BIN-B", 3)]
+    splits = plan_pick_allocation(5, candidates)
+    assert sum(qty for _bin, qty in splits) == 5
+
+    with pytest.raises(InventoryInvariantError, match="across bins"):
+        plan_pick_allocation(6, candidates)
+    with pytest.raises(InventoryInvariantError, match="greater than zero"):
+        plan_pick_allocation(0, candidates)
+
+
 def test_blind_count_match_needs_no_recount():
     result = evaluate_blind_count(25, 25)
     assert result["status"] == "Matched"
@@ -185,6 +270,18 @@ def test_blind_count_mismatch_requires_same_independent_recount():
     assert disagreed["accepted_qty"] is None
 
 
+def test_count_adjustment_keeps_reservations_and_refuses_to_undercut_them():
+    balance = BalanceState.from_values(25, 3, 2)
+
+    after, delta = apply_count_adjustment(balance, 23)
+
+    assert after == BalanceState.from_values(23, 3, 2)
+    assert delta == Decimal("-2")
+    assert apply_count_adjustment(balance, 30)[1] == Decimal("5")
+    with pytest.raises(InventoryInvariantError, match="below allocated plus held"):
+        apply_count_adjustment(balance, 4)
+
+
 @pytest.mark.parametrize("qty", [-1, "NaN", "Infinity"])
 def test_blind_count_rejects_invalid_quantity(qty):
     with pytest.raises(InventoryInvariantError):
@@ -51,6 +51,9 @@ def test_new_doctype_json_is_valid():
         LEGACY / "wms_work_line/wms_work_line.json",
         LEGACY / "wms_pack_handoff/wms_pack_handoff.json",
         LEGACY / "wms_pack_handoff_line/wms_pack_handoff_line.json",
+        LEGACY / "wms_parcel_pick_summary/wms_parcel_pick_summary.json",
+        LEGACY / "wms_idempotency_ledger/wms_idempotency_ledger.json",
+        LEGACY / "wms_erp_outbox/wms_erp_outbox.json",
         LEGACY / "wms_item_location/wms_item_location.json",
         LEGACY / "wms_settings/wms_settings.json",
         LEGACY / "warehouse_bin/warehouse_bin.json",
@@ -171,6 +174,73 @@ def test_pack_handoff_is_opt_in_append_only_and_one_time():
     assert "dispatch_pack_handoff_status" in dispatch
 
 
+def test_parcel_pick_lookup_is_indexed_and_summarised():
+    work = (LEGACY / "wms_work/wms_work.py").read_text()
+    assert 'add_index("WMS Work", ["parcel_awb", "status", "pack_handoff"])' in work
+
+    summary = json.loads(
+        (LEGACY / "wms_parcel_pick_summary/wms_parcel_pick_summary.json").read_text()
+    )
+    fields = {field["fieldname"]: field for field in summary["fields"]}
+    assert fields["awb"]["unique"] == 1
+    assert summary["track_changes"] == 0
+
+    service = (ROOT / "solara_wms" / "wms" / "pack_handoff.py").read_text()
+    status = service.split("def pack_handoff_status", 1)[1].split(
+        "def consume_pack_handoff", 1
+    )[0]
+    assert "_summary_rows(" in status
+    assert "_completed_pick_rows(" not in status
+    assert "record_completed_pick(" in (
+        ROOT / "solara_wms" / "wms" / "work.py"
+    ).read_text()
+
+
+def test_command_keys_resolve_through_one_ledger():
+    ledger = json.loads(
+        (LEGACY / "wms_idempotency_ledger/wms_idempotency_ledger.json").read_text()
+    )
+    fields = {field["fieldname"]: field for field in ledger["fields"]}
+    assert fields["idempotency_key"]["unique"] == 1
+    assert fields["recorded_at"]["search_index"] == 1
+
+    work = (ROOT / "solara_wms" / "wms" / "work.py").read_text()
+    assert "MOVEMENT_DOCTYPE" not in work
+    assert "_record_idempotency(" in work.split("def _work_event", 1)[1]
+    inventory = (ROOT / "solara_wms" / "wms" / "inventory.py").read_text()
+    assert inventory.count("_record_idempotency(key, hash_value") == 2
+    hooks = (ROOT / "solara_wms" / "hooks.py").read_text()
+    assert "solara_wms.wms.inventory.archive_idempotency_ledger" in hooks
+
+
+def test_legacy_completions_queue_erp_drafts_through_the_outbox():
+    for relative in ("wms_task/wms_task.py", "wms_asn/wms_asn.py"):
+        source = (LEGACY / relative).read_text()
+        assert "enqueue_erp_draft(" in source, relative
+        new_docs = [
+            node.args[0].value
+            for node in ast.walk(ast.parse(source))
+            if isinstance(node, ast.Call)
+            and isinstance(node.func, ast.Attribute)
+            and node.func.attr == "new_doc"
+            and isinstance(node.args[0], ast.Constant)
+        ]
+        assert not set(new_docs) & {
+            "Stock Entry", "Stock Reconciliation", "Purchase Receipt"
+        }, f"{relative} prepares ERP drafts inline"
+
+    outbox = (ROOT / "solara_wms" / "wms" / "erp_outbox.py").read_text()
+    calls = {
+        node.func.attr
+        for node in ast.walk(ast.parse(outbox))
+        if isinstance(node, ast.Call) and isinstance(node.func, ast.Attribute)
+    }
+    assert "submit" not in calls
+    assert 'mode != "Draft Handoff"' in outbox
+    hooks = (ROOT / "solara_wms" / "hooks.py").read_text()
+    assert "solara_wms.wms.erp_outbox.drain_erp_outbox" in hooks
+
+
 def test_item_location_is_warehouse_scoped():
     schema = json.loads(
         (LEGACY / "wms_item_location/wms_item_location.json").read_text()
@@ -299,3 +369,32 @@ def test_floor_completion_methods_are_execution_gated():
             if isinstance(node, ast.Call) and isinstance(node.func, ast.Name)
         }
         assert "require_wms_mode" in calls, f"{relative}:{method_name} is ungated"
+
+
+def test_wave_picking_records_through_parcel_pick_work():
+    service = (ROOT / "solara_wms" / "wms" / "wave_pick.py").read_text()
+    forbidden = [
+        node.func.attr
+        for node in ast.walk(ast.parse(service))
+        if isinstance(node, ast.Call)
+        and isinstance(node.func, ast.Attribute)
+        and node.func.attr in {"submit", "commit", "insert"}
+    ]
+    assert forbidden == []
+    assert "_require_shadow_write(warehouse)" in service
+    assert "_execute_pick_scan(" in service
+    assert "_execute_pick_scan(payload, hash_value" in (
+        ROOT / "solara_wms" / "wms" / "work.py"
+    ).read_text()
+
+
+def test_velocity_replenishment_is_opt_in_and_allocates_through_work():
+    settings = json.loads((LEGACY / "wms_settings/wms_settings.json").read_text())
+    fields = {field["fieldname"]: field for field in settings["fields"]}
+    assert fields["replenishment_trigger_enabled"]["default"] == "0"
+    service = (ROOT / "solara_wms" / "wms" / "replenishment.py").read_text()
+    assert "_require_shadow_write(warehouse)" in service
+    assert "_allocate_replenishment(" in service
+    assert ".commit(" not in service
+    hooks = (ROOT / "solara_wms" / "hooks.py").read_text()
+    assert "solara_wms.wms.replenishment.scheduled_replenishment" in hooks